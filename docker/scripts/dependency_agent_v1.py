@@ -36,11 +36,15 @@ Optional knobs:
   - DM_INSTANCE_ID          (skip IP detection; recommended if you can inject it)
   - DM_INSTANCE_IP          (use this IP for register() lookup)
   - DM_COMFYUI_DIR          (default: $WORKSPACE/ComfyUI)
+  - DM_COMFY_OUTPUT_DIR     (Comfy --output-directory, read directly for local outputs; default: $DM_COMFYUI_DIR/output)
+  - DM_COMFY_DIRECT_OUTPUTS_ENABLED (hard-link/read local Comfy outputs instead of fetching /view; default: true)
   - WORKSPACE               (default: /workspace)
   - DM_POLL_SECONDS         (default: 5)
   - DM_HEARTBEAT_SECONDS    (default: 30)
   - MAX_PARALLEL_DOWNLOADS  (default: 3)
-  - DM_STATE_PATH           (default: $WORKSPACE/dependency_agent_state.json)
+  - DM_STATE_PATH           (legacy JSON state file, imported into the SQLite store on first start and left in place for rollback; default: $WORKSPACE/dependency_agent_state.json)
+  - DM_STATE_STORE          (sqlite or json; default: sqlite)
+  - DM_STATE_DB_PATH        (SQLite state store; default: DM_STATE_PATH with a .sqlite3 suffix)
   - DM_ALLOWED_DOMAINS      (comma-separated allowlist for dependency/model downloads; default: huggingface.co,hf.co,civitai.red,civitai.com)
   - DM_INPUT_ALLOWED_DOMAINS (optional comma-separated allowlist for job input/prefetch downloads; default: allow all)
   - DM_DOWNLOAD_TOOL             (default: auto; options: auto, wget, python, aria2; auto prefers aria2c when installed)
@@ -63,6 +67,18 @@ Optional knobs:
   - DM_AGENT_RTDB_QUEUE_CLAIM_ENABLED (allow server-gated direct RTDB queue claims; default: true)
   - DM_AGENT_RTDB_LEASE_HEARTBEAT_ENABLED (allow server-gated active lease heartbeats through RTDB; default: true)
   - DM_COORDINATION_RUNTIME_FULL_SYNC_SECONDS (full RTDB runtime mirror inventory cadence; default: 900)
+  - DM_RUNTIME_DELTA_ENABLED      (patch only runtime mirror fields changed since the last acknowledged write,
+                                  with a snapshot every full-sync interval; default: true)
+  - DM_RUNTIME_GZIP_MIN_BYTES     (gzip+base64 inputCacheKeys/nodeContract into <name>Gzip when their JSON is
+                                  at least this large; default: 0 = off)
+  - DM_RUNTIME_DELTA_LOG          (append acknowledged runtime snapshot/delta records to this JSONL file;
+                                  replay with --replay-runtime-deltas FILE; default: unset)
+  - DM_RUNTIME_DELTA_LOG_MAX_BYTES (rotate the delta log to <file>.1 past this size; default: 64MiB)
+  - DM_RUNTIME_PROBES_ASYNC       (refresh heartbeat probes on background collectors; 0 runs them inline; default: true)
+  - DM_RUNTIME_PROBE_<NAME>_SECONDS / DM_RUNTIME_PROBE_<NAME>_TIMEOUT_SECONDS
+                                  (per-collector refresh interval and timeout; NAME is COMFY_REACHABLE 5/5,
+                                  NODE_CONTRACT 15/10, QUEUE_SUMMARY 2/5, MEMORY 5/2, SYSTEM_STATS 30/3,
+                                  INPUT_CACHE 30/30 or GPU_TELEMETRY 5/5)
   - DM_AGENT_WAITING_DEPS_EVENT_SECONDS (waiting_dependencies event cadence; default: 60)
   - DM_AGENT_DEPENDENCY_WAIT_POLL_SECONDS (dependency readiness poll while waiting; default: 0.5)
   - DM_AGENT_PROGRESS_EVENT_SECONDS (execution_progress event cadence; default: 60)
@@ -71,7 +87,10 @@ Optional knobs:
   - DM_AGENT_API_RETRY_MAX_SECONDS (max agent API retry backoff; default: 20)
   - DM_AGENT_TERMINAL_EVENT_RETRY_ATTEMPTS (extra retries for terminal job events; default: 8)
   - DM_AGENT_MAX_UPLOAD_WORKERS    (local output upload worker cap; default: max(4, exec*2))
-  - DM_VIDEO_OUTPUT_QUALITY_GATE_ENABLED (decode + entropy gate before video upload; default: true on video server types)
+  - DM_HTTP_POOL_ENABLED          (reuse keep-alive connections for API/RTDB/upload calls; default: true)
+  - DM_HTTP_POOL_MAX_PER_HOST     (pooled concurrent requests per host; default: 16)
+  - DM_HTTP_POOL_IDLE_SECONDS     (retire pooled connections idle longer than this; default: 30)
+  - DM_VIDEO_OUTPUT_QUALITY_GATE_ENABLED (decode + entropy gate before video upload; overlaps only staged GCS uploads; default: true on video server types)
   - DM_VIDEO_OUTPUT_MIN_NORMALIZED_LUMA_ENTROPY (median normalized luma entropy floor; default: 0.65)
   - DM_VIDEO_OUTPUT_CORRUPTION_SIGNATURE_ENABLED (H3 oversaturation/weak-motion safety gate; default: true on video_gen_v4)
   - DM_VIDEO_OUTPUT_SUSPICIOUS_SATURATION_FLOOR (H3 signalstats SATAVG median floor; default: 27)
@@ -79,6 +98,8 @@ Optional knobs:
   - DM_LOCAL_COMFY_BASE_URL       (local ComfyUI URL; default: http://127.0.0.1:8188)
   - DM_COMFY_NODE_TIMING_ENABLED  (capture native Comfy node-boundary timings; default: true on video_gen_v3/video_gen_v4)
   - DM_COMFY_NODE_TIMING_MAX_ROWS (maximum persisted slow-node rows per job; default/max: 64)
+  - DM_COMFY_EVENT_STREAM_ENABLED (learn prompt completion from Comfy's WebSocket instead of polling /history; default: true)
+  - DM_COMFY_EVENT_STREAM_HISTORY_SAFETY_SECONDS (/history check interval while the event stream is healthy; default: 30)
   - DM_LOCAL_READINESS_FILE       (readiness marker file in Comfy input dir; default: provisioning_complete.txt)
   - DM_VIDEO_GEN_V2_BOOTSTRAP_GATE_WAIT_SECONDS (max wait for the managed video bootstrap gate; default: 1800)
   - DM_VIDEO_GEN_V2_BOOTSTRAP_COMFY_WAIT_SECONDS (max post-gate wait for managed Comfy startup; default: 300)
@@ -87,13 +108,20 @@ Optional knobs:
   - DM_GPU_COORDINATOR_REQUIRED   (fail closed when coordinator discovery is unavailable; default: false)
   - DM_GPU_COORDINATOR_TOKEN      (optional bearer token for loopback coordinator requests)
   - DM_GPU_COORDINATOR_LEASE_TTL_SECONDS (renewable coordinator lease TTL; default: 60)
+  - GPU_NVML_DISABLED            (skip the optional gpu_nvml_sampler module and fork nvidia-smi; default: 0)
   - GPU_ADMISSION_MODE           (off, shadow, or enforcing; default: off)
   - DM_GPU_ADMISSION_MAX_DEPTH   (shared foreground queue bound; default: 64)
+  - DM_GPU_ADMISSION_LAYOUT      (root whole-root CAS or sharded per-ticket records; a root-layout holder
+                                  of active/ still blocks sharded claims, but waiting tickets without an
+                                  index/ entry are not FIFO-ordered, so enable it only once every writer of
+                                  a SERVER_TYPE, backend inference tickets included, emits them; default: root)
   - DM_COMFY_FULL_TRIM_MEM_AVAILABLE_GIB (full Comfy cache trim threshold; default: 24)
   - DM_COMFY_FULL_TRIM_MEMORY_PSI_AVG10 (full Comfy cache trim PSI avg10 threshold; default: 5)
   - DM_MINING_ONLY                (set to 1 for PRL mining-only instances; skips Comfy probes and job execution)
   - DM_INPUT_CACHE_DIR            (persistent remote-input cache dir; default: $WORKSPACE/.dm_input_cache)
   - DM_INPUT_CACHE_MAX_BYTES      (max remote-input cache size; default: 20GiB)
+  - DM_INPUT_CACHE_SCRUB_MIB_PER_SECOND (background re-verify rate for cold input cache entries; default: 0 = off)
+  - DM_INPUT_CACHE_SCRUB_INTERVAL_SECONDS (re-verify an input cache entry at most this often; default: 86400)
   - DM_AGENT_SELF_UPDATE_ENABLED  (allow backend-directed in-place script updates; default: true)
   - DM_AGENT_SELF_UPDATE_ALLOW_DOWNGRADE (allow backend-directed downgrades/rollbacks; default: false)
   - DM_AGENT_SELF_UPDATE_RETRY_SECONDS (retry delay after failed update attempts; default: 300)
@@ -112,6 +140,8 @@ from __future__ import annotations
 import ast
 import base64
 from collections import deque
+import copy
+import gzip
 import hashlib
 import http.client
 import ipaddress
@@ -122,10 +152,12 @@ import mimetypes
 import os
 import random
 import re
+import select
 import shlex
 import shutil
 import signal
 import socket
+import sqlite3
 import ssl
 import struct
 import subprocess
@@ -145,14 +177,16 @@ from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-
-AGENT_VERSION = "dm-agent-py/0.10.153"
+AGENT_VERSION = "dm-agent-py/0.10.168"
 RUNTIME_ENV_DELIVERY_KEYS = frozenset(("HF_TOKEN", "CIVITAI_TOKEN", "FURGEN_H3_ATTENTION_BACKEND"))
 VIDEO_GEN_V2_FURGENPUB_COMMIT = "f46d81937e578aaf6f2674cd5deb7982ea09b4bb"
 VIDEO_GEN_V2_FURGENPUB_RAW_BASE_URL = (
     f"https://raw.githubusercontent.com/Dodzilla/FurgenPub/{VIDEO_GEN_V2_FURGENPUB_COMMIT}/docker/support"
 )
 MAX_AGENT_ERROR_MESSAGE_CHARS = 4000
+RTDB_CLAIM_MAX_PARALLEL = 8
+# Ticket fields mirrored into the compact /gpuAdmission/{serverType}/index node.
+GPU_ADMISSION_INDEX_FIELDS = ("sequence", "state", "holder", "attached", "heartbeatAtMs", "expiresAtMs", "requestId")
 # Flags that control ComfyUI memory behaviour rather than transport/attention.
 # A restart that rebuilds COMFYUI_ARGS must carry these over from the
 # provisioning env; dropping them changes how the workload allocates VRAM.
@@ -690,7 +724,71 @@ def _read_tail_text(path: Path, max_bytes: int = 32768) -> str:
         return ""
 
 
+_gpu_nvml_sampler_module: Any = None
+
+
+def _gpu_nvml_sampler() -> Any:
+    """Import the optional sibling gpu_nvml_sampler module once it is on disk.
+
+    Provisioning scripts may download it after the agent starts, so a missing
+    module is retried on later calls rather than remembered.
+    """
+    global _gpu_nvml_sampler_module
+    if _gpu_nvml_sampler_module is None:
+        try:
+            import gpu_nvml_sampler
+        except ImportError:
+            return None
+        _gpu_nvml_sampler_module = gpu_nvml_sampler
+    return _gpu_nvml_sampler_module
+
+
+def _nvml_gpu_telemetry() -> Dict[str, Any]:
+    """GPU 0 telemetry from the shared in-process NVML sampler; {} to fall back to nvidia-smi."""
+    module = _gpu_nvml_sampler()
+    if module is None:
+        return {}
+    try:
+        sampler = module.shared_sampler()
+        reading = sampler.latest(max_age_seconds=2.0) if sampler is not None else None
+    except Exception:
+        return {}
+    devices = reading.get("devices") if isinstance(reading, dict) else None
+    if not devices or not isinstance(devices[0], dict):
+        return {}
+    device = devices[0]
+    out: Dict[str, Any] = {
+        "gpuName": str(device.get("name") or "")[:160],
+        "gpuTelemetryAtMs": int(reading.get("atMs") or _now_ms()),
+    }
+    for source, key, scale in (
+        ("utilizationGpuPct", "gpuUtilizationPct", 1.0),
+        ("memoryUsedBytes", "gpuMemoryUsedMb", 1024.0 ** 2),
+        ("memoryTotalBytes", "gpuMemoryTotalMb", 1024.0 ** 2),
+        ("powerDrawW", "gpuPowerDrawW", 1.0),
+        ("powerLimitW", "gpuPowerLimitW", 1.0),
+        ("temperatureC", "gpuTemperatureC", 1.0),
+        ("graphicsClockMhz", "gpuGraphicsClockMhz", 1.0),
+        ("smClockMhz", "gpuSmClockMhz", 1.0),
+        ("memoryClockMhz", "gpuMemoryClockMhz", 1.0),
+        ("videoClockMhz", "gpuVideoClockMhz", 1.0),
+    ):
+        value = device.get(source)
+        if isinstance(value, (int, float)) and value >= 0:
+            out[key] = float(value) / scale
+    if "gpuUtilizationPct" in out:
+        out["gpuUtilizationPct"] = min(100.0, out["gpuUtilizationPct"])
+    if device.get("pstate"):
+        out["gpuPstate"] = str(device["pstate"])[:32]
+    if device.get("throttleReasons"):
+        out["gpuClocksThrottleReasonsActive"] = str(device["throttleReasons"])[:200]
+    return out
+
+
 def _query_gpu_telemetry() -> Dict[str, Any]:
+    nvml = _nvml_gpu_telemetry()
+    if nvml:
+        return nvml
     fields = [
         "name",
         "utilization.gpu",
@@ -1069,6 +1167,194 @@ def _sha256_hex_bytes(value: bytes) -> str:
     return hashlib.sha256(value).hexdigest()
 
 
+RUNTIME_DELTA_FORMAT_VERSION = 1
+RUNTIME_GZIP_SECTIONS = ("agentControl/inputCacheKeys", "agentControl/nodeContract")
+RUNTIME_GZIP_SUFFIX = "Gzip"
+
+
+def _runtime_gzip_sections(payload: Dict[str, Any], min_bytes: int) -> None:
+    """Replace large runtime sections in place with a ``<name>Gzip`` base64 sibling.
+
+    The plain key is set to ``None`` so a reader never sees a stale copy next to
+    the compressed one, and a section that shrinks below the threshold clears
+    its stale ``Gzip`` sibling.  ``mtime=0`` keeps the bytes stable so an
+    unchanged section diffs as unchanged.
+    """
+    if min_bytes <= 0:
+        return
+    for section in RUNTIME_GZIP_SECTIONS:
+        parent_path, _, key = section.rpartition("/")
+        parent: Any = payload
+        for part in parent_path.split("/"):
+            parent = parent.get(part) if isinstance(parent, dict) else None
+        if not isinstance(parent, dict) or parent.get(key) is None:
+            continue
+        raw = _canonical_json_bytes(parent[key])
+        if len(raw) < min_bytes:
+            parent[key + RUNTIME_GZIP_SUFFIX] = None
+            continue
+        parent[key + RUNTIME_GZIP_SUFFIX] = base64.b64encode(gzip.compress(raw, mtime=0)).decode("ascii")
+        parent[key] = None
+
+
+def _runtime_gunzip_sections(state: Dict[str, Any]) -> None:
+    for section in RUNTIME_GZIP_SECTIONS:
+        parent_path, _, key = section.rpartition("/")
+        parent: Any = state
+        for part in parent_path.split("/"):
+            parent = parent.get(part) if isinstance(parent, dict) else None
+        if not isinstance(parent, dict) or not isinstance(parent.get(key + RUNTIME_GZIP_SUFFIX), str):
+            continue
+        encoded = parent.pop(key + RUNTIME_GZIP_SUFFIX)
+        parent[key] = json.loads(gzip.decompress(base64.b64decode(encoded)).decode("utf-8"))
+
+
+class RuntimeDeltaEncoder:
+    """Turns flattened runtime patches into acknowledged snapshot/delta records.
+
+    A record is ``{"v", "seq", "baseSeq", "kind", "atMs", "set"}`` where ``set``
+    maps slash-separated paths below the runtime root to their new value
+    (``null`` deletes).  A ``snapshot`` has ``baseSeq`` null and carries every
+    path; a ``delta`` carries only the paths whose value differs from the last
+    acknowledged record and applies on top of record ``baseSeq``.  The baseline
+    only advances in ``acknowledge``, so a write that failed is folded into the
+    next delta.  ``replay_runtime_deltas`` rebuilds the document.
+    """
+
+    def __init__(self, log_path: str = "", log_max_bytes: int = 0):
+        self.log_path = log_path
+        self.log_max_bytes = max(0, int(log_max_bytes))
+        self.snapshot_at_ms = 0
+        self._seq = 0
+        self._acked: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(value: Any) -> str:
+        return _sha256_hex_bytes(_canonical_json_bytes(value))
+
+    def reset(self) -> None:
+        """Drop the baseline so the next record is a snapshot."""
+        with self._lock:
+            self.snapshot_at_ms = 0
+            self._acked = {}
+
+    def encode(self, flat: Dict[str, Any], snapshot: bool = False, at_ms: Optional[int] = None) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = bool(snapshot or self.snapshot_at_ms <= 0)
+            if snapshot:
+                changed = dict(flat)
+            else:
+                changed = {
+                    path: value
+                    for path, value in flat.items()
+                    if self._acked.get(path) != self._digest(value)
+                }
+            return {
+                "v": RUNTIME_DELTA_FORMAT_VERSION,
+                "seq": self._seq + 1,
+                "baseSeq": None if snapshot else self._seq,
+                "kind": "snapshot" if snapshot else "delta",
+                "atMs": int(at_ms if isinstance(at_ms, int) else _now_ms()),
+                "set": changed,
+            }
+
+    def acknowledge(self, record: Dict[str, Any]) -> None:
+        """Advance the baseline once ``record`` has been written."""
+        with self._lock:
+            snapshot = record.get("kind") == "snapshot"
+            # Two writers raced from the same baseline.  The later PATCH still
+            # lands on top of the earlier one, so renumber it onto the current
+            # sequence and resync with a snapshot next time.
+            raced = not snapshot and record.get("baseSeq") != self._seq
+            record["seq"] = self._seq + 1
+            if not snapshot:
+                record["baseSeq"] = self._seq
+            if snapshot:
+                self._acked = {}
+                self.snapshot_at_ms = int(record.get("atMs") or _now_ms())
+            for path, value in record["set"].items():
+                self._acked[path] = self._digest(value)
+            self._seq = record["seq"]
+            if raced:
+                self.snapshot_at_ms = 0
+            if self.log_path:
+                self._append_log(record)
+
+    def _append_log(self, record: Dict[str, Any]) -> None:
+        try:
+            with open(self.log_path, "ab") as handle:
+                handle.write(_canonical_json_bytes(record) + b"\n")
+                size = handle.tell()
+            if self.log_max_bytes and size >= self.log_max_bytes:
+                os.replace(self.log_path, self.log_path + ".1")
+                # The fresh file must open with a snapshot to be replayable.
+                self.snapshot_at_ms = 0
+        except OSError as exc:
+            logging.debug("Failed to append runtime delta log %s: %s", self.log_path, exc)
+
+
+def _runtime_delta_set(state: Dict[str, Any], path: str, value: Any) -> None:
+    parts = [part for part in path.split("/") if part]
+    if not parts:
+        return
+    # RTDB stores neither nulls nor empty containers, and drops parents left empty.
+    delete = value is None or value == {} or value == []
+    node = state
+    trail: List[Tuple[Dict[str, Any], str]] = []
+    for part in parts[:-1]:
+        child = node.get(part)
+        if not isinstance(child, dict):
+            if delete:
+                return
+            child = node[part] = {}
+        trail.append((node, part))
+        node = child
+    if not delete:
+        node[parts[-1]] = copy.deepcopy(value)
+        return
+    node.pop(parts[-1], None)
+    for parent, key in reversed(trail):
+        if parent[key]:
+            break
+        del parent[key]
+
+
+def replay_runtime_deltas(records: Iterable[Dict[str, Any]], decode_gzip: bool = True) -> Dict[str, Any]:
+    """Rebuild the runtime document from a snapshot/delta record stream."""
+    state: Optional[Dict[str, Any]] = None
+    seq = 0
+    for record in records:
+        if not isinstance(record, dict) or record.get("v") != RUNTIME_DELTA_FORMAT_VERSION:
+            raise ValueError(f"Unsupported runtime delta record: {record!r:.200}")
+        kind = record.get("kind")
+        if kind == "snapshot":
+            state = {}
+        elif kind == "delta":
+            if state is None:
+                raise ValueError(f"Runtime delta seq={record.get('seq')} precedes any snapshot")
+            if record.get("baseSeq") != seq:
+                raise ValueError(
+                    f"Runtime delta seq={record.get('seq')} expects baseSeq={record.get('baseSeq')} but replay is at seq={seq}"
+                )
+        else:
+            raise ValueError(f"Unknown runtime delta kind: {kind!r}")
+        for path, value in sorted((record.get("set") or {}).items()):
+            _runtime_delta_set(state, path, value)
+        seq = int(record.get("seq") or 0)
+    state = state if state is not None else {}
+    if decode_gzip:
+        _runtime_gunzip_sections(state)
+    return state
+
+
+def _read_runtime_delta_log(path: str) -> Iterable[Dict[str, Any]]:
+    with open(path, "rb") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
 def _sleep_with_jitter(seconds: float, jitter_ratio: float = 0.2) -> None:
     if seconds <= 0:
         return
@@ -1176,7 +1462,111 @@ def disk_stats(path: Path) -> Dict[str, Any]:
     return out
 
 
-def _scan_deleted_open_files(base_paths: Iterable[Path], max_examples: int = 20) -> Dict[str, Any]:
+class ProcOpenFileIndex:
+    """Host-wide index of files held open by any process, built from ``/proc/*/fd``.
+
+    ``refresh`` re-lists every fd but only stats targets it has not seen on the
+    same ``(pid, fd)`` before, and never stats sockets, pipes or anon inodes, so
+    a refresh after the first is mostly ``readlink`` calls. Lookups match by
+    ``(st_dev, st_ino)`` and by the kernel's canonical target path, which keeps
+    the old path-based semantics while also catching hard links.
+    """
+
+    def __init__(self, proc_root: Path = Path("/proc")) -> None:
+        self.proc_root = proc_root
+        self._lock = threading.Lock()
+        # (pid, fd) -> (readlink target, (dev, ino) or None)
+        self._fd_cache: Dict[Tuple[str, str], Tuple[str, Optional[Tuple[int, int]]]] = {}
+        self._inodes: Set[Tuple[int, int]] = set()
+        self._targets: Set[str] = set()
+        self._deleted: List[Tuple[str, str, str]] = []
+        self.last_refresh_stats: Dict[str, int] = {}
+
+    def refresh(self) -> "ProcOpenFileIndex":
+        started = time.monotonic()
+        fd_cache: Dict[Tuple[str, str], Tuple[str, Optional[Tuple[int, int]]]] = {}
+        inodes: Set[Tuple[int, int]] = set()
+        targets: Set[str] = set()
+        deleted: List[Tuple[str, str, str]] = []
+        stat_calls = 0
+        fd_count = 0
+        try:
+            pids = [name for name in os.listdir(str(self.proc_root)) if name.isdigit()]
+        except Exception:
+            pids = []
+        with self._lock:
+            previous = self._fd_cache
+        for pid in pids:
+            fd_dir = os.path.join(str(self.proc_root), pid, "fd")
+            try:
+                fds = os.listdir(fd_dir)
+            except Exception:
+                continue
+            for fd in fds:
+                fd_path = os.path.join(fd_dir, fd)
+                try:
+                    target = os.readlink(fd_path)
+                except Exception:
+                    continue
+                if not target.startswith("/"):
+                    continue
+                fd_count += 1
+                is_deleted = target.endswith(" (deleted)")
+                clean_target = target[: -len(" (deleted)")] if is_deleted else target
+                cached = previous.get((pid, fd))
+                devino: Optional[Tuple[int, int]] = None
+                if cached is not None and cached[0] == target and not is_deleted:
+                    devino = cached[1]
+                else:
+                    try:
+                        st = os.stat(fd_path)
+                        devino = (int(st.st_dev), int(st.st_ino))
+                    except Exception:
+                        devino = None
+                    stat_calls += 1
+                fd_cache[(pid, fd)] = (target, devino)
+                targets.add(clean_target)
+                if devino is not None:
+                    inodes.add(devino)
+                if is_deleted:
+                    deleted.append((pid, fd, clean_target))
+        with self._lock:
+            self._fd_cache = fd_cache
+            self._inodes = inodes
+            self._targets = targets
+            self._deleted = deleted
+            self.last_refresh_stats = {
+                "pids": len(pids),
+                "fileFds": fd_count,
+                "statCalls": stat_calls,
+                "durationMs": int((time.monotonic() - started) * 1000),
+            }
+        return self
+
+    def is_open(self, path: Path) -> bool:
+        try:
+            st = os.stat(str(path))
+            devino: Optional[Tuple[int, int]] = (int(st.st_dev), int(st.st_ino))
+        except Exception:
+            devino = None
+        real_path = os.path.realpath(str(path))
+        with self._lock:
+            return (devino is not None and devino in self._inodes) or real_path in self._targets
+
+    def deleted_open_files(self) -> List[Tuple[str, str, str]]:
+        """Return ``(pid, fd, path)`` for every open fd whose file was unlinked."""
+        with self._lock:
+            return list(self._deleted)
+
+
+PROC_OPEN_FILES = ProcOpenFileIndex()
+
+
+def _scan_deleted_open_files(
+    base_paths: Iterable[Path],
+    max_examples: int = 20,
+    index: Optional[ProcOpenFileIndex] = None,
+) -> Dict[str, Any]:
     bases: List[str] = []
     for base in base_paths:
         try:
@@ -1191,79 +1581,37 @@ def _scan_deleted_open_files(base_paths: Iterable[Path], max_examples: int = 20)
     total_bytes = 0
     examples: List[Dict[str, Any]] = []
     truncated = False
-    proc = Path("/proc")
-    try:
-        pid_dirs = [p for p in proc.iterdir() if p.name.isdigit()]
-    except Exception:
-        return {"count": 0, "bytes": 0, "examples": [], "truncated": False}
-
-    for pid_dir in pid_dirs:
-        fd_dir = pid_dir / "fd"
+    open_files = index if index is not None else PROC_OPEN_FILES.refresh()
+    for pid, fd, clean_target in open_files.deleted_open_files():
         try:
-            fds = list(fd_dir.iterdir())
+            resolved_target = str(Path(clean_target).resolve())
         except Exception:
+            resolved_target = clean_target
+        if not any(resolved_target == base or resolved_target.startswith(base.rstrip("/") + "/") for base in bases):
             continue
-        for fd in fds:
-            try:
-                target = os.readlink(str(fd))
-            except Exception:
-                continue
-            if " (deleted)" not in target:
-                continue
-            clean_target = target.replace(" (deleted)", "")
-            try:
-                resolved_target = str(Path(clean_target).resolve())
-            except Exception:
-                resolved_target = clean_target
-            if not any(resolved_target == base or resolved_target.startswith(base.rstrip("/") + "/") for base in bases):
-                continue
+        size = 0
+        try:
+            size = int(os.stat(os.path.join(str(open_files.proc_root), pid, "fd", fd)).st_size)
+        except Exception:
             size = 0
-            try:
-                size = int(os.stat(str(fd)).st_size)
-            except Exception:
-                size = 0
-            count += 1
-            total_bytes += max(0, size)
-            if len(examples) < max_examples:
-                examples.append({
-                    "pid": pid_dir.name,
-                    "fd": fd.name,
-                    "path": clean_target[:500],
-                    "sizeBytes": int(size),
-                })
-            else:
-                truncated = True
+        count += 1
+        total_bytes += max(0, size)
+        if len(examples) < max_examples:
+            examples.append({
+                "pid": pid,
+                "fd": fd,
+                "path": clean_target[:500],
+                "sizeBytes": int(size),
+            })
+        else:
+            truncated = True
     return {"count": count, "bytes": int(total_bytes), "examples": examples, "truncated": truncated}
 
 
-def _is_path_open_by_process(path: Path) -> bool:
-    try:
-        target_path = str(path.resolve())
-    except Exception:
-        target_path = str(path)
-    proc = Path("/proc")
-    try:
-        pid_dirs = [p for p in proc.iterdir() if p.name.isdigit()]
-    except Exception:
-        return False
-    for pid_dir in pid_dirs:
-        fd_dir = pid_dir / "fd"
-        try:
-            fds = list(fd_dir.iterdir())
-        except Exception:
-            continue
-        for fd in fds:
-            try:
-                fd_target = os.readlink(str(fd)).replace(" (deleted)", "")
-            except Exception:
-                continue
-            try:
-                fd_target_resolved = str(Path(fd_target).resolve())
-            except Exception:
-                fd_target_resolved = fd_target
-            if fd_target_resolved == target_path:
-                return True
-    return False
+def _is_path_open_by_process(path: Path, index: Optional[ProcOpenFileIndex] = None) -> bool:
+    """True if any process holds ``path`` open; pass a refreshed ``index`` to check many paths."""
+    open_files = index if index is not None else PROC_OPEN_FILES.refresh()
+    return open_files.is_open(path)
 
 
 def _discard_oversized_partial(dest_partial: Path, expected_size_bytes: int, context: str) -> bool:
@@ -1516,6 +1864,311 @@ def _is_permanent_http_error(err: Exception) -> bool:
     return any(400 <= code < 500 for code in codes)
 
 
+class _PooledHost:
+    def __init__(self, max_connections: int) -> None:
+        self.slots = threading.BoundedSemaphore(max(1, int(max_connections)))
+        self.idle: List[Tuple[Any, float]] = []
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.retired_idle = 0
+        self.stale_retries = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.latency_ms_total = 0.0
+        self.latency_ms_max = 0.0
+
+
+class HttpConnectionPool:
+    """Thread-safe keep-alive HTTP(S) connection pool shared by the agent's executors.
+
+    Connections are keyed by (scheme, host, port) and reused LIFO so the warmest
+    TLS session serves the next request. Each host has a concurrency cap
+    (callers wait for a slot up to their timeout); idle connections older than
+    ``idle_seconds`` are retired, and a reused socket that the peer already
+    closed is detected before the request is written. Per-host latency and
+    reuse counters are available through ``snapshot()``.
+    """
+
+    IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+
+    def __init__(self, max_per_host: int = 16, idle_seconds: float = 30.0) -> None:
+        self.max_per_host = max(1, int(max_per_host))
+        self.idle_seconds = max(0.0, float(idle_seconds))
+        self._lock = threading.Lock()
+        self._hosts: Dict[Tuple[str, str, int], _PooledHost] = {}
+        self._ssl_context = ssl.create_default_context()
+
+    def handles(self, url: str) -> bool:
+        try:
+            parsed = urllib.parse.urlparse(url)
+        except Exception:
+            return False
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            return False
+        # Honour proxy environments through urllib instead of bypassing them.
+        proxies = urllib.request.getproxies()
+        return not proxies.get(parsed.scheme) or bool(urllib.request.proxy_bypass(parsed.hostname))
+
+    def _host(self, key: Tuple[str, str, int]) -> _PooledHost:
+        with self._lock:
+            host = self._hosts.get(key)
+            if host is None:
+                host = _PooledHost(self.max_per_host)
+                self._hosts[key] = host
+            return host
+
+    @staticmethod
+    def _peer_closed(conn: Any) -> bool:
+        sock = getattr(conn, "sock", None)
+        if sock is None:
+            return True
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        # An idle keep-alive socket is never readable unless the peer closed it
+        # (EOF) or sent something unsolicited; either way it cannot be reused.
+        return bool(readable)
+
+    def _checkout(self, key: Tuple[str, str, int], host: _PooledHost, timeout_seconds: float) -> Tuple[Any, bool]:
+        now = time.monotonic()
+        retired: List[Any] = []
+        conn: Any = None
+        with self._lock:
+            while host.idle:
+                candidate, idle_since = host.idle.pop()
+                if now - idle_since > self.idle_seconds or self._peer_closed(candidate):
+                    retired.append(candidate)
+                    host.retired_idle += 1
+                    continue
+                conn = candidate
+                break
+            # Anything older than the newest idle connection expires first.
+            keep: List[Tuple[Any, float]] = []
+            for candidate, idle_since in host.idle:
+                if now - idle_since > self.idle_seconds:
+                    retired.append(candidate)
+                    host.retired_idle += 1
+                else:
+                    keep.append((candidate, idle_since))
+            host.idle = keep
+        for stale in retired:
+            try:
+                stale.close()
+            except Exception:
+                pass
+        if conn is not None:
+            conn.timeout = timeout_seconds
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout_seconds)
+            return conn, True
+        scheme, hostname, port = key
+        if scheme == "https":
+            conn = http.client.HTTPSConnection(hostname, port, timeout=timeout_seconds, context=self._ssl_context)
+        else:
+            conn = http.client.HTTPConnection(hostname, port, timeout=timeout_seconds)
+        return conn, False
+
+    def _checkin(self, host: _PooledHost, conn: Any) -> None:
+        with self._lock:
+            if len(host.idle) < self.max_per_host:
+                host.idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout_seconds: float = 30.0,
+        body_writer: Optional[Callable[[Callable[[bytes], None]], None]] = None,
+    ) -> Tuple[int, bytes, Dict[str, str]]:
+        """Send one request and read the whole response; returns (status, body, lower-cased headers).
+
+        ``body_writer`` streams a request body through the supplied send
+        function (the caller sets Content-Length); it may be invoked again if a
+        stale pooled connection forces an idempotent retry.
+        """
+        parsed = urllib.parse.urlparse(url)
+        scheme = parsed.scheme
+        if scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {scheme}")
+        hostname = parsed.hostname or ""
+        if not hostname:
+            raise ValueError("URL missing hostname")
+        key = (scheme, hostname, int(parsed.port or (443 if scheme == "https" else 80)))
+        path = parsed.path or "/"
+        if parsed.query:
+            path = f"{path}?{parsed.query}"
+        method = method.upper()
+        host = self._host(key)
+        if not host.slots.acquire(timeout=max(0.001, float(timeout_seconds))):
+            raise TimeoutError(f"HTTP pool for {hostname} saturated ({self.max_per_host} in flight)")
+        started = time.monotonic()
+        with self._lock:
+            host.requests += 1
+            host.in_flight += 1
+        try:
+            attempt = 0
+            while True:
+                conn, reused = self._checkout(key, host, timeout_seconds)
+                with self._lock:
+                    if reused:
+                        host.reused_connections += 1
+                    else:
+                        host.new_connections += 1
+                try:
+                    conn.putrequest(method, path)
+                    for name, value in (headers or {}).items():
+                        conn.putheader(name, value)
+                    if body_writer is None and "Content-Length" not in (headers or {}) and (
+                        body is not None or method in ("POST", "PUT", "PATCH")
+                    ):
+                        conn.putheader("Content-Length", str(len(body or b"")))
+                    conn.endheaders()
+                    if body_writer is not None:
+                        body_writer(conn.send)
+                    elif body:
+                        conn.send(body)
+                    resp = conn.getresponse()
+                    raw = resp.read()
+                    out_headers = {k.lower(): v for k, v in resp.getheaders()}
+                    status = int(resp.status)
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError, ConnectionAbortedError):
+                    conn.close()
+                    if reused and attempt == 0 and method in self.IDEMPOTENT_METHODS:
+                        attempt += 1
+                        with self._lock:
+                            host.stale_retries += 1
+                        continue
+                    raise
+                except BaseException:
+                    conn.close()
+                    raise
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self._checkin(host, conn)
+                return status, raw, out_headers
+        except BaseException:
+            with self._lock:
+                host.errors += 1
+            raise
+        finally:
+            elapsed_ms = (time.monotonic() - started) * 1000.0
+            with self._lock:
+                host.in_flight -= 1
+                host.latency_ms_total += elapsed_ms
+                host.latency_ms_max = max(host.latency_ms_max, elapsed_ms)
+            host.slots.release()
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        # A list rather than a host-keyed map: hostnames are not valid RTDB keys.
+        out: List[Dict[str, Any]] = []
+        with self._lock:
+            for (scheme, hostname, port), host in self._hosts.items():
+                requests = max(0, int(host.requests))
+                out.append({
+                    "origin": f"{scheme}://{hostname}:{port}",
+                    "requests": requests,
+                    "newConnections": int(host.new_connections),
+                    "reusedConnections": int(host.reused_connections),
+                    "retiredIdle": int(host.retired_idle),
+                    "staleRetries": int(host.stale_retries),
+                    "errors": int(host.errors),
+                    "inFlight": int(host.in_flight),
+                    "idle": len(host.idle),
+                    "avgLatencyMs": round(host.latency_ms_total / requests, 2) if requests else 0.0,
+                    "maxLatencyMs": round(host.latency_ms_max, 2),
+                })
+        out.sort(key=lambda row: -int(row["requests"]))
+        return out
+
+    def close_idle(self) -> None:
+        with self._lock:
+            idle = [conn for host in self._hosts.values() for conn, _ in host.idle]
+            for host in self._hosts.values():
+                host.idle = []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+HTTP_POOL = HttpConnectionPool(
+    max_per_host=max(1, _env_int("DM_HTTP_POOL_MAX_PER_HOST", 16)),
+    idle_seconds=max(0.0, _env_float("DM_HTTP_POOL_IDLE_SECONDS", 30.0)),
+)
+HTTP_POOL_ENABLED = _env_bool("DM_HTTP_POOL_ENABLED", True)
+
+
+def _pooled_http_request(
+    method: str,
+    url: str,
+    body: Optional[bytes] = None,
+    headers: Optional[Dict[str, str]] = None,
+    timeout_seconds: float = 30.0,
+) -> Optional[Tuple[int, bytes, Dict[str, str]]]:
+    """Send through HTTP_POOL, following redirects like urllib; None when the pool cannot serve the URL.
+
+    As with urllib, only GET/HEAD are re-sent to the new location, and a POST
+    answered with 301/302/303 is re-issued as a bodiless GET. Any other
+    redirect (a PUT, or a POST answered with 307/308) is returned unfollowed,
+    so a request body is never replayed against a second URL.
+    """
+    if not HTTP_POOL_ENABLED:
+        return None
+    for _ in range(5):
+        if not HTTP_POOL.handles(url):
+            return None
+        status, raw, out_headers = HTTP_POOL.request(
+            method,
+            url,
+            body=body,
+            headers=headers,
+            timeout_seconds=timeout_seconds,
+        )
+        location = out_headers.get("location")
+        if status not in (301, 302, 303, 307, 308) or not location:
+            return status, raw, out_headers
+        verb = method.upper()
+        if verb == "POST" and status in (301, 302, 303):
+            method, body = "GET", None
+            headers = {k: v for k, v in (headers or {}).items() if k.lower() != "content-type"}
+        elif verb not in ("GET", "HEAD"):
+            return status, raw, out_headers
+        url = urllib.parse.urljoin(url, location)
+    return status, raw, out_headers
+
+
+def _pooled_api_json(
+    method: str,
+    url: str,
+    payload: Optional[bytes],
+    headers: Dict[str, str],
+    timeout_seconds: float,
+) -> Optional[Tuple[int, Optional[Any]]]:
+    try:
+        pooled = _pooled_http_request(method, url, body=payload, headers=headers, timeout_seconds=timeout_seconds)
+    except (OSError, TimeoutError, http.client.HTTPException) as e:
+        raise NetworkError(url, e) from None
+    if pooled is None:
+        return None
+    status, raw_bytes, _headers = pooled
+    raw = raw_bytes.decode("utf-8", errors="replace")
+    if not 200 <= status < 300:
+        # Mirror urllib's HTTPErrorProcessor so callers keep seeing ApiError.
+        raise ApiError(status, raw)
+    if not raw:
+        return status, None
+    parsed = _json_loads_or_none(raw)
+    return status, parsed if parsed is not None else raw
+
+
 def api_json(
     method: str,
     url: str,
@@ -1531,6 +2184,9 @@ def api_json(
         payload = json.dumps(body).encode("utf-8")
         req_headers["Content-Type"] = "application/json"
 
+    pooled = _pooled_api_json(method, url, payload, req_headers, timeout_seconds)
+    if pooled is not None:
+        return pooled
     req = urllib.request.Request(url, data=payload, method=method.upper(), headers=req_headers)
     try:
         with urllib.request.urlopen(req, timeout=timeout_seconds) as resp:
@@ -1564,6 +2220,9 @@ def api_form_json(
     if headers:
         req_headers.update(headers)
     payload = urllib.parse.urlencode({k: str(v) for k, v in body.items()}).encode("utf-8")
+    pooled = _pooled_api_json(method, url, payload, req_headers, timeout_seconds)
+    if pooled is not None:
+        return pooled
     req = urllib.request.Request(url, data=payload, method=method.upper(), headers=req_headers)
     try:
         with urllib.request.urlopen(req, timeout=timeout_seconds) as resp:
@@ -1616,67 +2275,425 @@ def sha256_file(
     return h.hexdigest()
 
 
-def huggingface_hub_download(
-    url: str,
-    dest_partial: Path,
-    auth_header: Optional[str],
-    expected_size_bytes: int = 0,
-    progress_cb: Optional[Callable[[int, int], None]] = None,
-) -> None:
-    """Download a pinned Hugging Face /resolve/ URL through hf_xet when available."""
-    parsed = urllib.parse.urlparse(url)
-    host = (parsed.hostname or "").lower()
-    path_parts = [urllib.parse.unquote(part) for part in parsed.path.split("/") if part]
-    try:
-        resolve_index = path_parts.index("resolve")
-    except ValueError as exc:
-        raise RuntimeError("Hugging Face URL is not a pinned /resolve/ URL") from exc
-    if host not in {"huggingface.co", "www.huggingface.co", "hf.co", "www.hf.co"}:
-        raise RuntimeError(f"Unsupported Hugging Face host: {host or 'missing'}")
-    if resolve_index < 2 or resolve_index + 2 >= len(path_parts):
-        raise RuntimeError("Hugging Face /resolve/ URL is missing repo, revision, or filename")
+class RangeSha256:
+    """Incremental sha256 of a file whose byte ranges may complete out of order.
 
-    repo_id = "/".join(path_parts[:resolve_index])
-    revision = path_parts[resolve_index + 1]
-    filename = "/".join(path_parts[resolve_index + 2:])
-    token = auth_header[7:] if isinstance(auth_header, str) and auth_header.startswith("Bearer ") else None
-    cache_dir = Path(os.environ.get("DM_HF_CACHE_DIR") or (Path(os.environ.get("WORKSPACE", "/workspace")) / ".dm_hf_cache"))
-    cache_dir.mkdir(parents=True, exist_ok=True)
-    dest_partial.parent.mkdir(parents=True, exist_ok=True)
+    Sequential downloaders feed bytes straight into ``update`` as they are
+    written. Segmented downloaders (aria2c) instead report completed
+    ``[start, end)`` ranges through ``mark_complete``; ``advance`` then reads
+    back only the newly contiguous prefix from offset 0 while it is still in the
+    page cache. Either way the digest is ready when the last byte lands instead
+    of after a second full read of the file.
+    """
 
-    try:
-        from huggingface_hub import hf_hub_download as hf_download
-    except Exception as exc:
-        raise RuntimeError(f"huggingface_hub unavailable: {exc}") from exc
+    def __init__(self, path: Path, chunk_size: int = 8 * 1024 * 1024) -> None:
+        self.path = path
+        self.chunk_size = max(64 * 1024, int(chunk_size))
+        self._hash = hashlib.sha256()
+        self._offset = 0
+        # Sorted, non-overlapping completed ranges that start beyond _offset.
+        self._pending: List[Tuple[int, int]] = []
 
-    previous_high_performance = os.environ.get("HF_XET_HIGH_PERFORMANCE")
-    os.environ["HF_XET_HIGH_PERFORMANCE"] = "1"
-    try:
-        cached_path = Path(hf_download(
-            repo_id=repo_id,
-            filename=filename,
-            revision=revision,
-            cache_dir=str(cache_dir),
-            token=token,
-        )).resolve()
-    finally:
-        if previous_high_performance is None:
-            os.environ.pop("HF_XET_HIGH_PERFORMANCE", None)
+    @property
+    def hashed_bytes(self) -> int:
+        return int(self._offset)
+
+    def reset(self) -> None:
+        self._hash = hashlib.sha256()
+        self._offset = 0
+        self._pending = []
+
+    def update(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self._hash.update(chunk)
+        self._offset += len(chunk)
+        self._pending = [(max(start, self._offset), end) for start, end in self._pending if end > self._offset]
+
+    def update_at(self, offset: int, chunk: bytes) -> None:
+        """Feed bytes read at ``offset``; only the part extending the hashed prefix counts.
+
+        Lets a reader that may re-send ranges (upload retries, resumed chunks)
+        tee its reads into the digest without double-counting.
+        """
+        offset = int(offset)
+        end = offset + len(chunk)
+        if offset > self._offset or end <= self._offset:
+            return
+        self.update(chunk[self._offset - offset:])
+
+    def mark_complete(self, start: int, end: int) -> None:
+        start = max(int(start), self._offset)
+        end = int(end)
+        if end <= start:
+            return
+        merged: List[Tuple[int, int]] = []
+        for cur_start, cur_end in sorted(self._pending + [(start, end)]):
+            if merged and cur_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], cur_end))
+            else:
+                merged.append((cur_start, cur_end))
+        self._pending = merged
+
+    def advance(self) -> int:
+        """Hash the completed prefix that is now contiguous; returns bytes hashed."""
+        if not self._pending or self._pending[0][0] > self._offset:
+            return 0
+        target = self._pending[0][1]
+        hashed = 0
+        with self.path.open("rb") as f:
+            f.seek(self._offset)
+            while self._offset < target:
+                chunk = f.read(min(self.chunk_size, target - self._offset))
+                if not chunk:
+                    break
+                self._hash.update(chunk)
+                self._offset += len(chunk)
+                hashed += len(chunk)
+        self._pending = [(max(start, self._offset), end) for start, end in self._pending if end > self._offset]
+        return hashed
+
+    def hexdigest(self, total_size: int) -> str:
+        """Digest of the first ``total_size`` bytes, or "" when not all of them were hashed."""
+        if int(total_size) <= 0 or self._offset != int(total_size):
+            return ""
+        return self._hash.hexdigest()
+
+
+class VerifiedDigestIndex:
+    """Persistent ``path -> (dev, ino, size, mtime_ns, sha256)`` map for cache files.
+
+    A lookup only returns the recorded digest while the file's identity and
+    metadata still match, so any rewrite, truncate, replace or touch we did not
+    account for forces a fresh hash. The index is a small JSON file reloaded on
+    start, so verified entries survive agent restarts. New digests and removals
+    are written through at once; LRU retouches and scrub timestamps only mark
+    the index dirty and are written at most every ``flush_interval_seconds``
+    (and by ``flush`` at shutdown). Losing them costs at most one rehash,
+    because a lookup never trusts an entry whose metadata has moved on.
+    """
+
+    def __init__(self, path: Path, flush_interval_seconds: float = 30.0) -> None:
+        self.path = path
+        self.flush_interval_seconds = float(flush_interval_seconds)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._dirty = False
+        self._flushed_at = float("-inf")
+
+    @staticmethod
+    def _key(file_path: Path) -> str:
+        return os.path.abspath(str(file_path))
+
+    @staticmethod
+    def _matches(entry: Dict[str, Any], stat_result: os.stat_result) -> bool:
+        return (
+            int(entry.get("dev", -1)) == int(stat_result.st_dev)
+            and int(entry.get("ino", -1)) == int(stat_result.st_ino)
+            and int(entry.get("size", -1)) == int(stat_result.st_size)
+            and int(entry.get("mtimeNs", -1)) == int(stat_result.st_mtime_ns)
+        )
+
+    def _load_locked(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            raw = json.loads(self.path.read_text("utf-8"))
+        except FileNotFoundError:
+            return
+        except Exception as exc:
+            logging.warning("Ignoring unreadable digest index %s: %s", self.path, exc)
+            return
+        entries = raw.get("entries") if isinstance(raw, dict) else None
+        if not isinstance(entries, dict):
+            return
+        for key, entry in entries.items():
+            if isinstance(key, str) and isinstance(entry, dict) and isinstance(entry.get("sha256"), str):
+                self._entries[key] = entry
+
+    def _flush_locked(self) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        try:
+            tmp.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps({"version": 1, "entries": self._entries}, sort_keys=True), "utf-8")
+            os.replace(str(tmp), str(self.path))
+        except Exception as exc:
+            logging.warning("Failed writing digest index %s: %s", self.path, exc)
+            return
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+
+    def _changed_locked(self, urgent: bool = False) -> None:
+        self._dirty = True
+        if urgent or time.monotonic() - self._flushed_at >= self.flush_interval_seconds:
+            self._flush_locked()
+
+    def flush(self, force: bool = True) -> None:
+        """Write pending changes; with ``force=False`` only once the flush interval has elapsed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            if force or time.monotonic() - self._flushed_at >= self.flush_interval_seconds:
+                self._flush_locked()
+
+    def lookup(self, file_path: Path, stat_result: os.stat_result) -> str:
+        """Return the verified sha256 for an unchanged file, or "" (dropping a stale entry)."""
+        key = self._key(file_path)
+        with self._lock:
+            self._load_locked()
+            entry = self._entries.get(key)
+            if entry is None:
+                return ""
+            if self._matches(entry, stat_result):
+                return str(entry["sha256"])
+            self._entries.pop(key, None)
+            self._changed_locked(urgent=True)
+            return ""
+
+    def record(self, file_path: Path, stat_result: os.stat_result, sha256_hex: str) -> None:
+        if not sha256_hex:
+            return
+        with self._lock:
+            self._load_locked()
+            self._entries[self._key(file_path)] = {
+                "dev": int(stat_result.st_dev),
+                "ino": int(stat_result.st_ino),
+                "size": int(stat_result.st_size),
+                "mtimeNs": int(stat_result.st_mtime_ns),
+                "sha256": str(sha256_hex).lower(),
+                "verifiedAtMs": _now_ms(),
+            }
+            self._changed_locked(urgent=True)
+
+    def retouch(self, file_path: Path, before: os.stat_result, after: os.stat_result) -> None:
+        """Carry an entry across our own utime() so LRU touches do not invalidate it."""
+        key = self._key(file_path)
+        with self._lock:
+            self._load_locked()
+            entry = self._entries.get(key)
+            if entry is None or not self._matches(entry, before):
+                return
+            if int(before.st_ino) != int(after.st_ino) or int(before.st_size) != int(after.st_size):
+                self._entries.pop(key, None)
+                self._changed_locked(urgent=True)
+            elif int(entry["mtimeNs"]) != int(after.st_mtime_ns):
+                entry["mtimeNs"] = int(after.st_mtime_ns)
+                self._changed_locked()
+
+    def forget(self, file_path: Path) -> None:
+        key = self._key(file_path)
+        with self._lock:
+            self._load_locked()
+            if self._entries.pop(key, None) is not None:
+                self._changed_locked(urgent=True)
+
+    def coldest(self, verified_before_ms: int) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return the least recently verified entry older than ``verified_before_ms``."""
+        with self._lock:
+            self._load_locked()
+            candidates = [
+                (int(entry.get("verifiedAtMs") or 0), key)
+                for key, entry in self._entries.items()
+                if int(entry.get("verifiedAtMs") or 0) < int(verified_before_ms)
+            ]
+            if not candidates:
+                return None
+            _verified_at, key = min(candidates)
+            return key, dict(self._entries[key])
+
+    def mark_verified(self, file_path: Path, entry: Dict[str, Any]) -> None:
+        key = self._key(file_path)
+        with self._lock:
+            current = self._entries.get(key)
+            if current is None or current.get("sha256") != entry.get("sha256") or current.get("mtimeNs") != entry.get("mtimeNs"):
+                return
+            current["verifiedAtMs"] = _now_ms()
+            self._changed_locked()
+
+
+def sha256_file_rate_limited(
+    path: Path,
+    bytes_per_second: int,
+    stop_event: Optional[threading.Event] = None,
+    chunk_size: int = 1024 * 1024,
+) -> str:
+    """sha256 a file without exceeding ``bytes_per_second`` of read bandwidth.
+
+    Returns "" if ``stop_event`` is set before the file is fully hashed.
+    """
+    h = hashlib.sha256()
+    rate = max(1, int(bytes_per_second))
+    started = time.monotonic()
+    processed = 0
+    with path.open("rb") as f:
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return ""
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+            processed += len(chunk)
+            ahead = processed / float(rate) - (time.monotonic() - started)
+            if ahead > 0:
+                if stop_event is not None:
+                    if stop_event.wait(ahead):
+                        return ""
+                else:
+                    time.sleep(ahead)
+    return h.hexdigest()
+
+
+def _aria2_control_completed_ranges(control_path: Path) -> Optional[List[Tuple[int, int]]]:
+    """Completed byte ranges recorded in an aria2 ``.aria2`` control file.
+
+    Layout: VER(2) EXT(4) INFOHASH_LEN(4) INFOHASH PIECE_LEN(4) TOTAL_LEN(8)
+    UPLOAD_LEN(8) BITFIELD_LEN(4) BITFIELD ... Version 1 is big-endian, version 0
+    uses host byte order. Returns None when the file is missing or unparseable.
+    """
+    try:
+        data = control_path.read_bytes()
+    except OSError:
+        return None
+    if len(data) < 2:
+        return None
+    version = struct.unpack(">H", data[:2])[0]
+    if version == 1:
+        order = ">"
+    elif version == 0:
+        order = "="
+    else:
+        return None
+    try:
+        pos = 6
+        (info_hash_len,) = struct.unpack_from(order + "I", data, pos)
+        pos += 4 + int(info_hash_len)
+        piece_len, total_len, _upload_len, bitfield_len = struct.unpack_from(order + "IQQI", data, pos)
+        pos += 4 + 8 + 8 + 4
+        bitfield = data[pos:pos + int(bitfield_len)]
+    except struct.error:
+        return None
+    if piece_len <= 0 or total_len <= 0 or len(bitfield) != int(bitfield_len):
+        return None
+    ranges: List[Tuple[int, int]] = []
+    piece_count = (int(total_len) + int(piece_len) - 1) // int(piece_len)
+    for index in range(min(piece_count, len(bitfield) * 8)):
+        if not bitfield[index // 8] & (0x80 >> (index % 8)):
+            continue
+        start = index * int(piece_len)
+        end = min(start + int(piece_len), int(total_len))
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def _copy_file_with_sha256(src: Path, dest: Path, chunk_size: int = 8 * 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with src.open("rb") as reader, dest.open("wb") as writer:
+        while True:
+            chunk = reader.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+            writer.write(chunk)
+    return h.hexdigest()
+
+
+_HF_BLOB_DIGEST_INDEXES: Dict[str, VerifiedDigestIndex] = {}
+_HF_BLOB_DIGEST_INDEXES_LOCK = threading.Lock()
+
+
+def _hf_blob_digest_index(cache_dir: Path) -> VerifiedDigestIndex:
+    """Digest index for hub cache blobs, shared by every download into ``cache_dir``."""
+    key = os.path.abspath(str(cache_dir))
+    with _HF_BLOB_DIGEST_INDEXES_LOCK:
+        index = _HF_BLOB_DIGEST_INDEXES.get(key)
+        if index is None:
+            index = VerifiedDigestIndex(Path(key) / ".dm_blob_digests.json")
+            _HF_BLOB_DIGEST_INDEXES[key] = index
+        return index
+
+
+def huggingface_hub_download(
+    url: str,
+    dest_partial: Path,
+    auth_header: Optional[str],
+    expected_size_bytes: int = 0,
+    progress_cb: Optional[Callable[[int, int], None]] = None,
+) -> str:
+    """Download a pinned Hugging Face /resolve/ URL through hf_xet when available.
+
+    Returns the sha256 of the staged bytes. hf_hub_download does not check
+    blob contents against a sha256, so a blob is hashed once when it is first
+    staged (while copying it when a hard link is not possible) and the digest
+    is remembered against the blob's inode and mtime; staging the same
+    unchanged blob again reuses it instead of re-reading the file.
+    """
+    parsed = urllib.parse.urlparse(url)
+    host = (parsed.hostname or "").lower()
+    path_parts = [urllib.parse.unquote(part) for part in parsed.path.split("/") if part]
+    try:
+        resolve_index = path_parts.index("resolve")
+    except ValueError as exc:
+        raise RuntimeError("Hugging Face URL is not a pinned /resolve/ URL") from exc
+    if host not in {"huggingface.co", "www.huggingface.co", "hf.co", "www.hf.co"}:
+        raise RuntimeError(f"Unsupported Hugging Face host: {host or 'missing'}")
+    if resolve_index < 2 or resolve_index + 2 >= len(path_parts):
+        raise RuntimeError("Hugging Face /resolve/ URL is missing repo, revision, or filename")
+
+    repo_id = "/".join(path_parts[:resolve_index])
+    revision = path_parts[resolve_index + 1]
+    filename = "/".join(path_parts[resolve_index + 2:])
+    token = auth_header[7:] if isinstance(auth_header, str) and auth_header.startswith("Bearer ") else None
+    cache_dir = Path(os.environ.get("DM_HF_CACHE_DIR") or (Path(os.environ.get("WORKSPACE", "/workspace")) / ".dm_hf_cache"))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    dest_partial.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        from huggingface_hub import hf_hub_download as hf_download
+    except Exception as exc:
+        raise RuntimeError(f"huggingface_hub unavailable: {exc}") from exc
+
+    previous_high_performance = os.environ.get("HF_XET_HIGH_PERFORMANCE")
+    os.environ["HF_XET_HIGH_PERFORMANCE"] = "1"
+    try:
+        cached_path = Path(hf_download(
+            repo_id=repo_id,
+            filename=filename,
+            revision=revision,
+            cache_dir=str(cache_dir),
+            token=token,
+        )).resolve()
+    finally:
+        if previous_high_performance is None:
+            os.environ.pop("HF_XET_HIGH_PERFORMANCE", None)
         else:
             os.environ["HF_XET_HIGH_PERFORMANCE"] = previous_high_performance
 
-    actual_size = int(cached_path.stat().st_size)
+    blob_stat = cached_path.stat()
+    actual_size = int(blob_stat.st_size)
     if expected_size_bytes > 0 and actual_size != int(expected_size_bytes):
         raise RuntimeError(
             f"Hugging Face cached file size mismatch: expected {expected_size_bytes}, got {actual_size}"
         )
 
+    digest_index = _hf_blob_digest_index(cache_dir)
+    known_digest = digest_index.lookup(cached_path, blob_stat)
     staged_link = dest_partial.with_name(f"{dest_partial.name}.hf-{uuid.uuid4().hex}")
     try:
         try:
             os.link(cached_path, staged_link)
+            digest = known_digest or sha256_file(staged_link)
         except OSError:
-            shutil.copyfile(cached_path, staged_link)
+            digest = _copy_file_with_sha256(cached_path, staged_link)
+        if not known_digest:
+            after = cached_path.stat()
+            if int(after.st_ino) == int(blob_stat.st_ino) and int(after.st_mtime_ns) == int(blob_stat.st_mtime_ns):
+                digest_index.record(cached_path, blob_stat, digest)
         os.replace(staged_link, dest_partial)
     finally:
         try:
@@ -1685,6 +2702,7 @@ def huggingface_hub_download(
             pass
     if progress_cb:
         progress_cb(actual_size, int(expected_size_bytes or actual_size))
+    return digest
 
 
 AGENT_VERSION_RE = re.compile(r'^\s*AGENT_VERSION\s*=\s*["\']([^"\']+)["\']', re.MULTILINE)
@@ -1760,7 +2778,12 @@ def http_download(
     verbose: bool = False,
     debug: bool = False,
     progress_cb: Optional[Callable[[int, int], None]] = None,
-) -> None:
+) -> str:
+    """Stream ``url`` into ``dest_partial``; returns the sha256 of the finished file.
+
+    The digest is accumulated as chunks are written (a resumed prefix is read
+    back once first). "" means no digest was produced and the caller must hash.
+    """
     parsed = urllib.parse.urlparse(url)
     host = (parsed.hostname or "").lower()
     if not host:
@@ -1810,7 +2833,7 @@ def http_download(
 
     if expected_size_bytes > 0 and existing_bytes == expected_size_bytes:
         # Previous attempt fully downloaded but crashed before rename.
-        return
+        return ""
 
     req_headers = dict(headers)
     if existing_bytes > 0:
@@ -1917,12 +2940,17 @@ def http_download(
                     except Exception:
                         pass
 
+            hasher = RangeSha256(dest_partial, chunk_size=chunk_size)
+            if mode == "ab":
+                hasher.mark_complete(0, existing_bytes)
+                hasher.advance()
             with dest_partial.open(mode) as f:
                 while True:
                     chunk = resp.read(chunk_size)
                     if not chunk:
                         break
                     f.write(chunk)
+                    hasher.update(chunk)
                     downloaded += len(chunk)
                     if expected_total is not None and downloaded > int(expected_total):
                         raise RuntimeError(
@@ -1952,6 +2980,7 @@ def http_download(
                 if actual_size > int(expected_total):
                     _discard_oversized_partial(dest_partial, int(expected_total), safe_url)
                 raise RuntimeError(f"Incomplete download for {safe_url}: got {actual_size} bytes, expected {expected_total} bytes")
+        return hasher.hexdigest(downloaded)
     except urllib.error.HTTPError as e:
         code = int(getattr(e, "code", 0) or 0)
         if code == 416 and existing_bytes > 0:
@@ -1969,7 +2998,7 @@ def http_download(
             if total is not None:
                 try:
                     if int(dest_partial.stat().st_size) >= int(total):
-                        return
+                        return ""
                 except Exception:
                     pass
 
@@ -2038,7 +3067,12 @@ def wget_download(
     debug: bool = False,
     user_agent: str = "dm-agent-wget/1.0",
     progress_cb: Optional[Callable[[int, int], None]] = None,
-) -> None:
+) -> str:
+    """Download via wget; returns the sha256 of the finished file ("" if unavailable).
+
+    wget appends sequentially, so the growing prefix is hashed on every poll
+    while it is still in the page cache.
+    """
     if not _command_exists("wget"):
         raise RuntimeError("wget not found on PATH (install wget or set DM_DOWNLOAD_TOOL=python).")
 
@@ -2067,7 +3101,7 @@ def wget_download(
         existing_bytes = 0
 
     if expected_size_bytes > 0 and existing_bytes == expected_size_bytes:
-        return
+        return ""
 
     if debug:
         try:
@@ -2136,11 +3170,26 @@ def wget_download(
     stderr_thread = threading.Thread(target=_drain_stderr, daemon=True)
     stderr_thread.start()
 
+    hasher = RangeSha256(dest_partial)
+
+    def _hash_written_prefix() -> None:
+        try:
+            written = int(dest_partial.stat().st_size) if dest_partial.exists() else 0
+            if written < hasher.hashed_bytes:
+                # wget restarted the transfer from scratch; earlier bytes are gone.
+                hasher.reset()
+            hasher.mark_complete(0, written)
+            hasher.advance()
+        except OSError:
+            hasher.reset()
+
     last_progress_at = 0.0
     oversize_error: Optional[str] = None
     while True:
         ret = proc.poll()
         now = time.time()
+        if ret is None:
+            _hash_written_prefix()
         if progress_cb and (ret is not None or now - last_progress_at >= 2.0):
             current_bytes = 0
             try:
@@ -2226,6 +3275,12 @@ def wget_download(
                 f"Incomplete download for {safe_url}: got {actual_size} bytes, expected {int(expected_size_bytes)} bytes"
             )
 
+    _hash_written_prefix()
+    try:
+        return hasher.hexdigest(int(dest_partial.stat().st_size))
+    except OSError:
+        return ""
+
 
 def aria2_download(
     url: str,
@@ -2237,13 +3292,17 @@ def aria2_download(
     debug: bool = False,
     user_agent: str = "dm-agent-aria2/1.0",
     progress_cb: Optional[Callable[[int, int], None]] = None,
-) -> None:
+) -> str:
     """Multi-connection download via aria2c (-x8 -s8). Single-stream HTTP from the
     model CDNs is frequently the bottleneck on Vast hosts; splitting the transfer
     rescues hosts whose per-connection throughput collapses.
 
     Domain allowlisting is enforced on the initial URL host (redirect-chain
     enforcement is wget-only); final size is verified the same as other tools.
+
+    Returns the sha256 of the finished file ("" if unavailable). Completed
+    pieces are read from the .aria2 control file each poll and the contiguous
+    prefix is hashed as segments fill in.
     """
     if not _command_exists("aria2c"):
         raise RuntimeError("aria2c not found on PATH (install aria2 or set DM_DOWNLOAD_TOOL=wget).")
@@ -2273,7 +3332,7 @@ def aria2_download(
         existing_bytes = 0
 
     if expected_size_bytes > 0 and existing_bytes == expected_size_bytes:
-        return
+        return ""
 
     cmd: List[str] = [
         "aria2c",
@@ -2282,6 +3341,7 @@ def aria2_download(
         "--split=8",
         "--min-split-size=4M",
         "--file-allocation=none",
+        "--auto-save-interval=1",
         "--max-tries=3",
         "--retry-wait=5",
         f"--timeout={int(max(1.0, float(timeout_seconds)))}",
@@ -2348,6 +3408,20 @@ def aria2_download(
         except Exception:
             return 0
 
+    control_path = dest_partial.with_name(dest_partial.name + ".aria2")
+    hasher = RangeSha256(dest_partial)
+
+    def _hash_completed_pieces() -> None:
+        completed = _aria2_control_completed_ranges(control_path)
+        if not completed:
+            return
+        for start, end in completed:
+            hasher.mark_complete(start, end)
+        try:
+            hasher.advance()
+        except OSError:
+            hasher.reset()
+
     last_progress_at = 0.0
     last_progress_bytes = int(existing_bytes)
     last_byte_progress_at = time.time()
@@ -2356,6 +3430,8 @@ def aria2_download(
     while True:
         ret = proc.poll()
         now = time.time()
+        if ret is None:
+            _hash_completed_pieces()
         if progress_cb and (ret is not None or now - last_progress_at >= 2.0):
             current_bytes = _current_downloaded_bytes()
             if current_bytes > last_progress_bytes:
@@ -2422,6 +3498,16 @@ def aria2_download(
                 f"Incomplete download for {safe_url}: got {actual_size} bytes, expected {int(expected_size_bytes)} bytes"
             )
 
+    # aria2c removes the control file on success; every byte is complete now and
+    # only the tail landed since the last poll still needs hashing.
+    try:
+        final_size = int(dest_partial.stat().st_size)
+        hasher.mark_complete(0, final_size)
+        hasher.advance()
+        return hasher.hexdigest(final_size)
+    except OSError:
+        return ""
+
 
 def http_download_to_file(
     url: str,
@@ -2430,12 +3516,13 @@ def http_download_to_file(
     timeout_seconds: float = 60.0,
     chunk_size: int = 8 * 1024 * 1024,
     user_agent: Optional[str] = None,
-) -> None:
+) -> str:
     req_headers = dict(headers or {})
     if user_agent and "User-Agent" not in req_headers and "user-agent" not in req_headers:
         req_headers["User-Agent"] = user_agent
     req = urllib.request.Request(url, headers=req_headers, method="GET")
     dest_path.parent.mkdir(parents=True, exist_ok=True)
+    h = hashlib.sha256()
     with urllib.request.urlopen(req, timeout=timeout_seconds) as resp:
         with dest_path.open("wb") as f:
             while True:
@@ -2443,6 +3530,8 @@ def http_download_to_file(
                 if not chunk:
                     break
                 f.write(chunk)
+                h.update(chunk)
+    return h.hexdigest()
 
 
 def curl_download_to_file(
@@ -2491,7 +3580,12 @@ def download_file_with_tool_fallback(
     chunk_size: int = 8 * 1024 * 1024,
     user_agent: str = "dm-agent-download/1.0",
     tools: Optional[List[str]] = None,
-) -> str:
+) -> Tuple[str, str]:
+    """Try each tool in order; returns (tool, sha256 of the downloaded file).
+
+    Tools that hash in flight supply the digest directly; for the rest (curl)
+    the file is hashed once here so callers never need a second pass.
+    """
     ordered_tools = tools or ["python", "aria2", "wget", "curl"]
     errors: List[str] = []
     for tool in ordered_tools:
@@ -2504,8 +3598,9 @@ def download_file_with_tool_fallback(
                     dest_path.unlink()
             except Exception:
                 pass
+            digest = ""
             if normalized == "python":
-                http_download_to_file(
+                digest = http_download_to_file(
                     url,
                     dest_path,
                     timeout_seconds=timeout_seconds,
@@ -2513,7 +3608,7 @@ def download_file_with_tool_fallback(
                     user_agent=user_agent,
                 )
             elif normalized == "aria2":
-                aria2_download(
+                digest = aria2_download(
                     url=url,
                     dest_partial=dest_path,
                     auth_header=None,
@@ -2524,7 +3619,7 @@ def download_file_with_tool_fallback(
                     user_agent=user_agent,
                 )
             elif normalized == "wget":
-                wget_download(
+                digest = wget_download(
                     url=url,
                     dest_partial=dest_path,
                     auth_header=None,
@@ -2548,7 +3643,7 @@ def download_file_with_tool_fallback(
                 raise RuntimeError("download produced an empty file")
             if errors:
                 logging.info("Download succeeded with %s after fallback(s): %s", normalized, "; ".join(errors[-3:]))
-            return normalized
+            return normalized, (digest or sha256_file(dest_path)).lower()
         except Exception as exc:
             errors.append(f"{normalized}: {exc}")
             logging.warning("Download tool %s failed for %s: %s", normalized, _safe_url_for_logs(url), exc)
@@ -2614,6 +3709,21 @@ def http_put_bytes(
     host = parsed.hostname or ""
     if not host:
         raise ValueError("Upload URL missing hostname")
+
+    req_headers = {"Content-Length": str(len(body))}
+    if headers:
+        req_headers.update(headers)
+
+    if HTTP_POOL_ENABLED:
+        status, raw_bytes, out_headers = HTTP_POOL.request(
+            "PUT",
+            url,
+            body=body,
+            headers=req_headers,
+            timeout_seconds=timeout_seconds,
+        )
+        return status, raw_bytes.decode("utf-8", errors="replace"), out_headers
+
     port = parsed.port
     path_with_query = parsed.path or "/"
     if parsed.query:
@@ -2624,10 +3734,6 @@ def http_put_bytes(
     else:
         conn = http.client.HTTPConnection(host, port or 80, timeout=timeout_seconds)
 
-    req_headers = {"Content-Length": str(len(body))}
-    if headers:
-        req_headers.update(headers)
-
     try:
         conn.putrequest("PUT", path_with_query)
         for k, v in req_headers.items():
@@ -2655,6 +3761,7 @@ def http_put_file_stream(
     chunk_size: int = 8 * 1024 * 1024,
     start_offset: int = 0,
     length: Optional[int] = None,
+    chunk_observer: Optional[Callable[[int, bytes], None]] = None,
 ) -> Tuple[int, str, Dict[str, str]]:
     parsed = urllib.parse.urlparse(url)
     if parsed.scheme not in ("http", "https"):
@@ -2662,15 +3769,6 @@ def http_put_file_stream(
     host = parsed.hostname or ""
     if not host:
         raise ValueError("Upload URL missing hostname")
-    port = parsed.port
-    path_with_query = parsed.path or "/"
-    if parsed.query:
-        path_with_query = f"{path_with_query}?{parsed.query}"
-
-    if parsed.scheme == "https":
-        conn: Any = http.client.HTTPSConnection(host, port or 443, timeout=timeout_seconds)
-    else:
-        conn = http.client.HTTPConnection(host, port or 80, timeout=timeout_seconds)
 
     total_size = int(file_path.stat().st_size)
     if start_offset < 0:
@@ -2686,23 +3784,49 @@ def http_put_file_stream(
     if headers:
         req_headers.update(headers)
 
-    try:
-        conn.putrequest("PUT", path_with_query)
-        for k, v in req_headers.items():
-            conn.putheader(k, v)
-        conn.endheaders()
-
+    def _send_file_range(send: Callable[[bytes], None]) -> None:
         with file_path.open("rb") as f:
             if start_offset:
                 f.seek(start_offset)
+            position = int(start_offset)
             remaining = int(length)
             while remaining > 0:
                 chunk = f.read(min(int(chunk_size), remaining))
                 if not chunk:
                     break
-                conn.send(chunk)
+                if chunk_observer is not None:
+                    chunk_observer(position, chunk)
+                send(chunk)
+                position += len(chunk)
                 remaining -= len(chunk)
 
+    if HTTP_POOL_ENABLED:
+        status, raw_bytes, out_headers = HTTP_POOL.request(
+            "PUT",
+            url,
+            headers=req_headers,
+            timeout_seconds=timeout_seconds,
+            body_writer=_send_file_range,
+        )
+        return status, raw_bytes.decode("utf-8", errors="replace"), out_headers
+
+    port = parsed.port
+    path_with_query = parsed.path or "/"
+    if parsed.query:
+        path_with_query = f"{path_with_query}?{parsed.query}"
+
+    if parsed.scheme == "https":
+        conn: Any = http.client.HTTPSConnection(host, port or 443, timeout=timeout_seconds)
+    else:
+        conn = http.client.HTTPConnection(host, port or 80, timeout=timeout_seconds)
+
+    try:
+        conn.putrequest("PUT", path_with_query)
+        for k, v in req_headers.items():
+            conn.putheader(k, v)
+        conn.endheaders()
+        _send_file_range(conn.send)
+
         resp = conn.getresponse()
         raw = resp.read().decode("utf-8", errors="replace")
         out_headers = {k.lower(): v for k, v in dict(resp.headers).items()}
@@ -2746,6 +3870,12 @@ def gcs_resumable_query_offset(
     raise RuntimeError(f"GCS resumable status query failed (status={status}): {body[:200]}")
 
 
+def _read_file_range(file_path: Path, offset: int, length: int) -> bytes:
+    with file_path.open("rb") as f:
+        f.seek(int(offset))
+        return f.read(int(length))
+
+
 def gcs_resumable_upload_file(
     session_url: str,
     file_path: Path,
@@ -2753,7 +3883,19 @@ def gcs_resumable_upload_file(
     timeout_seconds: float = 300.0,
     chunk_size: int = 8 * 1024 * 1024,
     progress_cb: Optional[Callable[[int, int], None]] = None,
+    prefetch: bool = True,
+    chunk_observer: Optional[Callable[[int, bytes], None]] = None,
 ) -> None:
+    """Upload ``file_path`` to a GCS resumable session chunk by chunk.
+
+    Chunks go through HTTP_POOL, so a session reuses one keep-alive TLS
+    connection instead of handshaking per chunk. With ``prefetch`` the next
+    chunk is read from disk on a helper thread while the current PUT is in
+    flight, keeping the link busy rather than alternating disk and network.
+    Server-side progress (308 ``Range``) always decides the next offset; a
+    prefetched chunk that no longer starts there is discarded.
+    ``chunk_observer`` sees every ``(offset, bytes)`` read for sending.
+    """
     total_size = int(file_path.stat().st_size)
     if total_size <= 0:
         raise RuntimeError("Cannot resumable-upload an empty file.")
@@ -2764,89 +3906,124 @@ def gcs_resumable_upload_file(
 
     offset = 0
     consecutive_failures = 0
+    reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gcs-prefetch") if prefetch else None
+    prefetched: Optional[Tuple[int, Future]] = None
+
+    def _chunk_at(start: int) -> bytes:
+        nonlocal prefetched
+        length = min(chunk_size, total_size - start)
+        pending, prefetched = prefetched, None
+        if pending is not None and pending[0] == start:
+            data = pending[1].result()
+            if len(data) == length:
+                return data
+        return _read_file_range(file_path, start, length)
+
+    def _prefetch_from(start: int) -> None:
+        nonlocal prefetched
+        if reader is None or start >= total_size:
+            return
+        prefetched = (start, reader.submit(_read_file_range, file_path, start, min(chunk_size, total_size - start)))
 
-    while offset < total_size:
-        chunk_end = min(offset + chunk_size, total_size) - 1
-        chunk_length = (chunk_end - offset) + 1
-        headers = {
-            "Content-Type": content_type,
-            "Content-Range": f"bytes {int(offset)}-{int(chunk_end)}/{int(total_size)}",
-        }
+    try:
+        while offset < total_size:
+            chunk_end = min(offset + chunk_size, total_size) - 1
+            chunk_length = (chunk_end - offset) + 1
+            headers = {
+                "Content-Type": content_type,
+                "Content-Range": f"bytes {int(offset)}-{int(chunk_end)}/{int(total_size)}",
+            }
 
-        try:
-            status, body, resp_headers = http_put_file_stream(
-                session_url,
-                file_path,
-                headers=headers,
-                timeout_seconds=timeout_seconds,
-                chunk_size=chunk_size,
-                start_offset=offset,
-                length=chunk_length,
-            )
-            consecutive_failures = 0
-        except Exception:
-            consecutive_failures += 1
-            offset = gcs_resumable_query_offset(
-                session_url,
-                total_size,
-                content_type,
-                timeout_seconds=min(60.0, timeout_seconds),
-            )
-            if progress_cb:
-                try:
-                    progress_cb(int(offset), int(total_size))
-                except Exception:
-                    pass
-            if consecutive_failures >= 5:
-                raise
-            _sleep_with_jitter(min(5.0, float(consecutive_failures)))
-            continue
+            try:
+                if reader is not None:
+                    chunk = _chunk_at(offset)
+                    _prefetch_from(chunk_end + 1)
+                    if chunk_observer is not None:
+                        chunk_observer(offset, chunk)
+                    status, body, resp_headers = http_put_bytes(
+                        session_url,
+                        body=chunk,
+                        headers=headers,
+                        timeout_seconds=timeout_seconds,
+                    )
+                else:
+                    status, body, resp_headers = http_put_file_stream(
+                        session_url,
+                        file_path,
+                        headers=headers,
+                        timeout_seconds=timeout_seconds,
+                        chunk_size=chunk_size,
+                        start_offset=offset,
+                        length=chunk_length,
+                        chunk_observer=chunk_observer,
+                    )
+                consecutive_failures = 0
+            except Exception:
+                consecutive_failures += 1
+                offset = gcs_resumable_query_offset(
+                    session_url,
+                    total_size,
+                    content_type,
+                    timeout_seconds=min(60.0, timeout_seconds),
+                )
+                if progress_cb:
+                    try:
+                        progress_cb(int(offset), int(total_size))
+                    except Exception:
+                        pass
+                if consecutive_failures >= 5:
+                    raise
+                _sleep_with_jitter(min(5.0, float(consecutive_failures)))
+                continue
 
-        if status in (200, 201):
-            offset = total_size
-            if progress_cb:
-                try:
-                    progress_cb(int(total_size), int(total_size))
-                except Exception:
-                    pass
-            return
+            if status in (200, 201):
+                offset = total_size
+                if progress_cb:
+                    try:
+                        progress_cb(int(total_size), int(total_size))
+                    except Exception:
+                        pass
+                return
+
+            if status == 308:
+                next_offset = _parse_gcs_resume_offset(resp_headers)
+                if next_offset <= offset:
+                    next_offset = gcs_resumable_query_offset(
+                        session_url,
+                        total_size,
+                        content_type,
+                        timeout_seconds=min(60.0, timeout_seconds),
+                    )
+                offset = max(offset, next_offset)
+                if progress_cb:
+                    try:
+                        progress_cb(int(offset), int(total_size))
+                    except Exception:
+                        pass
+                continue
 
-        if status == 308:
-            next_offset = _parse_gcs_resume_offset(resp_headers)
-            if next_offset <= offset:
-                next_offset = gcs_resumable_query_offset(
+            if status in (408, 429) or 500 <= status <= 599:
+                consecutive_failures += 1
+                offset = gcs_resumable_query_offset(
                     session_url,
                     total_size,
                     content_type,
                     timeout_seconds=min(60.0, timeout_seconds),
                 )
-            offset = max(offset, next_offset)
-            if progress_cb:
-                try:
-                    progress_cb(int(offset), int(total_size))
-                except Exception:
-                    pass
-            continue
-
-        if status in (408, 429) or 500 <= status <= 599:
-            consecutive_failures += 1
-            offset = gcs_resumable_query_offset(
-                session_url,
-                total_size,
-                content_type,
-                timeout_seconds=min(60.0, timeout_seconds),
-            )
-            if progress_cb:
-                try:
-                    progress_cb(int(offset), int(total_size))
-                except Exception:
-                    pass
-            if consecutive_failures >= 5:
-                raise RuntimeError(f"GCS resumable upload failed after retries (status={status}): {body[:200]}")
-            _sleep_with_jitter(min(5.0, float(consecutive_failures)))
-            continue
+                if progress_cb:
+                    try:
+                        progress_cb(int(offset), int(total_size))
+                    except Exception:
+                        pass
+                if consecutive_failures >= 5:
+                    raise RuntimeError(f"GCS resumable upload failed after retries (status={status}): {body[:200]}")
+                _sleep_with_jitter(min(5.0, float(consecutive_failures)))
+                continue
 
-        raise RuntimeError(f"GCS resumable upload failed (status={status}): {body[:200]}")
+            raise RuntimeError(f"GCS resumable upload failed (status={status}): {body[:200]}")
+    finally:
+        if reader is not None:
+            reader.shutdown(wait=True, cancel_futures=True)
 
 
 @dataclass
@@ -2884,6 +4061,165 @@ class LocalState:
         )
 
 
+class SqliteStateStore:
+    """WAL-mode SQLite persistence for ``LocalState`` with per-record writes.
+
+    ``save`` diffs the in-memory state against what it last committed and
+    upserts/deletes only the changed records, all in one transaction, so an
+    eviction that drops several dependencies lands atomically and an LRU touch
+    costs one row instead of a whole-file rewrite. Callers keep mutating
+    ``LocalState`` and calling ``save`` exactly as they did with the JSON file.
+    """
+
+    SET_SECTIONS = ("installed_static", "installed_dynamic", "failed", "node_bundle_verify_class_types")
+    MAP_SECTIONS = ("lru", "retry", "verified", "node_bundle_verify_class_types_by_bundle")
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        # section -> key -> last committed value (deep-copied) for diffing.
+        self._persisted: Dict[str, Dict[str, Any]] = {
+            section: {} for section in self.SET_SECTIONS + self.MAP_SECTIONS
+        }
+
+    def open(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state_records ("
+                "section TEXT NOT NULL, record_key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (section, record_key)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS state_meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn = conn
+
+    def close(self) -> None:
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def is_initialized(self) -> bool:
+        """True once a save has committed; the schema row lands in the same
+        transaction as the records, so it marks a completed import."""
+        with self._lock:
+            assert self._conn is not None
+            row = self._conn.execute("SELECT value FROM state_meta WHERE name = 'schema'").fetchone()
+            return row is not None
+
+    def load(self) -> Dict[str, Any]:
+        """Return the committed state in the legacy JSON document shape."""
+        data: Dict[str, Any] = {section: [] for section in self.SET_SECTIONS}
+        data.update({section: {} for section in self.MAP_SECTIONS})
+        with self._lock:
+            assert self._conn is not None
+            rows = self._conn.execute("SELECT section, record_key, value FROM state_records").fetchall()
+            for section, key, value_text in rows:
+                if section not in data:
+                    continue
+                try:
+                    value = json.loads(value_text)
+                except Exception:
+                    continue
+                if section in self.SET_SECTIONS:
+                    data[section].append(key)
+                else:
+                    data[section][key] = value
+        return data
+
+    @staticmethod
+    def _sections(state: LocalState) -> Dict[str, Any]:
+        return {
+            "installed_static": state.installed_static,
+            "installed_dynamic": state.installed_dynamic,
+            "failed": state.failed,
+            "node_bundle_verify_class_types": state.node_bundle_verify_class_types,
+            "lru": state.lru,
+            "retry": state.retry,
+            "verified": state.verified,
+            "node_bundle_verify_class_types_by_bundle": state.node_bundle_verify_class_types_by_bundle,
+        }
+
+    def save(self, state: LocalState, meta: Optional[Dict[str, str]] = None) -> int:
+        """Commit the records that changed since the last save; returns rows written.
+
+        ``meta`` rows are written in the same transaction as the records.
+        """
+        with self._lock:
+            assert self._conn is not None
+            upserts: List[Tuple[str, str, str]] = []
+            deletes: List[Tuple[str, str]] = []
+            staged: List[Tuple[str, str, Any]] = []
+            for section, current in self._sections(state).items():
+                previous = self._persisted[section]
+                if section in self.SET_SECTIONS:
+                    for key in current - previous.keys():
+                        upserts.append((section, key, "true"))
+                        staged.append((section, key, True))
+                    for key in previous.keys() - current:
+                        deletes.append((section, key))
+                    continue
+                for key, value in current.items():
+                    if key in previous and previous[key] == value:
+                        continue
+                    if section == "node_bundle_verify_class_types_by_bundle":
+                        encoded = json.dumps(sorted(value))
+                    else:
+                        encoded = json.dumps(value, sort_keys=True, separators=(",", ":"))
+                    upserts.append((section, key, encoded))
+                    staged.append((section, key, copy.deepcopy(value)))
+                for key in previous.keys() - current.keys():
+                    deletes.append((section, key))
+            initialized = self._conn.execute("SELECT 1 FROM state_meta WHERE name = 'schema'").fetchone() is not None
+            if not upserts and not deletes and initialized:
+                return 0
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if upserts:
+                    self._conn.executemany(
+                        "INSERT INTO state_records (section, record_key, value) VALUES (?, ?, ?) "
+                        "ON CONFLICT (section, record_key) DO UPDATE SET value = excluded.value",
+                        upserts,
+                    )
+                if deletes:
+                    self._conn.executemany(
+                        "DELETE FROM state_records WHERE section = ? AND record_key = ?",
+                        deletes,
+                    )
+                self._conn.execute(
+                    "INSERT INTO state_meta (name, value) VALUES ('schema', '1') ON CONFLICT (name) DO NOTHING"
+                )
+                self._conn.executemany(
+                    "INSERT INTO state_meta (name, value) VALUES (?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+                    [("updatedAtMs", str(_now_ms())), *sorted((meta or {}).items())],
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            for section, key, value in staged:
+                self._persisted[section][key] = value
+            for section, key in deletes:
+                self._persisted[section].pop(key, None)
+            return len(upserts) + len(deletes)
+
+    def prime(self, state: LocalState) -> None:
+        """Treat ``state`` as already committed (used right after ``load``)."""
+        with self._lock:
+            for section, current in self._sections(state).items():
+                if section in self.SET_SECTIONS:
+                    self._persisted[section] = {key: True for key in current}
+                else:
+                    self._persisted[section] = copy.deepcopy(dict(current))
+
+
 @dataclass
 class DownloadActivity:
     dep_id: str
@@ -3173,6 +4509,18 @@ class GPUCoordinatorClient:
         if status not in (200, 204, 404, 409, 410):
             raise GPUCoordinatorUnavailable(f"GPU coordinator release failed (status={status})")
 
+    def invalidate_admission_claim(self, claim_id: str) -> bool:
+        """Drop a released claim from the gateway's validation cache; older gateways return 404."""
+        if not claim_id or not self._ensure_supported():
+            return False
+        status, _payload, _headers = self._request(
+            "POST",
+            "/v1/gpu/admission-claims/invalidate",
+            body={"claimId": str(claim_id)},
+            timeout_seconds=2.0,
+        )
+        return 200 <= status < 300
+
 
 @dataclass
 class AgentExecuteLease:
@@ -3233,6 +4581,8 @@ class PrlMinerController:
         self.gate_dir = self.root / "launch_gates"
         self.download_timeout_seconds = max(30.0, float(download_timeout_seconds))
         self.download_chunk_size = max(1024 * 1024, int(download_chunk_size))
+        # The agent swaps in its cached GPU telemetry collector.
+        self.gpu_telemetry: Callable[[], Dict[str, Any]] = _query_gpu_telemetry
         self._lock = threading.Lock()
         self._process_op_lock = threading.Lock()
         self._proc: Optional[subprocess.Popen] = None
@@ -3491,7 +4841,7 @@ class PrlMinerController:
             out["minerProcessCount"] = int(len(existing_pids))
             if existing_pids:
                 out["minerProcessPids"] = [int(existing_pid) for existing_pid in existing_pids[:20]]
-            out.update(_query_gpu_telemetry())
+            out.update(self.gpu_telemetry())
             if self.log_path.exists():
                 stat = self.log_path.stat()
                 out["logSizeBytes"] = int(stat.st_size)
@@ -3622,14 +4972,13 @@ class PrlMinerController:
         for download_url in urls:
             tmp_path = self.root / f".prl_gpu_miner.{uuid.uuid4().hex}.tmp"
             try:
-                download_tool = download_file_with_tool_fallback(
+                download_tool, actual = download_file_with_tool_fallback(
                     download_url,
                     tmp_path,
                     timeout_seconds=max(60.0, float(self.download_timeout_seconds)),
                     chunk_size=int(self.download_chunk_size),
                     user_agent=f"dm-agent-prl-miner/{AGENT_VERSION}",
                 )
-                actual = sha256_file(tmp_path).lower()
                 if actual != expected:
                     raise RuntimeError(f"PRL miner checksum mismatch: expected {expected} got {actual}")
                 if package_type == "tar_gz":
@@ -4419,15 +5768,192 @@ class PrlMinerController:
             )
 
 
-class ComfyNodeTimingCollector:
+class ComfyWebSocketClosed(EOFError):
+    """Raised when ComfyUI sends a WebSocket close frame."""
+
+
+class ComfyWebSocketClient:
+    """Dependency-free WebSocket transport for ComfyUI's local ``/ws`` endpoint.
+
+    Subclasses own the reader thread and decide what to do with decoded JSON
+    messages; this class only handles the handshake, framing and control frames.
+    """
+
+    _WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    def __init__(self, base_url: str, client_id: str) -> None:
+        self.base_url = str(base_url or "").rstrip("/")
+        self.client_id = str(client_id)
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._recv_buffer = bytearray()
+        self._fragments = bytearray()
+        self._fragment_opcode: Optional[int] = None
+        self._connected = False
+
+    def _connect(self, timeout_seconds: float) -> None:
+        parsed = urllib.parse.urlparse(self.base_url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise RuntimeError(f"Unsupported local Comfy URL for WebSocket: {self.base_url}")
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self._recv_buffer = bytearray()
+        self._fragments = bytearray()
+        self._fragment_opcode = None
+        sock = socket.create_connection((parsed.hostname, port), timeout=timeout_seconds)
+        self._sock = sock
+        if parsed.scheme == "https":
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parsed.hostname)
+            self._sock = sock
+        sock.settimeout(1.0)
+
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        base_path = (parsed.path or "").rstrip("/")
+        target = f"{base_path}/ws?{urllib.parse.urlencode({'clientId': self.client_id})}"
+        host = parsed.hostname if port in (80, 443) else f"{parsed.hostname}:{port}"
+        request = (
+            f"GET {target} HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode("ascii")
+        sock.sendall(request)
+        response = bytearray()
+        while b"\r\n\r\n" not in response:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise RuntimeError("Comfy WebSocket closed during handshake")
+            response.extend(chunk)
+            if len(response) > 65536:
+                raise RuntimeError("Comfy WebSocket handshake response was too large")
+        header_bytes, remainder = bytes(response).split(b"\r\n\r\n", 1)
+        header_text = header_bytes.decode("iso-8859-1")
+        if not header_text.startswith("HTTP/1.1 101"):
+            raise RuntimeError(f"Comfy WebSocket handshake failed: {header_text.splitlines()[0]}")
+        headers: Dict[str, str] = {}
+        for line in header_text.split("\r\n")[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        expected_accept = base64.b64encode(hashlib.sha1((key + self._WS_GUID).encode("ascii")).digest()).decode("ascii")
+        if headers.get("sec-websocket-accept") != expected_accept:
+            raise RuntimeError("Comfy WebSocket handshake accept key mismatch")
+        self._recv_buffer.extend(remainder)
+        with self._lock:
+            self._connected = True
+        self._send_control(
+            0x1,
+            json.dumps({"type": "feature_flags", "data": {"supports_preview_metadata": True}}).encode("utf-8"),
+        )
+
+    def _close_socket(self) -> None:
+        sock = self._sock
+        self._sock = None
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+        try:
+            sock.close()
+        except Exception:
+            pass
+
+    def _recv_exact(self, size: int) -> bytes:
+        while len(self._recv_buffer) < size:
+            sock = self._sock
+            if sock is None:
+                raise EOFError("WebSocket stopped")
+            chunk = sock.recv(min(65536, size - len(self._recv_buffer)))
+            if not chunk:
+                raise EOFError("WebSocket closed")
+            self._recv_buffer.extend(chunk)
+        out = bytes(self._recv_buffer[:size])
+        del self._recv_buffer[:size]
+        return out
+
+    def _recv_frame(self) -> Tuple[int, bool, bytes]:
+        head = self._recv_exact(2)
+        first, second = head[0], head[1]
+        fin = bool(first & 0x80)
+        opcode = first & 0x0F
+        masked = bool(second & 0x80)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", self._recv_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", self._recv_exact(8))[0]
+        if length > MAX_COMFY_WS_FRAME_BYTES:
+            raise RuntimeError(f"Comfy WebSocket frame exceeds {MAX_COMFY_WS_FRAME_BYTES} bytes")
+        mask = self._recv_exact(4) if masked else b""
+        payload = self._recv_exact(int(length))
+        if mask:
+            payload = bytes(byte ^ mask[idx % 4] for idx, byte in enumerate(payload))
+        return opcode, fin, payload
+
+    def _send_control(self, opcode: int, payload: bytes = b"") -> None:
+        sock = self._sock
+        if sock is None:
+            return
+        payload = payload[:125]
+        mask = os.urandom(4)
+        masked = bytes(byte ^ mask[idx % 4] for idx, byte in enumerate(payload))
+        frame = bytes([0x80 | (opcode & 0x0F), 0x80 | len(payload)]) + mask + masked
+        with self._send_lock:
+            sock.sendall(frame)
+
+    def _recv_message(self) -> Optional[Any]:
+        """Read one frame and return the decoded JSON message it completes, if any.
+
+        Control frames, binary previews and undecodable text return ``None``.
+        A close frame raises ``ComfyWebSocketClosed``.
+        """
+        opcode, fin, payload = self._recv_frame()
+        if opcode == 0x8:
+            raise ComfyWebSocketClosed("Comfy WebSocket sent close frame")
+        if opcode == 0x9:
+            self._send_control(0xA, payload)
+            return None
+        if opcode == 0xA:
+            return None
+        if opcode in (0x1, 0x2):
+            if self._fragment_opcode is not None:
+                raise RuntimeError("Comfy WebSocket started a data frame before finishing the prior message")
+            self._fragment_opcode = opcode
+            self._fragments = bytearray(payload)
+        elif opcode == 0x0 and self._fragment_opcode is not None:
+            self._fragments.extend(payload)
+        else:
+            return None
+        if len(self._fragments) > MAX_COMFY_WS_FRAME_BYTES:
+            raise RuntimeError(f"Comfy WebSocket fragmented message exceeds {MAX_COMFY_WS_FRAME_BYTES} bytes")
+        if not fin:
+            return None
+        complete_opcode = self._fragment_opcode
+        complete_payload = bytes(self._fragments)
+        self._fragment_opcode = None
+        self._fragments.clear()
+        if complete_opcode != 0x1:
+            return None
+        try:
+            return json.loads(complete_payload.decode("utf-8"))
+        except Exception:
+            return None
+
+
+class ComfyNodeTimingCollector(ComfyWebSocketClient):
     """Best-effort, dependency-free reader for ComfyUI's local WebSocket events.
 
     This intentionally measures wall time between native ``executing`` boundaries.
     It never synchronizes CUDA, polls GPU state, or participates in job completion.
     Any telemetry failure is recorded as partial coverage and must remain fail-open.
-    """
 
-    _WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+    The collector either owns a socket (``start``) or is fed by a shared
+    ``ComfyPromptEventStream`` through ``feed`` and ``stream_lost``.
+    """
 
     def __init__(
         self,
@@ -4437,8 +5963,7 @@ class ComfyNodeTimingCollector:
         workflow: Dict[str, Any],
         max_rows: int = MAX_COMFY_NODE_TIMING_ROWS,
     ) -> None:
-        self.base_url = str(base_url or "").rstrip("/")
-        self.client_id = str(client_id)
+        super().__init__(base_url, client_id)
         self.prompt_id = str(prompt_id)
         self.max_rows = max(1, min(MAX_COMFY_NODE_TIMING_ROWS, int(max_rows)))
         self._node_meta: Dict[str, Dict[str, str]] = {}
@@ -4454,16 +5979,10 @@ class ComfyNodeTimingCollector:
                 "title": title,
             }
 
-        self._lock = threading.Lock()
-        self._send_lock = threading.Lock()
         self._stop = threading.Event()
         self._ready = threading.Event()
         self._terminal = threading.Event()
         self._thread: Optional[threading.Thread] = None
-        self._sock: Optional[socket.socket] = None
-        self._recv_buffer = bytearray()
-        self._fragments = bytearray()
-        self._fragment_opcode: Optional[int] = None
         self._capture_started_ns = time.monotonic_ns()
         self._execution_started_ns: Optional[int] = None
         self._execution_finished_ns: Optional[int] = None
@@ -4472,7 +5991,6 @@ class ComfyNodeTimingCollector:
         self._cached_node_ids: Set[str] = set()
         self._terminal_event = ""
         self._issues: Set[str] = set()
-        self._connected = False
 
     def start(self, timeout_seconds: float = 3.0) -> bool:
         try:
@@ -4508,19 +6026,24 @@ class ComfyNodeTimingCollector:
                 self._issues.add("missing_ws_terminal")
         self._terminal.set()
 
+    def feed(self, message: Any, now_ns: Optional[int] = None) -> None:
+        """Apply one event delivered by a shared event stream."""
+        if self._stop.is_set():
+            return
+        self._handle_message(message, int(now_ns) if isinstance(now_ns, int) else time.monotonic_ns())
+
+    def stream_lost(self, reason: str = "websocket_disconnected") -> None:
+        """Record that the shared event stream dropped while this prompt ran."""
+        if self._stop.is_set() or self._terminal.is_set():
+            return
+        now_ns = time.monotonic_ns()
+        with self._lock:
+            self._close_active_locked(now_ns, str(reason)[:48], complete=False)
+            self._issues.add("websocket_disconnected")
+
     def stop(self) -> None:
         self._stop.set()
-        sock = self._sock
-        self._sock = None
-        if sock is not None:
-            try:
-                sock.shutdown(socket.SHUT_RDWR)
-            except Exception:
-                pass
-            try:
-                sock.close()
-            except Exception:
-                pass
+        self._close_socket()
         thread = self._thread
         if thread is not None and thread is not threading.current_thread():
             thread.join(timeout=1.0)
@@ -4595,151 +6118,19 @@ class ComfyNodeTimingCollector:
         with self._lock:
             self._issues.add(str(issue)[:64])
 
-    def _connect(self, timeout_seconds: float) -> None:
-        parsed = urllib.parse.urlparse(self.base_url)
-        if parsed.scheme not in ("http", "https") or not parsed.hostname:
-            raise RuntimeError(f"Unsupported local Comfy URL for WebSocket: {self.base_url}")
-        port = parsed.port or (443 if parsed.scheme == "https" else 80)
-        sock = socket.create_connection((parsed.hostname, port), timeout=timeout_seconds)
-        self._sock = sock
-        if parsed.scheme == "https":
-            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parsed.hostname)
-            self._sock = sock
-        sock.settimeout(1.0)
-
-        key = base64.b64encode(os.urandom(16)).decode("ascii")
-        base_path = (parsed.path or "").rstrip("/")
-        target = f"{base_path}/ws?{urllib.parse.urlencode({'clientId': self.client_id})}"
-        host = parsed.hostname if port in (80, 443) else f"{parsed.hostname}:{port}"
-        request = (
-            f"GET {target} HTTP/1.1\r\n"
-            f"Host: {host}\r\n"
-            "Upgrade: websocket\r\n"
-            "Connection: Upgrade\r\n"
-            f"Sec-WebSocket-Key: {key}\r\n"
-            "Sec-WebSocket-Version: 13\r\n\r\n"
-        ).encode("ascii")
-        sock.sendall(request)
-        response = bytearray()
-        while b"\r\n\r\n" not in response:
-            chunk = sock.recv(4096)
-            if not chunk:
-                raise RuntimeError("Comfy WebSocket closed during handshake")
-            response.extend(chunk)
-            if len(response) > 65536:
-                raise RuntimeError("Comfy WebSocket handshake response was too large")
-        header_bytes, remainder = bytes(response).split(b"\r\n\r\n", 1)
-        header_text = header_bytes.decode("iso-8859-1")
-        if not header_text.startswith("HTTP/1.1 101"):
-            raise RuntimeError(f"Comfy WebSocket handshake failed: {header_text.splitlines()[0]}")
-        headers: Dict[str, str] = {}
-        for line in header_text.split("\r\n")[1:]:
-            if ":" in line:
-                name, value = line.split(":", 1)
-                headers[name.strip().lower()] = value.strip()
-        expected_accept = base64.b64encode(hashlib.sha1((key + self._WS_GUID).encode("ascii")).digest()).decode("ascii")
-        if headers.get("sec-websocket-accept") != expected_accept:
-            raise RuntimeError("Comfy WebSocket handshake accept key mismatch")
-        self._recv_buffer.extend(remainder)
-        with self._lock:
-            self._connected = True
-        self._send_control(
-            0x1,
-            json.dumps({"type": "feature_flags", "data": {"supports_preview_metadata": True}}).encode("utf-8"),
-        )
-
-    def _recv_exact(self, size: int) -> bytes:
-        while len(self._recv_buffer) < size:
-            sock = self._sock
-            if sock is None:
-                raise EOFError("WebSocket stopped")
-            chunk = sock.recv(min(65536, size - len(self._recv_buffer)))
-            if not chunk:
-                raise EOFError("WebSocket closed")
-            self._recv_buffer.extend(chunk)
-        out = bytes(self._recv_buffer[:size])
-        del self._recv_buffer[:size]
-        return out
-
-    def _recv_frame(self) -> Tuple[int, bool, bytes]:
-        head = self._recv_exact(2)
-        first, second = head[0], head[1]
-        fin = bool(first & 0x80)
-        opcode = first & 0x0F
-        masked = bool(second & 0x80)
-        length = second & 0x7F
-        if length == 126:
-            length = struct.unpack("!H", self._recv_exact(2))[0]
-        elif length == 127:
-            length = struct.unpack("!Q", self._recv_exact(8))[0]
-        if length > MAX_COMFY_WS_FRAME_BYTES:
-            raise RuntimeError(f"Comfy WebSocket frame exceeds {MAX_COMFY_WS_FRAME_BYTES} bytes")
-        mask = self._recv_exact(4) if masked else b""
-        payload = self._recv_exact(int(length))
-        if mask:
-            payload = bytes(byte ^ mask[idx % 4] for idx, byte in enumerate(payload))
-        return opcode, fin, payload
-
-    def _send_control(self, opcode: int, payload: bytes = b"") -> None:
-        sock = self._sock
-        if sock is None:
-            return
-        payload = payload[:125]
-        mask = os.urandom(4)
-        masked = bytes(byte ^ mask[idx % 4] for idx, byte in enumerate(payload))
-        frame = bytes([0x80 | (opcode & 0x0F), 0x80 | len(payload)]) + mask + masked
-        with self._send_lock:
-            sock.sendall(frame)
-
     def _run(self) -> None:
         try:
             while not self._stop.is_set():
                 try:
-                    opcode, fin, payload = self._recv_frame()
+                    message = self._recv_message()
                 except socket.timeout:
                     continue
-                if opcode == 0x8:
-                    if not self._terminal.is_set():
-                        now_ns = time.monotonic_ns()
-                        with self._lock:
-                            self._close_active_locked(now_ns, "websocket_closed", complete=False)
-                            self._issues.add("websocket_disconnected")
-                    break
-                if opcode == 0x9:
-                    self._send_control(0xA, payload)
-                    continue
-                if opcode == 0xA:
-                    continue
-                if opcode in (0x1, 0x2):
-                    if self._fragment_opcode is not None:
-                        raise RuntimeError("Comfy WebSocket started a data frame before finishing the prior message")
-                    self._fragment_opcode = opcode
-                    self._fragments = bytearray(payload)
-                elif opcode == 0x0 and self._fragment_opcode is not None:
-                    self._fragments.extend(payload)
-                else:
-                    continue
-                if len(self._fragments) > MAX_COMFY_WS_FRAME_BYTES:
-                    raise RuntimeError(f"Comfy WebSocket fragmented message exceeds {MAX_COMFY_WS_FRAME_BYTES} bytes")
-                if not fin:
-                    continue
-                complete_opcode = self._fragment_opcode
-                complete_payload = bytes(self._fragments)
-                self._fragment_opcode = None
-                self._fragments.clear()
-                if complete_opcode != 0x1:
-                    continue
-                try:
-                    message = json.loads(complete_payload.decode("utf-8"))
-                except Exception:
-                    continue
-                self._handle_message(message, time.monotonic_ns())
+                if message is not None:
+                    self._handle_message(message, time.monotonic_ns())
+        except ComfyWebSocketClosed:
+            self.stream_lost("websocket_closed")
         except (EOFError, OSError):
-            if not self._stop.is_set() and not self._terminal.is_set():
-                now_ns = time.monotonic_ns()
-                with self._lock:
-                    self._close_active_locked(now_ns, "websocket_disconnected", complete=False)
-                    self._issues.add("websocket_disconnected")
+            self.stream_lost("websocket_disconnected")
         except Exception as exc:
             if not self._stop.is_set() and not self._terminal.is_set():
                 now_ns = time.monotonic_ns()
@@ -4766,62 +6157,430 @@ class ComfyNodeTimingCollector:
         if data.get("prompt_id") != self.prompt_id:
             return
         with self._lock:
-            if event_type == "execution_start":
-                self._execution_started_ns = now_ns
-                return
-            if event_type == "execution_cached":
-                nodes = data.get("nodes")
-                if isinstance(nodes, list):
-                    for node_id in nodes[:512]:
-                        if isinstance(node_id, (str, int)):
-                            self._cached_node_ids.add(str(node_id)[:64])
-                return
-            if event_type == "executing":
-                node = data.get("node")
-                if node is None:
-                    if self._execution_finished_ns is None:
-                        self._close_active_locked(now_ns, "execution_complete", complete=True)
-                        self._execution_finished_ns = now_ns
-                        self._terminal_event = "executing_complete"
-                        self._terminal.set()
-                    return
-                self._close_active_locked(now_ns, "next_node", complete=True)
-                node_id = str(node)[:64]
-                display_node = str(data.get("display_node") or node_id)[:64]
-                metadata = self._node_meta.get(node_id) or self._node_meta.get(display_node) or {}
-                if self._execution_started_ns is None:
-                    self._execution_started_ns = now_ns
-                    self._issues.add("missing_execution_start")
-                self._active = {
-                    "nodeId": node_id,
-                    "classType": metadata.get("classType", ""),
-                    "title": metadata.get("title", ""),
-                    "startNs": now_ns,
-                }
+            if event_type == "execution_start":
+                self._execution_started_ns = now_ns
+                return
+            if event_type == "execution_cached":
+                nodes = data.get("nodes")
+                if isinstance(nodes, list):
+                    for node_id in nodes[:512]:
+                        if isinstance(node_id, (str, int)):
+                            self._cached_node_ids.add(str(node_id)[:64])
+                return
+            if event_type == "executing":
+                node = data.get("node")
+                if node is None:
+                    if self._execution_finished_ns is None:
+                        self._close_active_locked(now_ns, "execution_complete", complete=True)
+                        self._execution_finished_ns = now_ns
+                        self._terminal_event = "executing_complete"
+                        self._terminal.set()
+                    return
+                self._close_active_locked(now_ns, "next_node", complete=True)
+                node_id = str(node)[:64]
+                display_node = str(data.get("display_node") or node_id)[:64]
+                metadata = self._node_meta.get(node_id) or self._node_meta.get(display_node) or {}
+                if self._execution_started_ns is None:
+                    self._execution_started_ns = now_ns
+                    self._issues.add("missing_execution_start")
+                self._active = {
+                    "nodeId": node_id,
+                    "classType": metadata.get("classType", ""),
+                    "title": metadata.get("title", ""),
+                    "startNs": now_ns,
+                }
+                return
+            terminal_event = event_type in ("execution_success", "execution_interrupted") or (
+                event_type == "execution_error" and isinstance(data.get("timestamp"), (int, float))
+            )
+            if terminal_event and self._execution_finished_ns is None:
+                self._close_active_locked(now_ns, str(event_type), complete=True)
+                self._execution_finished_ns = now_ns
+                self._terminal_event = str(event_type)
+                self._terminal.set()
+
+    def _close_active_locked(self, end_ns: int, end_reason: str, complete: bool) -> None:
+        active = self._active
+        self._active = None
+        if not active:
+            return
+        start_ns = int(active.get("startNs") or end_ns)
+        self._spans.append({
+            "nodeId": str(active.get("nodeId") or "")[:64],
+            "classType": str(active.get("classType") or "")[:96],
+            "title": str(active.get("title") or "")[:96],
+            "durationMs": max(0, int(round((end_ns - start_ns) / 1_000_000))),
+            "complete": bool(complete),
+            "endReason": str(end_reason)[:48],
+        })
+
+
+def _comfy_terminal_event(event_type: Any, data: Dict[str, Any]) -> str:
+    if event_type == "executing" and "node" in data and data.get("node") is None:
+        return "executing_complete"
+    if event_type in ("execution_success", "execution_error", "execution_interrupted"):
+        return str(event_type)
+    return ""
+
+
+class ComfyPromptWatch:
+    """One prompt's view of the shared Comfy event stream.
+
+    ``/history`` stays authoritative for outputs and failure details; the watch
+    only tells the execute loop when it is worth asking.
+    """
+
+    # ComfyUI sends the terminal event just before it records the history
+    # entry, so /history is re-read quickly for this long after the event.
+    terminal_fast_poll_seconds = 2.0
+
+    def __init__(self, prompt_id: str, collector: Optional[ComfyNodeTimingCollector] = None) -> None:
+        self.prompt_id = str(prompt_id)
+        self.collector = collector
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._terminal_event = ""
+        self._terminal_at: Optional[float] = None
+        self._error: Dict[str, Any] = {}
+        self._progress: Dict[str, Any] = {}
+        self._needs_history = False
+        self._stream_live = False
+
+    @property
+    def terminal_event(self) -> str:
+        with self._lock:
+            return self._terminal_event
+
+    @property
+    def stream_live(self) -> bool:
+        with self._lock:
+            return self._stream_live
+
+    def wait_for_update(self, timeout_seconds: float) -> bool:
+        woke = self._wake.wait(timeout=max(0.0, float(timeout_seconds)))
+        self._wake.clear()
+        return woke
+
+    def history_retry_delay(self) -> float:
+        """Seconds to sleep before re-reading a /history entry that is not terminal yet."""
+        with self._lock:
+            terminal_at = self._terminal_at
+            live = self._stream_live
+        if terminal_at is not None:
+            return 0.05 if time.monotonic() - terminal_at < self.terminal_fast_poll_seconds else 0.5
+        # A live stream without a terminal event waits in wait_for_update().
+        return 0.0 if live else 0.5
+
+    def take_resync(self) -> bool:
+        """Return True once after the stream reconnected and may have missed events."""
+        with self._lock:
+            needs_history = self._needs_history
+            self._needs_history = False
+            return needs_history
+
+    def progress_payload(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._progress)
+
+    def error_payload(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._error)
+
+    def _apply(self, message: Dict[str, Any], data: Dict[str, Any], now_ns: int) -> None:
+        event_type = message.get("type")
+        terminal_event = _comfy_terminal_event(event_type, data)
+        with self._lock:
+            if event_type == "progress":
+                for key in ("value", "max"):
+                    if isinstance(data.get(key), (int, float)):
+                        self._progress[key] = int(data[key])
+                if isinstance(data.get("node"), (str, int)):
+                    self._progress["node"] = str(data["node"])[:64]
+            elif event_type == "executing" and isinstance(data.get("node"), (str, int)):
+                node = str(data["node"])[:64]
+                if self._progress.get("node") != node:
+                    self._progress = {"node": node}
+            if terminal_event and not self._terminal_event:
+                self._terminal_event = terminal_event
+                self._terminal_at = time.monotonic()
+                if event_type == "execution_error":
+                    self._error = {
+                        key: str(data.get(key))[:512]
+                        for key in ("node_id", "node_type", "exception_type", "exception_message")
+                        if data.get(key) is not None
+                    }
+        if self.collector is not None:
+            self.collector.feed(message, now_ns)
+        if terminal_event or event_type == "progress":
+            self._wake.set()
+
+    def _set_stream_live(self, live: bool) -> None:
+        with self._lock:
+            self._stream_live = bool(live)
+            if live:
+                self._needs_history = True
+        if not live and self.collector is not None:
+            self.collector.stream_lost()
+        self._wake.set()
+
+
+class ComfyPromptEventStream(ComfyWebSocketClient):
+    """One long-lived ComfyUI WebSocket multiplexed across concurrent prompts.
+
+    ComfyUI only sends prompt events to the ``client_id`` that submitted the
+    prompt, so every prompt watched here must be submitted with this stream's
+    ``client_id``. Terminal events that arrive before a prompt is watched are
+    kept briefly so a late ``watch`` still sees them. After a reconnect every
+    open watch is flagged for a ``/history`` resync, since events sent while
+    the socket was down are lost.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        client_id: str,
+        reconnect_seconds: float = 1.0,
+        max_recent_terminals: int = 256,
+    ) -> None:
+        super().__init__(base_url, client_id)
+        self.reconnect_seconds = max(0.05, float(reconnect_seconds))
+        self.max_recent_terminals = max(1, int(max_recent_terminals))
+        self._stop = threading.Event()
+        self._online = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._watches: Dict[str, ComfyPromptWatch] = {}
+        self._recent_terminals: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        self._connects = 0
+        self._disconnects = 0
+        self._messages = 0
+
+    def start(self, timeout_seconds: float = 3.0) -> bool:
+        """Start the reader thread and wait briefly for the first connection."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="comfy-event-stream", daemon=True)
+                self._thread.start()
+        return self._online.wait(timeout=max(0.0, min(10.0, timeout_seconds)))
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._close_socket()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+
+    def connected(self) -> bool:
+        return self._online.is_set()
+
+    def watch(self, prompt_id: str, collector: Optional[ComfyNodeTimingCollector] = None) -> ComfyPromptWatch:
+        watch = ComfyPromptWatch(prompt_id, collector=collector)
+        with self._lock:
+            self._watches[watch.prompt_id] = watch
+            replay = self._recent_terminals.pop(watch.prompt_id, None)
+            live = self._connected
+        with watch._lock:
+            watch._stream_live = live
+        if replay is not None:
+            message, data = replay
+            watch._apply(message, data, time.monotonic_ns())
+        return watch
+
+    def unwatch(self, watch: ComfyPromptWatch) -> None:
+        with self._lock:
+            if self._watches.get(watch.prompt_id) is watch:
+                self._watches.pop(watch.prompt_id, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "connected": bool(self._connected),
+                "watches": len(self._watches),
+                "connects": self._connects,
+                "disconnects": self._disconnects,
+                "messages": self._messages,
+            }
+
+    def _run(self) -> None:
+        backoff = self.reconnect_seconds
+        while not self._stop.is_set():
+            try:
+                self._connect(timeout_seconds=3.0)
+            except Exception as exc:
+                self._close_socket()
+                with self._lock:
+                    self._connected = False
+                logging.debug("Comfy event stream connect failed (%s): %s", self.base_url, exc)
+                self._stop.wait(backoff)
+                backoff = min(10.0, backoff * 2)
+                continue
+            backoff = self.reconnect_seconds
+            self._set_online(True)
+            try:
+                while not self._stop.is_set():
+                    try:
+                        message = self._recv_message()
+                    except socket.timeout:
+                        continue
+                    if message is not None:
+                        self._dispatch(message, time.monotonic_ns())
+            except Exception as exc:
+                if not self._stop.is_set():
+                    logging.debug("Comfy event stream disconnected (%s): %s", self.base_url, exc)
+            finally:
+                self._close_socket()
+                self._set_online(False)
+            if not self._stop.is_set():
+                self._stop.wait(self.reconnect_seconds)
+
+    def _set_online(self, online: bool) -> None:
+        with self._lock:
+            self._connected = online
+            if online:
+                self._connects += 1
+            else:
+                self._disconnects += 1
+            watches = list(self._watches.values())
+        if online:
+            self._online.set()
+        else:
+            self._online.clear()
+        for watch in watches:
+            watch._set_stream_live(online)
+
+    def _dispatch(self, message: Any, now_ns: int) -> None:
+        if not isinstance(message, dict):
+            return
+        data = message.get("data") if isinstance(message.get("data"), dict) else {}
+        prompt_id = data.get("prompt_id")
+        if not isinstance(prompt_id, str) or not prompt_id:
+            return
+        with self._lock:
+            self._messages += 1
+            watch = self._watches.get(prompt_id)
+            if watch is None:
+                if _comfy_terminal_event(message.get("type"), data):
+                    self._recent_terminals.pop(prompt_id, None)
+                    self._recent_terminals[prompt_id] = (message, data)
+                    while len(self._recent_terminals) > self.max_recent_terminals:
+                        self._recent_terminals.pop(next(iter(self._recent_terminals)))
                 return
-            terminal_event = event_type in ("execution_success", "execution_interrupted") or (
-                event_type == "execution_error" and isinstance(data.get("timestamp"), (int, float))
-            )
-            if terminal_event and self._execution_finished_ns is None:
-                self._close_active_locked(now_ns, str(event_type), complete=True)
-                self._execution_finished_ns = now_ns
-                self._terminal_event = str(event_type)
-                self._terminal.set()
+        watch._apply(message, data, now_ns)
 
-    def _close_active_locked(self, end_ns: int, end_reason: str, complete: bool) -> None:
-        active = self._active
-        self._active = None
-        if not active:
+
+class ProbeCollector:
+    """Refreshes one runtime probe on a daemon thread so heartbeats read it from memory.
+
+    ``probe(timeout_seconds)`` runs every ``interval_seconds`` and ``read()``
+    returns the newest value with its staleness metadata.  A failed run keeps
+    the previous value and records the error.  A Python thread cannot be
+    cancelled, so the timeout is handed to the probe for its own requests and a
+    run that outlives it is reported as ``overdue``.  Until ``start()`` is
+    called every ``read()`` runs the probe inline.  Runs may overlap (an inline
+    refresh next to the thread's own run); each is stamped when it starts and
+    a result older than the stored one is discarded.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        probe: Callable[[float], Any],
+        interval_seconds: float,
+        timeout_seconds: float,
+    ) -> None:
+        self.name = name
+        self._probe = probe
+        self.interval_seconds = max(0.1, float(interval_seconds))
+        self.timeout_seconds = max(0.1, float(timeout_seconds))
+        self.stale_seconds = self.interval_seconds * 2 + self.timeout_seconds
+        self._lock = threading.Lock()
+        self._has_value = threading.Event()
+        self._value: Any = None
+        self._refreshed_at_ms = 0
+        self._refreshed_monotonic = 0.0
+        self._duration_ms = 0
+        self._run_seq = 0
+        self._stored_seq = 0
+        self._running: Dict[int, float] = {}
+        self._error = ""
+        self._failures = 0
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running():
             return
-        start_ns = int(active.get("startNs") or end_ns)
-        self._spans.append({
-            "nodeId": str(active.get("nodeId") or "")[:64],
-            "classType": str(active.get("classType") or "")[:96],
-            "title": str(active.get("title") or "")[:96],
-            "durationMs": max(0, int(round((end_ns - start_ns) / 1_000_000))),
-            "complete": bool(complete),
-            "endReason": str(end_reason)[:48],
-        })
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"dm-probe-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+
+    def request_refresh(self) -> None:
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.collect()
+            self._wakeup.wait(self.interval_seconds)
+            self._wakeup.clear()
+
+    def collect(self) -> None:
+        started = time.monotonic()
+        with self._lock:
+            self._run_seq += 1
+            seq = self._run_seq
+            self._running[seq] = started
+        try:
+            value, error = self._probe(self.timeout_seconds), ""
+        except Exception as exc:
+            value, error = None, str(exc)[:200] or type(exc).__name__
+            logging.debug("Runtime probe %s failed: %s", self.name, error)
+        finished = time.monotonic()
+        with self._lock:
+            self._running.pop(seq, None)
+            if seq < self._stored_seq:
+                return
+            self._stored_seq = seq
+            self._duration_ms = int((finished - started) * 1000)
+            if error:
+                self._error = error
+                self._failures += 1
+                return
+            self._value = value
+            self._refreshed_at_ms = _now_ms()
+            self._refreshed_monotonic = finished
+            self._error = ""
+            self._failures = 0
+        self._has_value.set()
+
+    def read(self) -> Tuple[Any, Dict[str, Any]]:
+        """Return ``(value, metadata)``; waits up to one timeout for the first value."""
+        if not self.running():
+            self.collect()
+        elif not self._has_value.is_set():
+            self._has_value.wait(self.timeout_seconds)
+        now = time.monotonic()
+        with self._lock:
+            has_value = self._has_value.is_set()
+            meta: Dict[str, Any] = {
+                "refreshedAtMs": int(self._refreshed_at_ms),
+                "durationMs": int(self._duration_ms),
+                "intervalMs": int(self.interval_seconds * 1000),
+                "stale": not has_value or now - self._refreshed_monotonic > self.stale_seconds,
+            }
+            if any(now - since > self.timeout_seconds for since in self._running.values()):
+                meta["overdue"] = True
+            if self._error:
+                meta["error"] = self._error
+                meta["failures"] = int(self._failures)
+            value = copy.copy(self._value)
+        return value, meta
 
 
 class DependencyAgent:
@@ -4838,7 +6597,14 @@ class DependencyAgent:
         self.provider_metadata = detect_provider_metadata()
         self.workspace = Path(_env_str("WORKSPACE", "/workspace") or "/workspace")
         self.comfyui_dir = Path(_env_str("DM_COMFYUI_DIR") or str(self.workspace / "ComfyUI"))
+        self.comfy_output_dir = Path(_env_str("DM_COMFY_OUTPUT_DIR") or str(self.comfyui_dir / "output"))
+        self.comfy_direct_outputs_enabled = _env_bool("DM_COMFY_DIRECT_OUTPUTS_ENABLED", True)
         self.state_path = Path(_env_str("DM_STATE_PATH") or str(self.workspace / "dependency_agent_state.json"))
+        self.state_store_kind = (_env_str("DM_STATE_STORE") or "sqlite").strip().lower()
+        if self.state_store_kind not in ("sqlite", "json"):
+            raise RuntimeError("DM_STATE_STORE must be sqlite or json")
+        self.state_db_path = Path(_env_str("DM_STATE_DB_PATH") or str(self.state_path.with_suffix(".sqlite3")))
+        self._state_store: Optional[SqliteStateStore] = None
         self.poll_seconds = _env_float("DM_POLL_SECONDS", 5.0)
         self.heartbeat_seconds = _env_float("DM_HEARTBEAT_SECONDS", 30.0)
         self.max_parallel = max(1, min(4, _env_int("MAX_PARALLEL_DOWNLOADS", 3)))
@@ -4855,6 +6621,7 @@ class DependencyAgent:
             self.download_timeout_seconds,
             self.download_chunk_size,
         )
+        self._idle_prl_miner.gpu_telemetry = lambda: self._runtime_probe_read("gpuTelemetry")[0] or {}
         self.idle_prl_free_comfy_before_start = _env_bool("DM_IDLE_PRL_FREE_COMFY_BEFORE_START", True)
         self.idle_prl_free_comfy_min_interval_ms = int(
             max(5.0, min(600.0, _env_float("DM_IDLE_PRL_FREE_COMFY_MIN_INTERVAL_SECONDS", 30.0))) * 1000
@@ -4875,9 +6642,13 @@ class DependencyAgent:
         if self.gpu_admission_mode not in ("off", "shadow", "enforcing"):
             raise RuntimeError("GPU_ADMISSION_MODE must be off, shadow, or enforcing")
         self.gpu_admission_max_depth = max(1, min(256, _env_int("DM_GPU_ADMISSION_MAX_DEPTH", 64)))
+        self.gpu_admission_layout = (_env_str("DM_GPU_ADMISSION_LAYOUT") or "root").strip().lower()
+        if self.gpu_admission_layout not in ("root", "sharded"):
+            raise RuntimeError("DM_GPU_ADMISSION_LAYOUT must be root or sharded")
         self.gpu_admission_ticket_stale_ms = int(
             max(5.0, min(120.0, _env_float("DM_GPU_ADMISSION_TICKET_STALE_SECONDS", 20.0))) * 1000
         )
+        self._gpu_admission_pruned_at_ms = 0
         self.gpu_admission_recovery_ms = int(
             max(10.0, min(300.0, _env_float("DM_GPU_ADMISSION_RECOVERY_SECONDS", 45.0))) * 1000
         )
@@ -4995,6 +6766,12 @@ class DependencyAgent:
             1,
             min(MAX_COMFY_NODE_TIMING_ROWS, _env_int("DM_COMFY_NODE_TIMING_MAX_ROWS", MAX_COMFY_NODE_TIMING_ROWS)),
         )
+        self.comfy_event_stream_enabled = _env_bool("DM_COMFY_EVENT_STREAM_ENABLED", True)
+        self.comfy_event_stream_history_safety_ms = int(
+            max(5.0, min(600.0, _env_float("DM_COMFY_EVENT_STREAM_HISTORY_SAFETY_SECONDS", 30.0))) * 1000
+        )
+        self._comfy_event_stream: Optional[ComfyPromptEventStream] = None
+        self._comfy_event_stream_lock = threading.Lock()
         self.local_comfy_allow_discovery = _env_bool(
             "DM_LOCAL_COMFY_ALLOW_DISCOVERY",
             self.server_type not in ("video_gen_v2", "video_gen_v3", "video_gen_v4"),
@@ -5042,6 +6819,17 @@ class DependencyAgent:
         self.input_cache_dir = Path(_env_str("DM_INPUT_CACHE_DIR") or str(self.workspace / ".dm_input_cache"))
         self.input_cache_max_bytes = max(0, int(_parse_bytes(_env_str("DM_INPUT_CACHE_MAX_BYTES")) or 20 * 1024 * 1024 * 1024))
         self.input_cache_heartbeat_max_keys = max(0, min(1000, _env_int("DM_INPUT_CACHE_HEARTBEAT_MAX_KEYS", 50)))
+        self.input_cache_scrub_bytes_per_second = int(
+            max(0.0, min(1024.0, _env_float("DM_INPUT_CACHE_SCRUB_MIB_PER_SECOND", 0.0))) * 1024 * 1024
+        )
+        self.input_cache_scrub_interval_ms = int(
+            max(60.0, _env_float("DM_INPUT_CACHE_SCRUB_INTERVAL_SECONDS", 86400.0)) * 1000
+        )
+        self._input_digest_index = VerifiedDigestIndex(self.input_cache_dir / ".index" / "digests.json")
+        self._input_cache_scrub_thread: Optional[threading.Thread] = None
+        self.runtime_probes_async = _env_bool("DM_RUNTIME_PROBES_ASYNC", True)
+        self._runtime_probes: Optional[Dict[str, ProbeCollector]] = None
+        self._runtime_probes_lock = threading.Lock()
         self.self_update_enabled = _env_bool("DM_AGENT_SELF_UPDATE_ENABLED", True)
         self.self_update_allow_downgrade = _env_bool("DM_AGENT_SELF_UPDATE_ALLOW_DOWNGRADE", False)
         self.self_update_retry_seconds = max(30.0, _env_float("DM_AGENT_SELF_UPDATE_RETRY_SECONDS", 300.0))
@@ -5081,6 +6869,9 @@ class DependencyAgent:
         self._profile: Dict[str, Any] = {}
         self._downloading: Set[str] = set()
         self._session_hash_verified_dep_ids: Set[str] = set()
+        # depId -> sha256 hashed while the download landed, plus the file identity
+        # (dev, inode, size, mtime) it describes; lets verification skip a re-read.
+        self._streamed_dependency_digests: Dict[str, Dict[str, Any]] = {}
         self._download_activity: Dict[str, DownloadActivity] = {}
         self._state: LocalState = self._load_state()
         self._dynamic_bytes_used = 0
@@ -5125,6 +6916,7 @@ class DependencyAgent:
         self._coordination_stream_thread: Optional[threading.Thread] = None
         self._coordination_stream_stop = threading.Event()
         self._coordination_stream_healthy = False
+        self._coordination_unindexed_queue_keys: Set[str] = set()
         self._coordination_dependency_http_checkpoint_due_ms = 0
         self._coordination_agent_http_checkpoint_due_ms = 0
         self._coordination_agent_direct_empty_probe_ms = 0
@@ -5134,6 +6926,12 @@ class DependencyAgent:
         self._last_agent_runtime_full_sync_ms = 0
         self._last_agent_runtime_signature = ""
         self._last_agent_http_transition_signature = ""
+        self.agent_runtime_delta_enabled = _env_bool("DM_RUNTIME_DELTA_ENABLED", True)
+        self.agent_runtime_gzip_min_bytes = max(0, _env_int("DM_RUNTIME_GZIP_MIN_BYTES", 0))
+        self._runtime_delta = RuntimeDeltaEncoder(
+            log_path=_env_str("DM_RUNTIME_DELTA_LOG") or "",
+            log_max_bytes=max(0, _env_int("DM_RUNTIME_DELTA_LOG_MAX_BYTES", 64 * 1024 * 1024)),
+        )
 
         # Best-effort local reconciliation (no API calls).
         with self._lock:
@@ -5609,6 +7407,9 @@ class DependencyAgent:
     def stop(self) -> None:
         self._stop.set()
         self._coordination_stream_stop.set()
+        for collector in (self._runtime_probes or {}).values():
+            collector.stop()
+        self._input_digest_index.flush()
         self._dependency_poll_wakeup.set()
         self._agent_poll_wakeup.set()
         self._loop_wakeup.set()
@@ -6613,6 +8414,7 @@ class DependencyAgent:
         self._coordination_id_token = None
         self._coordination_refresh_token = None
         self._coordination_id_token_expires_at_ms = 0
+        self._runtime_delta.reset()
         self._coordination_dependency_http_checkpoint_due_ms = 0
         self._coordination_agent_http_checkpoint_due_ms = 0
         self._coordination_agent_direct_empty_probe_ms = 0
@@ -6638,6 +8440,7 @@ class DependencyAgent:
         self._coordination_id_token = None
         self._coordination_refresh_token = None
         self._coordination_id_token_expires_at_ms = 0
+        self._runtime_delta.reset()
         self._coordination_dependency_http_checkpoint_due_ms = 0
         self._coordination_agent_http_checkpoint_due_ms = 0
         self._coordination_agent_direct_empty_probe_ms = 0
@@ -6895,14 +8698,22 @@ class DependencyAgent:
     ) -> Tuple[Optional[Any], str]:
         id_token = self._ensure_coordination_id_token()
         url = self._coordination_rtdb_url(node_path, id_token=id_token)
-        req = urllib.request.Request(
-            url,
-            method="GET",
-            headers={
-                "Accept": "application/json",
-                "X-Firebase-ETag": "true",
-            },
-        )
+        req_headers = {
+            "Accept": "application/json",
+            "X-Firebase-ETag": "true",
+        }
+        try:
+            pooled = _pooled_http_request("GET", url, headers=req_headers, timeout_seconds=timeout_seconds)
+        except (OSError, TimeoutError, http.client.HTTPException) as e:
+            raise NetworkError(url, e) from None
+        if pooled is not None:
+            status, raw_bytes, resp_headers = pooled
+            raw = raw_bytes.decode("utf-8", errors="replace")
+            if not 200 <= status < 300:
+                raise ApiError(status, raw)
+            parsed = _json_loads_or_none(raw) if raw else None
+            return parsed, str(resp_headers.get("etag") or "")
+        req = urllib.request.Request(url, method="GET", headers=req_headers)
         try:
             with urllib.request.urlopen(req, timeout=timeout_seconds) as resp:
                 raw = resp.read().decode("utf-8", errors="replace")
@@ -6921,7 +8732,7 @@ class DependencyAgent:
     def _coordination_put_json_if_match(
         self,
         node_path: str,
-        value: Dict[str, Any],
+        value: Any,
         etag: str,
         timeout_seconds: float = 10.0,
     ) -> bool:
@@ -6930,16 +8741,23 @@ class DependencyAgent:
         id_token = self._ensure_coordination_id_token()
         url = self._coordination_rtdb_url(node_path, id_token=id_token)
         payload = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
-        req = urllib.request.Request(
-            url,
-            data=payload,
-            method="PUT",
-            headers={
-                "Accept": "application/json",
-                "Content-Type": "application/json",
-                "If-Match": etag,
-            },
-        )
+        req_headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "If-Match": etag,
+        }
+        try:
+            pooled = _pooled_http_request("PUT", url, body=payload, headers=req_headers, timeout_seconds=timeout_seconds)
+        except (OSError, TimeoutError, http.client.HTTPException) as e:
+            raise NetworkError(url, e) from None
+        if pooled is not None:
+            status, raw_bytes, _resp_headers = pooled
+            if status == 412:
+                return False
+            if not 200 <= status < 300:
+                raise ApiError(status, raw_bytes.decode("utf-8", errors="replace"))
+            return status in (200, 204)
+        req = urllib.request.Request(url, data=payload, method="PUT", headers=req_headers)
         try:
             with urllib.request.urlopen(req, timeout=timeout_seconds) as resp:
                 return int(resp.status) in (200, 204)
@@ -6961,6 +8779,15 @@ class DependencyAgent:
             raise RuntimeError("A valid SERVER_TYPE is required for GPU admission")
         return f"/gpuAdmission/{server_type}"
 
+    def _gpu_admission_ticket_live(self, ticket: Dict[str, Any], now_ms: int) -> bool:
+        expires_at_ms = int(ticket.get("expiresAtMs") or 0)
+        heartbeat_at_ms = int(ticket.get("heartbeatAtMs") or 0)
+        is_active = str(ticket.get("state") or "") == "active"
+        is_parked_async = ticket.get("holder") == "inference_async" and ticket.get("attached") is not True
+        return expires_at_ms > now_ms and (
+            is_active or is_parked_async or now_ms - heartbeat_at_ms <= self.gpu_admission_ticket_stale_ms
+        )
+
     def _gpu_admission_prune(self, raw: Any, now_ms: int) -> Dict[str, Any]:
         root = dict(raw) if isinstance(raw, dict) else {}
         tickets_raw = root.get("tickets") if isinstance(root.get("tickets"), dict) else {}
@@ -6969,13 +8796,7 @@ class DependencyAgent:
             if not isinstance(ticket_value, dict):
                 continue
             ticket = dict(ticket_value)
-            expires_at_ms = int(ticket.get("expiresAtMs") or 0)
-            heartbeat_at_ms = int(ticket.get("heartbeatAtMs") or 0)
-            is_active = str(ticket.get("state") or "") == "active"
-            is_parked_async = ticket.get("holder") == "inference_async" and ticket.get("attached") is not True
-            if expires_at_ms > now_ms and (
-                is_active or is_parked_async or now_ms - heartbeat_at_ms <= self.gpu_admission_ticket_stale_ms
-            ):
+            if self._gpu_admission_ticket_live(ticket, now_ms):
                 tickets[str(ticket_id)] = ticket
         root["tickets"] = tickets
         return root
@@ -6984,20 +8805,237 @@ class DependencyAgent:
         self,
         mutate: Callable[[Dict[str, Any]], Tuple[Optional[Dict[str, Any]], Any]],
         attempts: int = 24,
+        record: str = "",
     ) -> Any:
+        """ETag compare-and-swap of the admission root, or of one ``record`` below it.
+
+        ``mutate`` returns ``(replacement, result)``; a ``None`` replacement
+        skips the write and an empty dict deletes the record.
+        """
         if not self._coordination:
             raise RuntimeError("RTDB coordination is unavailable for GPU admission")
-        root_path = self._gpu_admission_root_path()
+        node_path = self._gpu_admission_root_path() + (f"/{record}" if record else "")
         for attempt in range(max(1, attempts)):
-            raw, etag = self._coordination_get_json_with_etag(root_path, timeout_seconds=10.0)
+            raw, etag = self._coordination_get_json_with_etag(node_path, timeout_seconds=10.0)
             replacement, result = mutate(dict(raw) if isinstance(raw, dict) else {})
             if replacement is None:
                 return result
-            if self._coordination_put_json_if_match(root_path, replacement, etag, timeout_seconds=10.0):
+            if self._coordination_put_json_if_match(node_path, replacement, etag, timeout_seconds=10.0):
                 return result
             _sleep_with_jitter(min(0.5, 0.02 * (2 ** min(5, attempt))), jitter_ratio=0.25)
         raise RuntimeError("GPU admission transaction remained contended")
 
+    # Sharded layout (DM_GPU_ADMISSION_LAYOUT=sharded). Under /gpuAdmission/{serverType}:
+    #   tickets/{ticketId}  full ticket, written only by its owner
+    #   index/{ticketId}    compact copy of the fields FIFO ordering and pruning need
+    #   active              the single claim record; the only node waiters contend on
+    #   nextSequence        FIFO sequence counter
+    # Every read and compare-and-swap targets one of these small records, so an
+    # admission round never transfers the whole root and only hand-off races.
+
+    def _gpu_admission_index_entry(self, ticket: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: ticket[key] for key in GPU_ADMISSION_INDEX_FIELDS if key in ticket}
+
+    def _gpu_admission_patch(self, updates: Dict[str, Any], now_ms: int, bump_revision: bool = True) -> None:
+        """Atomic multi-path update of admission records relative to the root."""
+        root_path = self._gpu_admission_root_path()
+        body = dict(updates)
+        if bump_revision:
+            body["updatedAtMs"] = now_ms
+            body["revision"] = {".sv": {"increment": 1}}
+        url = self._coordination_rtdb_url(
+            root_path,
+            id_token=self._ensure_coordination_id_token(),
+            query={"print": "silent"},
+        )
+        status, resp = api_json("PATCH", url, body=body, timeout_seconds=10.0)
+        if status not in (200, 204):
+            raise RuntimeError(f"Unexpected RTDB admission patch response: {status} {resp}")
+
+    def _gpu_admission_drop_tickets(self, ticket_ids: List[str], now_ms: int, extra: Optional[Dict[str, Any]] = None) -> None:
+        updates: Dict[str, Any] = dict(extra or {})
+        for ticket_id in ticket_ids:
+            updates[f"tickets/{ticket_id}"] = None
+            updates[f"index/{ticket_id}"] = None
+        if updates:
+            self._gpu_admission_patch(updates, now_ms)
+
+    def _gpu_admission_live_index(self, now_ms: int, prune: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Live index entries; ``prune`` also drops stale ones, at most once per staleness window.
+
+        Stale entries are already excluded from the result, so pruning is only
+        garbage collection and does not need to run on every admission poll.
+        """
+        raw = self._coordination_get_json(self._gpu_admission_root_path() + "/index", timeout_seconds=10.0)
+        live: Dict[str, Dict[str, Any]] = {}
+        stale: List[str] = []
+        for ticket_id, entry in (raw.items() if isinstance(raw, dict) else ()):
+            if isinstance(entry, dict) and self._gpu_admission_ticket_live(entry, now_ms):
+                live[str(ticket_id)] = dict(entry)
+            else:
+                stale.append(str(ticket_id))
+        last_pruned_ms = int(getattr(self, "_gpu_admission_pruned_at_ms", 0))
+        if prune and stale and now_ms - last_pruned_ms >= self.gpu_admission_ticket_stale_ms:
+            self._gpu_admission_pruned_at_ms = now_ms
+            for ticket_id in stale:
+                # The owner may heartbeat concurrently; only drop the entry if it
+                # is still stale under its own ETag.
+                def mutate(entry: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
+                    if entry and self._gpu_admission_ticket_live(entry, now_ms):
+                        return None, False
+                    return {}, True
+
+                try:
+                    if self._gpu_admission_transaction(mutate, attempts=2, record=f"index/{ticket_id}"):
+                        self._gpu_admission_drop_tickets([ticket_id], now_ms)
+                except Exception as exc:
+                    logging.debug("Could not prune stale GPU admission ticket=%s: %s", ticket_id, exc)
+        return live
+
+    def _gpu_admission_heartbeat(self, ticket_id: str, now_ms: int) -> None:
+        """Refresh the caller's own ticket with one PATCH and no revision bump.
+
+        Only state transitions go through ``_gpu_admission_touch_ticket``. A
+        heartbeat racing a prune can leave a ``{heartbeatAtMs}`` stub behind;
+        without ``expiresAtMs`` it is never live and the next prune drops it.
+        """
+        self._gpu_admission_patch(
+            {f"tickets/{ticket_id}/heartbeatAtMs": now_ms, f"index/{ticket_id}/heartbeatAtMs": now_ms},
+            now_ms,
+            bump_revision=False,
+        )
+
+    def _gpu_admission_touch_ticket(self, ticket_id: str, fields: Dict[str, Any], now_ms: int) -> bool:
+        """Compare-and-swap a state change onto the caller's own ticket; False once it has been pruned."""
+
+        def mutate(entry: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
+            if not entry:
+                return None, False
+            entry.update({key: value for key, value in fields.items() if key in GPU_ADMISSION_INDEX_FIELDS})
+            return entry, True
+
+        def mutate_ticket(ticket: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
+            # A per-field PATCH would recreate a ticket another agent just
+            # pruned as a partial record without kind/sequence.
+            if not ticket:
+                return None, False
+            ticket.update(fields)
+            return ticket, True
+
+        if not self._gpu_admission_transaction(mutate, attempts=4, record=f"index/{ticket_id}"):
+            return False
+        if not self._gpu_admission_transaction(mutate_ticket, attempts=4, record=f"tickets/{ticket_id}"):
+            return False
+        self._gpu_admission_patch({}, now_ms)
+        return True
+
+    def _gpu_admission_next_sequence(self, attempts: int = 24) -> int:
+        node_path = self._gpu_admission_root_path() + "/nextSequence"
+        for attempt in range(max(1, attempts)):
+            raw, etag = self._coordination_get_json_with_etag(node_path, timeout_seconds=10.0)
+            sequence = (int(raw) if isinstance(raw, (int, float)) else 0) + 1
+            if self._coordination_put_json_if_match(node_path, sequence, etag, timeout_seconds=10.0):
+                return sequence
+            _sleep_with_jitter(min(0.5, 0.02 * (2 ** min(5, attempt))), jitter_ratio=0.25)
+        raise RuntimeError("GPU admission sequence remained contended")
+
+    def _enqueue_comfy_gpu_admission_sharded(
+        self,
+        lease: AgentExecuteLease,
+        ticket_id: str,
+        estimated_duration_ms: int,
+        now_ms: int,
+    ) -> str:
+        root_path = self._gpu_admission_root_path()
+        existing = self._coordination_get_json(f"{root_path}/tickets/{ticket_id}", timeout_seconds=10.0)
+        if isinstance(existing, dict) and self._gpu_admission_ticket_live(existing, now_ms):
+            fields = {
+                "heartbeatAtMs": now_ms,
+                "expiresAtMs": max(int(existing.get("expiresAtMs") or 0), now_ms + 3_600_000),
+                "attached": True,
+            }
+            if self._gpu_admission_touch_ticket(ticket_id, fields, now_ms):
+                return ticket_id
+        # The depth bound is advisory here: concurrent enqueuers may overshoot it
+        # by at most their own count instead of serialising on the whole root.
+        if len(self._gpu_admission_live_index(now_ms, prune=True)) >= self.gpu_admission_max_depth:
+            raise GPUCoordinatorBusy("GPU admission queue is full", 5.0)
+        ticket = {
+            "ticketId": ticket_id,
+            "requestId": str(lease.job_id)[:128],
+            "holder": "comfy",
+            "sequence": self._gpu_admission_next_sequence(),
+            "enqueuedAtMs": now_ms,
+            "heartbeatAtMs": now_ms,
+            "expiresAtMs": now_ms + 3_600_000,
+            "estimatedDurationMs": max(1_000, min(3_600_000, int(estimated_duration_ms))),
+            "stream": False,
+            "attached": True,
+            "state": "waiting",
+        }
+        self._gpu_admission_patch(
+            {f"tickets/{ticket_id}": ticket, f"index/{ticket_id}": self._gpu_admission_index_entry(ticket)},
+            now_ms,
+        )
+        return ticket_id
+
+    def _claim_comfy_gpu_admission_sharded(
+        self,
+        ticket_id: str,
+        now_ms: int,
+        should_heartbeat: bool,
+        attempts: int = 4,
+    ) -> Tuple[Optional[str], bool]:
+        """One admission poll: returns ``(claim_token, saw_recovering)``."""
+        active_path = self._gpu_admission_root_path() + "/active"
+        for _attempt in range(max(1, attempts)):
+            raw, etag = self._coordination_get_json_with_etag(active_path, timeout_seconds=10.0)
+            active = dict(raw) if isinstance(raw, dict) and raw else None
+            if active is not None:
+                if active.get("ticketId") == ticket_id:
+                    return str(active.get("claimToken") or "") or None, False
+                saw_recovering = False
+                if now_ms - int(active.get("heartbeatAtMs") or 0) >= self.gpu_admission_recovery_ms:
+                    saw_recovering = True
+                    if active.get("state") != "recovering":
+                        active["state"] = "recovering"
+                        if not self._coordination_put_json_if_match(active_path, active, etag, timeout_seconds=10.0):
+                            continue
+                        return None, True
+                if should_heartbeat:
+                    self._gpu_admission_heartbeat(ticket_id, now_ms)
+                return None, saw_recovering
+            index = self._gpu_admission_live_index(now_ms, prune=True)
+            if ticket_id not in index:
+                return None, False
+            eligible = sorted(
+                (
+                    (str(key), entry) for key, entry in index.items()
+                    if entry.get("attached") is True and entry.get("state") == "waiting"
+                ),
+                key=lambda row: (int(row[1].get("sequence") or 0), row[0]),
+            )
+            if not eligible or eligible[0][0] != ticket_id:
+                if should_heartbeat:
+                    self._gpu_admission_heartbeat(ticket_id, now_ms)
+                return None, False
+            claim_token = uuid.uuid4().hex
+            record = {
+                "ticketId": ticket_id,
+                "requestId": str(index[ticket_id].get("requestId") or ""),
+                "holder": "comfy",
+                "sequence": int(index[ticket_id].get("sequence") or 0),
+                "claimToken": claim_token,
+                "claimedAtMs": now_ms,
+                "heartbeatAtMs": now_ms,
+                "state": "active",
+            }
+            if not self._coordination_put_json_if_match(active_path, record, etag, timeout_seconds=10.0):
+                continue
+            self._gpu_admission_touch_ticket(ticket_id, {"state": "active", "heartbeatAtMs": now_ms}, now_ms)
+            return claim_token, False
+        return None, False
+
     def _gpu_admission_ticket_key(self, lease: AgentExecuteLease) -> str:
         identity = f"{self.instance_id or 'instance'}:{lease.item_id}"
         return "comfy_" + base64.urlsafe_b64encode(identity.encode("utf-8")).decode("ascii").rstrip("=")
@@ -7007,6 +9045,13 @@ class DependencyAgent:
             return None
         ticket_id = self._gpu_admission_ticket_key(lease)
         now_ms = _now_ms()
+        if self.gpu_admission_layout == "sharded":
+            if not self._coordination:
+                raise RuntimeError("RTDB coordination is unavailable for GPU admission")
+            lease.gpu_admission_ticket_id = self._enqueue_comfy_gpu_admission_sharded(
+                lease, ticket_id, estimated_duration_ms, now_ms
+            )
+            return lease.gpu_admission_ticket_id
 
         def mutate(raw: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
             root = self._gpu_admission_prune(raw, now_ms)
@@ -7052,6 +9097,21 @@ class DependencyAgent:
         if coordinator_status.get("safeToClearAdmission") is not True:
             return False
         now_ms = _now_ms()
+        if self.gpu_admission_layout == "sharded":
+
+            def clear_active(active: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
+                if not active or active.get("state") != "recovering":
+                    return None, None
+                if now_ms - int(active.get("heartbeatAtMs") or 0) < self.gpu_admission_recovery_ms:
+                    return None, None
+                return {}, str(active.get("ticketId") or "")
+
+            stale_ticket_id = self._gpu_admission_transaction(clear_active, record="active")
+            if stale_ticket_id is None:
+                return False
+            self._gpu_admission_drop_tickets([stale_ticket_id] if stale_ticket_id else [], now_ms)
+            logging.warning("Recovered a stale GPU admission claim after verifying the local coordinator was idle")
+            return True
 
         def mutate(raw: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
             root = self._gpu_admission_prune(raw, now_ms)
@@ -7142,7 +9202,12 @@ class DependencyAgent:
                 root["revision"] = int(root.get("revision") or 0) + 1
                 return root, claim_token
 
-            claim_token = self._gpu_admission_transaction(mutate)
+            if self.gpu_admission_layout == "sharded":
+                claim_token, saw_recovering = self._claim_comfy_gpu_admission_sharded(
+                    ticket_id, now_ms, should_heartbeat
+                )
+            else:
+                claim_token = self._gpu_admission_transaction(mutate)
             if claim_token:
                 lease.gpu_admission_claim_token = str(claim_token)
                 logging.info("Claimed FIFO GPU admission ticket=%s jobId=%s", ticket_id, lease.job_id)
@@ -7157,6 +9222,19 @@ class DependencyAgent:
 
     def _heartbeat_comfy_gpu_admission(self, ticket_id: str, claim_token: str) -> bool:
         now_ms = _now_ms()
+        if self.gpu_admission_layout == "sharded":
+
+            def touch_active(active: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
+                if active.get("ticketId") != ticket_id or active.get("claimToken") != claim_token:
+                    return None, False
+                active["heartbeatAtMs"] = now_ms
+                active["state"] = "active"
+                return active, True
+
+            if not self._gpu_admission_transaction(touch_active, record="active"):
+                return False
+            self._gpu_admission_heartbeat(ticket_id, now_ms)
+            return True
 
         def mutate(raw: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
             root = self._gpu_admission_prune(raw, now_ms)
@@ -7184,6 +9262,28 @@ class DependencyAgent:
             return
         now_ms = _now_ms()
 
+        def release_active(active: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
+            if claim_token and active and (
+                active.get("ticketId") != ticket_id or active.get("claimToken") != claim_token
+            ):
+                return None, None
+            if active.get("ticketId") == ticket_id:
+                return {}, max(1, now_ms - int(active.get("claimedAtMs") or now_ms))
+            return None, 0
+
+        def release_sharded() -> None:
+            elapsed_ms = self._gpu_admission_transaction(release_active, record="active")
+            if elapsed_ms is None:
+                return
+            extra: Dict[str, Any] = {}
+            if elapsed_ms:
+                previous = self._coordination_get_json(
+                    self._gpu_admission_root_path() + "/serviceEwmaMs", timeout_seconds=10.0
+                )
+                previous_ms = int(previous) if isinstance(previous, (int, float)) and previous else elapsed_ms
+                extra["serviceEwmaMs"] = round(previous_ms * 0.8 + elapsed_ms * 0.2)
+            self._gpu_admission_drop_tickets([ticket_id], now_ms, extra)
+
         def mutate(raw: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
             root = self._gpu_admission_prune(raw, now_ms)
             active = root.get("active")
@@ -7202,10 +9302,18 @@ class DependencyAgent:
             return root, True
 
         try:
-            self._gpu_admission_transaction(mutate)
+            if self.gpu_admission_layout == "sharded":
+                release_sharded()
+            else:
+                self._gpu_admission_transaction(mutate)
             logging.info("Released FIFO GPU admission ticket=%s jobId=%s reason=%s", ticket_id, lease.job_id, reason)
         except Exception as exc:
             logging.error("Failed releasing FIFO GPU admission ticket=%s jobId=%s: %s", ticket_id, lease.job_id, exc)
+        if claim_token and self._gpu_coordinator.configured:
+            try:
+                self._gpu_coordinator.invalidate_admission_claim(claim_token)
+            except Exception as exc:
+                logging.debug("Could not invalidate cached GPU admission claim ticket=%s: %s", ticket_id, exc)
 
     def _gpu_admission_has_foreground_work(self) -> bool:
         if self.gpu_admission_mode != "enforcing":
@@ -7213,6 +9321,15 @@ class DependencyAgent:
         if not self._coordination:
             return True
         try:
+            if self.gpu_admission_layout == "sharded":
+                root_path = self._gpu_admission_root_path()
+                if self._coordination_get_json(f"{root_path}/durableDemandActive", timeout_seconds=5.0) is True:
+                    return True
+                if isinstance(self._coordination_get_json(f"{root_path}/active", timeout_seconds=5.0), dict):
+                    return True
+                return any(
+                    entry.get("attached") is True for entry in self._gpu_admission_live_index(_now_ms()).values()
+                )
             raw = self._coordination_get_json(self._gpu_admission_root_path(), timeout_seconds=5.0)
             root = self._gpu_admission_prune(raw, _now_ms())
             if root.get("durableDemandActive") is True:
@@ -7298,6 +9415,56 @@ class DependencyAgent:
             return None
         return candidates
 
+    def _coordination_claim_order_candidates(
+        self,
+        queue_path_key: str,
+        root_path: str,
+        claim_window: int,
+        skip_execute_jobs: bool,
+        max_pages: int = 8,
+    ) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+        """Page the claimOrderKey range until ``claim_window`` claimable items are found."""
+        candidates: List[Tuple[str, Dict[str, Any]]] = []
+        seen: Set[str] = set()
+        start_at = "queued|"
+        for _page in range(max(1, max_pages)):
+            try:
+                raw = self._coordination_get_json(
+                    root_path,
+                    timeout_seconds=10.0,
+                    query={
+                        "orderBy": json.dumps("claimOrderKey"),
+                        "startAt": json.dumps(start_at),
+                        "endAt": json.dumps("queued|\uf8ff"),
+                        "limitToFirst": str(claim_window),
+                    },
+                )
+            except Exception as e:
+                if isinstance(e, ApiError) and "Index not defined" in str(e.body or ""):
+                    logging.warning("RTDB %s has no claimOrderKey index; claiming via the state query.", queue_path_key)
+                    self._coordination_unindexed_queue_keys.add(queue_path_key)
+                else:
+                    logging.warning("RTDB queue read failed for %s via claimOrderKey: %s", queue_path_key, e)
+                return None
+            page = raw if isinstance(raw, dict) else {}
+            fresh = {key: value for key, value in page.items() if key not in seen}
+            seen.update(fresh)
+            parsed = self._coordination_collect_queue_candidates(queue_path_key, fresh, skip_execute_jobs)
+            if parsed is None:
+                return None
+            candidates.extend(parsed)
+            order_keys = [
+                value.get("claimOrderKey")
+                for value in page.values()
+                if isinstance(value, dict) and isinstance(value.get("claimOrderKey"), str)
+            ]
+            # startAt is inclusive, so the next page repeats the last key;
+            # a page with nothing new means ties filled the whole window.
+            if len(candidates) >= claim_window or len(page) < claim_window or not fresh or not order_keys:
+                break
+            start_at = max(order_keys)
+        return candidates
+
     def _coordination_claim_queue_items(
         self,
         queue_path_key: str,
@@ -7315,47 +9482,34 @@ class DependencyAgent:
         if not isinstance(root_path, str) or not root_path:
             return None
 
-        query_attempts: List[Tuple[str, Dict[str, str]]] = []
-        if queue_path_key == "agentQueueItems":
-            claim_window = max(4, min(40, max(1, int(limit)) * 4))
-            query_attempts.append(
-                (
-                    "claimOrderKey",
-                    {
-                        "orderBy": json.dumps("claimOrderKey"),
-                        "startAt": json.dumps("queued|"),
-                        "endAt": json.dumps("queued|\uf8ff"),
-                        "limitToFirst": str(claim_window),
-                    },
-                )
-            )
-        query_attempts.append(
-            (
-                "state",
-                {
-                    "orderBy": json.dumps("state"),
-                    "equalTo": json.dumps("queued"),
-                },
-            )
-        )
-
+        # The agent queue is read through the claimOrderKey index
+        # ("<state>|<priority/age>"), which returns queued items already in
+        # claim order one bounded page at a time; further pages are read only
+        # while the page holds too few items this host may claim. The
+        # dependency queue's writers do not all set the key yet, so it keeps
+        # the state query. That query stays unbounded: RTDB returns
+        # equalTo matches in key order and REST cannot page them by value, so
+        # a limit would hide eligible or higher-priority items behind
+        # ineligible ones.
+        claim_window = max(4, min(40, max(1, int(limit)) * 4))
         candidates: Optional[List[Tuple[str, Dict[str, Any]]]] = None
-        for query_name, query in query_attempts:
+        if queue_path_key == "agentQueueItems" and queue_path_key not in self._coordination_unindexed_queue_keys:
+            candidates = self._coordination_claim_order_candidates(
+                queue_path_key, root_path, claim_window, skip_execute_jobs
+            )
+            if candidates is None and queue_path_key not in self._coordination_unindexed_queue_keys:
+                return None
+        if not candidates:
             try:
                 raw = self._coordination_get_json(
                     root_path,
                     timeout_seconds=10.0,
-                    query=query,
+                    query={"orderBy": json.dumps("state"), "equalTo": json.dumps("queued")},
                 )
             except Exception as e:
-                logging.warning("RTDB queue read failed for %s via %s: %s", queue_path_key, query_name, e)
-                return None
-            parsed = self._coordination_collect_queue_candidates(queue_path_key, raw, skip_execute_jobs)
-            if parsed is None:
+                logging.warning("RTDB queue read failed for %s via state: %s", queue_path_key, e)
                 return None
-            if parsed or query_name == "state":
-                candidates = parsed
-                break
+            candidates = self._coordination_collect_queue_candidates(queue_path_key, raw, skip_execute_jobs)
 
         if candidates is None:
             return None
@@ -7363,87 +9517,126 @@ class DependencyAgent:
         if not candidates:
             return []
 
-        claimed: List[Dict[str, Any]] = []
+        # Claim a batch sized to the caller's free capacity. Each item is its
+        # own compare-and-swap, so a wave of them runs concurrently and only
+        # items lost to other agents are replaced from the rest of the window.
+        need = max(1, int(limit))
         instance_id = str(self._resolved_instance_id or "")
         lease_duration_sec = float(self._coordination.get("leaseDurationSeconds") or 90.0)
-        for encoded_key, item in sorted(candidates, key=lambda row: self._coordination_candidate_sort_key(row[1])):
-            if len(claimed) >= max(1, int(limit)):
-                break
-            item_path = self._coordination_queue_item_path(root_path, encoded_key)
+        ordered = sorted(candidates, key=lambda row: self._coordination_candidate_sort_key(row[1]))
+        claimed: List[Dict[str, Any]] = []
+        cursor = 0
+
+        def claim(row: Tuple[str, Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+            encoded_key, item = row
             try:
-                current, etag = self._coordination_get_json_with_etag(item_path, timeout_seconds=10.0)
-                if not isinstance(current, dict) or str(current.get("state") or "") != "queued":
-                    continue
-                lease_id = f"lease_{uuid.uuid4().hex}"
-                lease_expires_at_ms = self._server_now_ms() + int(max(10.0, lease_duration_sec) * 1000)
-                attempts = int(current.get("attempts") or 0) if isinstance(current.get("attempts"), (int, float)) else 0
-                next_value = dict(current)
-                next_value.update(
-                    {
-                        "state": target_state,
-                        "leaseOwner": instance_id,
-                        "leaseId": lease_id,
-                        "leaseExpiresAtMs": lease_expires_at_ms,
-                        "leaseExpiresAt": _ms_to_iso(lease_expires_at_ms),
-                        "attempts": attempts + 1,
-                        "updatedAtMs": self._server_now_ms(),
-                    }
+                return self._coordination_claim_queue_item(
+                    queue_path_key, root_path, encoded_key, item, target_state, instance_id, lease_duration_sec
+                ), None
+            except Exception as e:
+                logging.warning("RTDB queue claim failed for %s/%s: %s", queue_path_key, item.get("itemId"), e)
+                return None, e
+
+        while len(claimed) < need and cursor < len(ordered):
+            wave = ordered[cursor:cursor + need - len(claimed)]
+            cursor += len(wave)
+            if len(wave) == 1:
+                results = [claim(wave[0])]
+            else:
+                with ThreadPoolExecutor(
+                    max_workers=min(RTDB_CLAIM_MAX_PARALLEL, len(wave)),
+                    thread_name_prefix="rtdb-claim",
+                ) as pool:
+                    results = list(pool.map(claim, wave))
+            claimed.extend(claimed_item for claimed_item, _error in results if claimed_item is not None)
+            if any(error is not None for _claimed_item, error in results):
+                # Items already leased in this round are handed back to the
+                # caller rather than stranded until their lease expires.
+                return claimed or None
+        return claimed
+
+    def _coordination_claim_queue_item(
+        self,
+        queue_path_key: str,
+        root_path: str,
+        encoded_key: str,
+        item: Dict[str, Any],
+        target_state: str,
+        instance_id: str,
+        lease_duration_sec: float,
+    ) -> Optional[Dict[str, Any]]:
+        """Lease one queue item with an ETag compare-and-swap; None when it was lost or unusable."""
+        item_path = self._coordination_queue_item_path(root_path, encoded_key)
+        current, etag = self._coordination_get_json_with_etag(item_path, timeout_seconds=10.0)
+        if not isinstance(current, dict) or str(current.get("state") or "") != "queued":
+            return None
+        lease_id = f"lease_{uuid.uuid4().hex}"
+        lease_expires_at_ms = self._server_now_ms() + int(max(10.0, lease_duration_sec) * 1000)
+        attempts = int(current.get("attempts") or 0) if isinstance(current.get("attempts"), (int, float)) else 0
+        next_value = dict(current)
+        next_value.update(
+            {
+                "state": target_state,
+                "leaseOwner": instance_id,
+                "leaseId": lease_id,
+                "leaseExpiresAtMs": lease_expires_at_ms,
+                "leaseExpiresAt": _ms_to_iso(lease_expires_at_ms),
+                "attempts": attempts + 1,
+                "updatedAtMs": self._server_now_ms(),
+            }
+        )
+        claimed_item = dict(next_value)
+        claimed_item["itemId"] = str(current.get("itemId") or item.get("itemId") or encoded_key)
+        write_value = dict(next_value)
+        if queue_path_key == "agentQueueItems":
+            payload = current.get("payload")
+            if isinstance(payload, dict):
+                if isinstance(payload.get("jobId"), str):
+                    write_value.setdefault("requestedByJobId", payload.get("jobId"))
+                if isinstance(payload.get("executionAttempt"), (int, float)):
+                    write_value.setdefault("executionAttempt", int(payload.get("executionAttempt")))
+                if isinstance(payload.get("attemptEpoch"), (int, float)):
+                    write_value.setdefault("attemptEpoch", int(payload.get("attemptEpoch")))
+            # The agent has the payload in claimed_item; keeping it in the
+            # leased RTDB mirror makes every heartbeat/event reconciliation
+            # reread the full command body.
+            write_value.pop("payload", None)
+            write_value.pop("claimOrderKey", None)
+        elif queue_path_key == "dependencyQueueItems":
+            write_value.pop("payload", None)
+            write_value.pop("resolved", None)
+            write_value.pop("claimOrderKey", None)
+        if not self._coordination_put_json_if_match(item_path, write_value, etag, timeout_seconds=10.0):
+            return None
+        if queue_path_key == "agentQueueItems" and not isinstance(claimed_item.get("payload"), dict):
+            fetched_item = self._agent_fetch_queue_item(claimed_item["itemId"], lease_id)
+            if isinstance(fetched_item, dict) and isinstance(fetched_item.get("payload"), dict):
+                claimed_item.update(fetched_item)
+                claimed_item["leaseId"] = lease_id
+                claimed_item["leaseExpiresAt"] = _ms_to_iso(lease_expires_at_ms)
+            else:
+                logging.warning(
+                    "RTDB agent queue claim %s/%s had no payload and queue-item fetch returned no payload; lease will expire.",
+                    queue_path_key,
+                    claimed_item.get("itemId"),
                 )
-                claimed_item = dict(next_value)
-                claimed_item["itemId"] = str(current.get("itemId") or item.get("itemId") or encoded_key)
-                write_value = dict(next_value)
-                if queue_path_key == "agentQueueItems":
-                    payload = current.get("payload")
-                    if isinstance(payload, dict):
-                        if isinstance(payload.get("jobId"), str):
-                            write_value.setdefault("requestedByJobId", payload.get("jobId"))
-                        if isinstance(payload.get("executionAttempt"), (int, float)):
-                            write_value.setdefault("executionAttempt", int(payload.get("executionAttempt")))
-                        if isinstance(payload.get("attemptEpoch"), (int, float)):
-                            write_value.setdefault("attemptEpoch", int(payload.get("attemptEpoch")))
-                    # The agent has the payload in claimed_item; keeping it in the
-                    # leased RTDB mirror makes every heartbeat/event reconciliation
-                    # reread the full command body.
-                    write_value.pop("payload", None)
-                    write_value.pop("claimOrderKey", None)
-                elif queue_path_key == "dependencyQueueItems":
-                    write_value.pop("payload", None)
-                    write_value.pop("resolved", None)
-                if not self._coordination_put_json_if_match(item_path, write_value, etag, timeout_seconds=10.0):
-                    continue
-                if queue_path_key == "agentQueueItems" and not isinstance(claimed_item.get("payload"), dict):
-                    fetched_item = self._agent_fetch_queue_item(claimed_item["itemId"], lease_id)
-                    if isinstance(fetched_item, dict) and isinstance(fetched_item.get("payload"), dict):
-                        claimed_item.update(fetched_item)
-                        claimed_item["leaseId"] = lease_id
-                        claimed_item["leaseExpiresAt"] = _ms_to_iso(lease_expires_at_ms)
-                    else:
-                        logging.warning(
-                            "RTDB agent queue claim %s/%s had no payload and queue-item fetch returned no payload; lease will expire.",
-                            queue_path_key,
-                            claimed_item.get("itemId"),
-                        )
-                        continue
-                if queue_path_key == "dependencyQueueItems":
-                    op = claimed_item.get("op")
-                    if op in ("download", "touch", "delete") and not isinstance(claimed_item.get("resolved"), dict):
-                        fetched_item = self._fetch_queue_item(claimed_item["itemId"])
-                        if isinstance(fetched_item, dict) and isinstance(fetched_item.get("resolved"), dict):
-                            claimed_item.update(fetched_item)
-                            claimed_item["leaseId"] = lease_id
-                            claimed_item["leaseExpiresAt"] = _ms_to_iso(lease_expires_at_ms)
-                        else:
-                            logging.warning(
-                                "RTDB dependency queue claim %s/%s had no resolved payload and queue-item fetch returned no resolved payload; lease will expire.",
-                                queue_path_key,
-                                claimed_item.get("itemId"),
-                            )
-                            continue
-                claimed.append(claimed_item)
-            except Exception as e:
-                logging.warning("RTDB queue claim failed for %s/%s: %s", queue_path_key, item.get("itemId"), e)
                 return None
-        return claimed
+        if queue_path_key == "dependencyQueueItems":
+            op = claimed_item.get("op")
+            if op in ("download", "touch", "delete") and not isinstance(claimed_item.get("resolved"), dict):
+                fetched_item = self._fetch_queue_item(claimed_item["itemId"])
+                if isinstance(fetched_item, dict) and isinstance(fetched_item.get("resolved"), dict):
+                    claimed_item.update(fetched_item)
+                    claimed_item["leaseId"] = lease_id
+                    claimed_item["leaseExpiresAt"] = _ms_to_iso(lease_expires_at_ms)
+                else:
+                    logging.warning(
+                        "RTDB dependency queue claim %s/%s had no resolved payload and queue-item fetch returned no resolved payload; lease will expire.",
+                        queue_path_key,
+                        claimed_item.get("itemId"),
+                    )
+                    return None
+        return claimed_item
 
     def _coordination_fetch_agent_queue(self, limit: int) -> Optional[List[Dict[str, Any]]]:
         skip_execute_jobs = bool(self.mining_only)
@@ -7846,23 +10039,115 @@ class DependencyAgent:
                 "error": str(exc)[:500],
             }
 
-    def _collect_agent_runtime_payload(self, full: bool = True, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        if body is None:
-            held_leases = self._collect_active_leases()
-            local_comfy = True if self.mining_only else self._local_comfy_reachable()
-            readiness_present = True if self.mining_only else self._local_readiness_file_present()
-            node_contract = {
+    def _runtime_probe_collectors(self) -> Dict[str, ProbeCollector]:
+        with self._runtime_probes_lock:
+            if self._runtime_probes is not None:
+                return self._runtime_probes
+            specs: List[Tuple[str, str, Callable[[float], Any], float, float]] = [
+                ("memoryTelemetry", "MEMORY", lambda _timeout: collect_cgroup_memory_telemetry(), 5.0, 2.0),
+                ("inputCacheInventory", "INPUT_CACHE", lambda _timeout: self._collect_input_cache_inventory(), 30.0, 30.0),
+                ("gpuTelemetry", "GPU_TELEMETRY", lambda _timeout: _query_gpu_telemetry(), 5.0, 5.0),
+            ]
+            if not self.mining_only:
+                specs += [
+                    (
+                        "comfyReachable",
+                        "COMFY_REACHABLE",
+                        lambda timeout: self._local_comfy_reachable(timeout_seconds=timeout),
+                        5.0,
+                        5.0,
+                    ),
+                    (
+                        "nodeContract",
+                        "NODE_CONTRACT",
+                        lambda timeout: self._local_node_contract_runtime(force=False, timeout_seconds=timeout),
+                        15.0,
+                        10.0,
+                    ),
+                    (
+                        "queueSummary",
+                        "QUEUE_SUMMARY",
+                        lambda timeout: self._local_comfy_queue_summary(timeout_seconds=timeout),
+                        self._comfy_queue_summary_ttl_ms / 1000.0,
+                        5.0,
+                    ),
+                    (
+                        "comfyRuntime",
+                        "SYSTEM_STATS",
+                        lambda timeout: self._comfy_runtime_snapshot(timeout_seconds=timeout),
+                        self._comfy_runtime_snapshot_ttl_ms / 1000.0,
+                        3.0,
+                    ),
+                ]
+            self._runtime_probes = {
+                name: ProbeCollector(
+                    name,
+                    probe,
+                    max(0.5, min(600.0, _env_float(f"DM_RUNTIME_PROBE_{env_name}_SECONDS", interval))),
+                    max(0.5, min(120.0, _env_float(f"DM_RUNTIME_PROBE_{env_name}_TIMEOUT_SECONDS", timeout))),
+                )
+                for name, env_name, probe, interval, timeout in specs
+            }
+            return self._runtime_probes
+
+    def _start_runtime_probes(self) -> None:
+        if not self.runtime_probes_async:
+            return
+        for collector in self._runtime_probe_collectors().values():
+            collector.start()
+
+    def _refresh_runtime_probes(self, *names: str) -> None:
+        """Re-run collectors inline after a local transition the cached values would lag."""
+        collectors = self._runtime_probe_collectors()
+        for name in names:
+            collector = collectors.get(name)
+            if collector is not None and collector.running():
+                collector.collect()
+
+    def _runtime_probe_read(self, name: str) -> Tuple[Any, Dict[str, Any]]:
+        collector = self._runtime_probe_collectors().get(name)
+        if collector is None:
+            return None, {}
+        return collector.read()
+
+    def _agent_runtime_probe_readings(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Latest value and staleness metadata of every heartbeat probe, without probing inline."""
+        values: Dict[str, Any] = {}
+        meta: Dict[str, Any] = {}
+        for name in ("comfyReachable", "nodeContract", "queueSummary", "memoryTelemetry", "comfyRuntime", "inputCacheInventory"):
+            values[name], probe_meta = self._runtime_probe_read(name)
+            if probe_meta:
+                meta[name] = probe_meta
+        if self.mining_only:
+            values["comfyReachable"] = True
+            values["nodeContract"] = {
                 "ready": True,
                 "requiredClassCount": 0,
                 "missingClassTypes": [],
                 "affectedBundleIds": [],
                 "checkedAtMs": _now_ms(),
-            } if self.mining_only else self._local_node_contract_runtime(force=False)
-            queue_summary = {} if self.mining_only else self._local_comfy_queue_summary(timeout_seconds=5.0)
-            input_cache_inventory = self._collect_input_cache_inventory()
+            }
+        gpu_meta = self._runtime_probe_read("gpuTelemetry")[1] if self.runtime_probes_async else {}
+        if gpu_meta:
+            meta["gpuTelemetry"] = gpu_meta
+        values["comfyReachable"] = values.get("comfyReachable") is True
+        for name in ("nodeContract", "queueSummary", "memoryTelemetry", "comfyRuntime", "inputCacheInventory"):
+            if not isinstance(values.get(name), dict):
+                values[name] = {}
+        return values, meta
+
+    def _collect_agent_runtime_payload(self, full: bool = True, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if body is None:
+            held_leases = self._collect_active_leases()
+            probes, probe_meta = self._agent_runtime_probe_readings()
+            local_comfy = probes["comfyReachable"]
+            readiness_present = True if self.mining_only else self._local_readiness_file_present()
+            node_contract = probes["nodeContract"]
+            queue_summary = probes["queueSummary"]
+            input_cache_inventory = probes["inputCacheInventory"]
             stage_counts = self._agent_stage_counts_payload()
-            memory_telemetry = collect_cgroup_memory_telemetry()
-            comfy_runtime = {} if self.mining_only else self._comfy_runtime_snapshot()
+            memory_telemetry = probes["memoryTelemetry"]
+            comfy_runtime = probes["comfyRuntime"]
             body = {
                 "localComfyReachable": bool(local_comfy),
                 "localReadinessFilePresent": bool(readiness_present),
@@ -7883,8 +10168,10 @@ class DependencyAgent:
                 "inputCacheInventoryTruncated": bool(input_cache_inventory.get("inventoryTruncated")),
                 **({"memoryTelemetry": memory_telemetry} if memory_telemetry else {}),
                 **({"comfyRuntime": comfy_runtime} if comfy_runtime else {}),
+                "runtimeProbes": probe_meta,
                 "idleMining": self._idle_prl_miner.snapshot(),
                 "gpuCoordinator": self._gpu_coordinator_runtime_snapshot(),
+                "httpPool": HTTP_POOL.snapshot(),
                 "agentVersion": AGENT_VERSION,
                 "capabilities": {
                     "dependencyChannel": True,
@@ -7931,6 +10218,9 @@ class DependencyAgent:
         gpu_coordinator = body.get("gpuCoordinator")
         if isinstance(gpu_coordinator, dict) and gpu_coordinator:
             agent_control["gpuCoordinator"] = gpu_coordinator
+        runtime_probes = body.get("runtimeProbes")
+        if isinstance(runtime_probes, dict) and runtime_probes:
+            agent_control["runtimeProbes"] = runtime_probes
         if full:
             capabilities = {
                 "dependencyChannel": True,
@@ -7953,6 +10243,7 @@ class DependencyAgent:
                 "inputCacheMaxBytes": int(body.get("inputCacheMaxBytes") or 0),
                 "inputCacheInventoryTruncated": body.get("inputCacheInventoryTruncated") is True,
                 "idleMining": body.get("idleMining") if isinstance(body.get("idleMining"), dict) else {},
+                "httpPool": body.get("httpPool") if isinstance(body.get("httpPool"), list) else [],
                 "agentVersion": body.get("agentVersion") or AGENT_VERSION,
                 "capabilities": capabilities,
             })
@@ -8046,10 +10337,25 @@ class DependencyAgent:
                 signature != self._last_agent_runtime_signature
                 or self._coordination_runtime_full_sync_due(self._last_agent_runtime_full_sync_ms, now_ms)
             )
-        ok = self._coordination_patch_runtime(
-            self._collect_agent_runtime_payload(full=full, body=body),
-            timeout_seconds=10.0,
+        delta = self._runtime_delta if self.agent_runtime_delta_enabled else None
+        snapshot = bool(
+            delta is not None
+            and (force_full or self._coordination_runtime_full_sync_due(delta.snapshot_at_ms, now_ms))
         )
+        full = full or snapshot
+        if force_full and body is None:
+            # Forced writes publish Comfy restart transitions; do not mirror a
+            # reachability reading taken before the restart.
+            self._refresh_runtime_probes("comfyReachable", "nodeContract", "queueSummary")
+        payload = self._collect_agent_runtime_payload(full=full, body=body)
+        _runtime_gzip_sections(payload, self.agent_runtime_gzip_min_bytes)
+        if delta is None:
+            ok = self._coordination_patch_runtime(payload, timeout_seconds=10.0)
+        else:
+            record = delta.encode(self._flatten_rtdb_patch(payload), snapshot=snapshot, at_ms=now_ms)
+            ok = self._coordination_patch_runtime(record["set"], timeout_seconds=10.0)
+            if ok:
+                delta.acknowledge(record)
         if ok:
             if signature:
                 self._last_agent_runtime_signature = signature
@@ -9282,7 +11588,7 @@ class DependencyAgent:
             for url in RIFE_VFI_ZIP_URLS:
                 try:
                     logging.info("Downloading ComfyUI-VFI RIFE model archive: %s", _safe_url_for_logs(url))
-                    tool = download_file_with_tool_fallback(
+                    tool, actual_zip_sha = download_file_with_tool_fallback(
                         url,
                         zip_path,
                         timeout_seconds=max(60.0, min(float(self.download_timeout_seconds), 180.0)),
@@ -9295,7 +11601,6 @@ class DependencyAgent:
                         raise RuntimeError(
                             f"RIFE model archive size mismatch: expected {RIFE_VFI_ZIP_SIZE_BYTES}, got {actual_zip_size}"
                         )
-                    actual_zip_sha = sha256_file(zip_path).lower()
                     if actual_zip_sha != RIFE_VFI_ZIP_SHA256:
                         raise RuntimeError(
                             f"RIFE model archive checksum mismatch: expected {RIFE_VFI_ZIP_SHA256}, got {actual_zip_sha}"
@@ -10738,8 +13043,8 @@ class DependencyAgent:
             self._node_contract_probe_cache = result
             return dict(result)
 
-    def _local_node_contract_runtime(self, force: bool = False) -> Dict[str, Any]:
-        result = self._probe_local_node_contract(force=force)
+    def _local_node_contract_runtime(self, force: bool = False, timeout_seconds: float = 10.0) -> Dict[str, Any]:
+        result = self._probe_local_node_contract(force=force, timeout_seconds=timeout_seconds)
         missing = result.get("missingClassTypes") if isinstance(result.get("missingClassTypes"), list) else []
         return {
             **result,
@@ -11033,6 +13338,8 @@ class DependencyAgent:
         freed = 0
         evicted = 0
         eviction_batch_max = int(policy.get("evictionBatchMax") or 20)
+        # One /proc pass per eviction cycle instead of one per candidate.
+        open_files: Optional[ProcOpenFileIndex] = None
 
         for _, dep_id, dest_rel in candidates:
             if evicted >= eviction_batch_max:
@@ -11054,7 +13361,9 @@ class DependencyAgent:
             size = 0
             try:
                 if path.exists():
-                    if _is_path_open_by_process(path):
+                    if open_files is None:
+                        open_files = PROC_OPEN_FILES.refresh()
+                    if _is_path_open_by_process(path, index=open_files):
                         logging.warning("Skipping eviction of open dynamic dependency %s: %s", dep_id, dest_rel)
                         continue
                     size = int(path.stat().st_size)
@@ -11071,6 +13380,7 @@ class DependencyAgent:
             self._state.failed.discard(dep_id)
             self._state.verified.pop(dep_id, None)
             self._session_hash_verified_dep_ids.discard(dep_id)
+            self._streamed_dependency_digests.pop(dep_id, None)
             freed += int(size)
             evicted += 1
             logging.info("Evicted dynamic dependency %s (%d bytes): %s", dep_id, size, dest_rel)
@@ -11115,111 +13425,153 @@ class DependencyAgent:
         return did_evict
 
     def _load_state(self) -> LocalState:
+        if self.state_store_kind != "sqlite":
+            return self._load_json_state()
+        store = SqliteStateStore(self.state_db_path)
+        try:
+            store.open()
+            if store.is_initialized():
+                state = self._parse_state_data(store.load())
+                store.prime(state)
+            else:
+                # First start on the SQLite store: import the legacy JSON file
+                # in one transaction. The database only becomes authoritative
+                # once that commit lands, and the JSON file is left untouched
+                # so an interrupted import retries and a rollback to a
+                # JSON-only agent still finds its state.
+                state = self._load_json_state()
+                imported_from = str(self.state_path) if self.state_path.exists() else ""
+                written = store.save(state, meta={"importedFromJson": imported_from})
+                if imported_from:
+                    logging.info(
+                        "Imported JSON state %s into %s (%d records); the JSON file is kept for rollback.",
+                        self.state_path,
+                        self.state_db_path,
+                        written,
+                    )
+        except Exception as exc:
+            logging.warning("SQLite state store %s unavailable; using JSON state file: %s", self.state_db_path, exc)
+            try:
+                store.close()
+            except Exception:
+                pass
+            return self._load_json_state()
+        self._state_store = store
+        return state
+
+    def _load_json_state(self) -> LocalState:
         try:
             raw = self.state_path.read_text("utf-8")
-            data = json.loads(raw)
-            installed_static = set(x for x in data.get("installed_static", []) if isinstance(x, str))
-            installed_dynamic = set(x for x in data.get("installed_dynamic", []) if isinstance(x, str))
-            failed = set(x for x in data.get("failed", []) if isinstance(x, str))
-            lru_raw = data.get("lru") if isinstance(data, dict) else None
-            lru: Dict[str, Dict[str, Any]] = {}
-            if isinstance(lru_raw, dict):
-                now = _now_ms()
-                for dep_id, entry in lru_raw.items():
-                    if not isinstance(dep_id, str) or not dep_id:
-                        continue
-                    if not isinstance(entry, dict):
-                        continue
-                    dest_rel = entry.get("destRelativePath") or entry.get("path")
-                    size = entry.get("sizeBytes") if isinstance(entry.get("sizeBytes"), int) else 0
-                    touched = entry.get("lastTouchedAtMs") if isinstance(entry.get("lastTouchedAtMs"), int) else now
-                    if isinstance(dest_rel, str) and dest_rel:
-                        lru[dep_id] = {
-                            "destRelativePath": dest_rel,
-                            "sizeBytes": int(size) if size > 0 else 0,
-                            "lastTouchedAtMs": int(touched),
-                        }
-            retry_raw = data.get("retry") if isinstance(data, dict) else None
-            retry: Dict[str, Dict[str, Any]] = {}
-            if isinstance(retry_raw, dict):
-                now = _now_ms()
-                for dep_id, entry in retry_raw.items():
-                    if not isinstance(dep_id, str) or not dep_id:
-                        continue
-                    if not isinstance(entry, dict):
-                        continue
-                    item_id = entry.get("itemId") if isinstance(entry.get("itemId"), str) else dep_id
-                    resolved = entry.get("resolved") if isinstance(entry.get("resolved"), dict) else None
-                    attempts = int(entry.get("attempts")) if isinstance(entry.get("attempts"), (int, float)) else 0
-                    next_at = int(entry.get("nextAttemptAtMs")) if isinstance(entry.get("nextAttemptAtMs"), (int, float)) else now
-                    last_err = entry.get("lastError") if isinstance(entry.get("lastError"), str) else None
-                    last_attempt = int(entry.get("lastAttemptAtMs")) if isinstance(entry.get("lastAttemptAtMs"), (int, float)) else 0
-                    if resolved:
-                        retry[dep_id] = {
-                            "itemId": item_id,
-                            "resolved": resolved,
-                            "attempts": max(0, attempts),
-                            "nextAttemptAtMs": max(0, next_at),
-                            "lastError": last_err or "",
-                            "lastAttemptAtMs": max(0, last_attempt),
-                        }
-            verified_raw = data.get("verified") if isinstance(data, dict) else None
-            verified: Dict[str, Dict[str, Any]] = {}
-            if isinstance(verified_raw, dict):
-                for dep_id, entry in verified_raw.items():
-                    if not isinstance(dep_id, str) or not dep_id or not isinstance(entry, dict):
-                        continue
-                    dest_rel = entry.get("destRelativePath")
-                    sha256_value = entry.get("sha256")
-                    size_bytes = entry.get("sizeBytes")
-                    mtime_ns = entry.get("mtimeNs")
-                    verified_at_ms = entry.get("verifiedAtMs")
-                    if not isinstance(dest_rel, str) or not dest_rel:
-                        continue
-                    if not isinstance(size_bytes, int) or size_bytes < 0:
-                        continue
-                    if not isinstance(mtime_ns, int) or mtime_ns < 0:
-                        continue
-                    verified[dep_id] = {
+            return self._parse_state_data(json.loads(raw))
+        except Exception:
+            return LocalState.empty()
+
+    def _parse_state_data(self, data: Dict[str, Any]) -> LocalState:
+        """Normalise a state document (JSON file or SQLite rows) into ``LocalState``."""
+        installed_static = set(x for x in data.get("installed_static", []) if isinstance(x, str))
+        installed_dynamic = set(x for x in data.get("installed_dynamic", []) if isinstance(x, str))
+        failed = set(x for x in data.get("failed", []) if isinstance(x, str))
+        lru_raw = data.get("lru") if isinstance(data, dict) else None
+        lru: Dict[str, Dict[str, Any]] = {}
+        if isinstance(lru_raw, dict):
+            now = _now_ms()
+            for dep_id, entry in lru_raw.items():
+                if not isinstance(dep_id, str) or not dep_id:
+                    continue
+                if not isinstance(entry, dict):
+                    continue
+                dest_rel = entry.get("destRelativePath") or entry.get("path")
+                size = entry.get("sizeBytes") if isinstance(entry.get("sizeBytes"), int) else 0
+                touched = entry.get("lastTouchedAtMs") if isinstance(entry.get("lastTouchedAtMs"), int) else now
+                if isinstance(dest_rel, str) and dest_rel:
+                    lru[dep_id] = {
                         "destRelativePath": dest_rel,
-                        "sha256": sha256_value.lower() if isinstance(sha256_value, str) else "",
-                        "sizeBytes": size_bytes,
-                        "mtimeNs": mtime_ns,
-                        "verifiedAtMs": verified_at_ms if isinstance(verified_at_ms, int) else 0,
+                        "sizeBytes": int(size) if size > 0 else 0,
+                        "lastTouchedAtMs": int(touched),
                     }
-            node_bundle_verify_class_types = set(
-                class_type
-                for class_type in data.get("node_bundle_verify_class_types", [])
-                if isinstance(class_type, str) and class_type
-            )
-            node_bundle_verify_class_types_by_bundle: Dict[str, Set[str]] = {}
-            by_bundle_raw = data.get("node_bundle_verify_class_types_by_bundle", {})
-            if isinstance(by_bundle_raw, dict):
-                for bundle_id, class_types in by_bundle_raw.items():
-                    if not isinstance(bundle_id, str) or not bundle_id or not isinstance(class_types, list):
-                        continue
-                    normalized_classes = {
-                        class_type.strip()
-                        for class_type in class_types
-                        if isinstance(class_type, str) and class_type.strip()
+        retry_raw = data.get("retry") if isinstance(data, dict) else None
+        retry: Dict[str, Dict[str, Any]] = {}
+        if isinstance(retry_raw, dict):
+            now = _now_ms()
+            for dep_id, entry in retry_raw.items():
+                if not isinstance(dep_id, str) or not dep_id:
+                    continue
+                if not isinstance(entry, dict):
+                    continue
+                item_id = entry.get("itemId") if isinstance(entry.get("itemId"), str) else dep_id
+                resolved = entry.get("resolved") if isinstance(entry.get("resolved"), dict) else None
+                attempts = int(entry.get("attempts")) if isinstance(entry.get("attempts"), (int, float)) else 0
+                next_at = int(entry.get("nextAttemptAtMs")) if isinstance(entry.get("nextAttemptAtMs"), (int, float)) else now
+                last_err = entry.get("lastError") if isinstance(entry.get("lastError"), str) else None
+                last_attempt = int(entry.get("lastAttemptAtMs")) if isinstance(entry.get("lastAttemptAtMs"), (int, float)) else 0
+                if resolved:
+                    retry[dep_id] = {
+                        "itemId": item_id,
+                        "resolved": resolved,
+                        "attempts": max(0, attempts),
+                        "nextAttemptAtMs": max(0, next_at),
+                        "lastError": last_err or "",
+                        "lastAttemptAtMs": max(0, last_attempt),
                     }
-                    if normalized_classes:
-                        node_bundle_verify_class_types_by_bundle[bundle_id] = normalized_classes
-                        node_bundle_verify_class_types.update(normalized_classes)
-            return LocalState(
-                installed_static=installed_static,
-                installed_dynamic=installed_dynamic,
-                failed=failed,
-                lru=lru,
-                retry=retry,
-                verified=verified,
-                node_bundle_verify_class_types=node_bundle_verify_class_types,
-                node_bundle_verify_class_types_by_bundle=node_bundle_verify_class_types_by_bundle,
-            )
-        except Exception:
-            return LocalState.empty()
+        verified_raw = data.get("verified") if isinstance(data, dict) else None
+        verified: Dict[str, Dict[str, Any]] = {}
+        if isinstance(verified_raw, dict):
+            for dep_id, entry in verified_raw.items():
+                if not isinstance(dep_id, str) or not dep_id or not isinstance(entry, dict):
+                    continue
+                dest_rel = entry.get("destRelativePath")
+                sha256_value = entry.get("sha256")
+                size_bytes = entry.get("sizeBytes")
+                mtime_ns = entry.get("mtimeNs")
+                verified_at_ms = entry.get("verifiedAtMs")
+                if not isinstance(dest_rel, str) or not dest_rel:
+                    continue
+                if not isinstance(size_bytes, int) or size_bytes < 0:
+                    continue
+                if not isinstance(mtime_ns, int) or mtime_ns < 0:
+                    continue
+                verified[dep_id] = {
+                    "destRelativePath": dest_rel,
+                    "sha256": sha256_value.lower() if isinstance(sha256_value, str) else "",
+                    "sizeBytes": size_bytes,
+                    "mtimeNs": mtime_ns,
+                    "verifiedAtMs": verified_at_ms if isinstance(verified_at_ms, int) else 0,
+                }
+        node_bundle_verify_class_types = set(
+            class_type
+            for class_type in data.get("node_bundle_verify_class_types", [])
+            if isinstance(class_type, str) and class_type
+        )
+        node_bundle_verify_class_types_by_bundle: Dict[str, Set[str]] = {}
+        by_bundle_raw = data.get("node_bundle_verify_class_types_by_bundle", {})
+        if isinstance(by_bundle_raw, dict):
+            for bundle_id, class_types in by_bundle_raw.items():
+                if not isinstance(bundle_id, str) or not bundle_id or not isinstance(class_types, list):
+                    continue
+                normalized_classes = {
+                    class_type.strip()
+                    for class_type in class_types
+                    if isinstance(class_type, str) and class_type.strip()
+                }
+                if normalized_classes:
+                    node_bundle_verify_class_types_by_bundle[bundle_id] = normalized_classes
+                    node_bundle_verify_class_types.update(normalized_classes)
+        return LocalState(
+            installed_static=installed_static,
+            installed_dynamic=installed_dynamic,
+            failed=failed,
+            lru=lru,
+            retry=retry,
+            verified=verified,
+            node_bundle_verify_class_types=node_bundle_verify_class_types,
+            node_bundle_verify_class_types_by_bundle=node_bundle_verify_class_types_by_bundle,
+        )
 
     def _save_state(self) -> None:
+        store = getattr(self, "_state_store", None)
+        if store is not None:
+            store.save(self._state)
+            return
         tmp = self.state_path.with_suffix(self.state_path.suffix + ".tmp")
         data = {
             "installed_static": sorted(self._state.installed_static),
@@ -12262,21 +14614,16 @@ class DependencyAgent:
         self._maybe_fetch_runtime_env_delivery("/agent/heartbeat")
 
         held_leases = self._collect_active_leases()
-        local_comfy = True if self.mining_only else self._local_comfy_reachable()
+        probes, probe_meta = self._agent_runtime_probe_readings()
+        local_comfy = probes["comfyReachable"]
         readiness_present = True if self.mining_only else self._local_readiness_file_present()
-        node_contract = {
-            "ready": True,
-            "requiredClassCount": 0,
-            "missingClassTypes": [],
-            "affectedBundleIds": [],
-            "checkedAtMs": _now_ms(),
-        } if self.mining_only else self._local_node_contract_runtime(force=False)
+        node_contract = probes["nodeContract"]
         queue_depth = len(held_leases)
-        queue_summary = {} if self.mining_only else self._local_comfy_queue_summary(timeout_seconds=5.0)
-        input_cache_inventory = self._collect_input_cache_inventory()
+        queue_summary = probes["queueSummary"]
+        input_cache_inventory = probes["inputCacheInventory"]
         stage_counts = self._agent_stage_counts_payload()
-        memory_telemetry = collect_cgroup_memory_telemetry()
-        comfy_runtime = {} if self.mining_only else self._comfy_runtime_snapshot()
+        memory_telemetry = probes["memoryTelemetry"]
+        comfy_runtime = probes["comfyRuntime"]
         ssh_host_key_sha256 = collect_ssh_host_key_sha256()
 
         body: Dict[str, Any] = {
@@ -12302,6 +14649,7 @@ class DependencyAgent:
             **({"memoryTelemetry": memory_telemetry} if memory_telemetry else {}),
             **({"comfyRuntime": comfy_runtime} if comfy_runtime else {}),
             **({"sshHostKeySha256": ssh_host_key_sha256} if ssh_host_key_sha256 else {}),
+            "runtimeProbes": probe_meta,
             "idleMining": self._idle_prl_miner.snapshot(),
             "gpuCoordinator": self._gpu_coordinator_runtime_snapshot(),
             "agentVersion": AGENT_VERSION,
@@ -12577,6 +14925,7 @@ class DependencyAgent:
     def _invalidate_dependency_verification_locked(self, dep_id: str, mark_failed: bool = False) -> None:
         self._state.verified.pop(dep_id, None)
         self._session_hash_verified_dep_ids.discard(dep_id)
+        self._streamed_dependency_digests.pop(dep_id, None)
         self._state.installed_static.discard(dep_id)
         self._state.installed_dynamic.discard(dep_id)
         previous_lru = self._state.lru.pop(dep_id, None)
@@ -12605,6 +14954,33 @@ class DependencyAgent:
         self._session_hash_verified_dep_ids.add(dep_id)
         return dict(record)
 
+    def _remember_streamed_dependency_digest_locked(
+        self,
+        dep_id: str,
+        stat_result: os.stat_result,
+        sha256_value: str,
+    ) -> None:
+        self._streamed_dependency_digests[dep_id] = {
+            "sha256": str(sha256_value or "").strip().lower(),
+            "dev": int(stat_result.st_dev),
+            "ino": int(stat_result.st_ino),
+            "sizeBytes": int(stat_result.st_size),
+            "mtimeNs": int(stat_result.st_mtime_ns),
+        }
+
+    def _streamed_dependency_digest_for_stat_locked(self, dep_id: str, stat_result: os.stat_result) -> str:
+        entry = self._streamed_dependency_digests.get(dep_id)
+        if not isinstance(entry, dict):
+            return ""
+        if (
+            entry.get("dev") != int(stat_result.st_dev)
+            or entry.get("ino") != int(stat_result.st_ino)
+            or entry.get("sizeBytes") != int(stat_result.st_size)
+            or entry.get("mtimeNs") != int(stat_result.st_mtime_ns)
+        ):
+            return ""
+        return str(entry.get("sha256") or "")
+
     @staticmethod
     def _verification_record_matches_stat(record: Dict[str, Any], dest_rel: str, stat_result: os.stat_result) -> bool:
         return (
@@ -12655,10 +15031,13 @@ class DependencyAgent:
                 record_matches = isinstance(record, dict) and self._verification_record_matches_stat(record, dest_rel, stat_result)
                 sha_matches_record = isinstance(record, dict) and str(record.get("sha256") or "").lower() == expected_sha
                 session_verified = dep_id in self._session_hash_verified_dep_ids
+                streamed_sha = self._streamed_dependency_digest_for_stat_locked(dep_id, stat_result)
             if record_matches and sha_matches_record and (not expected_sha or not require_full_hash or session_verified):
                 return True
 
-            actual_sha = sha256_file(dest_abs, progress_cb=progress_cb) if expected_sha else ""
+            actual_sha = ""
+            if expected_sha:
+                actual_sha = streamed_sha or sha256_file(dest_abs, progress_cb=progress_cb)
             if expected_sha and actual_sha.lower() != expected_sha:
                 logging.error(
                     "Dependency integrity check failed: depId=%s expected=%s got=%s path=%s",
@@ -12764,11 +15143,37 @@ class DependencyAgent:
             )
         return prompt_id
 
+    def _comfy_prompt_event_stream(self) -> Optional[ComfyPromptEventStream]:
+        """Return the shared Comfy event stream, reconnecting it if Comfy moved ports."""
+        if not bool(getattr(self, "comfy_event_stream_enabled", False)):
+            return None
+        try:
+            base_url = self._resolve_local_comfy_base_url(force_refresh=False, timeout_seconds=3.0)
+        except Exception as exc:
+            logging.debug("Comfy event stream unavailable: %s", exc)
+            return None
+        stale: Optional[ComfyPromptEventStream] = None
+        with self._comfy_event_stream_lock:
+            stream = self._comfy_event_stream
+            if stream is not None and stream.base_url != str(base_url or "").rstrip("/"):
+                stale, stream = stream, None
+            if stream is None:
+                stream = ComfyPromptEventStream(base_url, client_id=f"dm-agent-{uuid.uuid4().hex[:16]}")
+                self._comfy_event_stream = stream
+        if stale is not None:
+            stale.stop()
+        # Never wait for the socket here: a stream that is still connecting (or
+        # reconnecting) reports stream_live=False to its watches and the
+        # execute loop polls /history until the reader thread gets it back up.
+        stream.start(timeout_seconds=0.0)
+        return stream
+
     def _start_comfy_node_timing_collector(
         self,
         workflow: Dict[str, Any],
         client_id: str,
         prompt_id: str,
+        event_stream: Optional[ComfyPromptEventStream] = None,
     ) -> Optional[ComfyNodeTimingCollector]:
         if not bool(getattr(self, "comfy_node_timing_enabled", False)):
             return None
@@ -12781,6 +15186,10 @@ class DependencyAgent:
                 workflow=workflow,
                 max_rows=int(getattr(self, "comfy_node_timing_max_rows", MAX_COMFY_NODE_TIMING_ROWS)),
             )
+            if event_stream is not None:
+                # Fed through the shared stream's watch; a second socket with
+                # the same clientId would displace the stream's socket.
+                return collector
             if collector.start(timeout_seconds=3.0):
                 return collector
         except Exception as exc:
@@ -12989,11 +15398,25 @@ class DependencyAgent:
     def _touch_input_cache_path(self, path: Path) -> None:
         now = time.time()
         try:
+            before = path.stat()
             os.utime(path, (now, now))
+            self._input_digest_index.retouch(path, before, path.stat())
         except Exception:
             pass
 
-    def _is_cached_input_valid(self, cache_path: Path, row: Dict[str, Any]) -> bool:
+    def _cached_input_sha256(self, cache_path: Path) -> str:
+        """sha256 of a cache file, served from the verified-digest index when unchanged."""
+        before = cache_path.stat()
+        known = self._input_digest_index.lookup(cache_path, before)
+        if known:
+            return known
+        actual_sha = sha256_file(cache_path)
+        after = cache_path.stat()
+        if (after.st_ino, after.st_size, after.st_mtime_ns) == (before.st_ino, before.st_size, before.st_mtime_ns):
+            self._input_digest_index.record(cache_path, before, actual_sha)
+        return actual_sha
+
+    def _is_cached_input_valid(self, cache_path: Path, row: Dict[str, Any], known_sha256: str = "") -> bool:
         if not cache_path.exists() or not cache_path.is_file():
             return False
         expected_size = self._input_cache_expected_size_bytes(row)
@@ -13006,7 +15429,7 @@ class DependencyAgent:
         expected_sha = row.get("sha256")
         if isinstance(expected_sha, str) and expected_sha:
             try:
-                actual_sha = sha256_file(cache_path)
+                actual_sha = known_sha256 or self._cached_input_sha256(cache_path)
             except Exception:
                 return False
             if actual_sha.lower() != expected_sha.lower():
@@ -13025,6 +15448,7 @@ class DependencyAgent:
     def _iter_input_cache_files(self) -> List[Path]:
         out: List[Path] = []
         tmp_dir = (self.input_cache_dir / ".tmp").resolve()
+        index_dir = (self.input_cache_dir / ".index").resolve()
         if not self.input_cache_dir.exists():
             return out
         for path in self.input_cache_dir.rglob("*"):
@@ -13034,7 +15458,7 @@ class DependencyAgent:
                 resolved = path.resolve()
             except Exception:
                 resolved = path
-            if tmp_dir in resolved.parents:
+            if tmp_dir in resolved.parents or index_dir in resolved.parents:
                 continue
             out.append(path)
         return out
@@ -13063,10 +15487,72 @@ class DependencyAgent:
                 continue
             try:
                 path.unlink()
+                self._input_digest_index.forget(path)
                 total_bytes = max(0, total_bytes - int(size_bytes))
             except Exception:
                 continue
 
+    def _scrub_input_cache_once(self) -> bool:
+        """Re-verify the coldest indexed input at the scrub rate; returns True if one was checked."""
+        cold = self._input_digest_index.coldest(_now_ms() - int(self.input_cache_scrub_interval_ms))
+        if cold is None:
+            return False
+        key, entry = cold
+        path = Path(key)
+        with self._lock:
+            protected = self._protected_input_cache_paths_locked()
+            downloading = set(self._input_cache_downloading)
+        cache_key = self._extract_input_cache_key_from_path(path)
+        if key in protected or (cache_key and cache_key in downloading):
+            self._input_digest_index.mark_verified(path, entry)
+            return True
+        try:
+            before = path.stat()
+        except FileNotFoundError:
+            self._input_digest_index.forget(path)
+            return True
+        if not self._input_digest_index.lookup(path, before):
+            return True
+        actual_sha = sha256_file_rate_limited(path, self.input_cache_scrub_bytes_per_second, stop_event=self._stop)
+        if not actual_sha:
+            return False
+        try:
+            after = path.stat()
+        except FileNotFoundError:
+            self._input_digest_index.forget(path)
+            return True
+        if (after.st_ino, after.st_size, after.st_mtime_ns) != (before.st_ino, before.st_size, before.st_mtime_ns):
+            self._input_digest_index.forget(path)
+            return True
+        if actual_sha != entry.get("sha256"):
+            logging.warning("Input cache scrub found corrupt entry; removing %s", path)
+            self._input_digest_index.forget(path)
+            try:
+                path.unlink()
+            except Exception:
+                pass
+            return True
+        self._input_digest_index.mark_verified(path, entry)
+        return True
+
+    def _input_cache_scrub_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                checked = self._scrub_input_cache_once()
+            except Exception as exc:
+                logging.debug("Input cache scrub pass failed: %s", exc)
+                checked = False
+            self._input_digest_index.flush(force=False)
+            if self._stop.wait(1.0 if checked else 60.0):
+                return
+
+    def _start_input_cache_scrub(self) -> None:
+        if int(self.input_cache_scrub_bytes_per_second) <= 0 or self._input_cache_scrub_thread is not None:
+            return
+        thread = threading.Thread(target=self._input_cache_scrub_loop, name="dm-input-cache-scrub", daemon=True)
+        self._input_cache_scrub_thread = thread
+        thread.start()
+
     def _ensure_cached_input(self, lease: AgentExecuteLease, row: Dict[str, Any], idx: int) -> Dict[str, Any]:
         name = row.get("name") if isinstance(row.get("name"), str) and row.get("name") else f"input_{idx}"
         cache_key = self._input_cache_key(row, name)
@@ -13086,6 +15572,7 @@ class DependencyAgent:
             try:
                 if cache_path.exists():
                     cache_path.unlink()
+                self._input_digest_index.forget(cache_path)
             except Exception:
                 pass
 
@@ -13108,15 +15595,16 @@ class DependencyAgent:
             cache_path.parent.mkdir(parents=True, exist_ok=True)
             partial = tmp_dir / f"{cache_key}.{uuid.uuid4().hex}.partial"
             try:
-                http_download_to_file(
+                downloaded_sha = http_download_to_file(
                     download_url,
                     partial,
                     timeout_seconds=float(self.download_timeout_seconds),
                     chunk_size=int(self.download_chunk_size),
-                )
-                if not self._is_cached_input_valid(partial, row):
+                ) or sha256_file(partial)
+                if not self._is_cached_input_valid(partial, row, known_sha256=downloaded_sha):
                     raise RuntimeError(f"input_cache_validation_failed for {name}")
                 os.replace(str(partial), str(cache_path))
+                self._input_digest_index.record(cache_path, cache_path.stat(), downloaded_sha)
             finally:
                 try:
                     if partial.exists():
@@ -13157,6 +15645,71 @@ class DependencyAgent:
         base_url = self._resolve_local_comfy_base_url(force_refresh=False, timeout_seconds=2.0)
         return f"{base_url}/view?{urllib.parse.urlencode(params)}"
 
+    def _local_comfy_output_path(self, filename: str, subfolder: Optional[str], file_type: str = "output") -> Optional[Path]:
+        """Resolve a history output ref to the file Comfy wrote on this host.
+
+        Returns None (so the caller falls back to /view) when Comfy is not
+        served from loopback, the type has no known root, the file is missing,
+        or the ref resolves outside its root.
+        """
+        if not bool(getattr(self, "comfy_direct_outputs_enabled", False)):
+            return None
+        roots = {
+            "output": self.comfy_output_dir,
+            "temp": self.comfyui_dir / "temp",
+            "input": self.comfyui_dir / "input",
+        }
+        root = roots.get(file_type)
+        if root is None or not filename:
+            return None
+        base_url = self._resolve_local_comfy_base_url(force_refresh=False, timeout_seconds=2.0)
+        host = (urllib.parse.urlparse(base_url).hostname or "").lower()
+        if host not in ("127.0.0.1", "localhost", "::1"):
+            return None
+        try:
+            resolved_root = root.resolve(strict=True)
+            candidate = (resolved_root / (subfolder or "") / filename).resolve(strict=True)
+        except (OSError, RuntimeError):
+            return None
+        # Same containment rule as Comfy's /view handler.
+        if os.path.commonpath([str(resolved_root), str(candidate)]) != str(resolved_root):
+            return None
+        if not candidate.is_file():
+            return None
+        return candidate
+
+    def _collect_comfy_output(
+        self,
+        filename: str,
+        subfolder: Optional[str],
+        file_type: str,
+        local_output: Path,
+    ) -> Tuple[Path, str, str]:
+        """Stage one Comfy output for upload.
+
+        Returns ``(path, sha256, source)``. Local outputs are hard-linked into
+        ``local_output`` or, across filesystems, read in place; both skip the
+        loopback /view copy. ``sha256`` is only known for the /view path, where
+        it is hashed while streaming.
+        """
+        source_path = self._local_comfy_output_path(filename, subfolder, file_type)
+        if source_path is not None:
+            try:
+                local_output.parent.mkdir(parents=True, exist_ok=True)
+                os.link(str(source_path), str(local_output))
+                return local_output, "", "hardlink"
+            except OSError:
+                # Comfy never rewrites a saved output, so reading it in place is
+                # as safe as the linked copy.
+                return source_path, "", "direct"
+        sha256_sum = http_download_to_file(
+            self._comfy_view_url(filename=filename, subfolder=subfolder if subfolder else None, file_type=file_type),
+            local_output,
+            timeout_seconds=max(60.0, float(self.download_timeout_seconds)),
+            chunk_size=int(self.download_chunk_size),
+        )
+        return local_output, sha256_sum, "view"
+
     def _collect_history_output_refs(self, history_entry: Dict[str, Any]) -> List[Dict[str, str]]:
         outputs = history_entry.get("outputs")
         if not isinstance(outputs, dict):
@@ -13984,12 +16537,27 @@ class DependencyAgent:
             except Exception:
                 pass
 
+        def _confirmed_partial_sha(streamed_sha: str) -> str:
+            # Trust the digest computed while bytes landed when it matches. A
+            # mismatch may be a hashing race with a rewriting tool rather than bad
+            # bytes, so confirm it with one full read before rejecting the file.
+            if streamed_sha and streamed_sha.lower() == str(sha256_expected).lower():
+                return streamed_sha.lower()
+            if streamed_sha:
+                logging.info("In-flight sha256 mismatch for %s; re-hashing partial to confirm", dep_id)
+            return sha256_file(
+                partial,
+                progress_cb=_progress_cb("verifying_download", "local"),
+            ).lower()
+
+        verified_partial_sha = ""
         try:
             resolved_tool = self._resolve_download_tool()
             checksum_verified = False
+            download_sha = ""
             if resolved_tool == "aria2":
                 try:
-                    aria2_download(
+                    download_sha = aria2_download(
                         url=url,
                         dest_partial=partial,
                         auth_header=auth_header,
@@ -14000,15 +16568,13 @@ class DependencyAgent:
                         progress_cb=_progress_cb("downloading", "aria2"),
                     )
                     if isinstance(sha256_expected, str) and sha256_expected:
-                        aria2_actual = sha256_file(
-                            partial,
-                            progress_cb=_progress_cb("verifying_download", "local"),
-                        )
-                        if aria2_actual.lower() != sha256_expected.lower():
+                        aria2_actual = _confirmed_partial_sha(download_sha)
+                        if aria2_actual != sha256_expected.lower():
                             raise RuntimeError(
                                 f"sha256 mismatch for {dep_id}: expected {sha256_expected}, got {aria2_actual}"
                             )
                         checksum_verified = True
+                        verified_partial_sha = aria2_actual
                 except Exception as aria2_error:
                     # Parallel range requests can produce a full-sized but corrupt
                     # file on some signed CDN/Xet endpoints, and occasionally stop
@@ -14020,6 +16586,7 @@ class DependencyAgent:
                             partial.unlink()
                     except Exception:
                         pass
+                    download_sha = ""
                     fallback_tool = "huggingface_hub"
                     logging.warning(
                         "aria2 download failed validation for %s; retrying from zero with %s: %s",
@@ -14028,7 +16595,7 @@ class DependencyAgent:
                         str(aria2_error),
                     )
                     try:
-                        huggingface_hub_download(
+                        download_sha = huggingface_hub_download(
                             url=url,
                             dest_partial=partial,
                             auth_header=auth_header,
@@ -14044,7 +16611,7 @@ class DependencyAgent:
                             str(huggingface_error),
                         )
                     if fallback_tool == "wget":
-                        wget_download(
+                        download_sha = wget_download(
                             url=url,
                             dest_partial=partial,
                             auth_header=auth_header,
@@ -14055,7 +16622,7 @@ class DependencyAgent:
                             progress_cb=_progress_cb("downloading_fallback", "wget"),
                         )
                     elif fallback_tool == "python":
-                        http_download(
+                        download_sha = http_download(
                             url=url,
                             dest_partial=partial,
                             auth_header=auth_header,
@@ -14068,7 +16635,7 @@ class DependencyAgent:
                             progress_cb=_progress_cb("downloading_fallback", "python"),
                         )
             elif resolved_tool == "wget":
-                wget_download(
+                download_sha = wget_download(
                     url=url,
                     dest_partial=partial,
                     auth_header=auth_header,
@@ -14079,7 +16646,7 @@ class DependencyAgent:
                     progress_cb=_progress_cb("downloading", "wget"),
                 )
             elif resolved_tool == "python":
-                http_download(
+                download_sha = http_download(
                     url=url,
                     dest_partial=partial,
                     auth_header=auth_header,
@@ -14095,17 +16662,15 @@ class DependencyAgent:
                 raise RuntimeError(f"Unsupported DM_DOWNLOAD_TOOL: {self.download_tool}")
 
             if isinstance(sha256_expected, str) and sha256_expected and not checksum_verified:
-                actual = sha256_file(
-                    partial,
-                    progress_cb=_progress_cb("verifying_download", "local"),
-                )
-                if actual.lower() != sha256_expected.lower():
+                actual = _confirmed_partial_sha(download_sha)
+                if actual != sha256_expected.lower():
                     try:
                         if partial.exists():
                             partial.unlink()
                     except Exception:
                         pass
                     raise RuntimeError(f"sha256 mismatch for {dep_id}: expected {sha256_expected}, got {actual}")
+                verified_partial_sha = actual
         except Exception as e:
             # Keep partial downloads for retryable errors so future retries can resume.
             # Pass the queue item here as well as in the outer retry handler. The
@@ -14123,13 +16688,17 @@ class DependencyAgent:
             self._clear_download_activity(dep_id)
             raise
 
-        # Make the accepted bytes durable before advertising them. Hashing the
-        # partial caught transfer corruption, but the old path trusted the rename
-        # itself and immediately marked the dependency installed. Re-open and
-        # hash the final path after fsync/rename so the installed marker proves
-        # the exact bytes ComfyUI will read.
+        # Make the accepted bytes durable before advertising them. The digest was
+        # taken while the bytes landed, so bind it to the fsynced inode: if the
+        # final path is still that exact inode (same dev/ino/size/mtime) after the
+        # rename, the installed marker proves the bytes ComfyUI will read without
+        # another full read. Any identity change falls back to re-hashing.
         with partial.open("rb") as partial_handle:
             os.fsync(partial_handle.fileno())
+            partial_stat = os.fstat(partial_handle.fileno())
+        if verified_partial_sha:
+            with self._lock:
+                self._remember_streamed_dependency_digest_locked(dep_id, partial_stat, verified_partial_sha)
         os.replace(str(partial), str(dest_abs))
         try:
             directory_fd = os.open(str(dest_abs.parent), os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
@@ -14142,10 +16711,13 @@ class DependencyAgent:
 
         final_actual_sha = ""
         if isinstance(sha256_expected, str) and sha256_expected:
-            final_actual_sha = sha256_file(
-                dest_abs,
-                progress_cb=_progress_cb("verifying_final_path", "local"),
-            )
+            with self._lock:
+                final_actual_sha = self._streamed_dependency_digest_for_stat_locked(dep_id, dest_abs.stat())
+            if not final_actual_sha:
+                final_actual_sha = sha256_file(
+                    dest_abs,
+                    progress_cb=_progress_cb("verifying_final_path", "local"),
+                )
             if final_actual_sha.lower() != sha256_expected.lower():
                 try:
                     dest_abs.unlink()
@@ -14289,6 +16861,7 @@ class DependencyAgent:
             self._downloading.discard(dep_id)
             self._state.verified.pop(dep_id, None)
             self._session_hash_verified_dep_ids.discard(dep_id)
+            self._streamed_dependency_digests.pop(dep_id, None)
             self._save_state()
 
         logging.info(
@@ -14565,10 +17138,13 @@ class DependencyAgent:
             return idx, row
         return None
 
-    def _validate_local_output_quality(self, filename: str, local_output: Path) -> Optional[Dict[str, Any]]:
+    def _output_quality_gate_applies(self, filename: str) -> bool:
         if not self.video_output_quality_gate_enabled:
-            return None
-        if Path(filename).suffix.lower() not in (".mp4", ".mov", ".mkv", ".webm", ".m4v"):
+            return False
+        return Path(filename).suffix.lower() in (".mp4", ".mov", ".mkv", ".webm", ".m4v")
+
+    def _validate_local_output_quality(self, filename: str, local_output: Path) -> Optional[Dict[str, Any]]:
+        if not self._output_quality_gate_applies(filename):
             return None
         metrics = inspect_video_output_quality(
             local_output,
@@ -14594,6 +17170,86 @@ class DependencyAgent:
         )
         return metrics
 
+    def _finalize_output_artifact(
+        self,
+        lease: AgentExecuteLease,
+        target: Dict[str, Any],
+        filename: str,
+        local_output: Path,
+        bytes_written: int,
+        sha256_sum: str = "",
+    ) -> Dict[str, Any]:
+        """Hash, quality-gate and upload one output with overlapping passes.
+
+        The digest is teed from the bytes the uploader reads, so a missing
+        ``sha256_sum`` costs no extra read. Direct uploads publish the object
+        as soon as they land, so the ffmpeg gate runs to completion first.
+        Only a staged GCS upload, which stays an unreferenced attempt object
+        until the job completes, overlaps the gate on its own thread; a gate
+        failure then fails the job and the staged object is discarded.
+        """
+        hasher = RangeSha256(local_output) if not sha256_sum else None
+        gate: Optional[ThreadPoolExecutor] = None
+        gate_future: Optional[Future] = None
+        gate_started_ms = _now_ms()
+        gate_applies = self._output_quality_gate_applies(filename)
+        quality_validation: Optional[Dict[str, Any]] = None
+        gate_ms = 0
+        if gate_applies and self._output_upload_is_staged(target, bytes_written):
+            gate = ThreadPoolExecutor(max_workers=1, thread_name_prefix="output-quality-gate")
+            gate_future = gate.submit(self._validate_local_output_quality, filename, local_output)
+        elif gate_applies:
+            quality_validation = self._validate_local_output_quality(filename, local_output)
+            gate_ms = max(0, _now_ms() - gate_started_ms)
+        try:
+            out_meta = self._upload_output_artifact(
+                lease,
+                target,
+                filename,
+                local_output,
+                bytes_written,
+                sha256_sum,
+                chunk_observer=hasher.update_at if hasher is not None else None,
+            )
+            if gate_future is not None:
+                quality_validation = gate_future.result()
+                gate_ms = max(0, _now_ms() - gate_started_ms)
+        finally:
+            if gate is not None:
+                gate.shutdown(wait=False)
+
+        hash_ms = 0
+        if hasher is not None:
+            sha256_sum = hasher.hexdigest(bytes_written)
+            if not sha256_sum:
+                # The uploader skipped bytes (e.g. a 412 accepted via HEAD).
+                hash_started_ms = _now_ms()
+                sha256_sum = sha256_file(local_output)
+                hash_ms = max(0, _now_ms() - hash_started_ms)
+            out_meta["sha256"] = sha256_sum
+        if quality_validation is not None:
+            out_meta["qualityValidation"] = quality_validation
+        timing = out_meta.get("uploadTiming") if isinstance(out_meta.get("uploadTiming"), dict) else {}
+        out_meta["uploadTiming"] = {
+            **timing,
+            "agentHashMs": hash_ms,
+            **({"agentQualityGateMs": gate_ms} if gate_applies else {}),
+        }
+        return out_meta
+
+    @staticmethod
+    def _output_upload_is_staged(target: Dict[str, Any], bytes_written: int) -> bool:
+        """True when the output goes to a GCS resumable session instead of a publishing PUT."""
+        fast_path_max_bytes = target.get("fastPathMaxBytes")
+        fast_path_threshold = int(fast_path_max_bytes) if isinstance(fast_path_max_bytes, (int, float)) else None
+        staged_upload_url = target.get("stagedUploadUrl")
+        return (
+            fast_path_threshold is not None and
+            int(bytes_written) > int(fast_path_threshold) and
+            isinstance(staged_upload_url, str) and bool(staged_upload_url) and
+            target.get("stagedUploadMethod") == "gcs_resumable_session_put"
+        )
+
     def _upload_output_artifact(
         self,
         lease: AgentExecuteLease,
@@ -14602,6 +17258,7 @@ class DependencyAgent:
         local_output: Path,
         bytes_written: int,
         sha256_sum: str,
+        chunk_observer: Optional[Callable[[int, bytes], None]] = None,
     ) -> Dict[str, Any]:
         logical_key = target.get("logicalOutputKey") if isinstance(target.get("logicalOutputKey"), str) else ""
         if not logical_key:
@@ -14612,16 +17269,8 @@ class DependencyAgent:
             guessed, _enc = mimetypes.guess_type(filename)
             content_type = guessed or "application/octet-stream"
 
-        fast_path_max_bytes = target.get("fastPathMaxBytes")
-        fast_path_threshold = int(fast_path_max_bytes) if isinstance(fast_path_max_bytes, (int, float)) else None
         staged_upload_url = target.get("stagedUploadUrl") if isinstance(target.get("stagedUploadUrl"), str) and target.get("stagedUploadUrl") else None
-        staged_upload_method = target.get("stagedUploadMethod") if isinstance(target.get("stagedUploadMethod"), str) else ""
-        should_stage = (
-            fast_path_threshold is not None and
-            int(bytes_written) > int(fast_path_threshold) and
-            staged_upload_url is not None and
-            staged_upload_method == "gcs_resumable_session_put"
-        )
+        should_stage = self._output_upload_is_staged(target, bytes_written)
 
         attempt_object_path = (
             target.get("attemptObjectPath")
@@ -14642,6 +17291,7 @@ class DependencyAgent:
                 content_type,
                 timeout_seconds=max(300.0, float(self.download_timeout_seconds)),
                 chunk_size=8 * 1024 * 1024,
+                chunk_observer=chunk_observer,
             )
             upload_ms = max(0, _now_ms() - upload_started_ms)
             out_meta: Dict[str, Any] = {
@@ -14706,6 +17356,7 @@ class DependencyAgent:
                     local_output,
                     headers=build_upload_headers(),
                     timeout_seconds=max(120.0, float(self.download_timeout_seconds)),
+                    chunk_observer=chunk_observer,
                 )
             except (OSError, socket.timeout, TimeoutError, http.client.HTTPException) as e:
                 if attempt_idx >= upload_attempts - 1:
@@ -15101,17 +17752,14 @@ class DependencyAgent:
                 if not filename:
                     continue
 
-                local_output = output_tmp_dir / f"{len(uploaded_outputs):02d}_{os.path.basename(filename)}"
-                http_download_to_file(
-                    self._comfy_view_url(filename=filename, subfolder=subfolder if subfolder else None, file_type=file_type),
-                    local_output,
-                    timeout_seconds=max(60.0, float(self.download_timeout_seconds)),
-                    chunk_size=int(self.download_chunk_size),
+                local_output, sha256_sum, _output_source = self._collect_comfy_output(
+                    filename,
+                    subfolder,
+                    file_type,
+                    output_tmp_dir / f"{len(uploaded_outputs):02d}_{os.path.basename(filename)}",
                 )
                 bytes_written = int(local_output.stat().st_size)
-                sha256_sum = sha256_file(local_output)
-                quality_validation = self._validate_local_output_quality(filename, local_output)
-                out_meta = self._upload_output_artifact(
+                out_meta = self._finalize_output_artifact(
                     lease,
                     target,
                     filename,
@@ -15119,8 +17767,6 @@ class DependencyAgent:
                     bytes_written,
                     sha256_sum,
                 )
-                if quality_validation is not None:
-                    out_meta["qualityValidation"] = quality_validation
                 uploaded_outputs.append(out_meta)
                 try:
                     emit_best_effort("output_uploaded", out_meta)
@@ -15394,6 +18040,8 @@ class DependencyAgent:
         retain_lease = False
         terminal_sent = False
         node_timing_collector: Optional[ComfyNodeTimingCollector] = None
+        event_stream: Optional[ComfyPromptEventStream] = None
+        prompt_watch: Optional[ComfyPromptWatch] = None
 
         def attach_node_timings(payload: Dict[str, Any], terminal_status: str) -> None:
             if node_timing_collector is None:
@@ -15488,22 +18136,32 @@ class DependencyAgent:
                 f"job start jobId={lease.job_id}",
                 self._comfy_runtime_snapshot(force_refresh=True),
             )
-            client_id = f"{lease.job_id}-{uuid.uuid4().hex[:12]}"
-            requested_prompt_id = str(uuid.uuid4()) if self.comfy_node_timing_enabled else None
+            event_stream = self._comfy_prompt_event_stream()
+            client_id = event_stream.client_id if event_stream is not None else f"{lease.job_id}-{uuid.uuid4().hex[:12]}"
+            requested_prompt_id = (
+                str(uuid.uuid4()) if self.comfy_node_timing_enabled or event_stream is not None else None
+            )
             if requested_prompt_id is not None:
                 node_timing_collector = self._start_comfy_node_timing_collector(
                     workflow,
                     client_id=client_id,
                     prompt_id=requested_prompt_id,
+                    event_stream=event_stream,
                 )
+                if event_stream is not None:
+                    prompt_watch = event_stream.watch(requested_prompt_id, collector=node_timing_collector)
             prompt_id = self._comfy_submit_prompt(
                 workflow,
                 client_id=client_id,
                 prompt_id=requested_prompt_id,
             )
-            if node_timing_collector is not None and prompt_id != requested_prompt_id:
-                node_timing_collector.stop()
-                node_timing_collector = None
+            if requested_prompt_id is not None and prompt_id != requested_prompt_id:
+                if node_timing_collector is not None:
+                    node_timing_collector.stop()
+                    node_timing_collector = None
+                if event_stream is not None and prompt_watch is not None:
+                    event_stream.unwatch(prompt_watch)
+                    prompt_watch = event_stream.watch(prompt_id)
             lease.prompt_submitted_at_ms = _now_ms()
             with self._lock:
                 active = self._active_exec_by_item.get(lease.item_id)
@@ -15515,8 +18173,21 @@ class DependencyAgent:
 
             start_exec_ms = _now_ms()
             last_progress_emit_ms = start_exec_ms
+            last_history_ms = start_exec_ms
             history_entry: Dict[str, Any] = {}
             history_errors = 0
+
+            def emit_progress_if_due() -> None:
+                nonlocal last_progress_emit_ms
+                if _now_ms() - last_progress_emit_ms < self.agent_progress_event_ms:
+                    return
+                progress_payload: Dict[str, Any] = {"promptId": prompt_id}
+                comfy_progress = prompt_watch.progress_payload() if prompt_watch is not None else {}
+                if comfy_progress:
+                    progress_payload["comfyProgress"] = comfy_progress
+                self._emit_agent_event_best_effort(lease, "execution_progress", progress_payload)
+                last_progress_emit_ms = _now_ms()
+
             while True:
                 if self._is_cancel_requested(lease):
                     self._comfy_interrupt()
@@ -15552,8 +18223,24 @@ class DependencyAgent:
                     terminal_sent = True
                     return
 
+                # While the event stream is healthy, /history is only read once
+                # the prompt reports a terminal event, after a reconnect that may
+                # have dropped events, or on the slow safety interval.
+                if prompt_watch is not None and prompt_watch.stream_live and not prompt_watch.terminal_event:
+                    prompt_watch.wait_for_update(timeout_seconds=0.5)
+                    resync = prompt_watch.take_resync()
+                    if (
+                        not resync
+                        and not prompt_watch.terminal_event
+                        and prompt_watch.stream_live
+                        and _now_ms() - last_history_ms < self.comfy_event_stream_history_safety_ms
+                    ):
+                        emit_progress_if_due()
+                        continue
+
                 try:
                     history_entry = self._comfy_get_history(prompt_id)
+                    last_history_ms = _now_ms()
                     history_errors = 0
                 except Exception as history_err:
                     history_errors += 1
@@ -15586,10 +18273,10 @@ class DependencyAgent:
                 if completed:
                     break
 
-                if _now_ms() - last_progress_emit_ms >= self.agent_progress_event_ms:
-                    self._emit_agent_event_best_effort(lease, "execution_progress", {"promptId": prompt_id})
-                    last_progress_emit_ms = _now_ms()
-                time.sleep(0.5)
+                emit_progress_if_due()
+                retry_delay = prompt_watch.history_retry_delay() if prompt_watch is not None else 0.5
+                if retry_delay > 0:
+                    time.sleep(retry_delay)
 
             with self._lock:
                 active = self._active_exec_by_item.get(lease.item_id)
@@ -15652,6 +18339,8 @@ class DependencyAgent:
                 e,
             )
         finally:
+            if event_stream is not None and prompt_watch is not None:
+                event_stream.unwatch(prompt_watch)
             if node_timing_collector is not None:
                 node_timing_collector.stop()
             if not retain_lease:
@@ -15724,21 +18413,24 @@ class DependencyAgent:
                 if not filename:
                     continue
 
-                local_output = output_tmp_dir / f"{len(uploaded_outputs):02d}_{os.path.basename(filename)}"
                 download_started_ms = _now_ms()
-                http_download_to_file(
-                    self._comfy_view_url(filename=filename, subfolder=subfolder if subfolder else None, file_type=file_type),
-                    local_output,
-                    timeout_seconds=max(60.0, float(self.download_timeout_seconds)),
-                    chunk_size=int(self.download_chunk_size),
+                local_output, sha256_sum, output_source = self._collect_comfy_output(
+                    filename,
+                    subfolder,
+                    file_type,
+                    output_tmp_dir / f"{len(uploaded_outputs):02d}_{os.path.basename(filename)}",
                 )
                 download_ms = max(0, _now_ms() - download_started_ms)
                 bytes_written = int(local_output.stat().st_size)
-                hash_started_ms = _now_ms()
-                sha256_sum = sha256_file(local_output)
-                hash_ms = max(0, _now_ms() - hash_started_ms)
-                quality_validation = self._validate_local_output_quality(filename, local_output)
-                out_meta = self._upload_output_artifact(
+                logging.debug(
+                    "Collected Comfy output via %s: jobId=%s file=%s bytes=%d collectMs=%d",
+                    output_source,
+                    lease.job_id,
+                    filename,
+                    bytes_written,
+                    download_ms,
+                )
+                out_meta = self._finalize_output_artifact(
                     lease,
                     target,
                     filename,
@@ -15746,13 +18438,10 @@ class DependencyAgent:
                     bytes_written,
                     sha256_sum,
                 )
-                if quality_validation is not None:
-                    out_meta["qualityValidation"] = quality_validation
                 timing = out_meta.get("uploadTiming") if isinstance(out_meta.get("uploadTiming"), dict) else {}
                 out_meta["uploadTiming"] = {
                     **timing,
                     "agentDownloadFromComfyMs": download_ms,
-                    "agentHashMs": hash_ms,
                     "agentUploadWorkerQueueMs": upload_worker_queue_ms,
                 }
                 uploaded_outputs.append(out_meta)
@@ -15983,7 +18672,10 @@ class DependencyAgent:
             raise SystemExit("Failed to register; exiting.")
 
         logging.info("ComfyUI dir: %s", str(self.comfyui_dir))
-        logging.info("State file: %s", str(self.state_path))
+        if self._state_store is not None:
+            logging.info("State store: %s (sqlite)", str(self.state_db_path))
+        else:
+            logging.info("State file: %s", str(self.state_path))
         logging.info("Allowed dependency download domains: %s", ",".join(sorted(self.allowed_domains)))
         if self.input_allowed_domains:
             logging.info("Allowed input prefetch download domains: %s", ",".join(sorted(self.input_allowed_domains)))
@@ -16049,6 +18741,8 @@ class DependencyAgent:
         self._agent_upload_executor = ThreadPoolExecutor(max_workers=max(1, int(self.agent_max_upload_workers)))
         self._agent_maintenance_executor = ThreadPoolExecutor(max_workers=1)
         self._agent_prl_miner_executor = ThreadPoolExecutor(max_workers=1)
+        self._start_runtime_probes()
+        self._start_input_cache_scrub()
         with self._lock:
             self._agent_prefetch_inflight.clear()
             self._agent_execute_inflight.clear()
@@ -16376,6 +19070,15 @@ def main() -> int:
         format="%(asctime)s %(levelname)s %(message)s",
     )
 
+    if len(sys.argv) == 3 and sys.argv[1] == "--replay-runtime-deltas":
+        try:
+            state = replay_runtime_deltas(_read_runtime_delta_log(sys.argv[2]))
+        except (OSError, ValueError) as e:
+            logging.error("Runtime delta replay failed: %s", e)
+            return 2
+        sys.stdout.write(json.dumps(state, indent=2, sort_keys=True) + "\n")
+        return 0
+
     agent = DependencyAgent()
 
     def _handle_signal(_signum: int, _frame: Any) -> None:
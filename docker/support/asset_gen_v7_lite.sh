@@ -14,6 +14,7 @@ BASE_SCRIPT="${WORKSPACE}/asset_gen_v5_lite.sh"
 INFERENCE_SCRIPT="${WORKSPACE}/asset_gen_v7_lite_inference.sh"
 GATEWAY_SCRIPT="${WORKSPACE}/asset_gen_v7_lite_gateway.py"
 COORDINATOR_SCRIPT="${WORKSPACE}/asset_gen_v7_lite_coordinator.py"
+NVML_SAMPLER_SCRIPT="${WORKSPACE}/gpu_nvml_sampler.py"
 READINESS_PATH="${DM_COMFYUI_DIR}/input/${DM_LOCAL_READINESS_FILE}"
 MODEL_PATH="${DM_COMFYUI_DIR}/models/llm/Qwen3.8-27B-Uncensored-Q5_K_M.gguf"
 VISION_PATH="${DM_COMFYUI_DIR}/models/llm/Qwen3.8-27B-Uncensored-vision-f16.gguf"
@@ -96,6 +97,7 @@ fi
 download_support_file asset_gen_v7_lite_inference.sh "${INFERENCE_SCRIPT}"
 download_support_file asset_gen_v7_lite_gateway.py "${GATEWAY_SCRIPT}"
 download_support_file asset_gen_v7_lite_coordinator.py "${COORDINATOR_SCRIPT}"
+download_support_file gpu_nvml_sampler.py "${NVML_SAMPLER_SCRIPT}"
 bash "${INFERENCE_SCRIPT}"
 
 curl -fsS "${DM_LOCAL_COMFY_BASE_URL}/system_stats" >/dev/null
@@ -19,12 +19,20 @@ import subprocess
 import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+try:
+    import gpu_nvml_sampler
+except ImportError:  # provisioned without the sampler; fall back to nvidia-smi
+    gpu_nvml_sampler = None
+
 
 HOLDERS = {"inference", "comfy", "mining"}
 FOREGROUND = {"inference", "comfy"}
 CACHE_HANDLE_RE = re.compile(r"^[A-Za-z0-9_-]{1,16}\.[a-f0-9]{64}$")
+SNAPSHOT_INTEGRITY = "sha256-merkle-v1"
+SNAPSHOT_READ_BYTES = 8 * 1024 * 1024
 
 
 class CoordinatorError(RuntimeError):
@@ -43,8 +51,103 @@ class StaleLease(CoordinatorError):
     code = "stale_gpu_lease"
 
 
+class SlotCache:
+    """KV residency of one llama-server slot (an index below ``--parallel``)."""
+
+    def __init__(self, slot):
+        self.slot = int(slot)
+        self.handle = None
+        self.metadata = {}
+        self.dirty = False
+        self.generation = 0
+        self.snapshot_timer = None
+
+
+def _chunk_digests(fd, size, chunk_bytes, workers=1, expected=None):
+    """Hash ``size`` bytes of ``fd`` as independent fixed-size chunks.
+
+    Chunks are read with ``pread`` so workers share one descriptor; hashlib
+    releases the GIL on large buffers, so threads hash in parallel.  When
+    ``expected`` digests are supplied the first mismatching chunk aborts the
+    remaining reads and ``None`` is returned.
+    """
+    chunk_bytes = max(1, int(chunk_bytes))
+    count = max(1, -(-int(size) // chunk_bytes))
+    if expected is not None and len(expected) != count:
+        return None
+    abort = threading.Event()
+
+    def hash_chunk(index):
+        digest = hashlib.sha256()
+        offset = index * chunk_bytes
+        end = min(int(size), offset + chunk_bytes)
+        try:
+            while offset < end and not abort.is_set():
+                data = os.pread(fd, min(SNAPSHOT_READ_BYTES, end - offset), offset)
+                if not data:
+                    raise OSError("snapshot file shrank during hashing")
+                digest.update(data)
+                offset += len(data)
+        except BaseException:
+            abort.set()
+            raise
+        if abort.is_set():
+            return None
+        value = digest.hexdigest()
+        if expected is not None and value != expected[index]:
+            abort.set()
+        return value
+
+    if workers <= 1 or count == 1:
+        results = [hash_chunk(index) for index in range(count)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(int(workers), count)) as pool:
+            results = list(pool.map(hash_chunk, range(count)))
+    if abort.is_set() or None in results:
+        return None
+    return results
+
+
+def _merkle_root(digests):
+    """Binary SHA-256 Merkle root over hex chunk digests (odd nodes carry up)."""
+    level = [bytes.fromhex(value) for value in digests]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    while len(level) > 1:
+        paired = []
+        for index in range(0, len(level) - 1, 2):
+            paired.append(hashlib.sha256(b"\x01" + level[index] + level[index + 1]).digest())
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+
+def _stat_identity(stat_result):
+    return (
+        stat_result.st_dev,
+        stat_result.st_ino,
+        stat_result.st_size,
+        stat_result.st_mtime_ns,
+        stat_result.st_ctime_ns,
+    )
+
+
 class SnapshotStore:
-    """Filesystem backend for atomic, compatibility-scoped llama slot files."""
+    """Filesystem backend for atomic, compatibility-scoped llama slot files.
+
+    Manifests record a SHA-256 per ``chunk_bytes`` block plus their Merkle
+    root (stored as ``sha256``).  Verification hashes chunks in parallel and
+    stops at the first corrupt block; a successful verification is remembered
+    against the file's inode, size, mtime and ctime so repeated restores of an
+    untouched slot file skip the multi-GiB read.  Manifests written before
+    chunking carry a whole-file ``sha256`` and are still verified that way.
+
+    Parsed manifests are indexed in memory by filename.  The store keeps the
+    index current on its own writes and re-reads a manifest only when its
+    inode, size or mtime no longer match, so listing and pruning cost one
+    directory scan plus a stat per entry instead of N JSON parses.
+    """
 
     def __init__(
         self,
@@ -54,6 +157,8 @@ class SnapshotStore:
         quota_bytes=48 * 1024**3,
         min_free_bytes=20 * 1024**3,
         max_entry_bytes=16 * 1024**3,
+        chunk_bytes=64 * 1024**2,
+        hash_workers=4,
     ):
         self.root = Path(root)
         self.root.mkdir(parents=True, exist_ok=True, mode=0o700)
@@ -63,7 +168,15 @@ class SnapshotStore:
         self.quota_bytes = int(quota_bytes)
         self.min_free_bytes = int(min_free_bytes)
         self.max_entry_bytes = int(max_entry_bytes)
+        self.chunk_bytes = max(1, int(chunk_bytes))
+        self.hash_workers = max(1, int(hash_workers))
         self.lock = threading.RLock()
+        # handle -> (stat identity, manifest digest) of the last verified file.
+        self._verified = {}
+        self.verification_stats = {"cached": 0, "hashed": 0, "corrupt": 0}
+        # manifest filename -> ((st_ino, st_size, st_mtime_ns), manifest)
+        self._manifests = {}
+        self.manifest_loads = 0
         self._recover_filesystem()
 
     def _recover_filesystem(self):
@@ -75,9 +188,10 @@ class SnapshotStore:
                 if not slot_path.with_suffix(".json").is_file():
                     slot_path.unlink(missing_ok=True)
             for manifest_path in self.root.glob("*.json"):
-                manifest = self._read_manifest(manifest_path)
+                manifest = self._load_manifest(manifest_path)
                 slot_path = self.root / str((manifest or {}).get("filename", ""))
                 if not manifest or not slot_path.is_file():
+                    self._manifests.pop(manifest_path.name, None)
                     manifest_path.unlink(missing_ok=True)
 
     def _paths(self, handle):
@@ -92,18 +206,42 @@ class SnapshotStore:
         except (OSError, ValueError):
             return None
 
+    def _load_manifest(self, path):
+        """Return a copy of ``path``'s manifest, parsing only when it changed."""
+        try:
+            stat_result = path.stat()
+        except OSError:
+            self._manifests.pop(path.name, None)
+            return None
+        identity = (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns)
+        cached = self._manifests.get(path.name)
+        if cached and cached[0] == identity:
+            return dict(cached[1])
+        manifest = self._read_manifest(path)
+        self.manifest_loads += 1
+        if manifest is None:
+            self._manifests.pop(path.name, None)
+            return None
+        self._manifests[path.name] = (identity, manifest)
+        return dict(manifest)
+
     def entries(self):
         result = []
         with self.lock:
-            for manifest_path in self.root.glob("*.json"):
-                manifest = self._read_manifest(manifest_path)
+            with os.scandir(self.root) as scan:
+                names = {item.name for item in scan}
+            for stale in set(self._manifests) - names:
+                del self._manifests[stale]
+            for name in names:
+                if not name.endswith(".json") or name.startswith("."):
+                    continue
+                manifest = self._load_manifest(self.root / name)
                 if not manifest:
                     continue
-                slot_path = self.root / str(manifest.get("filename", ""))
-                if not slot_path.is_file():
+                filename = str(manifest.get("filename", ""))
+                if filename not in names:
                     continue
-                manifest = dict(manifest)
-                manifest["path"] = str(slot_path)
+                manifest["path"] = str(self.root / filename)
                 result.append(manifest)
         return result
 
@@ -145,7 +283,7 @@ class SnapshotStore:
         now = time.time() if now is None else float(now)
         slot_path, manifest_path = self._paths(handle)
         with self.lock:
-            manifest = self._read_manifest(manifest_path)
+            manifest = self._load_manifest(manifest_path)
             if not manifest or not slot_path.is_file():
                 return None
             if manifest.get("fingerprint") != self.fingerprint:
@@ -175,32 +313,32 @@ class SnapshotStore:
             initial_stat = slot_path.stat()
         except OSError:
             return None
-        digest = hashlib.sha256()
-        try:
-            # Integrity validation is intentionally outside the store lock so
-            # a multi-GiB read never blocks capacity/status operations.
-            with slot_path.open("rb") as stream:
-                for chunk in iter(lambda: stream.read(8 * 1024 * 1024), b""):
-                    digest.update(chunk)
-        except OSError:
-            return None
+        identity = _stat_identity(initial_stat)
         with self.lock:
-            current = self._read_manifest(manifest_path)
+            cached = self._verified.get(handle) == (identity, expected_sha256)
+        valid = cached
+        if not cached and expected_sha256:
+            try:
+                # Integrity validation is intentionally outside the store lock
+                # so a multi-GiB read never blocks capacity/status operations.
+                valid = self._verify_file(slot_path, initial_stat.st_size, entry)
+            except OSError:
+                return None
+        with self.lock:
+            current = self._load_manifest(manifest_path)
             try:
                 current_stat = slot_path.stat()
             except OSError:
                 return None
-            stable_file = (
-                current_stat.st_dev == initial_stat.st_dev
-                and current_stat.st_ino == initial_stat.st_ino
-                and current_stat.st_size == initial_stat.st_size
-                and current_stat.st_mtime_ns == initial_stat.st_mtime_ns
-            )
+            stable_file = _stat_identity(current_stat) == identity
             if not current or not stable_file or str(current.get("sha256") or "") != expected_sha256:
                 return None
-            if not expected_sha256 or digest.hexdigest() != expected_sha256:
+            if not expected_sha256 or not valid:
+                self.verification_stats["corrupt"] += 1
                 self.delete(handle)
                 return None
+            self.verification_stats["cached" if cached else "hashed"] += 1
+            self._verified[handle] = (identity, expected_sha256)
             manifest = dict(current)
             manifest["lastUsedAt"] = now
             manifest["validationMs"] = round((time.monotonic() - validation_started) * 1000)
@@ -208,6 +346,31 @@ class SnapshotStore:
             self._write_manifest_atomic(manifest_path, manifest)
             return dict(manifest, path=str(slot_path))
 
+    def _verify_file(self, slot_path, size, manifest):
+        expected_sha256 = str(manifest.get("sha256") or "")
+        fd = os.open(slot_path, os.O_RDONLY)
+        try:
+            if manifest.get("integrity") != SNAPSHOT_INTEGRITY:
+                # Pre-chunking manifest: one chunk spanning the file is the
+                # plain whole-file digest.
+                digests = _chunk_digests(fd, size, max(1, size))
+                return bool(digests) and digests[0] == expected_sha256
+            expected = manifest.get("chunkSha256")
+            if not isinstance(expected, list) or _merkle_root([str(value) for value in expected]) != expected_sha256:
+                return False
+            digests = _chunk_digests(
+                fd,
+                size,
+                int(manifest.get("chunkBytes") or self.chunk_bytes),
+                workers=self.hash_workers,
+                expected=[str(value) for value in expected],
+            )
+            return digests is not None
+        except ValueError:
+            return False
+        finally:
+            os.close(fd)
+
     def temporary_filename(self, handle):
         self._paths(handle)
         return f".{handle}.{uuid.uuid4().hex}.tmp"
@@ -225,10 +388,8 @@ class SnapshotStore:
         # Hashing a multi-GiB slot is deliberately outside the store lock.
         # Revalidate the inode before the atomic rename so a concurrent
         # capacity/status operation is never held behind sequential disk I/O.
-        digest = hashlib.sha256()
         with temporary_path.open("rb") as stream:
-            for chunk in iter(lambda: stream.read(8 * 1024 * 1024), b""):
-                digest.update(chunk)
+            chunk_digests = _chunk_digests(stream.fileno(), size, self.chunk_bytes, workers=self.hash_workers)
             os.fsync(stream.fileno())
         with self.lock:
             current_stat = temporary_path.stat()
@@ -251,6 +412,8 @@ class SnapshotStore:
                 raise OSError("snapshot would violate free disk floor")
             os.replace(temporary_path, slot_path)
             os.chmod(slot_path, 0o600)
+            merkle_root = _merkle_root(chunk_digests)
+            self._verified[handle] = (_stat_identity(slot_path.stat()), merkle_root)
             directory_fd = os.open(self.root, os.O_RDONLY)
             try:
                 os.fsync(directory_fd)
@@ -263,7 +426,10 @@ class SnapshotStore:
                 "filename": slot_path.name,
                 "fingerprint": self.fingerprint,
                 "bytes": size,
-                "sha256": digest.hexdigest(),
+                "sha256": merkle_root,
+                "integrity": SNAPSHOT_INTEGRITY,
+                "chunkBytes": self.chunk_bytes,
+                "chunkSha256": chunk_digests,
                 "updatedAt": now,
                 "lastUsedAt": now,
             }
@@ -284,6 +450,12 @@ class SnapshotStore:
                 stream.flush()
                 os.fsync(stream.fileno())
             os.replace(temporary, path)
+            stat_result = path.stat()
+            with self.lock:
+                self._manifests[path.name] = (
+                    (stat_result.st_ino, stat_result.st_size, stat_result.st_mtime_ns),
+                    dict(manifest),
+                )
             directory_fd = os.open(self.root, os.O_RDONLY)
             try:
                 os.fsync(directory_fd)
@@ -295,6 +467,8 @@ class SnapshotStore:
     def delete(self, handle):
         slot_path, manifest_path = self._paths(handle)
         with self.lock:
+            self._verified.pop(handle, None)
+            self._manifests.pop(manifest_path.name, None)
             slot_path.unlink(missing_ok=True)
             manifest_path.unlink(missing_ok=True)
 
@@ -302,7 +476,7 @@ class SnapshotStore:
         now = time.time() if now is None else float(now)
         _slot_path, manifest_path = self._paths(handle)
         with self.lock:
-            manifest = self._read_manifest(manifest_path)
+            manifest = self._load_manifest(manifest_path)
             if not manifest:
                 return
             failures = int(manifest.get("restoreFailureCount", 0)) + 1
@@ -348,6 +522,8 @@ class SnapshotStore:
             "minFreeBytes": self.min_free_bytes,
             "freeBytes": shutil.disk_usage(self.root).free,
             "ttlSeconds": self.ttl_seconds,
+            "verification": dict(self.verification_stats),
+            "manifestLoads": self.manifest_loads,
         }
 
 
@@ -374,6 +550,7 @@ class GPUCoordinator:
         comfy_release_vram_max_bytes=3 * 1024**3,
         comfy_idle_baseline_bytes=None,
         comfy_release_vram_headroom_bytes=512 * 1024**2,
+        parallel_slots=1,
     ):
         self.llama_base_url = llama_base_url.rstrip("/")
         self.comfy_base_url = comfy_base_url.rstrip("/")
@@ -416,11 +593,8 @@ class GPUCoordinator:
         self.llama_argv = self._read_argv(self.llama_pid) or self._read_llama_command()
         if self.llama_pid and self.llama_argv:
             self._persist_llama_command(self.llama_argv)
-        self.current_cache_handle = None
-        self.current_cache_metadata = {}
-        self.cache_dirty = False
-        self.cache_generation = 0
-        self.snapshot_timer = None
+        self.parallel_slots = max(1, int(parallel_slots))
+        self.slot_caches = [SlotCache(slot) for slot in range(self.parallel_slots)]
         self.recovery_timer = None
         self.draining = False
         self.mining_not_before_ms = int((previous_journal or {}).get("miningNotBeforeMs", 0))
@@ -448,6 +622,42 @@ class GPUCoordinator:
         self._reconcile_previous_journal(previous_journal)
         self._persist_journal()
 
+    # Slot 0 is the only slot of a ``--parallel 1`` server; these aliases keep
+    # the single-slot view for callers that predate per-slot residency.
+    @property
+    def current_cache_handle(self):
+        return self.slot_caches[0].handle
+
+    @current_cache_handle.setter
+    def current_cache_handle(self, value):
+        self.slot_caches[0].handle = value
+
+    @property
+    def current_cache_metadata(self):
+        return self.slot_caches[0].metadata
+
+    @current_cache_metadata.setter
+    def current_cache_metadata(self, value):
+        self.slot_caches[0].metadata = value
+
+    @property
+    def cache_dirty(self):
+        return self.slot_caches[0].dirty
+
+    @cache_dirty.setter
+    def cache_dirty(self, value):
+        self.slot_caches[0].dirty = value
+
+    @property
+    def cache_generation(self):
+        return self.slot_caches[0].generation
+
+    def _slot_cache(self, slot):
+        slot = int(slot or 0)
+        if not 0 <= slot < self.parallel_slots:
+            raise ValueError(f"llama slot {slot} is outside --parallel {self.parallel_slots}")
+        return self.slot_caches[slot]
+
     def _read_journal(self):
         if not self.state_file:
             return None
@@ -848,10 +1058,11 @@ class GPUCoordinator:
         # A process stop destroys llama's in-memory KV. Keep disk snapshots in
         # SnapshotStore, but never allow the old handle to be reported as a
         # resident hit after Comfy/mining or recovery evicts llama.
-        self.current_cache_handle = None
-        self.current_cache_metadata = {}
-        self.cache_dirty = False
-        self.cache_generation += 1
+        for cache in self.slot_caches:
+            cache.handle = None
+            cache.metadata = {}
+            cache.dirty = False
+            cache.generation += 1
 
     def _free_comfy(self, preserve_cache=True):
         status, _, body = self.http_request(
@@ -940,7 +1151,21 @@ class GPUCoordinator:
         return False, True
 
     @staticmethod
-    def _gpu_processes(timeout_seconds=5):
+    def _gpu_process_rows(timeout_seconds=5):
+        """(pid, usedBytes) per compute process, from the NVML sampler or nvidia-smi."""
+        sampler = gpu_nvml_sampler.shared_sampler() if gpu_nvml_sampler is not None else None
+        if sampler is not None:
+            try:
+                reading = sampler.latest(max_age_seconds=sampler.interval_seconds * 2)
+                rows = [(int(item["pid"]), item["usedBytes"]) for item in reading["processes"]]
+            except Exception:
+                rows = None
+            if rows is not None:
+                # Unattributable usage is unknown, exactly like nvidia-smi's
+                # [N/A] below; counting it as 0 would report Comfy's VRAM released.
+                if any(used is None for _pid, used in rows):
+                    return None
+                return [(pid, int(used)) for pid, used in rows]
         try:
             result = subprocess.run(
                 ["nvidia-smi", "--query-compute-apps=pid,used_memory", "--format=csv,noheader,nounits"],
@@ -953,16 +1178,24 @@ class GPUCoordinator:
             return None
         if result.returncode != 0:
             return None
-        processes = []
+        rows = []
         for row in result.stdout.splitlines():
             if not row.strip():
                 continue
             try:
                 raw_pid, raw_mib = row.split(",", 1)
-                pid = int(raw_pid.strip())
-                used_bytes = int(raw_mib.strip()) * 1024**2
+                rows.append((int(raw_pid.strip()), int(raw_mib.strip()) * 1024**2))
             except ValueError:
                 return None
+        return rows
+
+    @staticmethod
+    def _gpu_processes(timeout_seconds=5):
+        rows = GPUCoordinator._gpu_process_rows(timeout_seconds)
+        if rows is None:
+            return None
+        processes = []
+        for pid, used_bytes in rows:
             try:
                 cmdline = Path(f"/proc/{pid}/cmdline").read_bytes().replace(b"\0", b" ").decode("utf-8", "replace")
                 cmdline = re.sub(r"(--api-key(?:=|\s+))\S+", r"\1[redacted]", cmdline)
@@ -1134,16 +1367,18 @@ class GPUCoordinator:
                 time.sleep(0.1)
         raise CoordinatorError("mining process did not release GPU")
 
-    def _cancel_snapshot_timer(self):
-        timer = self.snapshot_timer
-        self.snapshot_timer = None
-        if timer:
-            timer.cancel()
+    def _cancel_snapshot_timer(self, cache=None):
+        for slot_cache in ([cache] if cache is not None else self.slot_caches):
+            timer = slot_cache.snapshot_timer
+            slot_cache.snapshot_timer = None
+            if timer:
+                timer.cancel()
 
     def _evict_warm(self, holder):
         self.phase = "EVICTING"
         if holder == "inference":
-            self._bounded_dirty_save("eviction")
+            for cache in self.slot_caches:
+                self._bounded_dirty_save("eviction", slot=cache.slot)
             self._stop_llama()
         elif holder == "comfy":
             self._free_comfy(preserve_cache=True)
@@ -1401,8 +1636,10 @@ class GPUCoordinator:
                 lease["releasedReason"] = reason
                 self.state = "WARM"
                 self.phase = "WARM"
-                if holder == "inference" and self.current_cache_handle and self.cache_dirty:
-                    self._schedule_snapshot()
+                if holder == "inference":
+                    for cache in self.slot_caches:
+                        if cache.handle and cache.dirty:
+                            self._schedule_snapshot(cache.slot)
             else:
                 if holder == "inference" and self.enforce_transitions:
                     self._stop_llama()
@@ -1484,26 +1721,27 @@ class GPUCoordinator:
                 },
             }
 
-    def _schedule_snapshot(self):
-        self._cancel_snapshot_timer()
-        timer = threading.Timer(5.0, self._snapshot_if_still_warm)
+    def _schedule_snapshot(self, slot=0):
+        cache = self._slot_cache(slot)
+        self._cancel_snapshot_timer(cache)
+        timer = threading.Timer(5.0, self._snapshot_if_still_warm, args=(cache.slot,))
         timer.daemon = True
-        self.snapshot_timer = timer
+        cache.snapshot_timer = timer
         timer.start()
 
-    def _snapshot_if_still_warm(self):
+    def _snapshot_if_still_warm(self, slot=0):
         with self.lock:
-            self.snapshot_timer = None
+            self._slot_cache(slot).snapshot_timer = None
             eligible = self.lease and self.lease.get("holder") == "inference" and self.lease.get("state") == "WARM"
         # Never hold the scheduling lock during disk persistence.  A competing
         # foreground acquire may stop llama, which cancels the slot write and
         # turns it into a harmless best-effort cache miss.
         if eligible:
-            self.save_current_snapshot(best_effort=True)
+            self.save_current_snapshot(best_effort=True, slot=slot)
 
-    def _erase_llama_slot(self):
+    def _erase_llama_slot(self, slot=0):
         status, _, body = self.http_request(
-            f"{self.llama_base_url}/slots/0?action=erase",
+            f"{self.llama_base_url}/slots/{int(slot)}?action=erase",
             method="POST",
             timeout=30,
             authorize_backend=True,
@@ -1511,38 +1749,39 @@ class GPUCoordinator:
         if not 200 <= status < 300:
             raise CoordinatorError(f"slot erase returned {status}: {body[:500]!r}")
 
-    def prepare_cache(self, handle):
+    def prepare_cache(self, handle, slot=0):
         with self.lock:
-            if handle and handle == self.current_cache_handle:
-                observations = int(self.current_cache_metadata.get("reuseObservations", 0)) + 1
-                hits = int(self.current_cache_metadata.get("reuseHits", 0)) + 1
-                self.current_cache_metadata.update({
+            cache = self._slot_cache(slot)
+            if handle and handle == cache.handle:
+                observations = int(cache.metadata.get("reuseObservations", 0)) + 1
+                hits = int(cache.metadata.get("reuseHits", 0)) + 1
+                cache.metadata.update({
                     "reuseObservations": observations,
                     "reuseHits": hits,
                     "reuseProbability": (3 + hits) / (10 + observations),
                 })
                 return {"classification": "resident", "restored": False}
-            if self.current_cache_handle and self.cache_dirty:
-                self._bounded_dirty_save("key_switch")
-            self.cache_generation += 1
-            self.current_cache_handle = handle
-            self.current_cache_metadata = {}
-            self.cache_dirty = False
+            if cache.handle and cache.dirty:
+                self._bounded_dirty_save("key_switch", slot=cache.slot)
+            cache.generation += 1
+            cache.handle = handle
+            cache.metadata = {}
+            cache.dirty = False
             if not handle:
                 return {"classification": "unkeyed", "restored": False}
             if not self.snapshot_restore:
-                self._erase_llama_slot()
+                self._erase_llama_slot(cache.slot)
                 return {"classification": "cold", "restored": False}
             entry = self.snapshot_store.peek(handle)
             if not entry:
-                self._erase_llama_slot()
+                self._erase_llama_slot(cache.slot)
                 return {"classification": "cold", "restored": False}
             if float(entry.get("restoreBackoffUntil", 0)) > time.time():
                 # Retain the persisted failure policy while cold-prefilling.
                 # A later snapshot write must not erase the backoff and cause
                 # alternating keys to pay restore plus cold-prefill repeatedly.
-                self.current_cache_metadata = dict(entry)
-                self._erase_llama_slot()
+                cache.metadata = dict(entry)
+                self._erase_llama_slot(cache.slot)
                 return {"classification": "cold", "restored": False, "skipped": "restore_backoff"}
             estimated_cold = float(entry.get("coldPrefillMs", 0))
             predicted_restore = float(entry.get("restoreMs", 0))
@@ -1552,18 +1791,18 @@ class GPUCoordinator:
                 restore_rate = max(1.0, float(os.environ.get("QWEN_CACHE_RESTORE_MB_PER_SECOND", "2000")))
                 predicted_restore = (size_mib / validation_rate + size_mib / restore_rate) * 1000
             if predicted_restore and estimated_cold and predicted_restore > estimated_cold * 0.8:
-                self._erase_llama_slot()
+                self._erase_llama_slot(cache.slot)
                 return {"classification": "cold", "restored": False, "skipped": "restore_not_beneficial"}
             restore_started = time.monotonic()
             entry = self.snapshot_store.get(handle)
             if not entry:
-                self._erase_llama_slot()
+                self._erase_llama_slot(cache.slot)
                 return {"classification": "cold", "restored": False, "restoreFailed": True}
             filename = Path(entry["path"]).name
             invalid_snapshot = False
             try:
                 status, _, body = self.http_request(
-                    f"{self.llama_base_url}/slots/0?action=restore",
+                    f"{self.llama_base_url}/slots/{cache.slot}?action=restore",
                     method="POST",
                     payload={"filename": filename},
                     timeout=300,
@@ -1575,7 +1814,7 @@ class GPUCoordinator:
                 restore_ms = round((time.monotonic() - restore_started) * 1000)
                 observations = int(entry.get("reuseObservations", 0)) + 1
                 hits = int(entry.get("reuseHits", 0)) + 1
-                self.current_cache_metadata = dict(
+                cache.metadata = dict(
                     entry,
                     restoreMs=restore_ms,
                     reuseObservations=observations,
@@ -1583,7 +1822,7 @@ class GPUCoordinator:
                     reuseProbability=(3 + hits) / (10 + observations),
                 )
                 for key in ("restoreFailureCount", "restoreFailureAt", "restoreBackoffUntil"):
-                    self.current_cache_metadata.pop(key, None)
+                    cache.metadata.pop(key, None)
                 self.metrics["snapshotRestores"] += 1
                 return {"classification": "restored", "restored": True, "restoreMs": restore_ms}
             except Exception:
@@ -1592,20 +1831,21 @@ class GPUCoordinator:
                     self.snapshot_store.delete(handle)
                 else:
                     self.snapshot_store.record_restore_failure(handle)
-                self.current_cache_handle = None
-                self.current_cache_metadata = {}
-                self.cache_dirty = False
-                self.cache_generation += 1
-                self._erase_llama_slot()
+                cache.handle = None
+                cache.metadata = {}
+                cache.dirty = False
+                cache.generation += 1
+                self._erase_llama_slot(cache.slot)
                 return {"classification": "cold", "restored": False, "restoreFailed": True}
 
-    def mark_cache_dirty(self, handle, metadata):
+    def mark_cache_dirty(self, handle, metadata, slot=0):
         if not handle:
             return {"restoreIneffective": False}
         metadata = dict(metadata or {})
         with self.lock:
-            self.current_cache_handle = handle
-            previous_cold_prefill_ms = float(self.current_cache_metadata.get("coldPrefillMs", 0))
+            cache = self._slot_cache(slot)
+            cache.handle = handle
+            previous_cold_prefill_ms = float(cache.metadata.get("coldPrefillMs", 0))
             observed_cold_prefill_ms = float(metadata.get("coldPrefillMs", 0))
             restore_ineffective = (
                 metadata.get("classification") == "restored"
@@ -1622,28 +1862,28 @@ class GPUCoordinator:
                     self.snapshot_store.record_restore_failure(handle)
                     refreshed = self.snapshot_store.peek(handle)
                     if refreshed:
-                        self.current_cache_metadata.update(refreshed)
+                        cache.metadata.update(refreshed)
                 except Exception:
                     # Cache policy persistence is best-effort and must never
                     # turn a successfully generated response into a failure.
                     self.metrics["snapshotRestoreErrors"] += 1
-                observations = max(1, int(self.current_cache_metadata.get("reuseObservations", 1)))
-                hits = max(0, int(self.current_cache_metadata.get("reuseHits", 1)) - 1)
-                self.current_cache_metadata.update({
+                observations = max(1, int(cache.metadata.get("reuseObservations", 1)))
+                hits = max(0, int(cache.metadata.get("reuseHits", 1)) - 1)
+                cache.metadata.update({
                     "reuseObservations": observations,
                     "reuseHits": hits,
                     "reuseProbability": (3 + hits) / (10 + observations),
                 })
                 self.metrics["snapshotRestoreIneffective"] += 1
-            self.current_cache_metadata.update(metadata)
-            self.current_cache_metadata["coldPrefillMs"] = max(previous_cold_prefill_ms, observed_cold_prefill_ms)
-            self.current_cache_metadata.setdefault("reuseProbability", 0.3)
-            self.cache_dirty = True
-            self.cache_generation += 1
+            cache.metadata.update(metadata)
+            cache.metadata["coldPrefillMs"] = max(previous_cold_prefill_ms, observed_cold_prefill_ms)
+            cache.metadata.setdefault("reuseProbability", 0.3)
+            cache.dirty = True
+            cache.generation += 1
             return {"restoreIneffective": restore_ineffective}
 
-    def _snapshot_beneficial(self):
-        metadata = self.current_cache_metadata
+    def _snapshot_beneficial(self, metadata=None):
+        metadata = self.slot_caches[0].metadata if metadata is None else metadata
         reuse = float(metadata.get("reuseProbability", 0.3))
         cold = float(metadata.get("coldPrefillMs", 0))
         restore = float(metadata.get("restoreMs", 0))
@@ -1669,14 +1909,15 @@ class GPUCoordinator:
             bytes_per_token = max(1.0, float(os.environ.get("QWEN_CACHE_INITIAL_BYTES_PER_TOKEN", "600000")))
         return min(self.snapshot_store.max_entry_bytes, max(1, int(prompt_tokens * bytes_per_token)))
 
-    def _bounded_dirty_save(self, reason, max_latency_ms=250):
+    def _bounded_dirty_save(self, reason, max_latency_ms=250, slot=0):
         metric = "snapshotSkippedDirtyEviction" if reason == "eviction" else "snapshotSkippedKeySwitch"
-        handle = self.current_cache_handle
-        metadata = dict(self.current_cache_metadata)
-        generation = self.cache_generation
-        if not handle or not self.cache_dirty:
+        cache = self._slot_cache(slot)
+        handle = cache.handle
+        metadata = dict(cache.metadata)
+        generation = cache.generation
+        if not handle or not cache.dirty:
             return False
-        if not self.snapshot_write or not self._snapshot_beneficial():
+        if not self.snapshot_write or not self._snapshot_beneficial(metadata):
             self.metrics[metric] += 1
             return False
         predicted_ms = float(metadata.get("saveMs") or 0)
@@ -1694,7 +1935,7 @@ class GPUCoordinator:
         started = time.monotonic()
         try:
             status, _, body = self.http_request(
-                f"{self.llama_base_url}/slots/0?action=save",
+                f"{self.llama_base_url}/slots/{cache.slot}?action=save",
                 method="POST",
                 payload={"filename": temporary},
                 timeout=max_latency_ms / 1000,
@@ -1721,11 +1962,11 @@ class GPUCoordinator:
                     },
                 )
                 with self.lock:
-                    if self.current_cache_handle == handle and self.cache_generation == generation:
-                        self.current_cache_metadata = committed
-                        self.cache_dirty = False
-                    elif self.current_cache_handle == handle and self.cache_dirty and self.lease and self.lease.get("state") == "WARM":
-                        self._schedule_snapshot()
+                    if cache.handle == handle and cache.generation == generation:
+                        cache.metadata = committed
+                        cache.dirty = False
+                    elif cache.handle == handle and cache.dirty and self.lease and self.lease.get("state") == "WARM":
+                        self._schedule_snapshot(cache.slot)
                     self.metrics["snapshotSaves"] += 1
             except Exception:
                 (self.snapshot_store.root / temporary).unlink(missing_ok=True)
@@ -1736,12 +1977,13 @@ class GPUCoordinator:
         commit_thread.start()
         return True
 
-    def save_current_snapshot(self, best_effort=False):
+    def save_current_snapshot(self, best_effort=False, slot=0):
         with self.lock:
-            handle = self.current_cache_handle
-            metadata_at_start = dict(self.current_cache_metadata)
-            generation_at_start = self.cache_generation
-            if not self.snapshot_write or not handle or not self.cache_dirty or not self._snapshot_beneficial():
+            cache = self._slot_cache(slot)
+            handle = cache.handle
+            metadata_at_start = dict(cache.metadata)
+            generation_at_start = cache.generation
+            if not self.snapshot_write or not handle or not cache.dirty or not self._snapshot_beneficial(metadata_at_start):
                 return None
             if not self.snapshot_store.capacity(self._predicted_snapshot_bytes(metadata_at_start))["canWrite"]:
                 self.metrics["snapshotSaveErrors"] += 1
@@ -1751,7 +1993,7 @@ class GPUCoordinator:
         started = time.monotonic()
         try:
             status, _, body = self.http_request(
-                f"{self.llama_base_url}/slots/0?action=save",
+                f"{self.llama_base_url}/slots/{cache.slot}?action=save",
                 method="POST",
                 payload={"filename": temporary},
                 timeout=300,
@@ -1771,11 +2013,11 @@ class GPUCoordinator:
             metadata.setdefault("savedPrefillMs", max(0, float(metadata.get("coldPrefillMs", 0)) - float(metadata.get("restoreMs", 0))))
             result = self.snapshot_store.commit(handle, temporary, metadata)
             with self.lock:
-                if self.current_cache_handle == handle and self.cache_generation == generation_at_start:
-                    self.current_cache_metadata = result
-                    self.cache_dirty = False
-                elif self.current_cache_handle == handle and self.cache_dirty and self.lease and self.lease.get("state") == "WARM":
-                    self._schedule_snapshot()
+                if cache.handle == handle and cache.generation == generation_at_start:
+                    cache.metadata = result
+                    cache.dirty = False
+                elif cache.handle == handle and cache.dirty and self.lease and self.lease.get("state") == "WARM":
+                    self._schedule_snapshot(cache.slot)
                 self.metrics["snapshotSaves"] += 1
             return result
         except Exception:
@@ -1810,6 +2052,10 @@ class GPUCoordinator:
                 "metrics": dict(self.metrics),
                 "diagnosticsBusy": not acquired,
                 "draining": self.draining,
+                "slots": [
+                    {"slot": cache.slot, "resident": bool(cache.handle), "dirty": cache.dirty}
+                    for cache in self.slot_caches
+                ],
             }
         finally:
             if acquired:
@@ -39,11 +39,24 @@ if ADMISSION_MODE not in {"off", "shadow", "enforcing"}:
     raise RuntimeError("GPU_ADMISSION_MODE must be off, shadow, or enforcing")
 ADMIT_MAX_WAIT_SECONDS = max(0.0, min(60.0, float(os.environ.get("QWEN_ADMIT_MAX_WAIT_SECONDS", "10"))))
 MAX_GATEWAY_WAITERS = max(1, min(64, int(os.environ.get("QWEN_MAX_WAITERS", "4"))))
+# Must match llama-server --parallel. Each slot owns 1/N of --ctx-size, which is
+# the per-slot KV budget passed as QWEN_SLOT_CONTEXT_TOKENS (0 disables the check).
+LLAMA_PARALLEL_SLOTS = max(1, min(16, int(os.environ.get("QWEN_LLAMA_PARALLEL", "1"))))
+SLOT_CONTEXT_TOKENS = max(0, int(os.environ.get("QWEN_SLOT_CONTEXT_TOKENS", "0")))
+IMAGE_TOKEN_ESTIMATE = max(0, int(os.environ.get("QWEN_IMAGE_TOKEN_ESTIMATE", "4096")))
 ADMISSION_VALIDATION_URL = os.environ.get(
     "GPU_ADMISSION_VALIDATION_URL",
     "https://us-central1-furgencontentserver.cloudfunctions.net/inferenceApi/v1/internal/admission/validate",
 ).strip()
 SERVER_TYPE = os.environ.get("SERVER_TYPE", "asset_gen_v7_lite").strip()
+# A cached "valid" verdict lets a claim revoked upstream through for at most
+# this long unless the coordinator invalidates it first; "revoked" is final.
+ADMISSION_CACHE_TTL_SECONDS = max(0.0, min(60.0, float(os.environ.get("GPU_ADMISSION_CACHE_TTL_SECONDS", "5"))))
+ADMISSION_NEGATIVE_CACHE_TTL_SECONDS = max(
+    0.0, min(3600.0, float(os.environ.get("GPU_ADMISSION_NEGATIVE_CACHE_TTL_SECONDS", "300")))
+)
+# Validator rejections of the gateway itself rather than of the claim.
+ADMISSION_VALIDATION_TRANSIENT_STATUSES = frozenset({401, 403, 408, 429})
 
 
 def bool_env(name, default=False):
@@ -64,8 +77,6 @@ LLAMA_COMMAND_FILE = os.environ.get("QWEN_LLAMA_COMMAND_FILE", "/workspace/logs/
 COORDINATOR_STATE_FILE = os.environ.get("GPU_COORDINATOR_STATE_FILE", "/workspace/logs/asset_gen_v7_lite_coordinator.json")
 COORDINATOR_EPOCH_FILE = os.environ.get("GPU_COORDINATOR_EPOCH_FILE", "/workspace/logs/asset_gen_v7_lite_coordinator.epoch")
 REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9_.:-]{1,128}$")
-GPU_LOCK = threading.Lock()
-ADMIT_SEMAPHORE = threading.BoundedSemaphore(MAX_GATEWAY_WAITERS)
 STAGE_METRICS_LOCK = threading.Lock()
 STAGE_METRICS = {
     "gatewayWaiters": 0,
@@ -91,6 +102,242 @@ REQUIRED_TOOL_CAPABILITIES = (
 )
 
 
+class SlotScheduler:
+    """First-come admission of chat requests onto llama-server ``--parallel`` slots.
+
+    Only the oldest waiter may take a free slot, so neither a burst of short
+    requests nor one long generation can starve the other. Among free slots
+    the one that last served the same prompt-cache handle wins, then the
+    least recently used one, which keeps warm KV resident as long as possible.
+    """
+
+    def __init__(self, slots, max_waiters, context_tokens=0):
+        self.slots = max(1, int(slots))
+        self.max_waiters = max(0, int(max_waiters))
+        self.context_tokens = max(0, int(context_tokens))
+        self.condition = threading.Condition()
+        self.busy = {}
+        self.handles = {}
+        self.released_at = {slot: 0.0 for slot in range(self.slots)}
+        self.waiters = []
+
+    def fits(self, estimated_tokens):
+        return self.context_tokens <= 0 or int(estimated_tokens) <= self.context_tokens
+
+    def _pick_slot_locked(self, cache_handle):
+        free = [slot for slot in range(self.slots) if slot not in self.busy]
+        if not free:
+            return None
+        if cache_handle:
+            for slot in free:
+                if self.handles.get(slot) == cache_handle:
+                    return slot
+        return min(free, key=lambda slot: self.released_at[slot])
+
+    def acquire(self, request_id, cache_handle=None, timeout=0.0):
+        """Return ``(slot, "granted")`` or ``(None, "queue_full" | "timeout" | "cancelled")``."""
+        deadline = time.monotonic() + max(0.0, float(timeout))
+        with self.condition:
+            if (self.waiters or len(self.busy) >= self.slots) and len(self.waiters) >= self.max_waiters:
+                return None, "queue_full"
+            waiter = {"requestId": request_id, "cancelled": False}
+            self.waiters.append(waiter)
+            try:
+                while True:
+                    if waiter["cancelled"]:
+                        return None, "cancelled"
+                    if self.waiters[0] is waiter:
+                        slot = self._pick_slot_locked(cache_handle)
+                        if slot is not None:
+                            self.busy[slot] = request_id
+                            return slot, "granted"
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None, "timeout"
+                    self.condition.wait(remaining)
+            finally:
+                self.waiters.remove(waiter)
+                self.condition.notify_all()
+
+    def release(self, slot, cache_handle=None):
+        with self.condition:
+            self.busy.pop(slot, None)
+            self.handles[slot] = cache_handle
+            self.released_at[slot] = time.monotonic()
+            self.condition.notify_all()
+
+    def cancel(self, request_id):
+        with self.condition:
+            matched = [waiter for waiter in self.waiters if waiter["requestId"] == request_id]
+            for waiter in matched:
+                waiter["cancelled"] = True
+            if matched:
+                self.condition.notify_all()
+            return bool(matched)
+
+    def busy_count(self):
+        with self.condition:
+            return len(self.busy)
+
+    def snapshot(self):
+        with self.condition:
+            return {"total": self.slots, "busy": len(self.busy), "waiting": len(self.waiters)}
+
+
+class SharedInferenceLease:
+    """Reference-counted GPU ownership for the requests occupying llama slots.
+
+    The first request to start acquires the coordinator lease and later ones
+    renew it. The last one to finish releases it; requests that finish while
+    others still generate are deferred and settled with that final outcome.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.lease = None
+        self.members = set()
+        self.deferred = []
+        self.releasing = False
+        self.acquiring = False
+
+    def join(self, request_id, acquire, renew=None):
+        with self.condition:
+            while self.releasing or self.acquiring:
+                self.condition.wait()
+            if self.members:
+                if renew is not None and self.lease is not None:
+                    self.lease = renew(self.lease)
+                self.members.add(request_id)
+                return self.lease
+            # The coordinator round trip runs unlocked; later joiners wait on
+            # ``acquiring`` instead of the lock, so leave() is never stalled.
+            self.acquiring = True
+        try:
+            lease = acquire()
+        except BaseException:
+            with self.condition:
+                self.acquiring = False
+                self.condition.notify_all()
+            raise
+        with self.condition:
+            self.acquiring = False
+            self.lease = lease
+            self.members.add(request_id)
+            self.condition.notify_all()
+            return lease
+
+    def leave(self, request_id):
+        """Return ``(last, lease, deferred_ids)``; a last leaver must call ``released()``."""
+        with self.condition:
+            self.members.discard(request_id)
+            if self.members:
+                self.deferred.append(request_id)
+                return False, None, []
+            deferred, self.deferred = self.deferred, []
+            lease, self.lease = self.lease, None
+            self.releasing = True
+            return True, lease, deferred
+
+    def released(self):
+        with self.condition:
+            self.releasing = False
+            self.condition.notify_all()
+
+
+class AdmissionClaimCache:
+    """Short-lived verdicts of the remote admission validator, keyed by claim id.
+
+    A verdict belongs to the ``(server_type, ticket_id, claim_id)`` claim, so
+    every chat request made under one claim shares it; the request id of the
+    lookup that missed is forwarded to the validator for its audit trail only.
+    Valid claims are trusted for ``ttl_seconds`` and revoked ones for
+    ``negative_ttl_seconds``; validator errors are never cached. Concurrent
+    lookups of one claim share a single in-flight validation, and
+    ``invalidate`` drops a claim early, including one still being validated.
+    """
+
+    def __init__(self, ttl_seconds, negative_ttl_seconds, max_entries=4096):
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+        self.negative_ttl_seconds = max(0.0, float(negative_ttl_seconds))
+        self.max_entries = max(1, int(max_entries))
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.pending = {}
+        self.metrics = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    def validate(self, server_type, ticket_id, claim_id, request_id, fetch):
+        key = (server_type, ticket_id, claim_id)
+        with self.lock:
+            entry = self.entries.get(claim_id)
+            if entry and entry["key"] == key and entry["expiresAt"] > time.monotonic():
+                self.metrics["hits"] += 1
+                return entry["valid"]
+            flight = self.pending.get(claim_id)
+            if flight is not None and flight["key"] == key:
+                self.metrics["coalesced"] += 1
+                owner = False
+            else:
+                flight = {"key": key, "done": threading.Event(), "valid": None, "error": None, "invalidated": False}
+                self.pending[claim_id] = flight
+                self.metrics["misses"] += 1
+                owner = True
+        if not owner:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["valid"]
+        try:
+            flight["valid"] = bool(fetch(*key, request_id))
+            return flight["valid"]
+        except Exception as error:
+            flight["error"] = error
+            raise
+        finally:
+            with self.lock:
+                if self.pending.get(claim_id) is flight:
+                    self.pending.pop(claim_id)
+                ttl = self.ttl_seconds if flight["valid"] else self.negative_ttl_seconds
+                if flight["error"] is None and not flight["invalidated"] and ttl > 0:
+                    self.entries[claim_id] = {"key": key, "valid": flight["valid"], "expiresAt": time.monotonic() + ttl}
+                    self._prune_locked()
+            flight["done"].set()
+
+    def _prune_locked(self):
+        if len(self.entries) <= self.max_entries:
+            return
+        now = time.monotonic()
+        for claim_id in [key for key, entry in self.entries.items() if entry["expiresAt"] <= now]:
+            self.entries.pop(claim_id, None)
+        overflow = len(self.entries) - self.max_entries
+        if overflow > 0:
+            for claim_id in sorted(self.entries, key=lambda key: self.entries[key]["expiresAt"])[:overflow]:
+                self.entries.pop(claim_id, None)
+
+    def invalidate(self, claim_id=None):
+        """Forget one claim, or every claim when ``claim_id`` is None; return how many were dropped."""
+        with self.lock:
+            if claim_id is None:
+                dropped = len(self.entries)
+                self.entries.clear()
+                flights = list(self.pending.values())
+            else:
+                dropped = 1 if self.entries.pop(claim_id, None) else 0
+                flights = [self.pending[claim_id]] if claim_id in self.pending else []
+            for flight in flights:
+                flight["invalidated"] = True
+            self.metrics["invalidations"] += dropped + len(flights)
+            return dropped + len(flights)
+
+    def snapshot(self):
+        with self.lock:
+            return {**self.metrics, "entries": len(self.entries), "inflight": len(self.pending)}
+
+
+SLOT_SCHEDULER = SlotScheduler(LLAMA_PARALLEL_SLOTS, MAX_GATEWAY_WAITERS - 1, SLOT_CONTEXT_TOKENS)
+INFERENCE_LEASE = SharedInferenceLease()
+ADMISSION_CLAIMS = AdmissionClaimCache(ADMISSION_CACHE_TTL_SECONDS, ADMISSION_NEGATIVE_CACHE_TTL_SECONDS)
+
+
 def update_stage_metric(name, delta=0, maximum_name=None):
     with STAGE_METRICS_LOCK:
         STAGE_METRICS[name] = max(0, int(STAGE_METRICS.get(name, 0)) + int(delta))
@@ -136,6 +383,10 @@ def json_response_bytes(payload):
 
 
 def validate_admission_claim(server_type, ticket_id, claim_token, request_id):
+    return ADMISSION_CLAIMS.validate(server_type, ticket_id, claim_token, request_id, fetch_admission_claim_validity)
+
+
+def fetch_admission_claim_validity(server_type, ticket_id, claim_token, request_id):
     if not ADMISSION_VALIDATION_URL:
         raise RuntimeError("GPU admission validation URL is not configured")
     status, _, body = http_request(
@@ -153,8 +404,39 @@ def validate_admission_claim(server_type, ticket_id, claim_token, request_id):
     try:
         payload = json.loads(body)
     except (TypeError, ValueError, json.JSONDecodeError):
-        payload = {}
-    return status == 200 and payload.get("valid") is True
+        payload = None
+    # Only an explicit verdict may be cached; anything else is a validator error.
+    if status == 200 and isinstance(payload, dict) and isinstance(payload.get("valid"), bool):
+        return payload["valid"]
+    # A client error about the claim itself (unknown, revoked, expired) is a
+    # verdict; auth, timeout and rate-limit rejections are validator errors.
+    if 400 <= status < 500 and status not in ADMISSION_VALIDATION_TRANSIENT_STATUSES:
+        return False
+    raise RuntimeError(f"GPU admission validation returned status {status} without a verdict")
+
+
+def estimate_request_tokens(request_payload):
+    """Rough prompt plus completion size: ~4 bytes per text token, images at their token cap."""
+    tokens = 0
+    for message in request_payload.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            tokens += len(content) // 4
+        elif isinstance(content, list):
+            for part in content:
+                if not isinstance(part, dict):
+                    continue
+                if part.get("type") == "text":
+                    tokens += len(str(part.get("text") or "")) // 4
+                else:
+                    tokens += IMAGE_TOKEN_ESTIMATE
+    if request_payload.get("tools"):
+        tokens += len(json.dumps(request_payload["tools"], separators=(",", ":"))) // 4
+    try:
+        completion = int(request_payload.get("max_completion_tokens") or request_payload.get("max_tokens") or 0)
+    except (TypeError, ValueError):
+        completion = 0
+    return tokens + max(0, completion)
 
 
 def free_comfy_models(preserve_cache=False):
@@ -204,6 +486,8 @@ def get_coordinator():
             quota_bytes=int(os.environ.get("QWEN_SNAPSHOT_QUOTA_BYTES", str(48 * 1024**3))),
             min_free_bytes=int(os.environ.get("QWEN_SNAPSHOT_MIN_FREE_BYTES", str(20 * 1024**3))),
             max_entry_bytes=int(os.environ.get("QWEN_SNAPSHOT_MAX_ENTRY_BYTES", str(16 * 1024**3))),
+            chunk_bytes=int(os.environ.get("QWEN_SNAPSHOT_CHUNK_BYTES", str(64 * 1024**2))),
+            hash_workers=int(os.environ.get("QWEN_SNAPSHOT_HASH_WORKERS", "4")),
         )
         COORDINATOR = GPUCoordinator(
             LLAMA_BASE_URL,
@@ -229,10 +513,39 @@ def get_coordinator():
             comfy_release_vram_headroom_bytes=int(
                 os.environ.get("GPU_COMFY_RELEASE_VRAM_HEADROOM_BYTES", str(512 * 1024**2))
             ),
+            parallel_slots=LLAMA_PARALLEL_SLOTS,
         )
     return COORDINATOR
 
 
+def acquire_inference_lease(request_id):
+    if COORDINATOR_MODE not in {"enforcing", "shadow"}:
+        free_comfy_models(preserve_cache=False)
+        return None
+    handoff_deadline = time.monotonic() + ADMIT_MAX_WAIT_SECONDS
+    while True:
+        try:
+            lease = get_coordinator().acquire(
+                "inference", request_id, UPSTREAM_TIMEOUT_SECONDS * 1000 + 60_000
+            )
+            break
+        except LeaseConflict:
+            if ADMISSION_MODE != "enforcing" or time.monotonic() >= handoff_deadline:
+                raise
+            time.sleep(min(0.25, max(0.01, handoff_deadline - time.monotonic())))
+    if COORDINATOR_MODE == "shadow":
+        free_comfy_models(preserve_cache=True)
+    return lease
+
+
+def renew_inference_lease(lease):
+    return get_coordinator().renew(
+        lease["fencingToken"],
+        lease["epoch"],
+        UPSTREAM_TIMEOUT_SECONDS * 1000 + 60_000,
+    )
+
+
 def prune_releases(now=None):
     now = time.time() if now is None else now
     cutoff = now - RELEASE_TTL_SECONDS
@@ -296,6 +609,7 @@ def cancel_inflight(request_id):
             CANCELLED_REQUESTS.pop(stale_id, None)
         backend = INFLIGHT.get(request_id)
         CANCELLED_REQUESTS[request_id] = time.monotonic()
+    SLOT_SCHEDULER.cancel(request_id)
     if backend is None:
         # The cancellation marker is intentionally registered even before an
         # upstream socket exists, so retries and early disconnects are
@@ -333,40 +647,63 @@ def record_safe_rejection(request_id, code):
         print(f"Failed persisting safe rejection receipt request={request_id} code={code}: {error}", flush=True)
 
 
+def settle_deferred_releases(request_ids, gpu_released=None, sleeping=False):
+    for deferred_id in request_ids:
+        if gpu_released is None:
+            set_release(deferred_id, "error", code="gpu_release_failed", request_failed=True, sleeping=False)
+        else:
+            set_release(deferred_id, "request_complete", request_complete=True, gpu_released=gpu_released, sleeping=sleeping)
+
+
 def finalize_request_release(request_id, coordinator_lease, started_at, response_ready_ms, cache_state):
     release_completed_ms = round((time.monotonic() - started_at) * 1000)
-    if COORDINATOR_MODE in {"enforcing", "shadow"}:
-        released = get_coordinator().release(
-            coordinator_lease["fencingToken"],
-            coordinator_lease["epoch"],
-            keep_warm=WARM_RESIDENCY_ENABLED,
-            reason="request_complete",
-        )
-        if COORDINATOR_MODE == "shadow" and not force_llama_sleep():
-            raise CoordinatorError("Inference backend did not sleep after request completion")
+    last, coordinator_lease, deferred = INFERENCE_LEASE.leave(request_id)
+    if not last:
+        # Other slots are still generating on the same lease; the request that
+        # finishes last settles this receipt with the real GPU outcome.
         set_release(
             request_id,
             "request_complete",
             response_ready_ms=response_ready_ms,
             release_completed_ms=release_completed_ms,
             request_complete=True,
-            gpu_released=released["gpuReleased"],
-            sleeping=not get_coordinator().llama_running() if COORDINATOR_MODE == "enforcing" else True,
+            gpu_released=False,
+            sleeping=False,
             cache=cache_state,
         )
         return
-    if not force_llama_sleep():
-        raise CoordinatorError("Inference backend did not sleep after request completion")
-    set_release(
-        request_id,
-        "request_complete",
-        response_ready_ms=response_ready_ms,
-        release_completed_ms=release_completed_ms,
-        request_complete=True,
-        gpu_released=True,
-        sleeping=True,
-        cache=cache_state,
-    )
+    settled = None
+    try:
+        if COORDINATOR_MODE in {"enforcing", "shadow"}:
+            released = get_coordinator().release(
+                coordinator_lease["fencingToken"],
+                coordinator_lease["epoch"],
+                keep_warm=WARM_RESIDENCY_ENABLED,
+                reason="request_complete",
+            )
+            if COORDINATOR_MODE == "shadow" and not force_llama_sleep():
+                raise CoordinatorError("Inference backend did not sleep after request completion")
+            settled = (
+                released["gpuReleased"],
+                not get_coordinator().llama_running() if COORDINATOR_MODE == "enforcing" else True,
+            )
+        else:
+            if not force_llama_sleep():
+                raise CoordinatorError("Inference backend did not sleep after request completion")
+            settled = (True, True)
+        set_release(
+            request_id,
+            "request_complete",
+            response_ready_ms=response_ready_ms,
+            release_completed_ms=release_completed_ms,
+            request_complete=True,
+            gpu_released=settled[0],
+            sleeping=settled[1],
+            cache=cache_state,
+        )
+    finally:
+        INFERENCE_LEASE.released()
+        settle_deferred_releases(deferred, *(settled or (None,)))
 
 
 def health_payload():
@@ -385,7 +722,7 @@ def health_payload():
     capabilities = props.get("chat_template_caps", {}) if isinstance(props, dict) else {}
     statuses["tool_calling"] = all(capabilities.get(name) is True for name in REQUIRED_TOOL_CAPABILITIES)
     statuses["sleeping"] = bool(props and (props.get("is_sleeping") or props.get("sleeping")))
-    statuses["gpu_busy"] = GPU_LOCK.locked()
+    statuses["gpu_busy"] = SLOT_SCHEDULER.busy_count() > 0
     coordinator = get_coordinator()
     coordinator_status = coordinator.quick_status()
     inference_readiness = coordinator.inference_readiness()
@@ -407,6 +744,8 @@ def health_payload():
         "mode": ADMISSION_MODE,
         "maxWaitSeconds": ADMIT_MAX_WAIT_SECONDS,
         "maxWaiters": MAX_GATEWAY_WAITERS,
+        "slots": SLOT_SCHEDULER.snapshot(),
+        "claimCache": ADMISSION_CLAIMS.snapshot(),
     }
     statuses["concurrency"] = stage_metrics_snapshot()
     if statuses["llama"]:
@@ -474,10 +813,10 @@ def cache_metadata_from_response(response_payload):
     }
 
 
-def record_cache_observation(cache_handle, cache_state, response_payload):
+def record_cache_observation(cache_handle, cache_state, response_payload, slot=0):
     metadata = cache_metadata_from_response(response_payload)
     metadata["classification"] = cache_state.get("classification")
-    result = get_coordinator().mark_cache_dirty(cache_handle, metadata) or {}
+    result = get_coordinator().mark_cache_dirty(cache_handle, metadata, slot=slot) or {}
     if result.get("restoreIneffective"):
         cache_state.update({
             "classification": "cold",
@@ -538,6 +877,15 @@ def redact_unkeyed_stream_chunk(parse_buffer, chunk):
     return parse_buffer, bytes(output)
 
 
+def invalidate_admission_claims(payload):
+    if payload.get("all") is True:
+        return {"invalidated": ADMISSION_CLAIMS.invalidate()}
+    claim_id = str(payload.get("claimId") or "").strip()
+    if not REQUEST_ID_RE.fullmatch(claim_id):
+        raise ValueError("claimId or all=true is required")
+    return {"invalidated": ADMISSION_CLAIMS.invalidate(claim_id)}
+
+
 class JsonHandler(BaseHTTPRequestHandler):
     def log_message(self, fmt, *args):
         print(f"{self.log_date_time_string()} {self.client_address[0]} {fmt % args}", flush=True)
@@ -584,7 +932,7 @@ class CoordinatorHandler(JsonHandler):
             lease_state = str(local_lease.get("state") or "") if isinstance(local_lease, dict) else ""
             diagnostics_busy = coordinator_status.get("diagnosticsBusy") is True
             safe_to_clear = (
-                not GPU_LOCK.locked()
+                SLOT_SCHEDULER.busy_count() == 0
                 and not diagnostics_busy
                 and (not isinstance(local_lease, dict) or lease_state == "WARM")
             )
@@ -614,6 +962,9 @@ class CoordinatorHandler(JsonHandler):
             if self.path == "/v1/gpu/drain":
                 self.send_json(200, coordinator.begin_drain())
                 return
+            if self.path == "/v1/gpu/admission-claims/invalidate":
+                self.send_json(200, invalidate_admission_claims(payload))
+                return
             if self.path == "/v1/gpu/leases/acquire":
                 admission_claim_id = str(payload.get("admissionClaimId") or "").strip()
                 admission_ticket_id = str(payload.get("admissionTicketId") or "").strip()
@@ -726,7 +1077,7 @@ class Handler(JsonHandler):
             lease_state = str(local_lease.get("state") or "") if isinstance(local_lease, dict) else ""
             diagnostics_busy = coordinator_status.get("diagnosticsBusy") is True
             safe_to_clear = (
-                not GPU_LOCK.locked()
+                SLOT_SCHEDULER.busy_count() == 0
                 and not diagnostics_busy
                 and (not isinstance(local_lease, dict) or lease_state == "WARM")
             )
@@ -753,8 +1104,7 @@ class Handler(JsonHandler):
             with INFLIGHT_LOCK:
                 inflight = len(INFLIGHT)
             self.send_json(200, {
-                "total": 1,
-                "busy": 1 if GPU_LOCK.locked() else 0,
+                **SLOT_SCHEDULER.snapshot(),
                 "inflight": inflight,
                 "admissionMode": ADMISSION_MODE,
             })
@@ -771,11 +1121,17 @@ class Handler(JsonHandler):
             self.send_json(502, {"error": {"message": "Inference backend unavailable.", "code": "backend_unavailable", "detail": str(error)}})
 
     def do_POST(self):
-        if self.path not in {"/v1/chat/completions", "/v1/cancel"}:
+        if self.path not in {"/v1/chat/completions", "/v1/cancel", "/v1/gpu/admission-claims/invalidate"}:
             self.send_json(404, {"error": {"message": "Not found", "code": "not_found"}})
             return
         if not self.authorized():
             return
+        if self.path == "/v1/gpu/admission-claims/invalidate":
+            try:
+                self.send_json(200, invalidate_admission_claims(self.read_json()))
+            except (ValueError, json.JSONDecodeError) as error:
+                self.send_json(400, {"error": {"message": str(error), "code": "invalid_request"}})
+            return
         if self.path == "/v1/cancel":
             try:
                 payload = self.read_json()
@@ -840,56 +1196,58 @@ class Handler(JsonHandler):
                 record_safe_rejection(request_id, "admission_claim_revoked")
                 self.send_json(409, {"error": {"message": "The admission claim is no longer current.", "code": "admission_claim_revoked"}})
                 return
-        if not ADMIT_SEMAPHORE.acquire(blocking=False):
-            status = 503 if ADMISSION_MODE == "enforcing" else 429
-            code = "gpu_handoff_failed" if ADMISSION_MODE == "enforcing" else "queue_full"
-            record_safe_rejection(request_id, code)
-            self.send_json(status, {"error": {"message": "The bounded gateway handoff is unavailable.", "code": code}}, headers={"Retry-After": "1"})
+        if not SLOT_SCHEDULER.fits(estimate_request_tokens(request_payload)):
+            record_safe_rejection(request_id, "slot_context_exceeded")
+            self.send_json(413, {"error": {"message": "The request does not fit one inference slot's context.", "code": "slot_context_exceeded"}})
             return
         update_stage_metric("gatewayWaiters", 1, "gatewayWaitersMax")
-        lock_wait = ADMIT_MAX_WAIT_SECONDS if ADMISSION_MODE == "enforcing" else 0
-        if not GPU_LOCK.acquire(timeout=lock_wait):
-            update_stage_metric("gatewayWaiters", -1)
-            ADMIT_SEMAPHORE.release()
+        slot_wait = ADMIT_MAX_WAIT_SECONDS if ADMISSION_MODE == "enforcing" else 0
+        slot, outcome = SLOT_SCHEDULER.acquire(request_id, cache_handle, timeout=slot_wait)
+        update_stage_metric("gatewayWaiters", -1)
+        if slot is None:
+            if outcome == "cancelled":
+                clear_cancelled(request_id)
+                record_safe_rejection(request_id, "client_disconnected")
+                self.send_json(409, {"error": {"message": "The request was cancelled while queued.", "code": "client_disconnected"}})
+                return
             status = 503 if ADMISSION_MODE == "enforcing" else 429
-            code = "gpu_handoff_failed" if ADMISSION_MODE == "enforcing" else "queue_timeout"
+            if ADMISSION_MODE == "enforcing":
+                code = "gpu_handoff_failed"
+            else:
+                code = "queue_full" if outcome == "queue_full" else "queue_timeout"
+            if outcome == "queue_full":
+                message = "The bounded gateway handoff is unavailable."
+            else:
+                message = "The gateway handoff wait expired."
             record_safe_rejection(request_id, code)
-            self.send_json(status, {"error": {"message": "The gateway handoff wait expired.", "code": code}}, headers={"Retry-After": "1"})
+            self.send_json(status, {"error": {"message": message, "code": code}}, headers={"Retry-After": "1"})
             return
-        update_stage_metric("gatewayWaiters", -1)
         update_stage_metric("gpuExecutions", 1, "gpuExecutionsMax")
         update_stage_metric("gpuExecutionsStarted", 1)
         response_sent = False
         started_at = time.monotonic()
         coordinator_lease = None
+        lease_joined = False
         release_finalized = False
         cache_state = {"classification": "unkeyed", "restored": False}
-        set_release(request_id, "preparing", started_at=time.time())
+        set_release(request_id, "preparing", started_at=time.time(), slot=slot)
         try:
-            if COORDINATOR_MODE in {"enforcing", "shadow"}:
-                handoff_deadline = time.monotonic() + ADMIT_MAX_WAIT_SECONDS
-                while True:
-                    try:
-                        coordinator_lease = get_coordinator().acquire(
-                            "inference", request_id, UPSTREAM_TIMEOUT_SECONDS * 1000 + 60_000
-                        )
-                        break
-                    except LeaseConflict:
-                        if ADMISSION_MODE != "enforcing" or time.monotonic() >= handoff_deadline:
-                            raise
-                        time.sleep(min(0.25, max(0.01, handoff_deadline - time.monotonic())))
-                if COORDINATOR_MODE == "enforcing":
-                    cache_state = get_coordinator().prepare_cache(cache_handle)
-                    request_payload["id_slot"] = 0
-                    request_payload["cache_prompt"] = True
-                    if cache_handle and request_payload.get("stream") is True:
-                        stream_options = request_payload.setdefault("stream_options", {})
-                        if isinstance(stream_options, dict):
-                            stream_options["include_usage"] = True
-                else:
-                    free_comfy_models(preserve_cache=True)
-            else:
-                free_comfy_models(preserve_cache=False)
+            coordinator_lease = INFERENCE_LEASE.join(
+                request_id,
+                lambda: acquire_inference_lease(request_id),
+                renew=renew_inference_lease if COORDINATOR_MODE in {"enforcing", "shadow"} else None,
+            )
+            lease_joined = True
+            if COORDINATOR_MODE == "enforcing":
+                cache_state = get_coordinator().prepare_cache(cache_handle, slot=slot)
+                request_payload["id_slot"] = slot
+                request_payload["cache_prompt"] = True
+                if cache_handle and request_payload.get("stream") is True:
+                    stream_options = request_payload.setdefault("stream_options", {})
+                    if isinstance(stream_options, dict):
+                        stream_options["include_usage"] = True
+            elif LLAMA_PARALLEL_SLOTS > 1:
+                request_payload["id_slot"] = slot
             set_release(request_id, "inference")
             if request_payload.get("stream") is True:
                 backend = open_http_response(
@@ -941,7 +1299,7 @@ class Handler(JsonHandler):
                 response_ready_ms = round((time.monotonic() - started_at) * 1000)
                 set_release(request_id, "draining", response_ready_ms=response_ready_ms)
                 if cache_handle and 200 <= status < 300 and COORDINATOR_MODE == "enforcing":
-                    record_cache_observation(cache_handle, cache_state, stream_observation)
+                    record_cache_observation(cache_handle, cache_state, stream_observation, slot=slot)
             else:
                 backend = open_http_response(
                     f"{LLAMA_BASE_URL}/v1/chat/completions",
@@ -973,7 +1331,8 @@ class Handler(JsonHandler):
                         response_body = json_response_bytes(response_payload)
                 if cache_handle and 200 <= status < 300 and COORDINATOR_MODE == "enforcing":
                     response_payload = response_payload if isinstance(response_payload, dict) else {}
-                    record_cache_observation(cache_handle, cache_state, response_payload)
+                    record_cache_observation(cache_handle, cache_state, response_payload, slot=slot)
+                lease_joined = False
                 finalize_request_release(
                     request_id,
                     coordinator_lease,
@@ -991,6 +1350,7 @@ class Handler(JsonHandler):
                 )
                 response_sent = True
             if not release_finalized:
+                lease_joined = False
                 finalize_request_release(
                     request_id,
                     coordinator_lease,
@@ -1006,33 +1366,54 @@ class Handler(JsonHandler):
             if not response_sent:
                 self.send_json(503, {"error": {"message": str(error), "code": code}}, headers={"Retry-After": "5"})
         except Exception as error:
+            if release_finalized:
+                # Only the response write follows finalisation: the lease is
+                # already released and the receipt settled, and the partial
+                # response cannot be replaced with an error body.
+                return
             if request_was_cancelled(request_id) or isinstance(error, (BrokenPipeError, ConnectionResetError)):
                 code = "client_disconnected"
             elif isinstance(error, CoordinatorError):
                 code = "gpu_handoff_failed"
             else:
                 code = "gateway_failure"
-            if coordinator_lease and COORDINATOR_MODE in {"enforcing", "shadow"}:
+            last, deferred = True, []
+            if lease_joined:
+                last, coordinator_lease, deferred = INFERENCE_LEASE.leave(request_id)
+            if not last:
+                # Another slot still holds the shared lease and will settle
+                # this receipt when it releases the GPU.
+                set_release(request_id, "request_complete", code=code, request_failed=True, request_complete=True, gpu_released=False, sleeping=False)
+            else:
+                settled = None
                 try:
-                    released = get_coordinator().release(
-                        coordinator_lease["fencingToken"],
-                        coordinator_lease["epoch"],
-                        keep_warm=code == "client_disconnected" and WARM_RESIDENCY_ENABLED,
-                        reason=code,
-                    )
-                    slept = True if COORDINATOR_MODE == "enforcing" else force_llama_sleep()
-                    if slept:
-                        set_release(request_id, "request_complete", code=code, request_failed=True, request_complete=True, gpu_released=released["gpuReleased"], sleeping=COORDINATOR_MODE == "shadow")
+                    if coordinator_lease and COORDINATOR_MODE in {"enforcing", "shadow"}:
+                        try:
+                            released = get_coordinator().release(
+                                coordinator_lease["fencingToken"],
+                                coordinator_lease["epoch"],
+                                keep_warm=code == "client_disconnected" and WARM_RESIDENCY_ENABLED,
+                                reason=code,
+                            )
+                            slept = True if COORDINATOR_MODE == "enforcing" else force_llama_sleep()
+                            if slept:
+                                settled = (released["gpuReleased"], COORDINATOR_MODE == "shadow")
+                                set_release(request_id, "request_complete", code=code, request_failed=True, request_complete=True, gpu_released=released["gpuReleased"], sleeping=COORDINATOR_MODE == "shadow")
+                            else:
+                                set_release(request_id, "error", code="gpu_release_failed", request_failed=True, sleeping=False)
+                        except Exception:
+                            set_release(request_id, "error", code="gpu_release_failed", request_failed=True)
                     else:
-                        set_release(request_id, "error", code="gpu_release_failed", request_failed=True, sleeping=False)
-                except Exception:
-                    set_release(request_id, "error", code="gpu_release_failed", request_failed=True)
-            else:
-                slept = force_llama_sleep()
-                if slept:
-                    set_release(request_id, "request_complete", code=code, request_failed=True, request_complete=True, sleeping=True, gpu_released=True)
-                else:
-                    set_release(request_id, "error", code="gpu_release_failed", request_failed=True, sleeping=False)
+                        slept = force_llama_sleep()
+                        if slept:
+                            settled = (True, True)
+                            set_release(request_id, "request_complete", code=code, request_failed=True, request_complete=True, sleeping=True, gpu_released=True)
+                        else:
+                            set_release(request_id, "error", code="gpu_release_failed", request_failed=True, sleeping=False)
+                finally:
+                    if lease_joined:
+                        INFERENCE_LEASE.released()
+                    settle_deferred_releases(deferred, *(settled or (None,)))
             if not response_sent:
                 status = 503 if code == "gpu_handoff_failed" else 502
                 message = "GPU handoff failed." if code == "gpu_handoff_failed" else "Inference gateway failure."
@@ -1042,8 +1423,8 @@ class Handler(JsonHandler):
             clear_cancelled(request_id)
             update_stage_metric("gpuExecutions", -1)
             update_stage_metric("gpuExecutionsCompleted", 1)
-            GPU_LOCK.release()
-            ADMIT_SEMAPHORE.release()
+            keyed = cache_state.get("classification") in {"resident", "restored", "cold"}
+            SLOT_SCHEDULER.release(slot, cache_handle if keyed else None)
 
 
 def main():
@@ -24,6 +24,14 @@ GATEWAY_SCRIPT="${WORKSPACE}/asset_gen_v7_lite_gateway.py"
 SNAPSHOT_PATH="${QWEN_SNAPSHOT_PATH:-${WORKSPACE}/cache/qwen-slots}"
 GPU_COORDINATOR_MODE="${GPU_COORDINATOR_MODE:-shadow}"
 GPU_ADMISSION_MODE="${GPU_ADMISSION_MODE:-off}"
+LLAMA_CTX_SIZE="131072"
+# Concurrent llama slots. Each slot gets LLAMA_CTX_SIZE / QWEN_LLAMA_PARALLEL
+# tokens of KV, and the gateway schedules chat requests onto them.
+QWEN_LLAMA_PARALLEL="${QWEN_LLAMA_PARALLEL:-1}"
+if [[ ! "${QWEN_LLAMA_PARALLEL}" =~ ^[1-9][0-9]*$ ]] || (( QWEN_LLAMA_PARALLEL > 16 )); then
+    echo "ERROR: QWEN_LLAMA_PARALLEL must be an integer between 1 and 16." >&2
+    exit 1
+fi
 
 mkdir -p "${LOG_DIR}" "$(dirname "${MODEL_PATH}")" "${WORKSPACE}/src" "${SNAPSHOT_PATH}"
 chmod 700 "${SNAPSHOT_PATH}"
@@ -385,10 +393,10 @@ launch() {
         --model "${MODEL_PATH}" \
         --mmproj "${VISION_PATH}" \
         --alias "${MODEL_ALIAS}" \
-        --ctx-size 131072 \
+        --ctx-size "${LLAMA_CTX_SIZE}" \
         --batch-size 2048 \
         --ubatch-size 512 \
-        --parallel 1 \
+        --parallel "${QWEN_LLAMA_PARALLEL}" \
         --n-gpu-layers 999 \
         --load-mode mmap \
         --image-max-tokens 4096 \
@@ -432,6 +440,8 @@ launch() {
         GPU_ADMISSION_MODE="${GPU_ADMISSION_MODE}" \
         QWEN_ADMIT_MAX_WAIT_SECONDS="${QWEN_ADMIT_MAX_WAIT_SECONDS:-10}" \
         QWEN_MAX_WAITERS="${QWEN_MAX_WAITERS:-4}" \
+        QWEN_LLAMA_PARALLEL="${QWEN_LLAMA_PARALLEL}" \
+        QWEN_SLOT_CONTEXT_TOKENS="$((LLAMA_CTX_SIZE / QWEN_LLAMA_PARALLEL))" \
         GPU_COORDINATOR_STATE_FILE="${GPU_COORDINATOR_STATE_FILE:-${LOG_DIR}/asset_gen_v7_lite_coordinator.json}" \
         GPU_COORDINATOR_EPOCH_FILE="${GPU_COORDINATOR_EPOCH_FILE:-${LOG_DIR}/asset_gen_v7_lite_coordinator.epoch}" \
         GPU_MINING_GRACE_SECONDS="${GPU_MINING_GRACE_SECONDS:-30}" \
@@ -446,7 +456,9 @@ launch() {
         QWEN_SNAPSHOT_QUOTA_BYTES="${QWEN_SNAPSHOT_QUOTA_BYTES:-51539607552}" \
         QWEN_SNAPSHOT_MIN_FREE_BYTES="${QWEN_SNAPSHOT_MIN_FREE_BYTES:-21474836480}" \
         QWEN_SNAPSHOT_MAX_ENTRY_BYTES="${QWEN_SNAPSHOT_MAX_ENTRY_BYTES:-17179869184}" \
-        QWEN_SNAPSHOT_FINGERPRINT="${QWEN_SNAPSHOT_FINGERPRINT:-fmt=llama-slot-v1:model=${MODEL_SHA256}:mmproj=${VISION_SHA256}:llama=${LLAMA_CPP_COMMIT}:tokenizer=model-embedded:chat=jinja-model-embedded:quant=q5_k_m:ctx=131072:slots=1:kvk=q8_0:kvv=q8_0:ngl=999:load=mmap:rope=model-default:yarn=model-default:flash=on:batch=2048:ubatch=512:cont=on:image-max=4096:mtmd-batch=4096:spec=mtp1:reasoning=deepseek:layout=v1}" \
+        QWEN_SNAPSHOT_CHUNK_BYTES="${QWEN_SNAPSHOT_CHUNK_BYTES:-67108864}" \
+        QWEN_SNAPSHOT_HASH_WORKERS="${QWEN_SNAPSHOT_HASH_WORKERS:-4}" \
+        QWEN_SNAPSHOT_FINGERPRINT="${QWEN_SNAPSHOT_FINGERPRINT:-fmt=llama-slot-v1:model=${MODEL_SHA256}:mmproj=${VISION_SHA256}:llama=${LLAMA_CPP_COMMIT}:tokenizer=model-embedded:chat=jinja-model-embedded:quant=q5_k_m:ctx=${LLAMA_CTX_SIZE}:slots=${QWEN_LLAMA_PARALLEL}:kvk=q8_0:kvv=q8_0:ngl=999:load=mmap:rope=model-default:yarn=model-default:flash=on:batch=2048:ubatch=512:cont=on:image-max=4096:mtmd-batch=4096:spec=mtp1:reasoning=deepseek:layout=v1}" \
         QWEN_PREFILL_ESTIMATE_MS_PER_TOKEN="${QWEN_PREFILL_ESTIMATE_MS_PER_TOKEN:-0.5}" \
         QWEN_LLAMA_PID_FILE="${LOG_DIR}/asset_gen_v7_lite_llama.pid" \
         QWEN_LLAMA_LOG_FILE="${LOG_DIR}/asset_gen_v7_lite_llama.log" \
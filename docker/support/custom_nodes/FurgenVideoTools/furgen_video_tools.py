@@ -1,9 +1,17 @@
 import json
 import hashlib
+import logging
 import math
 import os
+import queue
 import re
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import folder_paths
@@ -20,9 +28,26 @@ FCS_SEAM_REPAIR_BLEND2_AFTER_TRIM = "blend2_after_trim"
 FCS_SEAM_REPAIR_BLEND2_AFTER_CONCAT = "blend2_after_concat"
 
 
+logger = logging.getLogger(__name__)
+
 RGB_LUMA_WEIGHTS = (0.2126, 0.7152, 0.0722)
 V2_FRAME_CHUNK_SIZE = 2
 V2_STAT_SAMPLE_PIXELS = 65536
+V2_STAT_CHUNK_FRAMES = max(1, int(os.environ.get("FURGEN_STAT_CHUNK_FRAMES", "16")))
+V2_MAX_FRAME_CHUNK_SIZE = 64
+V2_CHUNK_MEMORY_FRACTION = 0.25
+STABILIZE_WORKERS = max(1, int(os.environ.get("FURGEN_STABILIZE_WORKERS", str(min(8, os.cpu_count() or 1)))))
+RAW_FRAME_QUEUE_DEPTH = 2
+TRANSLATION_CHUNK_ELEMENTS = 1 << 18
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.environ.get("FURGEN_ANALYSIS_CACHE_MAX_ENTRIES", "64"))
+ANALYSIS_REMOTE_VALIDATOR_TIMEOUT_SECONDS = float(os.environ.get("FURGEN_ANALYSIS_REMOTE_VALIDATOR_TIMEOUT_SECONDS", "10"))
+ANALYSIS_CACHE_FILES = {"proxy": "proxy.mp4", "storyboard": "storyboard.webp", "analysis": "analysis.json"}
+PROBE_WORKERS = max(1, int(os.environ.get("FURGEN_PROBE_WORKERS", "8")))
+PROBE_CACHE_MAX_ENTRIES = int(os.environ.get("FURGEN_PROBE_CACHE_MAX_ENTRIES", "256"))
+PROBE_FRAME_COUNT_TOLERANCE = 0.01
+
+_probe_cache: dict = {}
+_probe_cache_lock = threading.Lock()
 
 
 def _is_url(value: str) -> bool:
@@ -50,7 +75,48 @@ def _parse_video_entries(video_entries: str) -> list[str]:
     return entries
 
 
+def _probe_cache_key(kind: str, path: str):
+    if _is_url(path):
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (kind, os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _cached_probe(kind: str, path: str, probe):
+    """Return ``probe(path)`` memoised by (path, size, mtime); URLs are never cached."""
+    key = _probe_cache_key(kind, path)
+    if key is not None:
+        with _probe_cache_lock:
+            cached = _probe_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+    result = probe(path)
+    if key is not None and PROBE_CACHE_MAX_ENTRIES > 0:
+        with _probe_cache_lock:
+            _probe_cache[key] = dict(result)
+            while len(_probe_cache) > PROBE_CACHE_MAX_ENTRIES:
+                _probe_cache.pop(next(iter(_probe_cache)))
+    return result
+
+
+def _probe_videos(paths: list[str], probe=None) -> list[dict]:
+    """Probe every input concurrently, returning results in input order."""
+    probe = probe or _probe_video
+    paths = list(paths)
+    if len(paths) <= 1 or PROBE_WORKERS <= 1:
+        return [probe(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(paths))) as executor:
+        return list(executor.map(probe, paths))
+
+
 def _probe_video(path: str) -> dict:
+    return _cached_probe("video", path, _probe_video_uncached)
+
+
+def _probe_video_uncached(path: str) -> dict:
     cmd = [
         FFPROBE_BIN,
         "-v",
@@ -99,18 +165,51 @@ def _fraction(value) -> float:
     return float(text)
 
 
-def _probe_video_details(path: str) -> dict:
+def _run_ffprobe_json(path: str, count_frames: bool = False) -> dict:
     cmd = [
         FFPROBE_BIN,
         "-v", "error",
         "-print_format", "json",
-        "-count_frames",
+        *(["-count_frames"] if count_frames else []),
         "-show_streams",
         "-show_format",
         path,
     ]
     proc = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    payload = json.loads(proc.stdout or "{}")
+    return json.loads(proc.stdout or "{}")
+
+
+def _container_frame_count_trusted(video: dict, format_info: dict) -> bool:
+    """Whether the header ``nb_frames`` agrees with duration x frame rate."""
+    try:
+        frames = int(video.get("nb_frames") or 0)
+    except (TypeError, ValueError):
+        return False
+    frame_rate = _fraction(video.get("avg_frame_rate") or video.get("r_frame_rate"))
+    try:
+        duration = float(video.get("duration") or format_info.get("duration") or 0.0)
+    except (TypeError, ValueError):
+        return False
+    if frames <= 0 or frame_rate <= 0 or duration <= 0:
+        return False
+    expected = duration * frame_rate
+    return abs(frames - expected) <= max(1.0, expected * PROBE_FRAME_COUNT_TOLERANCE)
+
+
+def _probe_video_details(path: str, count_frames: bool = True) -> dict:
+    kind = "details-counted" if count_frames else "details"
+    return _cached_probe(kind, path, lambda value: _probe_video_details_uncached(value, count_frames))
+
+
+def _probe_video_details_uncached(path: str, count_frames: bool = True) -> dict:
+    # Header metadata first; only fall back to a decoding -count_frames pass
+    # when the container's frame count is missing or disagrees with its timing.
+    payload = _run_ffprobe_json(path)
+    if count_frames:
+        streams = payload.get("streams") or []
+        video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+        if video and not _container_frame_count_trusted(video, payload.get("format") or {}):
+            payload = _run_ffprobe_json(path, count_frames=True)
     streams = payload.get("streams") or []
     format_info = payload.get("format") or {}
     video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
@@ -165,17 +264,108 @@ def _read_exact(pipe, size: int) -> bytes:
     return b"".join(chunks)
 
 
+def _blend_rgb24_frames(source: bytes, frames: list[bytes], source_weights: list[float]) -> list[bytes]:
+    """Blend each raw rgb24 frame toward ``source`` by its paired weight.
+
+    The whole seam batch is one float64 numpy expression, evaluated in the
+    same order as the former per-byte loop so output bytes are unchanged.
+    """
+    if not frames:
+        return []
+    if not source or any(len(frame) != len(source) for frame in frames):
+        return list(frames)
+    weights = np.clip(np.asarray(source_weights[: len(frames)], dtype=np.float64), 0.0, 1.0)[:, None]
+    stacked = np.frombuffer(b"".join(frames), dtype=np.uint8).reshape(len(frames), len(source))
+    blended = np.frombuffer(source, dtype=np.uint8)[None, :] * weights
+    blended += stacked * (1.0 - weights)
+    blended += 0.5
+    np.clip(blended, 0.0, 255.0, out=blended)
+    return [row.tobytes() for row in blended.astype(np.uint8)]
+
+
 def _blend_rgb24_frame(source: bytes, frame: bytes, source_weight: float) -> bytes:
-    if not source or len(source) != len(frame):
-        return frame
-    source_weight = max(0.0, min(1.0, float(source_weight)))
-    frame_weight = 1.0 - source_weight
-    out = bytearray(len(frame))
-    src_view = memoryview(source)
-    frame_view = memoryview(frame)
-    for idx in range(len(frame)):
-        out[idx] = min(255, max(0, int(src_view[idx] * source_weight + frame_view[idx] * frame_weight + 0.5)))
-    return bytes(out)
+    return _blend_rgb24_frames(source, [frame], [source_weight])[0]
+
+
+class _RawFrameReader:
+    """Read fixed-size raw frames from a pipe on a thread, a few frames ahead."""
+
+    def __init__(self, pipe, frame_size: int, depth: int = RAW_FRAME_QUEUE_DEPTH):
+        self._pipe = pipe
+        self._frame_size = int(frame_size)
+        self._frames = queue.Queue(maxsize=max(1, int(depth)))
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="furgen-raw-frame-reader", daemon=True)
+        self._thread.start()
+
+    def _put(self, item) -> bool:
+        while not self._stopped.is_set():
+            try:
+                self._frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                frame = _read_exact(self._pipe, self._frame_size)
+                if not frame:
+                    break
+                if not self._put(frame):
+                    return
+        except BaseException as exc:
+            self._put(exc)
+            return
+        self._put(None)
+
+    def __iter__(self):
+        while True:
+            item = self._frames.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join(timeout=5)
+
+
+class _RawFrameWriter:
+    """Write raw frames to an encoder pipe on a thread, a few frames behind."""
+
+    def __init__(self, pipe, depth: int = RAW_FRAME_QUEUE_DEPTH):
+        self._pipe = pipe
+        self._frames = queue.Queue(maxsize=max(1, int(depth)))
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="furgen-raw-frame-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            frame = self._frames.get()
+            if frame is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._pipe.write(frame)
+            except BaseException as exc:
+                self._error = exc
+
+    def write(self, frame: bytes):
+        if self._error is not None:
+            raise self._error
+        self._frames.put(frame)
+
+    def close(self):
+        self._frames.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
 
 
 class FCSConcatVideos:
@@ -247,7 +437,7 @@ class FCSConcatVideos:
         seam_repair_source_weights="0.35,0.15",
     ):
         entries = _parse_video_entries(video_entries)
-        probes = [_probe_video(entry) for entry in entries]
+        probes = _probe_videos(entries)
         base_width = probes[0]["width"] or 1920
         base_height = probes[0]["height"] or 1088
         overlap_frames = max(0, int(overlap_frames or 0))
@@ -484,6 +674,10 @@ class FCSConcatVideos:
         ]
         encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
         assert encoder.stdin is not None
+        # Decode, blend and encode overlap: a reader thread keeps the next
+        # frames buffered and a writer thread drains into the encoder while
+        # the seam batch is blended here.
+        writer = _RawFrameWriter(encoder.stdin)
         previous_last_frame = None
         try:
             for idx, probe in enumerate(probes):
@@ -520,19 +714,32 @@ class FCSConcatVideos:
                 ]
                 decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
                 assert decoder.stdout is not None
-                frame_index = 0
+                seam_frame_count = len(source_weights) if previous_last_frame is not None else 0
+                seam_frames = []
                 current_last_frame = None
-                while True:
-                    frame = _read_exact(decoder.stdout, frame_size)
-                    if not frame:
-                        break
-                    if len(frame) != frame_size:
-                        raise ValueError("short raw frame while concatenating videos")
-                    if previous_last_frame is not None and frame_index < len(source_weights):
-                        frame = _blend_rgb24_frame(previous_last_frame, frame, source_weights[frame_index])
-                    encoder.stdin.write(frame)
-                    current_last_frame = frame
-                    frame_index += 1
+                reader = _RawFrameReader(decoder.stdout, frame_size)
+                try:
+                    for frame in reader:
+                        if len(frame) != frame_size:
+                            raise ValueError("short raw frame while concatenating videos")
+                        if len(seam_frames) < seam_frame_count:
+                            seam_frames.append(frame)
+                            if len(seam_frames) < seam_frame_count:
+                                continue
+                            frames = _blend_rgb24_frames(previous_last_frame, seam_frames, source_weights)
+                            seam_frame_count = 0
+                        else:
+                            frames = [frame]
+                        for output_frame in frames:
+                            writer.write(output_frame)
+                        current_last_frame = frames[-1]
+                    if seam_frame_count and seam_frames:
+                        frames = _blend_rgb24_frames(previous_last_frame, seam_frames, source_weights)
+                        for output_frame in frames:
+                            writer.write(output_frame)
+                        current_last_frame = frames[-1]
+                finally:
+                    reader.close()
                 decoder_rc = decoder.wait()
                 stderr = decoder.stderr.read().decode("utf-8", errors="replace") if decoder.stderr else ""
                 if decoder_rc != 0:
@@ -540,6 +747,16 @@ class FCSConcatVideos:
                 if current_last_frame is None:
                     raise ValueError(f"clip {idx + 1} produced no frames after trim")
                 previous_last_frame = current_last_frame
+        except BaseException:
+            # A dead encoder usually fails the writer too; keep the decode or
+            # blend error that got us here rather than the follow-on pipe error.
+            try:
+                writer.close()
+            except Exception as close_error:
+                logger.warning("seam-repair frame writer failed while unwinding: %s", close_error)
+            raise
+        else:
+            writer.close()
         finally:
             try:
                 encoder.stdin.close()
@@ -722,6 +939,46 @@ def _chunked_frame_ranges(images: torch.Tensor, chunk_size=None):
         yield start, min(batch, start + step)
 
 
+def _available_memory_bytes(device: torch.device):
+    if device.type == "cuda":
+        try:
+            free, _total = torch.cuda.mem_get_info(device)
+            return int(free)
+        except Exception:
+            return None
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return int(os.sysconf("SC_AVPHYS_PAGES")) * int(os.sysconf("SC_PAGE_SIZE"))
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _planned_chunk_size(images: torch.Tensor, working_copies: int, halo: int = 0) -> int:
+    """Frames per chunk that fit a share of free RAM/VRAM at this resolution.
+
+    ``working_copies`` is how many frame-sized temporaries the caller holds
+    per chunk frame; ``halo`` frames on each side are reserved for temporal
+    neighbours.  FURGEN_FRAME_CHUNK_SIZE pins the size, and an unknown memory
+    budget falls back to ``V2_FRAME_CHUNK_SIZE``.
+    """
+    batch = max(1, int(images.shape[0]))
+    override = os.environ.get("FURGEN_FRAME_CHUNK_SIZE", "").strip()
+    if override:
+        return max(1, min(batch, int(override)))
+    available = _available_memory_bytes(images.device)
+    if not available:
+        return min(batch, V2_FRAME_CHUNK_SIZE)
+    frame_bytes = max(1, int(images[0].numel()) * images.element_size() * max(1, int(working_copies)))
+    fitting = int(available * V2_CHUNK_MEMORY_FRACTION // frame_bytes) - 2 * max(0, int(halo))
+    return max(1, min(batch, V2_MAX_FRAME_CHUNK_SIZE, fitting))
+
+
 def _sample_pixels_channel_last(values: torch.Tensor, max_pixels=None) -> torch.Tensor:
     flat = values.reshape(-1, values.shape[-1])
     if max_pixels is None:
@@ -740,14 +997,29 @@ def _mean_std_stats_single(values: torch.Tensor, max_pixels=None) -> tuple[torch
     return mean, std
 
 
-def _mean_std_stats_frames(values: torch.Tensor, max_pixels=None) -> tuple[torch.Tensor, torch.Tensor]:
-    means = []
-    stds = []
-    for index in range(values.shape[0]):
-        mean, std = _mean_std_stats_single(values[index : index + 1], max_pixels=max_pixels)
-        means.append(mean)
-        stds.append(std)
-    return torch.cat(means, dim=0), torch.cat(stds, dim=0)
+def _sample_pixels_frames(values: torch.Tensor, max_pixels=None) -> torch.Tensor:
+    """Per-frame ``_sample_pixels_channel_last`` for a whole batch: (B, N, C)."""
+    flat = values.reshape(values.shape[0], -1, values.shape[-1])
+    if max_pixels is None:
+        max_pixels = V2_STAT_SAMPLE_PIXELS
+    limit = max(1, int(max_pixels))
+    if flat.shape[1] <= limit:
+        return flat
+    index = torch.linspace(0, flat.shape[1] - 1, steps=limit, device=flat.device).long()
+    return flat.index_select(1, index)
+
+
+def _mean_std_stats_frames(
+    values: torch.Tensor, max_pixels=None, chunk_size=None,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    channels = values.shape[-1]
+    means = torch.empty((values.shape[0], 1, 1, channels), dtype=values.dtype, device=values.device)
+    stds = torch.empty_like(means)
+    for start, end in _chunked_frame_ranges(values, chunk_size=chunk_size or V2_STAT_CHUNK_FRAMES):
+        sample = _sample_pixels_frames(values[start:end], max_pixels=max_pixels)
+        means[start:end] = sample.mean(dim=1).view(-1, 1, 1, channels)
+        stds[start:end] = sample.std(dim=1, unbiased=False).view(-1, 1, 1, channels)
+    return means, stds
 
 
 def _mean_std_transfer_with_stats(
@@ -821,12 +1093,27 @@ def _robust_luma_mean_frames(
     black_percentile: float,
     white_percentile: float,
     max_pixels=None,
+    chunk_size=None,
 ) -> torch.Tensor:
-    means = [
-        _robust_luma_mean_single(luma[index : index + 1], black_percentile, white_percentile, max_pixels=max_pixels)
-        for index in range(luma.shape[0])
-    ]
-    return torch.cat(means, dim=0)
+    lo_p = max(0.0, min(1.0, float(black_percentile)))
+    hi_p = max(0.0, min(1.0, float(white_percentile)))
+    means = torch.empty((luma.shape[0], 1, 1, 1), dtype=luma.dtype, device=luma.device)
+    for start, end in _chunked_frame_ranges(luma, chunk_size=chunk_size or V2_STAT_CHUNK_FRAMES):
+        sample = _sample_pixels_frames(luma[start:end], max_pixels=max_pixels).reshape(end - start, -1)
+        if sample.shape[1] < 2 or hi_p <= lo_p:
+            means[start:end] = sample.mean(dim=1).view(-1, 1, 1, 1)
+            continue
+        bounds = torch.quantile(
+            sample, torch.tensor([lo_p, hi_p], dtype=sample.dtype, device=sample.device), dim=1, keepdim=True,
+        )
+        clamped = torch.maximum(torch.minimum(sample, bounds[1]), bounds[0])
+        means[start:end] = clamped.mean(dim=1).view(-1, 1, 1, 1)
+    return means
+
+
+def _log_frame_throughput(name: str, frames: int, started: float) -> None:
+    elapsed = max(1e-9, time.perf_counter() - started)
+    logger.info("%s processed %d frames in %.3fs (%.1f fps)", name, frames, elapsed, frames / elapsed)
 
 
 def _robust_luma_mean(luma: torch.Tensor, black_percentile: float, white_percentile: float) -> torch.Tensor:
@@ -963,7 +1250,7 @@ class FCSConcatVideosV2(FCSConcatVideos):
         seam_repair_source_weights="0.35,0.15",
     ):
         entries = _parse_video_entries_with_options(video_entries)
-        probes = [_probe_video(entry["path"]) for entry in entries]
+        probes = _probe_videos([entry["path"] for entry in entries])
         base_width = probes[0]["width"] or 1920
         base_height = probes[0]["height"] or 1088
         overlap_frames = max(0, int(overlap_frames or 0))
@@ -1357,12 +1644,16 @@ class FurgenSeamScaleStabilize:
         return frame
 
     @staticmethod
-    def _estimate_reference_to_current_affine(cv2, reference_u8, current_u8, min_inliers):
-        ref_gray = FurgenSeamScaleStabilize._to_gray(cv2, reference_u8)
-        cur_gray = FurgenSeamScaleStabilize._to_gray(cv2, current_u8)
+    def _detect_features(cv2, frame_u8):
         orb = cv2.ORB_create(nfeatures=1800, fastThreshold=5)
-        ref_kp, ref_desc = orb.detectAndCompute(ref_gray, None)
-        cur_kp, cur_desc = orb.detectAndCompute(cur_gray, None)
+        return orb.detectAndCompute(FurgenSeamScaleStabilize._to_gray(cv2, frame_u8), None)
+
+    @staticmethod
+    def _estimate_reference_to_current_affine(cv2, reference_u8, current_u8, min_inliers, reference_features=None):
+        if reference_features is None:
+            reference_features = FurgenSeamScaleStabilize._detect_features(cv2, reference_u8)
+        ref_kp, ref_desc = reference_features
+        cur_kp, cur_desc = FurgenSeamScaleStabilize._detect_features(cv2, current_u8)
         if ref_desc is None or cur_desc is None or len(ref_kp) < 8 or len(cur_kp) < 8:
             return None, 0
         matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
@@ -1426,30 +1717,51 @@ class FurgenSeamScaleStabilize:
             return (images,)
 
         reference_u8 = self._to_u8(reference[0])
+        # ORB on the reference is identical for every frame, so detect once.
+        reference_features = self._detect_features(cv2, reference_u8)
         output = images.clone()
         identity = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32)
         h = int(images.shape[1])
         w = int(images.shape[2])
-        for index in range(1, limit):
-            frame_strength = self._frame_strength(index, full_strength_frames, fade_out_frames, strength)
-            if frame_strength <= 0.0:
-                continue
+
+        def correct_frame(index, frame_strength):
             current_u8 = self._to_u8(images[index])
-            affine, _inliers = self._estimate_reference_to_current_affine(cv2, reference_u8, current_u8, min_inliers)
+            affine, _inliers = self._estimate_reference_to_current_affine(
+                cv2, reference_u8, current_u8, min_inliers, reference_features=reference_features,
+            )
             if affine is None:
-                continue
+                return None
             scale = self._affine_scale(affine)
             if not np.isfinite(scale) or abs(scale - 1.0) > float(max_scale_delta):
-                continue
+                return None
             inverse = cv2.invertAffineTransform(affine).astype(np.float32)
             correction = identity + (inverse - identity) * float(frame_strength)
-            corrected = cv2.warpAffine(
+            return cv2.warpAffine(
                 current_u8,
                 correction,
                 (w, h),
                 flags=cv2.INTER_LANCZOS4,
                 borderMode=cv2.BORDER_REPLICATE,
             )
+
+        # Frames are estimated and warped independently (cv2 releases the
+        # GIL), then written back in index order.  Each RANSAC call seeds its
+        # own generator, so the output does not depend on the worker count.
+        jobs = []
+        for index in range(1, limit):
+            frame_strength = self._frame_strength(index, full_strength_frames, fade_out_frames, strength)
+            if frame_strength > 0.0:
+                jobs.append((index, frame_strength))
+        workers = min(STABILIZE_WORKERS, len(jobs))
+        if workers <= 1:
+            results = [correct_frame(index, frame_strength) for index, frame_strength in jobs]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="furgen-stabilize") as pool:
+                results = list(pool.map(lambda job: correct_frame(*job), jobs))
+
+        for (index, _frame_strength), corrected in zip(jobs, results):
+            if corrected is None:
+                continue
             if corrected.ndim == 2:
                 corrected = corrected[..., None]
             corrected_tensor = torch.from_numpy(corrected.astype(np.float32) / 255.0).to(
@@ -2065,46 +2377,60 @@ class FurgenTemporalToneSmooth:
                 max_delta = max(0.0, float(max_frame_gain_delta))
                 global_strength = max(0.0, min(1.0, float(strength)))
 
-                smooth_y = None
-                smooth_chroma = None
-                previous_gain = None
-                previous_chroma_offset = None
-                output = torch.empty_like(images)
-
+                started = time.perf_counter()
+                eps = _eps_for(images)
+                frame_means = torch.empty((images.shape[0], 1, 1, 3), dtype=images.dtype, device=images.device)
+                for start, end in _chunked_frame_ranges(images, chunk_size=V2_STAT_CHUNK_FRAMES):
+                    phase = "frame_stats"
+                    # Y'CbCr is linear in RGB, so converting the per-frame RGB
+                    # means avoids materialising a converted copy of the chunk.
+                    frame_means[start:end] = _rgb_to_ycbcr(_image_rgb(images[start:end]).mean(dim=(1, 2), keepdim=True))
+
+                # The exponential smoothing and per-frame delta limits are a
+                # sequential recurrence, but only over (1, 1, 1, k) statistics.
+                phase = "temporal_gain"
+                gains = torch.empty((images.shape[0], 1, 1, 1), dtype=images.dtype, device=images.device)
+                chroma_offsets = torch.empty((images.shape[0], 1, 1, 2), dtype=images.dtype, device=images.device)
+                smooth_y = frame_means[0:1, ..., 0:1]
+                smooth_chroma = frame_means[0:1, ..., 1:3]
+                previous_gain = torch.ones_like(smooth_y)
+                previous_chroma_offset = torch.zeros_like(smooth_chroma)
                 for index in range(images.shape[0]):
-                    phase = "frame"
-                    image_frame = images[index : index + 1]
-                    rgb = _image_rgb(image_frame)
-                    ycbcr = _rgb_to_ycbcr(rgb)
-                    current_mean = ycbcr.mean(dim=(1, 2), keepdim=True)
-                    current_y = current_mean[..., 0:1]
-                    current_chroma = current_mean[..., 1:3]
-
-                    if smooth_y is None:
-                        smooth_y = current_y
-                        smooth_chroma = current_chroma
-                        previous_gain = torch.ones_like(smooth_y)
-                        previous_chroma_offset = torch.zeros_like(smooth_chroma)
-                    else:
+                    current_y = frame_means[index : index + 1, ..., 0:1]
+                    current_chroma = frame_means[index : index + 1, ..., 1:3]
+                    if index > 0:
                         smooth_y = smooth_y * luma_keep + current_y * (1.0 - luma_keep)
                         smooth_chroma = smooth_chroma * chroma_keep + current_chroma * (1.0 - chroma_keep)
 
-                    raw_gain = (smooth_y / current_y.clamp_min(_eps_for(rgb))).clamp(0.25, 4.0)
+                    raw_gain = (smooth_y / current_y.clamp_min(eps)).clamp(0.25, 4.0)
                     gain_delta = (raw_gain - previous_gain).clamp(-max_delta, max_delta)
-                    limited_gain = previous_gain + gain_delta
+                    previous_gain = previous_gain + gain_delta
                     raw_chroma_offset = smooth_chroma - current_chroma
                     chroma_delta = (raw_chroma_offset - previous_chroma_offset).clamp(-max_delta, max_delta)
-                    limited_chroma_offset = previous_chroma_offset + chroma_delta
-
-                    if index == 0 and bool(preserve_first_frame):
-                        output[index : index + 1] = image_frame
-                    else:
-                        adjusted = ycbcr.clone()
-                        adjusted[..., 0:1] = ycbcr[..., 0:1] * (1.0 + (limited_gain - 1.0) * global_strength)
-                        adjusted[..., 1:3] = ycbcr[..., 1:3] + limited_chroma_offset * global_strength
-                        output[index : index + 1] = _restore_channels(image_frame, _ycbcr_to_rgb(adjusted))
-                    previous_gain = limited_gain
-                    previous_chroma_offset = limited_chroma_offset
+                    previous_chroma_offset = previous_chroma_offset + chroma_delta
+                    gains[index : index + 1] = previous_gain
+                    chroma_offsets[index : index + 1] = previous_chroma_offset
+
+                # Scaling Y and shifting Cb/Cr is an affine map in RGB:
+                # rgb' = rgb + Y * (gain - 1) + a per-frame RGB offset.  Applying
+                # it directly skips the Y'CbCr round trip on full frames.
+                luma_scale = (gains - 1.0) * global_strength
+                cb_shift = chroma_offsets[..., 0:1] * global_strength * 1.8556
+                cr_shift = chroma_offsets[..., 1:2] * global_strength * 1.5748
+                rgb_offsets = torch.cat(
+                    (cr_shift, -(0.2126 * cr_shift + 0.0722 * cb_shift) / 0.7152, cb_shift), dim=-1,
+                )
+                output = torch.empty_like(images)
+                chunk_size = _planned_chunk_size(images, working_copies=4)
+                for start, end in _chunked_frame_ranges(images, chunk_size=chunk_size):
+                    phase = "frame_chunk"
+                    chunk = images[start:end]
+                    rgb = _image_rgb(chunk)
+                    corrected = rgb + _luma(rgb) * luma_scale[start:end] + rgb_offsets[start:end]
+                    output[start:end] = _restore_channels(chunk, corrected)
+                if bool(preserve_first_frame):
+                    output[0:1] = images[0:1]
+                _log_frame_throughput(self.__class__.__name__, int(images.shape[0]), started)
 
                 return (output,)
         except Exception as exc:
@@ -2152,34 +2478,54 @@ class FurgenTemporalUnsharpMask:
         phase = "validate"
         try:
             with torch.no_grad():
-                rgb = _image_rgb(images)
-                correction = torch.empty_like(rgb)
+                _image_rgb(images)
+                started = time.perf_counter()
                 amount_f = max(0.0, float(amount))
                 radius_f = max(0.25, float(radius))
                 threshold_f = max(0.0, float(threshold))
+                blend = max(0.0, min(1.0, float(temporal_blend)))
+                batch = int(images.shape[0])
+                # The temporal blend reads one neighbour on each side, so each
+                # chunk recomputes a one-frame halo and the chunked output is
+                # identical to blending the whole clip at once.
+                halo = 1 if blend > 0.0 and batch > 1 else 0
+                chunk_size = _planned_chunk_size(images, working_copies=10, halo=halo)
+                output = torch.empty_like(images)
 
-                for start, end in _chunked_frame_ranges(images):
+                for start, end in _chunked_frame_ranges(images, chunk_size=chunk_size):
                     phase = "frame_chunk"
-                    chunk_rgb = rgb[start:end]
-                    blurred = _gaussian_blur_channel_last(chunk_rgb, radius_f)
-                    detail = chunk_rgb - blurred
+                    lo, hi = max(0, start - halo), min(batch, end + halo)
+                    window_rgb = _image_rgb(images[lo:hi])
+                    blurred = _gaussian_blur_channel_last(window_rgb, radius_f)
+                    detail = window_rgb - blurred
                     if bool(luma_only):
-                        detail = _threshold_detail(_luma(detail), threshold_f).expand_as(chunk_rgb)
+                        detail = _threshold_detail(_luma(detail), threshold_f).expand_as(window_rgb)
                     else:
                         detail = _threshold_detail(detail, threshold_f)
-                    correction[start:end] = detail * amount_f
+                    correction = detail * amount_f
+                    inner = slice(start - lo, end - lo)
+
+                    if halo:
+                        phase = "temporal_blend"
+                        smooth = torch.empty_like(correction[inner])
+                        first, last = max(start, 1), min(end, batch - 1)
+                        if first < last:
+                            a, b = first - lo, last - lo
+                            smooth[first - start:last - start] = (
+                                correction[a - 1:b - 1] + correction[a:b] + correction[a + 1:b + 1]
+                            ) / 3.0
+                        if start == 0:
+                            smooth[0:1] = (correction[0:1] + correction[1:2]) * 0.5
+                        if end == batch:
+                            smooth[-1:] = (correction[-2:-1] + correction[-1:]) * 0.5
+                        output_correction = correction[inner].lerp(smooth, blend)
+                    else:
+                        output_correction = correction[inner]
 
-                blend = max(0.0, min(1.0, float(temporal_blend)))
-                if blend > 0.0 and correction.shape[0] > 1:
-                    phase = "temporal_blend"
-                    smooth = correction.clone()
-                    smooth[0:1] = (correction[0:1] + correction[1:2]) * 0.5
-                    smooth[-1:] = (correction[-2:-1] + correction[-1:]) * 0.5
-                    if correction.shape[0] > 2:
-                        smooth[1:-1] = (correction[:-2] + correction[1:-1] + correction[2:]) / 3.0
-                    correction = correction.lerp(smooth, blend)
-
-                return (_restore_channels(images, rgb + correction),)
+                    output[start:end] = _restore_channels(images[start:end], window_rgb[inner] + output_correction)
+
+                _log_frame_throughput(self.__class__.__name__, batch, started)
+                return (output,)
         except Exception as exc:
             raise _node_runtime_error(self.__class__.__name__, images, phase, exc) from exc
 
@@ -2708,7 +3054,7 @@ class FCSConcatVideosV3(FCSConcatVideosV2):
         seam_repair_source_weights="0.35,0.15",
     ):
         entries = _parse_video_entries_with_options(video_entries)
-        probes = [_probe_video(entry["path"]) for entry in entries]
+        probes = _probe_videos([entry["path"] for entry in entries])
         base_width = probes[0]["width"] or 1920
         base_height = probes[0]["height"] or 1088
         overlap_frames = max(0, int(overlap_frames or 0))
@@ -2966,29 +3312,175 @@ def _analysis_frame_geometry(source_width, source_height):
     return width, height
 
 
-def _decode_analysis_frames(source, source_width, source_height, duration, fps=10):
-    width, height = _analysis_frame_geometry(source_width, source_height)
+def _decode_analysis_streams(source, details, duration, proxy_path, storyboard_png, fps=10):
+    """Decode ``source`` once and fan it out to every analysis consumer.
+
+    One ffmpeg process splits the decoded video into the proxy encode, the
+    storyboard tile, the early-stability frames and a 2x2 frame counter, and
+    splits the audio into PCM extraction and the loudnorm measurement.
+    Remote sources are therefore read once instead of once per metric.
+    """
+    width, height = _analysis_frame_geometry(details["width"], details["height"])
     sample_duration = min(max(0.001, float(duration)), 1.600001)
     frame_limit = min(16, max(1, int(math.ceil(float(duration) * fps))))
-    raw = subprocess.run(
-        [
-            FFMPEG_BIN, "-v", "error", "-i", source, "-t", f"{sample_duration:.6f}",
-            "-vf", (
-                f"fps={fps}:start_time=0,scale={width}:{height}:force_original_aspect_ratio=decrease,"
-                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black,format=rgb24"
-            ),
-            "-frames:v", str(frame_limit),
-            "-f", "rawvideo", "-pix_fmt", "rgb24", "-",
-        ],
-        capture_output=True,
-        check=True,
-    ).stdout
+    frame_count, columns, rows, storyboard_width, frame_height = _storyboard_geometry(
+        duration, details["width"], details["height"]
+    )
+    filters = [
+        "[0:v]split=4[proxy_in][storyboard_in][early_in][count_in]",
+        "[proxy_in]fps=30,scale='min(1280,iw)':'min(720,ih)':force_original_aspect_ratio=decrease:force_divisible_by=2[proxy_v]",
+        f"[storyboard_in]fps={frame_count / duration:.9f},scale={storyboard_width}:{frame_height},"
+        f"tile={columns}x{rows}:nb_frames={frame_count}:padding=0:margin=0[storyboard_v]",
+        f"[early_in]trim=duration={sample_duration:.6f},fps={fps}:start_time=0,"
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:black,format=rgb24[early_v]",
+        "[count_in]scale=2:2,format=gray[count_v]",
+    ]
+    with tempfile.TemporaryDirectory(prefix="furgen-analysis-") as workdir:
+        early_path = os.path.join(workdir, "early.rgb")
+        count_path = os.path.join(workdir, "count.gray")
+        pcm_path = os.path.join(workdir, "audio.s16le")
+        outputs = [
+            "-map", "[proxy_v]", "-map", "0:a?",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "24", "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-b:a", "160k", "-movflags", "+faststart", proxy_path,
+            "-map", "[storyboard_v]", "-frames:v", "1", "-c:v", "png", storyboard_png,
+            "-map", "[early_v]", "-frames:v", str(frame_limit), "-f", "rawvideo", "-pix_fmt", "rgb24", early_path,
+            "-map", "[count_v]", "-fps_mode", "passthrough", "-f", "rawvideo", count_path,
+        ]
+        if details["has_audio"]:
+            filters.extend([
+                "[0:a]asplit=2[pcm_a][loudness_in]",
+                "[loudness_in]loudnorm=I=-16:TP=-1.5:LRA=11:print_format=json[loudness_a]",
+            ])
+            outputs.extend([
+                "-map", "[pcm_a]", "-ac", "1", "-ar", "48000", "-f", "s16le", pcm_path,
+                "-map", "[loudness_a]", "-f", "null", "-",
+            ])
+        proc = subprocess.run(
+            [
+                FFMPEG_BIN, "-y", "-v", "info", "-nostats", "-i", source,
+                "-filter_complex", ";".join(filters), *outputs,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg analysis decode failed: {(proc.stderr or '')[-2000:]}")
+        with open(early_path, "rb") as handle:
+            raw = handle.read()
+        decoded_frame_count = os.path.getsize(count_path) // 4
+        samples = None
+        if details["has_audio"]:
+            with open(pcm_path, "rb") as handle:
+                samples = np.frombuffer(handle.read(), dtype="<i2").astype(np.float32) / 32768.0
+
     frame_size = width * height * 3
-    frame_count = len(raw) // frame_size
-    frames = np.frombuffer(raw[:frame_count * frame_size], dtype=np.uint8).reshape(
-        frame_count, height, width, 3,
+    early_count = len(raw) // frame_size
+    early_frames = np.frombuffer(raw[:early_count * frame_size], dtype=np.uint8).reshape(
+        early_count, height, width, 3,
     )
-    return frames, width, height
+    loudness = {}
+    matches = re.findall(r"\{[^{}]*\}", proc.stderr or "", re.DOTALL)
+    if details["has_audio"] and matches:
+        try:
+            measured = json.loads(matches[-1])
+            loudness = {
+                "integratedLoudnessLufs": float(measured["input_i"]),
+                "truePeakDbfs": float(measured["input_tp"]),
+            }
+        except (KeyError, TypeError, ValueError, json.JSONDecodeError):
+            loudness = {}
+    return {
+        "earlyFrames": early_frames,
+        "analysisWidth": width,
+        "analysisHeight": height,
+        "frameCount": decoded_frame_count,
+        "samples": samples,
+        "loudness": loudness,
+    }
+
+
+def _analysis_cache_root():
+    return os.environ.get("FURGEN_ANALYSIS_CACHE_DIR") or os.path.join(
+        folder_paths.get_temp_directory(), "furgen-analysis-cache"
+    )
+
+
+def _remote_source_validators(url):
+    """``ETag|Last-Modified|size`` for a remote source, or ``None`` when it sends neither validator.
+
+    Asks for one byte with a ranged GET rather than a HEAD so presigned GET
+    URLs still answer.
+    """
+    if not url.lower().startswith(("http://", "https://")):
+        return None
+    request = urllib.request.Request(url, headers={"Range": "bytes=0-0"})
+    try:
+        with urllib.request.urlopen(request, timeout=ANALYSIS_REMOTE_VALIDATOR_TIMEOUT_SECONDS) as response:
+            headers = response.headers
+    except (OSError, ValueError):
+        return None
+    etag = headers.get("ETag") or ""
+    last_modified = headers.get("Last-Modified") or ""
+    if not etag and not last_modified:
+        return None
+    size = (headers.get("Content-Range") or "").rpartition("/")[2] or headers.get("Content-Length") or ""
+    return f"{etag}|{last_modified}|{size}"
+
+
+def _analysis_source_identity(source):
+    """Cache-key suffix tying an analysis to this version of ``source``; ``None`` if it cannot be cached.
+
+    Local files are keyed by size and mtime, like the probe cache, so a file
+    rewritten in place with the same geometry is re-analysed. Remote sources
+    are keyed by their ETag/Last-Modified validators; one that sends neither
+    is analysed afresh every time rather than served from the cache.
+    """
+    if _is_url(source):
+        validators = _remote_source_validators(source)
+        return f"|{validators}" if validators is not None else None
+    stat_key = _probe_cache_key("analysis", source)
+    return f"|{stat_key[2]}:{stat_key[3]}" if stat_key is not None else ""
+
+
+def _load_cached_analysis(cache_key, paths):
+    """Materialise a cached analysis bundle at ``paths``; ``None`` on a miss."""
+    entry = os.path.join(_analysis_cache_root(), cache_key)
+    try:
+        with open(os.path.join(entry, ANALYSIS_CACHE_FILES["analysis"]), "r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+        for name in ("proxy", "storyboard"):
+            shutil.copyfile(os.path.join(entry, ANALYSIS_CACHE_FILES[name]), paths[name])
+        os.utime(entry)
+    except (OSError, ValueError):
+        return None
+    manifest["proxy"]["filename"] = os.path.basename(paths["proxy"])
+    manifest["storyboard"]["filename"] = os.path.basename(paths["storyboard"])
+    return manifest
+
+
+def _store_cached_analysis(cache_key, paths):
+    """Best-effort copy of a finished bundle into the LRU analysis cache."""
+    root = _analysis_cache_root()
+    try:
+        os.makedirs(root, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{cache_key}.", dir=root)
+        try:
+            for name, filename in ANALYSIS_CACHE_FILES.items():
+                shutil.copyfile(paths[name], os.path.join(staging, filename))
+            os.rename(staging, os.path.join(root, cache_key))
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        entries = sorted(
+            (entry for entry in os.scandir(root) if entry.is_dir() and not entry.name.startswith(".")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries[:max(0, len(entries) - ANALYSIS_CACHE_MAX_ENTRIES)]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+    except OSError:
+        pass
 
 
 def _decode_analysis_reference(source, width, height):
@@ -3010,26 +3502,47 @@ def _decode_analysis_reference(source, width, height):
     return np.frombuffer(raw[:frame_size], dtype=np.uint8).reshape(height, width, 3)
 
 
-def _global_translation(previous, current, max_shift=4):
-    height, width = previous.shape
-    candidates = sorted(
+def _global_translations(luma, max_shift=4):
+    """Best integer (dx, dy, magnitude) between each consecutive luma frame.
+
+    Every shift in the +/-``max_shift`` window is scored for a chunk of frame
+    pairs at once as one batched mean-absolute-error reduction on CPU
+    tensors.  Chunks hold about ``TRANSLATION_CHUNK_ELEMENTS`` pixels so the
+    temporaries stay cache-resident.  Ties go to the smallest displacement,
+    then the smallest signed dx and dy.
+    """
+    luma = torch.as_tensor(np.asarray(luma, dtype=np.float32))
+    if luma.ndim != 3 or luma.shape[0] < 2:
+        return []
+    previous, current = luma[:-1], luma[1:]
+    pairs, height, width = previous.shape
+    shifts = sorted(
         ((dx, dy) for dy in range(-max_shift, max_shift + 1) for dx in range(-max_shift, max_shift + 1)),
-        key=lambda pair: (pair[0] * pair[0] + pair[1] * pair[1], abs(pair[0]), abs(pair[1])),
+        key=lambda pair: (pair[0] * pair[0] + pair[1] * pair[1], pair[0], pair[1]),
     )
-    best = None
-    for dx, dy in candidates:
-        x0, x1 = max(0, dx), min(width, width + dx)
-        y0, y1 = max(0, dy), min(height, height + dy)
-        if x1 <= x0 or y1 <= y0:
-            continue
-        prior = previous[y0:y1, x0:x1]
-        shifted = current[y0 - dy:y1 - dy, x0 - dx:x1 - dx]
-        error = float(np.mean(np.abs(prior - shifted)))
-        candidate = (error, dx * dx + dy * dy, dx, dy)
-        if best is None or candidate < best:
-            best = candidate
-    _, _, dx, dy = best or (0.0, 0, 0, 0)
-    return dx, dy, math.hypot(dx, dy)
+    errors = torch.full((pairs, len(shifts)), float("inf"), dtype=torch.float32)
+    step = max(1, TRANSLATION_CHUNK_ELEMENTS // max(1, height * width))
+    for start in range(0, pairs, step):
+        end = min(pairs, start + step)
+        for column, (dx, dy) in enumerate(shifts):
+            x0, x1 = max(0, dx), min(width, width + dx)
+            y0, y1 = max(0, dy), min(height, height + dy)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            difference = (
+                previous[start:end, y0:y1, x0:x1] - current[start:end, y0 - dy:y1 - dy, x0 - dx:x1 - dx]
+            )
+            errors[start:end, column] = difference.abs_().mean(dim=(1, 2))
+    result = []
+    for row, column in enumerate(torch.argmin(errors, dim=1).tolist()):
+        dx, dy = shifts[column] if math.isfinite(float(errors[row, column])) else (0, 0)
+        result.append((dx, dy, math.hypot(dx, dy)))
+    return result
+
+
+def _global_translation(previous, current, max_shift=4):
+    translations = _global_translations(np.stack([previous, current]), max_shift=max_shift)
+    return translations[0] if translations else (0, 0, 0.0)
 
 
 def _early_visual_metrics(frames, fps=10, reference=None):
@@ -3043,11 +3556,12 @@ def _early_visual_metrics(frames, fps=10, reference=None):
     luma = np.tensordot(normalized, np.asarray(RGB_LUMA_WEIGHTS, dtype=np.float32), axes=([3], [0]))
     first = normalized[0]
     reference_normalized = reference.astype(np.float32) / 255.0 if reference is not None else None
+    translations = [(0, 0, 0.0), *_global_translations(luma)]
     samples = []
     for index, frame in enumerate(normalized):
         change = 0.0 if index == 0 else float(np.mean(np.abs(frame - normalized[index - 1])))
         first_similarity = 1.0 - float(np.mean(np.abs(frame - first)))
-        dx, dy, motion = (0, 0, 0.0) if index == 0 else _global_translation(luma[index - 1], luma[index])
+        dx, dy, motion = translations[index]
         sample = {
             "timeSeconds": round(index / float(fps), 6),
             "changeEnergy": round(max(0.0, min(1.0, change)), 6),
@@ -3153,7 +3667,9 @@ class FCSAnalyzeVideo:
         self, source_video_url, source_fingerprint, filename_prefix, save_output, reference_image_url="",
     ):
         source = _resolve_video_entry(source_video_url)
-        details = _probe_video_details(source)
+        # Header-only probe: the frame count, dimensions and duration needed
+        # for the cache key come from container metadata, not a full decode.
+        details = _probe_video_details(source, count_frames=False)
         folder, subfolder, stem, paths = _output_bundle(
             filename_prefix,
             {"proxy": "-proxy.mp4", "storyboard": "-storyboard.webp", "analysis": "-analysis.json"},
@@ -3161,53 +3677,75 @@ class FCSAnalyzeVideo:
         )
         del folder
         duration = max(0.001, float(details["duration_seconds"]))
-        early_frames, analysis_width, analysis_height = _decode_analysis_frames(
-            source, details["width"], details["height"], duration,
-        )
-        reference_source = None
         reference_frame = None
         if str(reference_image_url or "").strip():
             reference_source = _resolve_video_entry(reference_image_url)
+            analysis_width, analysis_height = _analysis_frame_geometry(details["width"], details["height"])
             reference_frame = _decode_analysis_reference(reference_source, analysis_width, analysis_height)
+        source_identity = _analysis_source_identity(source)
+        cacheable = source_identity is not None
+        canonical_fingerprint = hashlib.sha256(
+            f"{source}|{details['width']}x{details['height']}|{details['duration_seconds']:.6f}|{details['frame_count']}"
+            f"{source_identity or ''}".encode()
+        ).hexdigest()
+        advisory = str(source_fingerprint or "").strip()
+        reference_fingerprint = hashlib.sha256(reference_frame.tobytes()).hexdigest() if reference_frame is not None else ""
+        cache_key = hashlib.sha256(
+            f"video-analysis-v2|{canonical_fingerprint}|{advisory}|{reference_fingerprint}".encode()
+        ).hexdigest()
+        manifest = _load_cached_analysis(cache_key, paths) if cacheable else None
+        cache_hit = manifest is not None
+        if not cache_hit:
+            manifest = self._analyze_uncached(
+                source, details, duration, paths, reference_frame,
+                cache_key, canonical_fingerprint, advisory, reference_fingerprint,
+            )
+        with open(paths["analysis"], "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, separators=(",", ":"), allow_nan=False)
+        if cacheable and not cache_hit:
+            _store_cached_analysis(cache_key, paths)
+        base_names = {key: os.path.basename(value) for key, value in paths.items()}
+        previews = [
+            {
+                "filename": base_names["proxy"], "subfolder": subfolder,
+                "type": "output" if save_output else "temp", "format": "video/h264-mp4",
+                "frame_rate": 30, "fullpath": paths["proxy"],
+            }
+        ]
+        history_files = [
+            {
+                "filename": base_names[key], "subfolder": subfolder,
+                "type": "output" if save_output else "temp",
+            }
+            for key in ("proxy", "storyboard", "analysis")
+        ]
+        return {
+            "ui": {"gifs": previews, "files": history_files},
+            "result": ((save_output, list(paths.values())),),
+        }
+
+    def _analyze_uncached(
+        self, source, details, duration, paths, reference_frame,
+        cache_key, canonical_fingerprint, advisory, reference_fingerprint,
+    ):
+        storyboard_png = paths["storyboard"] + ".png"
+        decoded = _decode_analysis_streams(source, details, duration, paths["proxy"], storyboard_png)
+        early_frames = decoded["earlyFrames"]
+        analysis_width, analysis_height = decoded["analysisWidth"], decoded["analysisHeight"]
         visual_stability = _early_visual_metrics(early_frames, reference=reference_frame)
-        subprocess.run(
-            [
-                FFMPEG_BIN, "-y", "-v", "error", "-i", source,
-                "-vf", "fps=30,scale='min(1280,iw)':'min(720,ih)':force_original_aspect_ratio=decrease:force_divisible_by=2",
-                "-map", "0:v:0", "-map", "0:a?",
-                "-c:v", "libx264", "-preset", "veryfast", "-crf", "24", "-pix_fmt", "yuv420p",
-                "-c:a", "aac", "-b:a", "160k", "-movflags", "+faststart", paths["proxy"],
-            ],
-            check=True,
-        )
-        proxy_details = _probe_video_details(paths["proxy"])
+        proxy_details = _probe_video_details(paths["proxy"], count_frames=False)
         frame_count, columns, rows, storyboard_width, frame_height = _storyboard_geometry(
             duration, details["width"], details["height"]
         )
-        storyboard_png = paths["storyboard"] + ".png"
-        subprocess.run(
-            [
-                FFMPEG_BIN, "-y", "-v", "error", "-i", source,
-                "-vf", f"fps={frame_count / duration:.9f},scale={storyboard_width}:{frame_height},tile={columns}x{rows}:nb_frames={frame_count}:padding=0:margin=0",
-                "-frames:v", "1", "-c:v", "png", storyboard_png,
-            ],
-            check=True,
-        )
         with Image.open(storyboard_png) as storyboard_image:
             storyboard_image.save(paths["storyboard"], format="WEBP", quality=82, method=4)
         os.unlink(storyboard_png)
 
         peaks, rms = [], []
-        loudness = {}
+        loudness = decoded["loudness"]
         audio_end_window = _audio_end_window_metrics(np.asarray([], dtype=np.float32))
-        if details["has_audio"]:
-            pcm = subprocess.run(
-                [FFMPEG_BIN, "-v", "error", "-i", source, "-vn", "-ac", "1", "-ar", "48000", "-f", "s16le", "-"],
-                capture_output=True,
-                check=True,
-            ).stdout
-            samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
-            samples = samples[:max(1, int(round(duration * 48000)))]
+        if decoded["samples"] is not None:
+            samples = decoded["samples"][:max(1, int(round(duration * 48000)))]
             audio_end_window = _audio_end_window_metrics(samples)
             block = 2400
             for start in range(0, samples.size, block):
@@ -3216,33 +3754,6 @@ class FCSAnalyzeVideo:
                     continue
                 peaks.append(round(float(np.max(np.abs(segment))), 6))
                 rms.append(round(float(np.sqrt(np.mean(np.square(segment)))), 6))
-            loudness_proc = subprocess.run(
-                [
-                    FFMPEG_BIN, "-v", "info", "-i", source, "-vn",
-                    "-af", "loudnorm=I=-16:TP=-1.5:LRA=11:print_format=json", "-f", "null", "-",
-                ],
-                capture_output=True,
-                text=True,
-            )
-            matches = re.findall(r"\{[^{}]*\}", loudness_proc.stderr or "", re.DOTALL)
-            if matches:
-                try:
-                    measured = json.loads(matches[-1])
-                    loudness = {
-                        "integratedLoudnessLufs": float(measured["input_i"]),
-                        "truePeakDbfs": float(measured["input_tp"]),
-                    }
-                except (KeyError, TypeError, ValueError, json.JSONDecodeError):
-                    loudness = {}
-
-        canonical_fingerprint = hashlib.sha256(
-            f"{source}|{details['width']}x{details['height']}|{details['duration_seconds']:.6f}|{details['frame_count']}".encode()
-        ).hexdigest()
-        advisory = str(source_fingerprint or "").strip()
-        reference_fingerprint = hashlib.sha256(reference_frame.tobytes()).hexdigest() if reference_frame is not None else ""
-        cache_key = hashlib.sha256(
-            f"video-analysis-v2|{canonical_fingerprint}|{advisory}|{reference_fingerprint}".encode()
-        ).hexdigest()
         base_names = {key: os.path.basename(value) for key, value in paths.items()}
         cues = [
             {
@@ -3262,7 +3773,7 @@ class FCSAnalyzeVideo:
             "canonicalSourceFingerprint": canonical_fingerprint,
             "source": {
                 "width": details["width"], "height": details["height"],
-                "frameRate": details["frame_rate"], "frameCount": details["frame_count"],
+                "frameRate": details["frame_rate"], "frameCount": decoded["frameCount"] or details["frame_count"],
                 "durationSeconds": details["duration_seconds"], "bitrate": details["bitrate"],
                 "hasAudio": details["has_audio"], "audioSampleRate": details["audio_sample_rate"],
                 "audioChannels": details["audio_channels"],
@@ -3287,26 +3798,7 @@ class FCSAnalyzeVideo:
             },
             "cors": {"allowOrigin": "*"},
         }
-        with open(paths["analysis"], "w", encoding="utf-8") as handle:
-            json.dump(manifest, handle, separators=(",", ":"), allow_nan=False)
-        previews = [
-            {
-                "filename": base_names["proxy"], "subfolder": subfolder,
-                "type": "output" if save_output else "temp", "format": "video/h264-mp4",
-                "frame_rate": 30, "fullpath": paths["proxy"],
-            }
-        ]
-        history_files = [
-            {
-                "filename": base_names[key], "subfolder": subfolder,
-                "type": "output" if save_output else "temp",
-            }
-            for key in ("proxy", "storyboard", "analysis")
-        ]
-        return {
-            "ui": {"gifs": previews, "files": history_files},
-            "result": ((save_output, list(paths.values())),),
-        }
+        return manifest
 
 
 def _v4_clip_duration(entry, probe):
@@ -3435,7 +3927,7 @@ class FCSConcatVideosV4(FCSConcatVideosV3):
             raise ValueError("edit_manifest.clips must contain at least one clip")
         for entry in entries:
             entry["path"] = _resolve_video_entry(entry.get("sourceVideoUrl"))
-        probes = [_probe_video(entry["path"]) for entry in entries]
+        probes = _probe_videos([entry["path"] for entry in entries])
         for entry, probe in zip(entries, probes):
             start, end, duration = _v4_clip_duration(entry, probe)
             if duration < 1.0 / float(frame_rate):
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""In-process NVML GPU telemetry sampler shared by the agent and the GPU coordinator.
+
+Forking ``nvidia-smi`` costs tens to hundreds of milliseconds per call, which
+puts a floor under every heartbeat and GPU hand-off poll.  This module binds
+``libnvidia-ml`` through ctypes, samples every device on a background thread
+and keeps a ring buffer of recent readings, so callers read telemetry from
+memory.  It uses only the standard library.  When NVML cannot be loaded,
+``shared_sampler()`` returns ``None`` and callers keep their ``nvidia-smi``
+path.  Tests inject a fake library object exposing the same functions.
+
+Environment:
+  - GPU_NVML_DISABLED         (set to 1 to skip NVML and use nvidia-smi; default: 0)
+  - GPU_NVML_LIBRARY          (NVML shared library path; default: libnvidia-ml.so.1)
+  - GPU_NVML_SAMPLE_SECONDS   (background sampling interval; default: 0.25)
+  - GPU_NVML_HISTORY          (readings kept in the ring buffer; default: 240)
+"""
+
+from __future__ import annotations
+
+import ctypes
+import os
+import threading
+import time
+from collections import deque
+
+NVML_SUCCESS = 0
+NVML_ERROR_INSUFFICIENT_SIZE = 7
+NVML_TEMPERATURE_GPU = 0
+NVML_CLOCKS = (("graphicsClockMhz", 0), ("smClockMhz", 1), ("memoryClockMhz", 2), ("videoClockMhz", 3))
+NVML_VALUE_NOT_AVAILABLE = 2**64 - 1
+MAX_PROCESSES = 64
+
+
+class NvmlError(RuntimeError):
+    def __init__(self, function, code):
+        super().__init__(f"{function} failed with NVML status {code}")
+        self.function = function
+        self.code = code
+
+
+class NvmlUtilization(ctypes.Structure):
+    _fields_ = [("gpu", ctypes.c_uint), ("memory", ctypes.c_uint)]
+
+
+class NvmlMemory(ctypes.Structure):
+    _fields_ = [("total", ctypes.c_ulonglong), ("free", ctypes.c_ulonglong), ("used", ctypes.c_ulonglong)]
+
+
+class NvmlProcessInfo(ctypes.Structure):
+    # nvmlProcessInfo_t as used by the _v2/_v3 process queries.
+    _fields_ = [
+        ("pid", ctypes.c_uint),
+        ("usedGpuMemory", ctypes.c_ulonglong),
+        ("gpuInstanceId", ctypes.c_uint),
+        ("computeInstanceId", ctypes.c_uint),
+    ]
+
+
+def load_nvml_library(path=None):
+    """Return the NVML ``CDLL`` or ``None`` when it is not installed."""
+    try:
+        return ctypes.CDLL(path or os.environ.get("GPU_NVML_LIBRARY") or "libnvidia-ml.so.1")
+    except OSError:
+        return None
+
+
+class NvmlSampler:
+    """Samples every NVML device into a bounded history of readings.
+
+    A reading is ``{"atMs", "monotonic", "devices": [...], "processes": [...]}``
+    where each process is ``{"pid", "usedBytes", "device"}``.  ``usedBytes`` is
+    ``None`` when NVML cannot attribute memory to the process (common inside
+    containers), matching nvidia-smi's ``[N/A]``; it must not be read as zero.
+    Fields a device does not support are omitted rather than failing the whole
+    reading.
+    """
+
+    def __init__(self, library, interval_seconds=0.25, history=240, clock=time.monotonic):
+        self._lib = library
+        self.interval_seconds = max(0.01, float(interval_seconds))
+        self._history = deque(maxlen=max(1, int(history)))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+        self._handles = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.errors = 0
+        self._call("nvmlInit_v2")
+
+    def _call(self, name, *args):
+        code = getattr(self._lib, name)(*args)
+        if code != NVML_SUCCESS:
+            raise NvmlError(name, code)
+
+    def _optional(self, name, *args):
+        try:
+            self._call(name, *args)
+            return True
+        except (NvmlError, AttributeError):
+            return False
+
+    def _device_handles(self):
+        if self._handles is None:
+            count = ctypes.c_uint()
+            self._call("nvmlDeviceGetCount_v2", ctypes.byref(count))
+            handles = []
+            for index in range(count.value):
+                handle = ctypes.c_void_p()
+                self._call("nvmlDeviceGetHandleByIndex_v2", index, ctypes.byref(handle))
+                handles.append(handle)
+            self._handles = handles
+        return self._handles
+
+    def _device_reading(self, index, handle):
+        device = {"index": index}
+        name = ctypes.create_string_buffer(96)
+        if self._optional("nvmlDeviceGetName", handle, name, 96):
+            device["name"] = name.value.decode("utf-8", "replace")
+        utilization = NvmlUtilization()
+        if self._optional("nvmlDeviceGetUtilizationRates", handle, ctypes.byref(utilization)):
+            device["utilizationGpuPct"] = float(utilization.gpu)
+        memory = NvmlMemory()
+        if self._optional("nvmlDeviceGetMemoryInfo", handle, ctypes.byref(memory)):
+            device["memoryUsedBytes"] = int(memory.used)
+            device["memoryTotalBytes"] = int(memory.total)
+        value = ctypes.c_uint()
+        if self._optional("nvmlDeviceGetPowerUsage", handle, ctypes.byref(value)):
+            device["powerDrawW"] = value.value / 1000.0
+        if self._optional("nvmlDeviceGetEnforcedPowerLimit", handle, ctypes.byref(value)):
+            device["powerLimitW"] = value.value / 1000.0
+        if self._optional("nvmlDeviceGetTemperature", handle, NVML_TEMPERATURE_GPU, ctypes.byref(value)):
+            device["temperatureC"] = float(value.value)
+        for key, clock_type in NVML_CLOCKS:
+            if self._optional("nvmlDeviceGetClockInfo", handle, clock_type, ctypes.byref(value)):
+                device[key] = float(value.value)
+        pstate = ctypes.c_int()
+        if self._optional("nvmlDeviceGetPerformanceState", handle, ctypes.byref(pstate)):
+            device["pstate"] = f"P{pstate.value}"
+        reasons = ctypes.c_ulonglong()
+        if self._optional("nvmlDeviceGetCurrentClocksThrottleReasons", handle, ctypes.byref(reasons)):
+            device["throttleReasons"] = f"0x{reasons.value:016x}"
+        return device
+
+    def _device_processes(self, index, handle):
+        size = 16
+        while size <= MAX_PROCESSES:
+            count = ctypes.c_uint(size)
+            infos = (NvmlProcessInfo * size)()
+            for name in ("nvmlDeviceGetComputeRunningProcesses_v3", "nvmlDeviceGetComputeRunningProcesses_v2"):
+                function = getattr(self._lib, name, None)
+                if function is None:
+                    continue
+                code = function(handle, ctypes.byref(count), infos)
+                if code == NVML_ERROR_INSUFFICIENT_SIZE:
+                    break
+                if code != NVML_SUCCESS:
+                    raise NvmlError(name, code)
+                return [
+                    {
+                        "pid": int(infos[slot].pid),
+                        "usedBytes": None if infos[slot].usedGpuMemory == NVML_VALUE_NOT_AVAILABLE else int(infos[slot].usedGpuMemory),
+                        "device": index,
+                    }
+                    for slot in range(min(count.value, size))
+                ]
+            else:
+                raise NvmlError("nvmlDeviceGetComputeRunningProcesses", -1)
+            size *= 2
+        raise NvmlError("nvmlDeviceGetComputeRunningProcesses", NVML_ERROR_INSUFFICIENT_SIZE)
+
+    def sample(self):
+        """Take one reading synchronously and append it to the history."""
+        with self._sample_lock:
+            devices, processes = [], []
+            for index, handle in enumerate(self._device_handles()):
+                devices.append(self._device_reading(index, handle))
+                processes.extend(self._device_processes(index, handle))
+            reading = {
+                "atMs": int(time.time() * 1000),
+                "monotonic": self._clock(),
+                "devices": devices,
+                "processes": processes,
+            }
+        with self._lock:
+            self._history.append(reading)
+        return reading
+
+    def latest(self, max_age_seconds=None):
+        """Newest reading, sampling inline when none is younger than ``max_age_seconds``."""
+        with self._lock:
+            reading = self._history[-1] if self._history else None
+        if reading is not None and (max_age_seconds is None or self._clock() - reading["monotonic"] <= max_age_seconds):
+            return reading
+        return self.sample()
+
+    def history(self):
+        with self._lock:
+            return list(self._history)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gpu-nvml-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=max(1.0, self.interval_seconds * 4))
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception:
+                self.errors += 1
+            self._stop.wait(self.interval_seconds)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+_shared_unavailable = False
+
+
+def shared_sampler(library=None):
+    """Process-wide running sampler, or ``None`` when NVML is unavailable."""
+    global _shared, _shared_unavailable
+    with _shared_lock:
+        if _shared is not None:
+            return _shared
+        if _shared_unavailable or os.environ.get("GPU_NVML_DISABLED", "0").strip().lower() in ("1", "true", "yes"):
+            return None
+        library = library if library is not None else load_nvml_library()
+        try:
+            if library is None:
+                raise NvmlError("load", -1)
+            sampler = NvmlSampler(
+                library,
+                interval_seconds=float(os.environ.get("GPU_NVML_SAMPLE_SECONDS", "0.25")),
+                history=int(os.environ.get("GPU_NVML_HISTORY", "240")),
+            )
+            sampler.sample()
+        except (NvmlError, AttributeError, ValueError):
+            _shared_unavailable = True
+            return None
+        _shared = sampler.start()
+        return _shared
+
+
+def reset_shared_sampler():
+    global _shared, _shared_unavailable
+    with _shared_lock:
+        if _shared is not None:
+            _shared.stop()
+        _shared = None
+        _shared_unavailable = False
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 import sys
@@ -12,11 +13,13 @@ from unittest import mock
 SUPPORT_DIR = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(SUPPORT_DIR))
 
+import asset_gen_v7_lite_coordinator as coordinator_module  # noqa: E402
 from asset_gen_v7_lite_coordinator import (  # noqa: E402
     GPUCoordinator,
     LeaseConflict,
     SnapshotStore,
     StaleLease,
+    _merkle_root,
 )
 
 
@@ -67,6 +70,84 @@ class SnapshotStoreTest(unittest.TestCase):
             self.assertIsNone(store.get(handle))
             self.assertFalse((Path(directory) / f"{handle}.slot").exists())
 
+    def test_chunked_manifest_detects_single_corrupt_block(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SnapshotStore(directory, "fp", min_free_bytes=0, chunk_bytes=4, hash_workers=3)
+            handle = "v1." + "d" * 64
+            temporary = store.temporary_filename(handle)
+            (Path(directory) / temporary).write_bytes(b"0123456789abcdefghij")
+            committed = store.commit(handle, temporary, {"coldPrefillMs": 1000})
+            self.assertEqual(committed["integrity"], "sha256-merkle-v1")
+            self.assertEqual(len(committed["chunkSha256"]), 5)
+            self.assertEqual(committed["sha256"], _merkle_root(committed["chunkSha256"]))
+            self.assertIsNotNone(SnapshotStore(directory, "fp", min_free_bytes=0).get(handle))
+            (Path(directory) / f"{handle}.slot").write_bytes(b"0123456789abXdefghij")
+            self.assertIsNone(store.get(handle))
+            self.assertFalse((Path(directory) / f"{handle}.slot").exists())
+            self.assertEqual(store.status()["verification"]["corrupt"], 1)
+
+    def test_verified_file_identity_skips_rehash_until_file_changes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SnapshotStore(directory, "fp", min_free_bytes=0, chunk_bytes=4)
+            handle = "v1." + "e" * 64
+            temporary = store.temporary_filename(handle)
+            (Path(directory) / temporary).write_bytes(b"occupied-kv-cache")
+            store.commit(handle, temporary, {"coldPrefillMs": 1000})
+            with mock.patch(
+                "asset_gen_v7_lite_coordinator._chunk_digests",
+                wraps=coordinator_module._chunk_digests,
+            ) as hashed:
+                self.assertIsNotNone(store.get(handle))
+                self.assertIsNotNone(store.get(handle))
+                self.assertEqual(hashed.call_count, 0)
+                slot_path = Path(directory) / f"{handle}.slot"
+                os.utime(slot_path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+                self.assertIsNotNone(store.get(handle))
+                self.assertEqual(hashed.call_count, 1)
+            self.assertEqual(store.status()["verification"], {"cached": 2, "hashed": 1, "corrupt": 0})
+
+    def test_legacy_whole_file_manifest_still_verifies(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SnapshotStore(directory, "fp", min_free_bytes=0)
+            handle = "v1." + "f" * 64
+            temporary = store.temporary_filename(handle)
+            (Path(directory) / temporary).write_bytes(b"legacy-slot")
+            store.commit(handle, temporary, {"coldPrefillMs": 1000})
+            manifest_path = Path(directory) / f"{handle}.json"
+            value = json.loads(manifest_path.read_text())
+            for key in ("integrity", "chunkBytes", "chunkSha256"):
+                value.pop(key)
+            value["sha256"] = hashlib.sha256(b"legacy-slot").hexdigest()
+            manifest_path.write_text(json.dumps(value))
+            self.assertIsNotNone(SnapshotStore(directory, "fp", min_free_bytes=0).get(handle))
+            value["sha256"] = hashlib.sha256(b"other").hexdigest()
+            manifest_path.write_text(json.dumps(value))
+            self.assertIsNone(SnapshotStore(directory, "fp", min_free_bytes=0).get(handle))
+            self.assertFalse((Path(directory) / f"{handle}.slot").exists())
+
+    def test_manifest_index_reparses_only_changed_manifests(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = SnapshotStore(directory, "fp", min_free_bytes=0)
+            handles = ["v1." + letter * 64 for letter in "abc"]
+            for handle in handles:
+                temporary = store.temporary_filename(handle)
+                (Path(directory) / temporary).write_bytes(b"kv")
+                store.commit(handle, temporary, {"promptTokens": 1})
+            with mock.patch.object(store, "_read_manifest", wraps=store._read_manifest) as parsed:
+                self.assertEqual(len(store.entries()), 3)
+                self.assertEqual(store.status()["entries"], 3)
+                store.prune()
+                self.assertEqual(parsed.call_count, 0)
+                manifest_path = Path(directory) / f"{handles[0]}.json"
+                value = json.loads(manifest_path.read_text())
+                value["promptTokens"] = 4096
+                manifest_path.write_text(json.dumps(value))
+                self.assertEqual(sum(item["promptTokens"] for item in store.entries()), 4098)
+                self.assertEqual(parsed.call_count, 1)
+                (Path(directory) / f"{handles[1]}.json").unlink()
+                self.assertEqual({item["handle"] for item in store.entries()}, {handles[0], handles[2]})
+                self.assertEqual(parsed.call_count, 1)
+
     def test_ttl_and_quota_prune(self):
         with tempfile.TemporaryDirectory() as directory:
             store = SnapshotStore(directory, "fp", ttl_seconds=10, quota_bytes=15, min_free_bytes=0)
@@ -227,6 +308,41 @@ class CoordinatorLeaseTest(unittest.TestCase):
             self.assertEqual(state["classification"], "cold")
             self.assertTrue(any("action=erase" in url for url in http.slot_actions))
 
+    def test_parallel_slots_keep_independent_residency_and_slot_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            http = FakeHttp(directory)
+            coordinator = GPUCoordinator(
+                "http://127.0.0.1:8081",
+                "http://127.0.0.1:8188",
+                http,
+                SnapshotStore(directory, "fp", min_free_bytes=0),
+                enabled=True,
+                enforce_transitions=True,
+                snapshot_write=True,
+                snapshot_restore=True,
+                parallel_slots=2,
+            )
+            first, second = "v1." + "1" * 64, "v1." + "2" * 64
+            self.assertEqual(coordinator.prepare_cache(first, slot=0)["classification"], "cold")
+            self.assertEqual(coordinator.prepare_cache(second, slot=1)["classification"], "cold")
+            self.assertEqual(http.slot_actions, [
+                "http://127.0.0.1:8081/slots/0?action=erase",
+                "http://127.0.0.1:8081/slots/1?action=erase",
+            ])
+            coordinator.mark_cache_dirty(second, {"promptTokens": 1000, "coldPrefillMs": 1000}, slot=1)
+            self.assertIsNone(coordinator.save_current_snapshot(slot=0))
+            self.assertIsNotNone(coordinator.save_current_snapshot(slot=1))
+            self.assertEqual([entry["handle"] for entry in coordinator.snapshot_store.list()], [second])
+            self.assertEqual(coordinator.prepare_cache(first, slot=0)["classification"], "resident")
+            self.assertEqual(coordinator.prepare_cache(second, slot=0)["classification"], "restored")
+            self.assertEqual(http.slot_actions[-1], "http://127.0.0.1:8081/slots/0?action=restore")
+            self.assertEqual(
+                [item["resident"] for item in coordinator.quick_status()["slots"]],
+                [True, True],
+            )
+            with self.assertRaises(ValueError):
+                coordinator.prepare_cache(first, slot=2)
+
     def test_unkeyed_requests_are_never_classified_as_keyed_resident_hits(self):
         with tempfile.TemporaryDirectory() as directory:
             coordinator, _ = self.make_coordinator(directory, enforcing=True)
@@ -732,6 +848,35 @@ class CoordinatorLeaseTest(unittest.TestCase):
             coordinator._process_matches = lambda pid, start: pid == 22 and start == "llama-start"
             self.assertEqual(coordinator._comfy_gpu_bytes(), 512 * 1024**2)
 
+    def test_gpu_processes_read_the_nvml_sampler_without_forking_nvidia_smi(self):
+        sampler = mock.Mock(interval_seconds=0.25)
+        sampler.latest.return_value = {"processes": [{"pid": os.getpid(), "usedBytes": 7 * 1024**2, "device": 0}]}
+        nvml = mock.Mock(shared_sampler=mock.Mock(return_value=sampler))
+        with mock.patch.object(coordinator_module, "gpu_nvml_sampler", nvml), mock.patch.object(
+            coordinator_module.subprocess, "run", side_effect=AssertionError("nvidia-smi forked")
+        ):
+            (process,) = GPUCoordinator._gpu_processes()
+        self.assertEqual((process["pid"], process["usedBytes"]), (os.getpid(), 7 * 1024**2))
+        self.assertTrue(process["cmdline"])
+        sampler.latest.assert_called_once_with(max_age_seconds=0.5)
+
+        nvml.shared_sampler.return_value = None
+        smi = mock.Mock(returncode=0, stdout=f"{os.getpid()}, 12\n")
+        with mock.patch.object(coordinator_module, "gpu_nvml_sampler", nvml), mock.patch.object(
+            coordinator_module.subprocess, "run", return_value=smi
+        ):
+            (process,) = GPUCoordinator._gpu_processes()
+        self.assertEqual(process["usedBytes"], 12 * 1024**2)
+
+    def test_unattributable_nvml_process_memory_is_unknown_not_released(self):
+        sampler = mock.Mock(interval_seconds=0.25)
+        sampler.latest.return_value = {"processes": [{"pid": os.getpid(), "usedBytes": None, "device": 0}]}
+        nvml = mock.Mock(shared_sampler=mock.Mock(return_value=sampler))
+        with mock.patch.object(coordinator_module, "gpu_nvml_sampler", nvml), mock.patch.object(
+            coordinator_module.subprocess, "run", side_effect=AssertionError("nvidia-smi forked")
+        ):
+            self.assertIsNone(GPUCoordinator._gpu_processes())
+
     def test_comfy_recovery_never_targets_verified_llama_with_comfy_cwd(self):
         with tempfile.TemporaryDirectory() as directory:
             coordinator, _ = self.make_coordinator(directory)
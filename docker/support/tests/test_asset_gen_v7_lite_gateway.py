@@ -8,6 +8,7 @@ import threading
 import time
 import tempfile
 import unittest
+import urllib.error
 import urllib.request
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
@@ -339,6 +340,15 @@ class GatewayTest(unittest.TestCase):
             self.gateway.ADMISSION_MODE = original_mode
             self.gateway.validate_admission_claim = original_validate
 
+    def test_admission_claim_invalidation_endpoint_drops_cached_verdict(self):
+        self.gateway.ADMISSION_CLAIMS.validate("asset_gen_v7_lite", "ticket-1", "claim-cached", "request-1", lambda *_args: True)
+        status, _, body = self.request(
+            "/v1/gpu/admission-claims/invalidate", method="POST", payload={"claimId": "claim-cached"}
+        )
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {"invalidated": 1})
+        self.assertEqual(self.gateway.ADMISSION_CLAIMS.snapshot()["entries"], 0)
+
     def test_release_acknowledgements_are_gateway_boot_identified(self):
         self.gateway.set_release("request-boot-id", "request_complete", gpu_released=True, request_complete=True)
         status, headers, body = self.request("/v1/gpu/releases/request-boot-id")
@@ -394,7 +404,7 @@ class GatewayTest(unittest.TestCase):
 
     def test_ineffective_restore_is_reported_as_a_cold_error(self):
         class Coordinator:
-            def mark_cache_dirty(self, _handle, _metadata):
+            def mark_cache_dirty(self, _handle, _metadata, slot=0):
                 return {"restoreIneffective": True}
 
         original = self.gateway.get_coordinator
@@ -479,7 +489,7 @@ class GatewayTest(unittest.TestCase):
         self.assertEqual(concurrency["gpuExecutionsCompleted"], 1)
 
     def test_lock_contention_returns_busy_without_forwarding(self):
-        self.gateway.GPU_LOCK.acquire()
+        slot, _ = self.gateway.SLOT_SCHEDULER.acquire("request-holder")
         try:
             request = urllib.request.Request(
                 self.base_url + "/v1/chat/completions",
@@ -499,7 +509,7 @@ class GatewayTest(unittest.TestCase):
             self.assertTrue(release["request_complete"])
             self.assertEqual(release["code"], "queue_timeout")
         finally:
-            self.gateway.GPU_LOCK.release()
+            self.gateway.SLOT_SCHEDULER.release(slot)
 
     def test_rejects_non_hmac_prompt_cache_handle(self):
         request = urllib.request.Request(
@@ -615,5 +625,397 @@ class GatewayTest(unittest.TestCase):
         self.assertTrue(self.state.backend_disconnected)
 
 
+    def test_broken_pipe_after_release_is_finalised_keeps_the_settled_receipt(self):
+        sleeps = []
+        original_sleep = self.gateway.force_llama_sleep
+        original_send_bytes = self.gateway.Handler.send_bytes
+
+        def counting_sleep():
+            sleeps.append(time.monotonic())
+            return original_sleep()
+
+        def broken_send_bytes(handler, status, content_type, body, headers=None):
+            if (headers or {}).get("X-Furgen-Gpu-Release-Id") == "request-broken-pipe":
+                raise BrokenPipeError("client went away")
+            return original_send_bytes(handler, status, content_type, body, headers=headers)
+
+        self.gateway.force_llama_sleep = counting_sleep
+        self.gateway.Handler.send_bytes = broken_send_bytes
+        with self.assertRaises((http.client.HTTPException, ConnectionError, urllib.error.URLError)):
+            self.request(
+                "/v1/chat/completions",
+                method="POST",
+                payload={"model": "qwen", "messages": [{"role": "user", "content": "hello"}]},
+                request_id="request-broken-pipe",
+            )
+        release = self.wait_for_safe_release("request-broken-pipe")
+        self.assertEqual(release["phase"], "request_complete")
+        self.assertNotEqual(release.get("code"), "gpu_release_failed")
+        self.assertEqual(len(sleeps), 1)
+        self.assertFalse(self.gateway.INFERENCE_LEASE.members)
+
+class FakeParallelLlama:
+    """llama-server stand-in that serves --parallel slots and records their use."""
+
+    def __init__(self, slots):
+        self.slots = slots
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.finished = []
+        self.slot_ids = []
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, _format, *_args):
+                return
+
+            def send_json(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with fake.lock:
+                    sleeping = fake.active == 0
+                self.send_json({"is_sleeping": sleeping, "status": "ok"})
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+                if self.path == "/free":
+                    self.send_json({"ok": True})
+                    return
+                with fake.lock:
+                    fake.active += 1
+                    fake.max_active = max(fake.max_active, fake.active)
+                    fake.slot_ids.append(payload.get("id_slot"))
+                time.sleep(float(payload.get("test_seconds", 0)))
+                with fake.lock:
+                    fake.active -= 1
+                    fake.finished.append(payload["test_name"])
+                self.send_json({"choices": [{"finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}]})
+
+        return Handler
+
+
+class ParallelSlotGatewayTest(unittest.TestCase):
+    def setUp(self):
+        self.gateway = load_gateway()
+        self.gateway.LLAMA_PARALLEL_SLOTS = 2
+        self.gateway.SLOT_SCHEDULER = self.gateway.SlotScheduler(2, 4)
+        self.llama = FakeParallelLlama(2)
+        self.backend = ThreadingHTTPServer(("127.0.0.1", 0), self.llama.handler())
+        threading.Thread(target=self.backend.serve_forever, daemon=True).start()
+        backend_url = f"http://127.0.0.1:{self.backend.server_address[1]}"
+        self.gateway.LLAMA_BASE_URL = backend_url
+        self.gateway.COMFY_BASE_URL = backend_url
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.gateway.Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.backend.shutdown()
+        self.backend.server_close()
+
+    def chat(self, name, seconds, results):
+        request = urllib.request.Request(
+            self.base_url + "/v1/chat/completions",
+            data=json.dumps({
+                "model": "qwen",
+                "messages": [{"role": "user", "content": name}],
+                "test_name": name,
+                "test_seconds": seconds,
+            }).encode(),
+            headers={
+                "Authorization": "Bearer test-instance-key",
+                "Content-Type": "application/json",
+                "X-Furgen-Request-Id": name,
+            },
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            results[name] = response.status
+
+    def release(self, request_id):
+        request = urllib.request.Request(
+            f"{self.base_url}/v1/gpu/releases/{request_id}",
+            headers={"Authorization": "Bearer test-instance-key"},
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return json.loads(response.read())
+
+    def test_short_requests_overtake_a_long_generation_on_free_slots(self):
+        results = {}
+        started = time.monotonic()
+        long_request = threading.Thread(target=self.chat, args=("long", 0.8, results))
+        long_request.start()
+        time.sleep(0.1)
+        for index in range(3):
+            self.chat(f"short-{index}", 0.1, results)
+        short_elapsed = time.monotonic() - started
+        long_request.join(timeout=10)
+
+        self.assertEqual(results, {"long": 200, "short-0": 200, "short-1": 200, "short-2": 200})
+        self.assertEqual(self.llama.finished, ["short-0", "short-1", "short-2", "long"])
+        self.assertLess(short_elapsed, 0.8)
+        self.assertEqual(self.llama.max_active, 2)
+        self.assertEqual(set(self.llama.slot_ids), {0, 1})
+        for name in results:
+            self.assertTrue(self.release(name)["safe"], name)
+        self.assertEqual(self.gateway.SLOT_SCHEDULER.snapshot()["busy"], 0)
+
+    def test_requests_beyond_free_slots_are_rejected_without_forwarding(self):
+        results = {}
+        threads = [threading.Thread(target=self.chat, args=(f"busy-{index}", 0.5, results)) for index in range(2)]
+        for thread in threads:
+            thread.start()
+        while self.llama.max_active < 2:
+            time.sleep(0.005)
+        with self.assertRaises(urllib.error.HTTPError) as caught:
+            self.chat("overflow", 0, results)
+        for thread in threads:
+            thread.join(timeout=10)
+        self.assertEqual(caught.exception.code, 429)
+        self.assertEqual(self.release("overflow")["code"], "queue_timeout")
+        self.assertNotIn("overflow", self.llama.finished)
+
+
+class SlotSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.gateway = load_gateway()
+
+    def test_waiters_are_granted_in_arrival_order(self):
+        scheduler = self.gateway.SlotScheduler(1, 8)
+        holder, _ = scheduler.acquire("holder")
+        granted = []
+
+        def wait(name):
+            slot, outcome = scheduler.acquire(name, timeout=5)
+            granted.append((name, outcome))
+            time.sleep(0.01)
+            scheduler.release(slot)
+
+        threads = []
+        for name in ("a", "b", "c"):
+            thread = threading.Thread(target=wait, args=(name,))
+            thread.start()
+            threads.append(thread)
+            deadline = time.monotonic() + 2
+            while scheduler.snapshot()["waiting"] < len(threads) and time.monotonic() < deadline:
+                time.sleep(0.005)
+        scheduler.release(holder)
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(granted, [("a", "granted"), ("b", "granted"), ("c", "granted")])
+
+    def test_queue_bound_timeout_and_cancellation(self):
+        scheduler = self.gateway.SlotScheduler(1, 1)
+        holder, _ = scheduler.acquire("holder")
+        self.assertEqual(scheduler.acquire("late", timeout=0), (None, "timeout"))
+        outcome = {}
+        thread = threading.Thread(target=lambda: outcome.update(queued=scheduler.acquire("queued", timeout=5)))
+        thread.start()
+        while scheduler.snapshot()["waiting"] == 0:
+            time.sleep(0.005)
+        self.assertEqual(scheduler.acquire("overflow", timeout=5), (None, "queue_full"))
+        self.assertTrue(scheduler.cancel("queued"))
+        thread.join(timeout=2)
+        self.assertEqual(outcome["queued"], (None, "cancelled"))
+        scheduler.release(holder)
+        self.assertEqual(scheduler.acquire("next")[1], "granted")
+
+    def test_prompt_cache_affinity_and_slot_context_budget(self):
+        scheduler = self.gateway.SlotScheduler(3, 0, context_tokens=1000)
+        slots = [scheduler.acquire(f"warm-{index}")[0] for index in range(3)]
+        handle = "v1." + "c" * 64
+        scheduler.release(slots[1], handle)
+        scheduler.release(slots[0])
+        scheduler.release(slots[2])
+        self.assertEqual(scheduler.acquire("keyed", handle)[0], slots[1])
+        self.assertEqual(scheduler.acquire("unkeyed")[0], slots[0])
+
+        small = {"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 100}
+        image = {"messages": [{"role": "user", "content": [{"type": "image_url", "image_url": {"url": "data:" + "A" * 100000}}]}]}
+        self.assertTrue(scheduler.fits(self.gateway.estimate_request_tokens(small)))
+        self.assertEqual(self.gateway.estimate_request_tokens(image), self.gateway.IMAGE_TOKEN_ESTIMATE)
+        self.assertFalse(scheduler.fits(self.gateway.estimate_request_tokens({**small, "max_tokens": 1000})))
+
+
+class SharedInferenceLeaseTest(unittest.TestCase):
+    def test_acquire_runs_without_holding_the_lease_lock(self):
+        gateway = load_gateway()
+        lease = gateway.SharedInferenceLease()
+        acquiring = threading.Event()
+        proceed = threading.Event()
+        calls = []
+        results = {}
+
+        def acquire():
+            calls.append("acquire")
+            acquiring.set()
+            proceed.wait(5)
+            return {"fencingToken": "token-1"}
+
+        first = threading.Thread(target=lambda: results.setdefault("first", lease.join("first", acquire)))
+        first.start()
+        self.assertTrue(acquiring.wait(5))
+        self.assertTrue(lease.condition.acquire(timeout=0.5))
+        lease.condition.release()
+        second = threading.Thread(target=lambda: results.setdefault("second", lease.join("second", acquire)))
+        second.start()
+        time.sleep(0.05)
+        self.assertNotIn("second", results)
+        proceed.set()
+        first.join(timeout=5)
+        second.join(timeout=5)
+
+        self.assertEqual(calls, ["acquire"])
+        self.assertEqual(results["first"], {"fencingToken": "token-1"})
+        self.assertEqual(results["second"], {"fencingToken": "token-1"})
+        self.assertEqual(lease.members, {"first", "second"})
+
+    def test_failed_acquire_lets_the_next_joiner_retry(self):
+        gateway = load_gateway()
+        lease = gateway.SharedInferenceLease()
+
+        def failing_acquire():
+            raise gateway.CoordinatorError("coordinator unavailable")
+
+        with self.assertRaises(gateway.CoordinatorError):
+            lease.join("first", failing_acquire)
+        self.assertEqual(lease.join("second", lambda: {"fencingToken": "token-2"}), {"fencingToken": "token-2"})
+        self.assertEqual(lease.members, {"second"})
+
+
+class AdmissionClaimCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.gateway = load_gateway()
+        self.calls = []
+        self.verdict = True
+        self.delay = 0.0
+
+    def fetch(self, *key):
+        self.calls.append(key)
+        time.sleep(self.delay)
+        if isinstance(self.verdict, Exception):
+            raise self.verdict
+        return self.verdict
+
+    def validate(self, cache, claim="claim-1", request_id="request-1"):
+        return cache.validate("asset_gen_v7_lite", "ticket-1", claim, request_id, self.fetch)
+
+    def test_valid_claims_expire_and_are_shared_across_requests_on_the_claim(self):
+        cache = self.gateway.AdmissionClaimCache(0.2, 60)
+        self.assertTrue(self.validate(cache))
+        self.assertTrue(self.validate(cache))
+        self.assertTrue(self.validate(cache, request_id="request-2"))
+        self.assertEqual(self.calls, [("asset_gen_v7_lite", "ticket-1", "claim-1", "request-1")])
+        self.assertEqual(cache.snapshot()["hits"], 2)
+        self.assertTrue(self.validate(cache, claim="claim-2", request_id="request-2"))
+        self.assertEqual(len(self.calls), 2)
+        time.sleep(0.25)
+        self.verdict = False
+        self.assertFalse(self.validate(cache, request_id="request-3"))
+        self.assertEqual(self.calls[-1], ("asset_gen_v7_lite", "ticket-1", "claim-1", "request-3"))
+
+    def test_revocations_are_cached_errors_are_not_and_invalidation_forces_revalidation(self):
+        cache = self.gateway.AdmissionClaimCache(30, 30)
+        self.verdict = RuntimeError("validator unavailable")
+        with self.assertRaises(RuntimeError):
+            self.validate(cache)
+        self.verdict = False
+        self.assertFalse(self.validate(cache))
+        self.verdict = True
+        self.assertFalse(self.validate(cache))
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(cache.invalidate("claim-1"), 1)
+        self.assertTrue(self.validate(cache))
+        self.assertEqual(cache.invalidate(), 1)
+        self.assertEqual(cache.snapshot()["entries"], 0)
+
+    def test_validator_outage_is_not_cached_as_a_revocation(self):
+        cache = self.gateway.AdmissionClaimCache(30, 300)
+        responses = [
+            (503, "application/json", b'{"error":"unavailable"}'),
+            (200, "application/json", b"not json"),
+            (200, "application/json", b'{"valid":true}'),
+        ]
+        original_http = self.gateway.http_request
+        original_url = self.gateway.ADMISSION_VALIDATION_URL
+        self.gateway.http_request = lambda *_args, **_kwargs: responses.pop(0)
+        self.gateway.ADMISSION_VALIDATION_URL = "http://validator.invalid/claims"
+        try:
+            fetch = self.gateway.fetch_admission_claim_validity
+            for _ in range(2):
+                with self.assertRaises(RuntimeError):
+                    cache.validate("asset_gen_v7_lite", "ticket-1", "claim-1", "request-1", fetch)
+            self.assertTrue(cache.validate("asset_gen_v7_lite", "ticket-1", "claim-1", "request-1", fetch))
+        finally:
+            self.gateway.http_request = original_http
+            self.gateway.ADMISSION_VALIDATION_URL = original_url
+        self.assertEqual(responses, [])
+
+    def test_validator_client_errors_about_the_claim_are_revocations(self):
+        responses = [
+            (404, "application/json", b'{"error":"claim not found"}'),
+            (410, "application/json", b'{"error":"claim revoked"}'),
+            (409, "application/json", b'{"valid":false}'),
+            (429, "application/json", b'{"error":"slow down"}'),
+            (401, "application/json", b'{"error":"unauthorized"}'),
+        ]
+        original_http = self.gateway.http_request
+        original_url = self.gateway.ADMISSION_VALIDATION_URL
+        self.gateway.http_request = lambda *_args, **_kwargs: responses.pop(0)
+        self.gateway.ADMISSION_VALIDATION_URL = "http://validator.invalid/claims"
+        try:
+            fetch = self.gateway.fetch_admission_claim_validity
+            for _ in range(3):
+                self.assertFalse(fetch("asset_gen_v7_lite", "ticket-1", "claim-1", "request-1"))
+            for _ in range(2):
+                with self.assertRaises(RuntimeError):
+                    fetch("asset_gen_v7_lite", "ticket-1", "claim-1", "request-1")
+        finally:
+            self.gateway.http_request = original_http
+            self.gateway.ADMISSION_VALIDATION_URL = original_url
+        self.assertEqual(responses, [])
+
+    def test_slow_validator_is_called_once_for_concurrent_lookups(self):
+        cache = self.gateway.AdmissionClaimCache(30, 30)
+        self.delay = 0.3
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.validate(cache))) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        self.assertEqual(results, [True] * 6)
+        self.assertEqual(len(self.calls), 1)
+        started = time.monotonic()
+        self.assertTrue(self.validate(cache))
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertEqual(cache.snapshot()["coalesced"], 5)
+
+    def test_invalidation_during_a_slow_validation_is_not_overwritten(self):
+        cache = self.gateway.AdmissionClaimCache(30, 30)
+        self.delay = 0.2
+        thread = threading.Thread(target=self.validate, args=(cache,))
+        thread.start()
+        while not cache.snapshot()["inflight"]:
+            time.sleep(0.005)
+        self.assertEqual(cache.invalidate("claim-1"), 1)
+        thread.join(timeout=5)
+        self.delay = 0
+        self.verdict = False
+        self.assertFalse(self.validate(cache))
+        self.assertEqual(len(self.calls), 2)
+
+
 if __name__ == "__main__":
     unittest.main()
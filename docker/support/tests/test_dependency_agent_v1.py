@@ -0,0 +1,1752 @@
+import base64
+import bisect
+import hashlib
+import importlib.util
+import json
+import os
+import socket
+import sqlite3
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import urllib.parse
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+
+SUPPORT_DIR = Path(__file__).resolve().parents[1]
+MODULE_PATH = SUPPORT_DIR.parent / "scripts" / "dependency_agent_v1.py"
+
+
+def load_agent():
+    spec = importlib.util.spec_from_file_location("dependency_agent_v1_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    assert spec.loader is not None
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+agent = load_agent()
+
+
+def write_aria2_control(path, piece_length, total_length, completed_pieces):
+    piece_count = (total_length + piece_length - 1) // piece_length
+    bitfield = bytearray((piece_count + 7) // 8)
+    for index in completed_pieces:
+        bitfield[index // 8] |= 0x80 >> (index % 8)
+    payload = struct.pack(">HII", 1, 0, 0)
+    payload += struct.pack(">IQQI", piece_length, total_length, 0, len(bitfield))
+    payload += bytes(bitfield) + struct.pack(">I", 0)
+    path.write_bytes(payload)
+
+
+class RangeSha256Test(unittest.TestCase):
+    def test_out_of_order_ranges_hash_only_the_contiguous_prefix(self):
+        data = os.urandom(5 * 65536 + 123)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "blob.partial"
+            path.write_bytes(data)
+            hasher = agent.RangeSha256(path, chunk_size=65536)
+
+            hasher.mark_complete(2 * 65536, 4 * 65536)
+            self.assertEqual(hasher.advance(), 0)
+            hasher.mark_complete(0, 65536)
+            self.assertEqual(hasher.advance(), 65536)
+            hasher.mark_complete(65536, 2 * 65536)
+            self.assertEqual(hasher.advance(), 3 * 65536)
+            self.assertEqual(hasher.hexdigest(len(data)), "")
+
+            hasher.mark_complete(0, len(data))
+            hasher.advance()
+            self.assertEqual(hasher.hexdigest(len(data)), hashlib.sha256(data).hexdigest())
+
+    def test_update_after_prefix_matches_full_digest(self):
+        data = os.urandom(300000)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "blob.partial"
+            path.write_bytes(data[:100000])
+            hasher = agent.RangeSha256(path)
+            hasher.mark_complete(0, 100000)
+            hasher.advance()
+            hasher.update(data[100000:])
+            self.assertEqual(hasher.hexdigest(len(data)), hashlib.sha256(data).hexdigest())
+
+    def test_update_at_ignores_resent_ranges(self):
+        data = os.urandom(3000)
+        hasher = agent.RangeSha256(Path("unused"))
+        hasher.update_at(0, data[:1000])
+        hasher.update_at(2000, data[2000:])
+        hasher.update_at(0, data[:1000])
+        hasher.update_at(500, data[500:2000])
+        hasher.update_at(2000, data[2000:])
+        self.assertEqual(hasher.hexdigest(len(data)), hashlib.sha256(data).hexdigest())
+
+    def test_aria2_control_bitfield_is_merged_into_ranges(self):
+        with tempfile.TemporaryDirectory() as directory:
+            control = Path(directory) / "blob.partial.aria2"
+            write_aria2_control(control, piece_length=1024, total_length=4500, completed_pieces=[0, 1, 3, 4])
+            self.assertEqual(
+                agent._aria2_control_completed_ranges(control),
+                [(0, 2048), (3072, 4500)],
+            )
+            control.write_bytes(b"\x00\x07garbage")
+            self.assertIsNone(agent._aria2_control_completed_ranges(control))
+
+
+class HttpDownloadDigestTest(unittest.TestCase):
+    def setUp(self):
+        self.body = os.urandom(3 * 1024 * 1024 + 17)
+        body = self.body
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, _format, *_args):
+                return
+
+            def do_GET(self):
+                start = 0
+                range_header = self.headers.get("Range")
+                if range_header:
+                    start = int(range_header.split("=", 1)[1].rstrip("-"))
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(body) - start))
+                self.end_headers()
+                self.wfile.write(body[start:])
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/model.safetensors"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fresh_and_resumed_downloads_return_in_flight_digest(self):
+        expected = hashlib.sha256(self.body).hexdigest()
+        with tempfile.TemporaryDirectory() as directory:
+            partial = Path(directory) / "model.safetensors.partial"
+            digest = agent.http_download(self.url, partial, None, expected_size_bytes=len(self.body), chunk_size=65536)
+            self.assertEqual(digest, expected)
+
+            partial.write_bytes(self.body[:1000003])
+            digest = agent.http_download(self.url, partial, None, expected_size_bytes=len(self.body), chunk_size=65536)
+            self.assertEqual(digest, expected)
+            self.assertEqual(partial.read_bytes(), self.body)
+
+    def test_tool_fallback_reports_digest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            dest = Path(directory) / "archive.zip"
+            tool, digest = agent.download_file_with_tool_fallback(self.url, dest, tools=["python"])
+            self.assertEqual(tool, "python")
+            self.assertEqual(digest, hashlib.sha256(self.body).hexdigest())
+
+
+class HuggingFaceHubStagingTest(unittest.TestCase):
+    def test_restaging_an_unchanged_cache_blob_reuses_its_digest(self):
+        body = os.urandom(256 * 1024 + 3)
+        with tempfile.TemporaryDirectory() as directory:
+            root = Path(directory)
+            blob = root / "hub" / "blobs" / "blob"
+            blob.parent.mkdir(parents=True)
+            blob.write_bytes(body)
+            hub = mock.Mock(hf_hub_download=mock.Mock(return_value=str(blob)))
+            url = "https://huggingface.co/org/repo/resolve/abc123/model.safetensors"
+            real_sha256_file = agent.sha256_file
+            with mock.patch.dict(sys.modules, {"huggingface_hub": hub}), mock.patch.dict(
+                os.environ, {"DM_HF_CACHE_DIR": str(root / "hub")}
+            ), mock.patch.object(agent, "sha256_file", side_effect=real_sha256_file) as hashed:
+                first = agent.huggingface_hub_download(url, root / "a.partial", None, len(body))
+                second = agent.huggingface_hub_download(url, root / "b.partial", None, len(body))
+                self.assertEqual(hashed.call_count, 1)
+
+                os.utime(blob, ns=(0, 0))
+                agent.huggingface_hub_download(url, root / "c.partial", None, len(body))
+                self.assertEqual(hashed.call_count, 2)
+            self.assertEqual(first, hashlib.sha256(body).hexdigest())
+            self.assertEqual(second, first)
+            self.assertEqual((root / "b.partial").read_bytes(), body)
+
+
+
+class GpuTelemetryTest(unittest.TestCase):
+    def test_nvml_sampler_readings_replace_nvidia_smi(self):
+        sampler = mock.Mock()
+        sampler.latest.return_value = {
+            "atMs": 1234,
+            "devices": [{
+                "name": "NVIDIA RTX 5090", "utilizationGpuPct": 87.0, "memoryUsedBytes": 6 * 1024**3,
+                "memoryTotalBytes": 32 * 1024**3, "powerDrawW": 402.5, "smClockMhz": 2400.0,
+                "pstate": "P2", "throttleReasons": "0x0000000000000004",
+            }],
+            "processes": [],
+        }
+        module = mock.Mock(shared_sampler=mock.Mock(return_value=sampler))
+        with mock.patch.object(agent, "_gpu_nvml_sampler", return_value=module), mock.patch.object(
+            agent.subprocess, "run", side_effect=AssertionError("nvidia-smi forked")
+        ):
+            telemetry = agent._query_gpu_telemetry()
+        self.assertEqual(telemetry, {
+            "gpuName": "NVIDIA RTX 5090",
+            "gpuTelemetryAtMs": 1234,
+            "gpuUtilizationPct": 87.0,
+            "gpuMemoryUsedMb": 6144.0,
+            "gpuMemoryTotalMb": 32768.0,
+            "gpuPowerDrawW": 402.5,
+            "gpuSmClockMhz": 2400.0,
+            "gpuPstate": "P2",
+            "gpuClocksThrottleReasonsActive": "0x0000000000000004",
+        })
+
+    def test_missing_nvml_falls_back_to_nvidia_smi(self):
+        smi = subprocess.CompletedProcess([], 0, stdout="NVIDIA RTX 5090, 50, 1024, 300\n")
+        with mock.patch.object(agent, "_gpu_nvml_sampler", return_value=None), mock.patch.object(
+            agent.subprocess, "run", return_value=smi
+        ):
+            telemetry = agent._query_gpu_telemetry()
+        self.assertEqual(telemetry["gpuName"], "NVIDIA RTX 5090")
+        self.assertEqual(telemetry["gpuMemoryUsedMb"], 1024.0)
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    active = 0
+    peak = 0
+    puts = 0
+    lock = threading.Lock()
+    delay = 0.0
+
+    def log_message(self, _format, *_args):
+        return
+
+    def _reply(self, status, body, location=None):
+        self.send_response(status)
+        if location:
+            self.send_header("Location", location)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            if cls.delay:
+                time.sleep(cls.delay)
+            if self.path.startswith("/missing"):
+                self._reply(404, b'{"error":"missing"}')
+            elif self.path.startswith("/moved"):
+                self._reply(302, b"", location="/ok")
+            else:
+                self._reply(200, b'{"ok":true}')
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def do_PUT(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length)
+        if self.path.startswith("/moved"):
+            self._reply(307, b"", location="/put")
+            return
+        with type(self).lock:
+            type(self).puts += 1
+        self._reply(200, json.dumps({"bytes": len(body)}).encode())
+
+
+class HttpConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        KeepAliveHandler.active = 0
+        KeepAliveHandler.peak = 0
+        KeepAliveHandler.puts = 0
+        KeepAliveHandler.delay = 0.0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.pool = agent.HttpConnectionPool(max_per_host=2, idle_seconds=30.0)
+
+    def tearDown(self):
+        self.pool.close_idle()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sequential_requests_reuse_one_connection(self):
+        for _ in range(5):
+            status, body, _headers = self.pool.request("GET", self.base_url + "/ok")
+            self.assertEqual((status, json.loads(body)), (200, {"ok": True}))
+        status, body, _headers = self.pool.request("PUT", self.base_url + "/put", body=b"x" * 1000)
+        self.assertEqual(json.loads(body), {"bytes": 1000})
+
+        (row,) = self.pool.snapshot()
+        self.assertEqual(row["requests"], 6)
+        self.assertEqual(row["newConnections"], 1)
+        self.assertEqual(row["reusedConnections"], 5)
+
+    def test_per_host_cap_bounds_concurrency(self):
+        KeepAliveHandler.delay = 0.1
+        threads = [threading.Thread(target=self.pool.request, args=("GET", self.base_url + "/ok")) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(KeepAliveHandler.peak, 2)
+        self.assertEqual(self.pool.snapshot()[0]["requests"], 6)
+
+    def test_idle_connections_are_retired(self):
+        self.pool.idle_seconds = 0.0
+        self.pool.request("GET", self.base_url + "/ok")
+        time.sleep(0.01)
+        self.pool.request("GET", self.base_url + "/ok")
+        row = self.pool.snapshot()[0]
+        self.assertEqual(row["newConnections"], 2)
+        self.assertEqual(row["retiredIdle"], 1)
+
+    def test_peer_closed_connection_is_not_reused(self):
+        self.pool.request("GET", self.base_url + "/ok")
+        for conn, _idle_since in self.pool._hosts[("http", "127.0.0.1", self.server.server_address[1])].idle:
+            conn.sock.shutdown(socket.SHUT_WR)
+        time.sleep(0.05)
+        status, _body, _headers = self.pool.request("GET", self.base_url + "/ok")
+        self.assertEqual(status, 200)
+        self.assertEqual(self.pool.snapshot()[0]["newConnections"], 2)
+
+    def test_api_json_maps_pooled_errors_to_api_error(self):
+        status, payload = agent.api_json("GET", self.base_url + "/ok")
+        self.assertEqual((status, payload), (200, {"ok": True}))
+        with self.assertRaises(agent.ApiError) as raised:
+            agent.api_json("GET", self.base_url + "/missing")
+        self.assertEqual(raised.exception.status, 404)
+
+
+    def test_redirects_are_followed_for_get_but_never_replay_a_put_body(self):
+        status, body, _headers = agent._pooled_http_request("GET", self.base_url + "/moved")
+        self.assertEqual((status, json.loads(body)), (200, {"ok": True}))
+
+        status, _body, headers = agent._pooled_http_request("PUT", self.base_url + "/moved", body=b"x" * 100)
+        self.assertEqual(status, 307)
+        self.assertEqual(headers.get("location"), "/put")
+        self.assertEqual(KeepAliveHandler.puts, 0)
+
+class FakeGcsResumableSession:
+    """In-memory GCS resumable session with scripted per-PUT failures.
+
+    Failure actions: "503" replies with a server error, "short" persists only
+    the first 256 KiB of the chunk and replies 308, "drop" persists half of the
+    chunk and closes the connection without replying.
+    """
+
+    def __init__(self, total_size, failures=None):
+        self.total_size = total_size
+        self.data = bytearray()
+        self.failures = dict(failures or {})
+        self.chunk_puts = 0
+        self.status_queries = 0
+        self.lock = threading.Lock()
+
+    def range_header(self):
+        return {"Range": f"bytes=0-{len(self.data) - 1}"} if self.data else {}
+
+
+def fake_gcs_handler(session):
+    class FakeGcsHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, _format, *_args):
+            return
+
+        def reply(self, status, headers=None, body=b""):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_PUT(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = self.rfile.read(length)
+            content_range = self.headers.get("Content-Range") or ""
+            with session.lock:
+                if content_range.startswith("bytes */"):
+                    session.status_queries += 1
+                    if len(session.data) == session.total_size:
+                        self.reply(200, body=b"{}")
+                    else:
+                        self.reply(308, session.range_header())
+                    return
+                span, total = content_range[len("bytes "):].split("/")
+                start, end = (int(value) for value in span.split("-"))
+                if int(total) != session.total_size or end - start + 1 != len(payload):
+                    self.reply(400, body=b"bad content-range")
+                    return
+                if start > len(session.data):
+                    self.reply(400, body=b"gap before chunk")
+                    return
+                overlap = len(session.data) - start
+                if bytes(session.data[start:]) != payload[:overlap]:
+                    self.reply(400, body=b"overlapping bytes differ")
+                    return
+                session.chunk_puts += 1
+                action = session.failures.pop(session.chunk_puts, None)
+                fresh = payload[overlap:]
+                if action == "503":
+                    self.reply(503, body=b"backend error")
+                    return
+                if action == "short":
+                    session.data.extend(fresh[:256 * 1024])
+                    self.reply(308, session.range_header())
+                    return
+                if action == "drop":
+                    session.data.extend(fresh[:len(fresh) // 2])
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                session.data.extend(fresh)
+                if len(session.data) == session.total_size:
+                    self.reply(200, body=b"{}")
+                else:
+                    self.reply(308, session.range_header())
+
+    return FakeGcsHandler
+
+
+class GcsResumableUploadTest(unittest.TestCase):
+    def upload(self, failures=None, prefetch=True):
+        content = os.urandom(3 * 1024 * 1024 + 4097)
+        session = FakeGcsResumableSession(len(content), failures)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), fake_gcs_handler(session))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        progress = []
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(agent, "_sleep_with_jitter"):
+            path = Path(directory) / "output.mp4"
+            path.write_bytes(content)
+            agent.gcs_resumable_upload_file(
+                f"http://127.0.0.1:{server.server_address[1]}/upload?upload_id=test",
+                path,
+                "video/mp4",
+                timeout_seconds=10.0,
+                chunk_size=1024 * 1024,
+                progress_cb=lambda done, total: progress.append(done),
+                prefetch=prefetch,
+            )
+        self.assertEqual(bytes(session.data), content)
+        self.assertEqual(progress[-1], len(content))
+        return session
+
+    def test_clean_upload_reuses_one_connection(self):
+        agent.HTTP_POOL.close_idle()
+        before = {row["origin"]: row for row in agent.HTTP_POOL.snapshot()}
+        session = self.upload()
+        self.assertEqual(session.chunk_puts, 4)
+        rows = [row for row in agent.HTTP_POOL.snapshot() if row["origin"] not in before]
+        self.assertEqual(rows[0]["newConnections"], 1)
+        self.assertEqual(rows[0]["reusedConnections"], 3)
+
+    def test_server_errors_resume_from_queried_offset(self):
+        session = self.upload({2: "503", 4: "503"})
+        self.assertGreaterEqual(session.status_queries, 2)
+
+    def test_partially_persisted_chunks_discard_the_prefetched_chunk(self):
+        for prefetch in (True, False):
+            with self.subTest(prefetch=prefetch):
+                session = self.upload({1: "short", 3: "short"}, prefetch=prefetch)
+                self.assertEqual(session.chunk_puts, 5)
+
+    def test_dropped_connection_mid_chunk_resumes(self):
+        self.upload({2: "drop"})
+
+
+class FakeComfyWebSocket(socketserver.BaseRequestHandler):
+    def handle(self):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return
+            request += chunk
+        headers = {}
+        lines = request.decode("iso-8859-1").split("\r\n")
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        client_id = lines[0].split("clientId=", 1)[-1].split(" ", 1)[0]
+        accept = base64.b64encode(
+            hashlib.sha1((headers["sec-websocket-key"] + agent.ComfyWebSocketClient._WS_GUID).encode("ascii")).digest()
+        ).decode("ascii")
+        self.request.sendall(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode("ascii")
+        )
+        self.server.attach(self.request)
+        self.server.push({"type": "status", "data": {"status": {}, "sid": client_id}})
+        try:
+            while self.request.recv(4096):
+                pass
+        except OSError:
+            pass
+
+
+class FakeComfyServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FakeComfyWebSocket)
+        self.lock = threading.Lock()
+        self.client = None
+        self.connections = 0
+
+    def attach(self, sock):
+        with self.lock:
+            self.client = sock
+            self.connections += 1
+
+    def push(self, message):
+        payload = json.dumps(message).encode("utf-8")
+        if len(payload) < 126:
+            header = bytes([0x81, len(payload)])
+        else:
+            header = bytes([0x81, 126]) + struct.pack("!H", len(payload))
+        with self.lock:
+            self.client.sendall(header + payload)
+
+    def drop(self):
+        with self.lock:
+            client, self.client = self.client, None
+        client.shutdown(socket.SHUT_RDWR)
+        client.close()
+
+    def wait_for_connections(self, count, timeout=5.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                if self.connections >= count and self.client is not None:
+                    return True
+            time.sleep(0.01)
+        return False
+
+
+class ComfyPromptEventStreamTest(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeComfyServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.stream = agent.ComfyPromptEventStream(
+            f"http://127.0.0.1:{self.server.server_address[1]}",
+            client_id="dm-agent-test",
+            reconnect_seconds=0.05,
+        )
+        self.assertTrue(self.stream.start(timeout_seconds=5.0))
+        self.assertTrue(self.server.wait_for_connections(1))
+
+    def tearDown(self):
+        self.stream.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def wait_until(self, predicate, timeout=5.0):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_one_socket_routes_events_to_each_prompt(self):
+        workflow = {"4": {"class_type": "KSampler", "_meta": {"title": "Sample"}}}
+        collector = agent.ComfyNodeTimingCollector("http://127.0.0.1:1", "dm-agent-test", "p1", workflow)
+        first = self.stream.watch("p1", collector=collector)
+        second = self.stream.watch("p2")
+        self.assertTrue(first.stream_live)
+
+        self.server.push({"type": "execution_start", "data": {"prompt_id": "p1"}})
+        self.server.push({"type": "executing", "data": {"node": "4", "prompt_id": "p1"}})
+        self.server.push({"type": "progress", "data": {"value": 3, "max": 20, "node": "4", "prompt_id": "p1"}})
+        self.server.push({"type": "execution_error", "data": {
+            "prompt_id": "p2", "node_id": "9", "exception_message": "boom", "timestamp": 1,
+        }})
+        self.server.push({"type": "execution_success", "data": {"prompt_id": "p1", "timestamp": 2}})
+
+        self.assertTrue(self.wait_until(lambda: first.terminal_event and second.terminal_event))
+        self.assertEqual(first.terminal_event, "execution_success")
+        self.assertEqual(first.progress_payload(), {"node": "4", "value": 3, "max": 20})
+        self.assertEqual(second.terminal_event, "execution_error")
+        self.assertEqual(second.error_payload(), {"node_id": "9", "exception_message": "boom"})
+        timing = collector.snapshot()
+        self.assertEqual(timing["terminalEvent"], "execution_success")
+        self.assertEqual(timing["nodes"][0]["classType"], "KSampler")
+        self.assertEqual(self.server.connections, 1)
+
+    def test_terminal_event_before_watch_is_replayed(self):
+        self.server.push({"type": "executing", "data": {"node": None, "prompt_id": "early"}})
+        self.assertTrue(self.wait_until(lambda: self.stream.snapshot()["messages"] == 1))
+
+        watch = self.stream.watch("early")
+        self.assertEqual(watch.terminal_event, "executing_complete")
+        self.assertTrue(watch.wait_for_update(0.0))
+
+    def test_reconnect_flags_open_watches_for_history_resync(self):
+        watch = self.stream.watch("p1")
+        self.assertFalse(watch.take_resync())
+
+        self.server.drop()
+        self.assertTrue(self.wait_until(lambda: not watch.stream_live))
+        self.assertTrue(self.server.wait_for_connections(2))
+        self.assertTrue(self.wait_until(lambda: watch.stream_live))
+        self.assertTrue(watch.take_resync())
+        self.assertFalse(watch.take_resync())
+
+        self.server.push({"type": "execution_success", "data": {"prompt_id": "p1"}})
+        self.assertTrue(self.wait_until(lambda: watch.terminal_event == "execution_success"))
+
+        self.stream.unwatch(watch)
+        self.assertEqual(self.stream.snapshot()["watches"], 0)
+
+
+    def test_terminal_history_fast_poll_is_bounded_when_history_never_appears(self):
+        watch = self.stream.watch("p1")
+        watch.terminal_fast_poll_seconds = 0.1
+        self.assertEqual(watch.history_retry_delay(), 0.0)
+
+        self.server.push({"type": "execution_success", "data": {"prompt_id": "p1"}})
+        self.assertTrue(self.wait_until(lambda: watch.terminal_event == "execution_success"))
+        self.assertEqual(watch.history_retry_delay(), 0.05)
+        time.sleep(0.15)
+        self.assertEqual(watch.history_retry_delay(), 0.5)
+
+    def test_agent_does_not_block_job_start_while_the_stream_is_down(self):
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        port = closed.getsockname()[1]
+        closed.close()
+        instance = agent.DependencyAgent.__new__(agent.DependencyAgent)
+        instance.comfy_event_stream_enabled = True
+        instance._comfy_event_stream_lock = threading.Lock()
+        instance._comfy_event_stream = None
+        instance._resolve_local_comfy_base_url = lambda **_kwargs: f"http://127.0.0.1:{port}"
+
+        started = time.monotonic()
+        stream = instance._comfy_prompt_event_stream()
+        self.addCleanup(stream.stop)
+        self.assertIs(instance._comfy_prompt_event_stream(), stream)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertFalse(stream.watch("p1").stream_live)
+
+class LocalComfyOutputTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.instance = agent.DependencyAgent.__new__(agent.DependencyAgent)
+        self.instance.comfyui_dir = root / "ComfyUI"
+        self.instance.comfy_output_dir = self.instance.comfyui_dir / "output"
+        self.instance.comfy_direct_outputs_enabled = True
+        self.instance._resolved_local_comfy_base_url = "http://127.0.0.1:8188"
+        self.instance.download_timeout_seconds = 60.0
+        self.instance.download_chunk_size = 65536
+        (self.instance.comfy_output_dir / "videos").mkdir(parents=True)
+        self.output = self.instance.comfy_output_dir / "videos" / "clip_00001.mp4"
+        self.output.write_bytes(b"video-bytes")
+        (root / "secret.txt").write_text("nope")
+        self.staging = root / "staging"
+        self.staging.mkdir()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_resolves_refs_inside_the_output_root_only(self):
+        self.assertEqual(
+            self.instance._local_comfy_output_path("clip_00001.mp4", "videos", "output"),
+            self.output.resolve(),
+        )
+        self.assertIsNone(self.instance._local_comfy_output_path("secret.txt", "../..", "output"))
+        self.assertIsNone(self.instance._local_comfy_output_path("missing.mp4", "videos", "output"))
+        self.assertIsNone(self.instance._local_comfy_output_path("clip_00001.mp4", "videos", "unknown"))
+        os.symlink(Path(self.tmp.name) / "secret.txt", self.instance.comfy_output_dir / "escape.txt")
+        self.assertIsNone(self.instance._local_comfy_output_path("escape.txt", "", "output"))
+
+    def test_remote_comfy_is_not_read_from_local_disk(self):
+        self.instance._resolved_local_comfy_base_url = "http://10.0.0.7:8188"
+        self.assertIsNone(self.instance._local_comfy_output_path("clip_00001.mp4", "videos", "output"))
+
+    def test_local_output_is_hard_linked_without_view(self):
+        with mock.patch.object(agent, "http_download_to_file") as view_download:
+            path, sha, source = self.instance._collect_comfy_output(
+                "clip_00001.mp4", "videos", "output", self.staging / "00_clip_00001.mp4"
+            )
+        view_download.assert_not_called()
+        self.assertEqual(source, "hardlink")
+        self.assertEqual(sha, "")
+        self.assertEqual(path.stat().st_ino, self.output.stat().st_ino)
+
+    def test_unknown_layout_falls_back_to_view(self):
+        with mock.patch.object(agent, "http_download_to_file", return_value="f" * 64) as view_download:
+            path, sha, source = self.instance._collect_comfy_output(
+                "other.mp4", "videos", "output", self.staging / "00_other.mp4"
+            )
+        self.assertEqual(source, "view")
+        self.assertEqual(sha, "f" * 64)
+        self.assertEqual(path, self.staging / "00_other.mp4")
+        self.assertIn("/view?", view_download.call_args[0][0])
+
+
+class OutputFinalizeTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = Path(self.tmp.name) / "clip.mp4"
+        self.data = os.urandom(3 * 1024 * 1024 + 17)
+        self.output.write_bytes(self.data)
+        self.instance = agent.DependencyAgent.__new__(agent.DependencyAgent)
+        self.instance.download_timeout_seconds = 60.0
+        self.instance.agent_upload_retry_attempts = 1
+        self.instance.video_output_quality_gate_enabled = True
+        self.lease = mock.Mock(job_id="job-1")
+        self.target = {
+            "logicalOutputKey": "video",
+            "uploadUrl": f"http://127.0.0.1:{self.server.server_address[1]}/upload",
+        }
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def staged_target(self):
+        return {
+            **self.target,
+            "fastPathMaxBytes": 1024,
+            "stagedUploadUrl": "http://127.0.0.1:9/session",
+            "stagedUploadMethod": "gcs_resumable_session_put",
+        }
+
+    def test_digest_is_teed_from_staged_upload_and_gate_overlaps_it(self):
+        upload_started = threading.Event()
+        gate_saw_upload = []
+
+        def staged_upload(_url, path, _content_type, chunk_observer=None, **_kwargs):
+            upload_started.set()
+            time.sleep(0.2)
+            chunk_observer(0, Path(path).read_bytes())
+
+        def gate(_filename, _path):
+            gate_saw_upload.append(upload_started.wait(5.0))
+            return {"sampleCount": 3}
+
+        with mock.patch.object(agent, "gcs_resumable_upload_file", side_effect=staged_upload), \
+                mock.patch.object(self.instance, "_validate_local_output_quality", side_effect=gate), \
+                mock.patch.object(agent, "sha256_file", side_effect=AssertionError("re-read")):
+            out_meta = self.instance._finalize_output_artifact(
+                self.lease, self.staged_target(), "clip.mp4", self.output, len(self.data)
+            )
+
+        self.assertEqual(gate_saw_upload, [True])
+        self.assertEqual(out_meta["deliveryPath"], "gcs_staged")
+        self.assertEqual(out_meta["sha256"], hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(out_meta["qualityValidation"], {"sampleCount": 3})
+        self.assertEqual(out_meta["uploadTiming"]["agentHashMs"], 0)
+        self.assertIn("agentQualityGateMs", out_meta["uploadTiming"])
+
+    def test_gate_failure_during_staged_upload_fails_finalisation(self):
+        gate_failed = threading.Event()
+
+        def staged_upload(_url, path, _content_type, chunk_observer=None, **_kwargs):
+            self.assertTrue(gate_failed.wait(5.0))
+            chunk_observer(0, Path(path).read_bytes())
+
+        def gate(_filename, _path):
+            gate_failed.set()
+            raise agent.OutputQualityValidationError("output_video_decode_failed: bad")
+
+        with mock.patch.object(agent, "gcs_resumable_upload_file", side_effect=staged_upload) as uploaded, \
+                mock.patch.object(self.instance, "_validate_local_output_quality", side_effect=gate):
+            with self.assertRaises(agent.OutputQualityValidationError):
+                self.instance._finalize_output_artifact(
+                    self.lease, self.staged_target(), "clip.mp4", self.output, len(self.data)
+                )
+        self.assertEqual(uploaded.call_count, 1)
+
+    def test_quality_gate_finishes_before_a_publishing_upload_starts(self):
+        KeepAliveHandler.puts = 0
+
+        def gate(_filename, _path):
+            raise agent.OutputQualityValidationError("output_video_decode_failed: bad")
+
+        with mock.patch.object(self.instance, "_validate_local_output_quality", side_effect=gate):
+            with self.assertRaises(agent.OutputQualityValidationError):
+                self.instance._finalize_output_artifact(
+                    self.lease, self.target, "clip.mp4", self.output, len(self.data)
+                )
+        self.assertEqual(KeepAliveHandler.puts, 0)
+
+        with mock.patch.object(self.instance, "_validate_local_output_quality", return_value={"sampleCount": 3}):
+            out_meta = self.instance._finalize_output_artifact(
+                self.lease, self.target, "clip.mp4", self.output, len(self.data)
+            )
+        self.assertEqual(KeepAliveHandler.puts, 1)
+        self.assertEqual(out_meta["deliveryPath"], "direct_bunny")
+        self.assertEqual(out_meta["qualityValidation"], {"sampleCount": 3})
+
+
+class InputCacheDigestIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.tmp.name) / "cache"
+        self.instance = self.make_agent()
+        self.data = os.urandom(256 * 1024)
+        self.path = self.cache_dir / "ab" / ("sha256_" + "a" * 64 + "_ref.mp4")
+        self.path.parent.mkdir(parents=True)
+        self.path.write_bytes(self.data)
+        self.row = {"sha256": hashlib.sha256(self.data).hexdigest(), "sizeBytes": len(self.data)}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_agent(self):
+        instance = agent.DependencyAgent.__new__(agent.DependencyAgent)
+        instance.input_cache_dir = self.cache_dir
+        instance._input_digest_index = agent.VerifiedDigestIndex(self.cache_dir / ".index" / "digests.json")
+        instance._lock = threading.RLock()
+        instance._stop = threading.Event()
+        instance._active_exec_by_item = {}
+        instance._input_cache_downloading = set()
+        instance.input_cache_scrub_bytes_per_second = 64 * 1024 * 1024
+        instance.input_cache_scrub_interval_ms = -1000
+        return instance
+
+    def test_hit_after_first_verification_only_stats(self):
+        real_sha256_file = agent.sha256_file
+        with mock.patch.object(agent, "sha256_file", side_effect=real_sha256_file) as hashed:
+            self.assertTrue(self.instance._is_cached_input_valid(self.path, self.row))
+            self.instance._touch_input_cache_path(self.path)
+            self.assertTrue(self.instance._is_cached_input_valid(self.path, self.row))
+            self.instance._input_digest_index.flush()
+            self.assertTrue(self.make_agent()._is_cached_input_valid(self.path, self.row))
+        self.assertEqual(hashed.call_count, 1)
+        self.assertNotIn(self.cache_dir / ".index" / "digests.json", self.instance._iter_input_cache_files())
+
+    def test_repeated_hits_do_not_rewrite_the_index(self):
+        index_path = self.cache_dir / ".index" / "digests.json"
+        self.assertTrue(self.instance._is_cached_input_valid(self.path, self.row))
+        written = index_path.read_bytes()
+        for _ in range(20):
+            self.instance._touch_input_cache_path(self.path)
+            self.assertTrue(self.instance._is_cached_input_valid(self.path, self.row))
+        self.assertEqual(index_path.read_bytes(), written)
+
+        self.instance._input_digest_index.flush(force=False)
+        self.assertEqual(index_path.read_bytes(), written)
+        self.instance._input_digest_index.flush()
+        self.assertNotEqual(index_path.read_bytes(), written)
+
+    def test_metadata_change_forces_rehash(self):
+        self.assertTrue(self.instance._is_cached_input_valid(self.path, self.row))
+        corrupted = bytearray(self.data)
+        corrupted[0] ^= 0xFF
+        self.path.write_bytes(bytes(corrupted))
+        os.utime(self.path, ns=(time.time_ns(), time.time_ns() + 5_000_000))
+        self.assertFalse(self.instance._is_cached_input_valid(self.path, self.row))
+
+    def test_scrub_removes_silently_corrupted_entry(self):
+        self.assertTrue(self.instance._is_cached_input_valid(self.path, self.row))
+        stat_before = self.path.stat()
+        with self.path.open("r+b") as handle:
+            handle.write(bytes([self.data[0] ^ 0xFF]))
+        os.utime(self.path, ns=(stat_before.st_atime_ns, stat_before.st_mtime_ns))
+
+        self.assertTrue(self.instance._scrub_input_cache_once())
+        self.assertFalse(self.path.exists())
+        self.assertIsNone(self.instance._input_digest_index.coldest(agent._now_ms() + 1000))
+
+    def test_scrub_refreshes_healthy_entry(self):
+        self.assertTrue(self.instance._is_cached_input_valid(self.path, self.row))
+        self.assertTrue(self.instance._scrub_input_cache_once())
+        self.assertTrue(self.path.exists())
+        self.assertTrue(self.instance._is_cached_input_valid(self.path, self.row))
+
+
+class ProcOpenFileIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_open_file_is_found_by_inode_and_path(self):
+        path = self.root / "model.safetensors"
+        path.write_bytes(b"x" * 64)
+        link = self.root / "hardlink.safetensors"
+        os.link(path, link)
+        index = agent.ProcOpenFileIndex()
+        with path.open("rb"):
+            index.refresh()
+            self.assertTrue(agent._is_path_open_by_process(path, index=index))
+            self.assertTrue(index.is_open(link))
+        index.refresh()
+        self.assertFalse(index.is_open(path))
+        self.assertFalse(index.is_open(self.root / "missing.bin"))
+
+    def test_refresh_only_stats_new_fds(self):
+        path = self.root / "held.bin"
+        path.write_bytes(b"x")
+        index = agent.ProcOpenFileIndex()
+        with path.open("rb"):
+            index.refresh()
+            first = index.last_refresh_stats
+            index.refresh()
+            second = index.last_refresh_stats
+        self.assertGreater(first["statCalls"], 0)
+        self.assertLess(second["statCalls"], first["statCalls"])
+
+    def test_deleted_open_files_under_base(self):
+        base = self.root / "workspace"
+        base.mkdir()
+        (self.root / "other").mkdir()
+        path = base / "gone.bin"
+        path.write_bytes(b"y" * 4096)
+        with path.open("rb"):
+            path.unlink()
+            index = agent.ProcOpenFileIndex().refresh()
+            found = agent._scan_deleted_open_files([base], index=index)
+            elsewhere = agent._scan_deleted_open_files([self.root / "other"], index=index)
+        self.assertEqual(found["count"], 1)
+        self.assertEqual(found["bytes"], 4096)
+        self.assertEqual(found["examples"][0]["path"], str(path.resolve()))
+        self.assertEqual(elsewhere["count"], 0)
+
+
+STATE_CRASH_SCRIPT = """
+import importlib.util, os, sys
+spec = importlib.util.spec_from_file_location("agent_crash", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+store = module.SqliteStateStore(module.Path(sys.argv[2]))
+store.open()
+state = module.LocalState.empty()
+store.prime(state)
+for dep_id in ("a", "b", "c"):
+    state.lru[dep_id] = {"destRelativePath": "models/" + dep_id, "sizeBytes": 1, "lastTouchedAtMs": 1}
+    state.installed_dynamic.add(dep_id)
+store.save(state)
+for dep_id in ("a", "b"):
+    state.lru.pop(dep_id)
+    state.installed_dynamic.discard(dep_id)
+
+class CrashOnCommit:
+    def __init__(self, conn):
+        self.conn = conn
+    def execute(self, sql, *args):
+        if sql == "COMMIT" and sys.argv[3] == "crash":
+            os._exit(17)
+        return self.conn.execute(sql, *args)
+    def executemany(self, sql, rows):
+        return self.conn.executemany(sql, rows)
+
+store._conn = CrashOnCommit(store._conn)
+store.save(state)
+os._exit(0)
+"""
+
+
+class FakeRtdb:
+    """In-memory stand-in for the RTDB REST surface: ETag reads, If-Match writes, multi-path PATCH.
+
+    Ordered queries use a sorted index per (parent, orderBy) that writes keep
+    current, so query cost tracks the result size like a real ``.indexOn``.
+    """
+
+    def __init__(self, indexed=("claimOrderKey", "state")):
+        self.tree = {}
+        self.lock = threading.Lock()
+        self.requests = []
+        self.indexed = set(indexed)
+        self.indexes = {}
+
+    @staticmethod
+    def etag(value):
+        return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+    @staticmethod
+    def prune(value):
+        if isinstance(value, dict):
+            out = {key: FakeRtdb.prune(child) for key, child in value.items()}
+            out = {key: child for key, child in out.items() if child is not None}
+            return out or None
+        return value
+
+    def get(self, parts):
+        node = self.tree
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def set(self, parts, value):
+        if not parts:
+            self.tree = self.prune(value) or {}
+            self.indexes.clear()
+            return
+        node = self.tree
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        value = self.prune(value)
+        if value is None:
+            node.pop(parts[-1], None)
+            self.tree = self.prune(self.tree) or {}
+        else:
+            node[parts[-1]] = value
+        for (parent, key), (entries, values) in list(self.indexes.items()):
+            if len(parts) > len(parent) and tuple(parts[: len(parent)]) == parent:
+                self.reindex(parent, key, parts[len(parent)], entries, values)
+            elif parent[: len(parts)] == tuple(parts):
+                del self.indexes[(parent, key)]
+
+    def reindex(self, parent, key, child, entries, values):
+        old = values.pop(child, None)
+        if old is not None:
+            del entries[bisect.bisect_left(entries, (old, child))]
+        row = self.get(list(parent) + [child])
+        value = row.get(key) if isinstance(row, dict) else None
+        if isinstance(value, str):
+            values[child] = value
+            bisect.insort(entries, (value, child))
+
+    def query(self, parts, params):
+        key = json.loads(params["orderBy"])
+        if key not in self.indexed:
+            raise KeyError(key)
+        parent = tuple(parts)
+        if (parent, key) not in self.indexes:
+            entries, values = [], {}
+            self.indexes[(parent, key)] = (entries, values)
+            for child in list((self.get(parts) or {}).keys()):
+                self.reindex(parent, key, child, entries, values)
+        entries, _values = self.indexes[(parent, key)]
+        start = json.loads(params.get("equalTo") or params.get("startAt") or "null")
+        end = json.loads(params.get("equalTo") or params.get("endAt") or "null")
+        low = bisect.bisect_left(entries, (start,)) if start is not None else 0
+        high = bisect.bisect_right(entries, (end, chr(0x10FFFF))) if end is not None else len(entries)
+        limit = int(params.get("limitToFirst") or len(entries))
+        node = self.get(parts)
+        return {child: node[child] for _value, child in entries[low:high][:limit]}
+
+    def resolve(self, parts, value):
+        if isinstance(value, dict) and ".sv" in value:
+            current = self.get(parts)
+            return (current if isinstance(current, (int, float)) else 0) + value[".sv"]["increment"]
+        return value
+
+
+def fake_rtdb_handler(db):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, _format, *_args):
+            return
+
+        def _parts(self):
+            path = urllib.parse.urlparse(self.path).path
+            path = path[: -len(".json")] if path.endswith(".json") else path
+            return path, [part for part in path.split("/") if part]
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"null")
+
+        def _reply(self, status, value, etag=None):
+            body = b"" if status == 204 else json.dumps(value).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path, parts = self._parts()
+            params = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+            with db.lock:
+                try:
+                    value = db.query(parts, params) if "orderBy" in params else db.get(parts)
+                except KeyError:
+                    self._reply(400, {"error": "Index not defined, add \".indexOn\""})
+                    return
+                value = json.loads(json.dumps(value))
+                db.requests.append(("GET", path, len(json.dumps(value))))
+            self._reply(200, value, db.etag(value) if self.headers.get("X-Firebase-ETag") else None)
+
+        def do_PUT(self):
+            path, parts = self._parts()
+            value = self._body()
+            with db.lock:
+                db.requests.append(("PUT", path, len(json.dumps(value))))
+                current_etag = db.etag(db.get(parts))
+                expected = self.headers.get("If-Match")
+                if expected and expected != current_etag:
+                    self._reply(412, {"error": "etag mismatch"}, current_etag)
+                    return
+                db.set(parts, value)
+            self._reply(200, value)
+
+        def do_PATCH(self):
+            path, parts = self._parts()
+            updates = self._body()
+            with db.lock:
+                db.requests.append(("PATCH", path, len(json.dumps(updates))))
+                for key, value in updates.items():
+                    child = parts + [part for part in key.split("/") if part]
+                    db.set(child, db.resolve(child, value))
+            self._reply(204, None)
+
+    return Handler
+
+
+class GpuAdmissionShardedTest(unittest.TestCase):
+    server_type = "rtx5090"
+    root = "/gpuAdmission/rtx5090"
+
+    def setUp(self):
+        self.db = FakeRtdb()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), fake_rtdb_handler(self.db))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.database_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        agent.HTTP_POOL.close_idle()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_agent(self, instance_id):
+        instance = agent.DependencyAgent.__new__(agent.DependencyAgent)
+        instance.server_type = self.server_type
+        instance.instance_id = instance_id
+        instance._coordination = {"databaseUrl": self.database_url}
+        instance._ensure_coordination_id_token = lambda force_refresh=False: "token"
+        instance.gpu_admission_mode = "enforcing"
+        instance.gpu_admission_layout = "sharded"
+        instance.gpu_admission_max_depth = 64
+        instance.gpu_admission_ticket_stale_ms = 20_000
+        instance.gpu_admission_recovery_ms = 45_000
+        instance.gpu_admission_heartbeat_seconds = 5.0
+        instance._stop = threading.Event()
+        instance._is_cancel_requested = lambda lease: False
+        instance._gpu_coordinator = mock.Mock(configured=False)
+        return instance
+
+    def make_lease(self, job_id):
+        return agent.AgentExecuteLease(
+            item_id=f"item-{job_id}",
+            lease_id="lease",
+            job_id=job_id,
+            execution_attempt=1,
+            attempt_epoch=1,
+            started_at_ms=0,
+        )
+
+    def test_concurrent_agents_are_admitted_one_at_a_time_in_fifo_order(self):
+        lock = threading.Lock()
+        holders = {"now": 0, "peak": 0}
+        claimed = []
+
+        def run_agent(index):
+            instance = self.make_agent(f"host{index}")
+            lease = self.make_lease(f"job{index}")
+            instance._wait_for_comfy_gpu_admission(lease, 10_000)
+            with self.db.lock:
+                sequence = self.db.get(self.root[1:].split("/") + ["index", lease.gpu_admission_ticket_id, "sequence"])
+            with lock:
+                holders["now"] += 1
+                holders["peak"] = max(holders["peak"], holders["now"])
+                claimed.append(sequence)
+            self.assertTrue(
+                instance._heartbeat_comfy_gpu_admission(lease.gpu_admission_ticket_id, lease.gpu_admission_claim_token)
+            )
+            time.sleep(0.05)
+            with lock:
+                holders["now"] -= 1
+            instance._release_comfy_gpu_admission(lease, "done")
+
+        threads = [threading.Thread(target=run_agent, args=(index,)) for index in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+
+        self.assertEqual(holders["peak"], 1)
+        self.assertEqual(claimed, sorted(claimed))
+        self.assertEqual(len(set(claimed)), 6)
+        state = self.db.get(self.root[1:].split("/"))
+        self.assertNotIn("active", state)
+        self.assertNotIn("tickets", state)
+        self.assertNotIn("index", state)
+        self.assertEqual(state["nextSequence"], 6)
+        self.assertIn("serviceEwmaMs", state)
+        self.assertFalse([row for row in self.db.requests if row[0] != "PATCH" and row[1] == self.root])
+
+    def test_waiting_poll_reads_only_the_active_record_regardless_of_queue_size(self):
+        now_ms = agent._now_ms()
+        waiting = {
+            f"comfy_other{index}": {
+                "sequence": index + 2, "state": "waiting", "holder": "comfy", "attached": True,
+                "heartbeatAtMs": now_ms, "expiresAtMs": now_ms + 3_600_000, "requestId": f"job-{index}",
+            }
+            for index in range(200)
+        }
+        self.db.set(self.root[1:].split("/"), {
+            "active": {"ticketId": "comfy_holder", "claimToken": "t", "heartbeatAtMs": now_ms, "state": "active"},
+            "index": waiting,
+            "tickets": waiting,
+        })
+        instance = self.make_agent("host-poll")
+        del self.db.requests[:]
+        token, saw_recovering = instance._claim_comfy_gpu_admission_sharded("comfy_other5", now_ms, False)
+
+        self.assertEqual((token, saw_recovering), (None, False))
+        self.assertEqual([(method, path) for method, path, _size in self.db.requests], [("GET", self.root + "/active")])
+        self.assertLess(self.db.requests[0][2], 256)
+
+    def test_stale_claim_is_recovered_and_stale_tickets_are_pruned(self):
+        now_ms = agent._now_ms()
+        stale = {"sequence": 1, "state": "waiting", "holder": "comfy", "attached": True,
+                 "heartbeatAtMs": now_ms - 60_000, "expiresAtMs": now_ms + 3_600_000}
+        self.db.set(self.root[1:].split("/"), {
+            "active": {"ticketId": "comfy_gone", "claimToken": "t", "heartbeatAtMs": now_ms - 60_000, "state": "active"},
+            "index": {"comfy_gone": dict(stale, state="active"), "comfy_stale": stale},
+            "tickets": {"comfy_gone": dict(stale, state="active"), "comfy_stale": stale},
+        })
+        instance = self.make_agent("host-recover")
+        instance._gpu_coordinator.admission_recovery_status.return_value = {"safeToClearAdmission": True}
+
+        self.assertEqual(instance._claim_comfy_gpu_admission_sharded("comfy_stale", now_ms, False), (None, True))
+        self.assertTrue(instance._recover_gpu_admission_if_locally_idle())
+        self.assertEqual(instance._gpu_admission_live_index(agent._now_ms(), prune=True), {})
+        self.assertIsNone(self.db.get(self.root[1:].split("/") + ["index"]))
+        self.assertIsNone(self.db.get(self.root[1:].split("/") + ["tickets"]))
+        self.assertFalse(instance._gpu_admission_has_foreground_work())
+
+    def test_touch_does_not_recreate_a_pruned_ticket(self):
+        now_ms = agent._now_ms()
+        entry = {"sequence": 1, "state": "waiting", "holder": "comfy", "attached": True,
+                 "heartbeatAtMs": now_ms, "expiresAtMs": now_ms + 3_600_000}
+        self.db.set(self.root[1:].split("/"), {"index": {"comfy_pruned": entry}})
+        instance = self.make_agent("host-touch")
+
+        self.assertFalse(instance._gpu_admission_touch_ticket("comfy_pruned", {"heartbeatAtMs": now_ms + 1}, now_ms))
+        self.assertIsNone(self.db.get(self.root[1:].split("/") + ["tickets"]))
+
+
+    def test_waiter_heartbeat_is_one_patch_and_pruning_runs_on_a_timer(self):
+        now_ms = agent._now_ms()
+        waiting = {"sequence": 2, "state": "waiting", "holder": "comfy", "attached": True,
+                   "heartbeatAtMs": now_ms - 1_000, "expiresAtMs": now_ms + 3_600_000}
+        stale = dict(waiting, sequence=1, heartbeatAtMs=now_ms - 60_000)
+        self.db.set(self.root[1:].split("/"), {
+            "active": {"ticketId": "comfy_holder", "claimToken": "t", "heartbeatAtMs": now_ms, "state": "active"},
+            "index": {"comfy_waiter": waiting, "comfy_stale": stale},
+            "tickets": {"comfy_waiter": waiting, "comfy_stale": stale},
+        })
+        instance = self.make_agent("host-heartbeat")
+        del self.db.requests[:]
+        self.assertEqual(instance._claim_comfy_gpu_admission_sharded("comfy_waiter", now_ms, True), (None, False))
+
+        self.assertEqual(
+            [(method, path) for method, path, _size in self.db.requests],
+            [("GET", self.root + "/active"), ("PATCH", self.root)],
+        )
+        self.assertEqual(self.db.get(self.root[1:].split("/") + ["index", "comfy_waiter", "heartbeatAtMs"]), now_ms)
+        self.assertIsNone(self.db.get(self.root[1:].split("/") + ["revision"]))
+
+        instance._gpu_admission_live_index(now_ms, prune=True)
+        self.assertIsNone(self.db.get(self.root[1:].split("/") + ["index", "comfy_stale"]))
+        self.db.set(self.root[1:].split("/") + ["index", "comfy_stale"], stale)
+        del self.db.requests[:]
+        instance._gpu_admission_live_index(now_ms + 1_000, prune=True)
+        self.assertEqual([method for method, _path, _size in self.db.requests], ["GET"])
+        instance._gpu_admission_live_index(now_ms + instance.gpu_admission_ticket_stale_ms, prune=True)
+        self.assertIsNone(self.db.get(self.root[1:].split("/") + ["index", "comfy_stale"]))
+
+    def test_root_layout_backend_holder_blocks_sharded_admission(self):
+        now_ms = agent._now_ms()
+        backend_ticket = {"ticketId": "inference_req1", "holder": "inference", "sequence": 1, "state": "active",
+                          "heartbeatAtMs": now_ms, "expiresAtMs": now_ms + 3_600_000, "attached": True}
+        self.db.set(self.root[1:].split("/"), {
+            "active": {"ticketId": "inference_req1", "holder": "inference", "claimToken": "backend",
+                       "heartbeatAtMs": now_ms, "state": "active"},
+            "tickets": {"inference_req1": backend_ticket},
+            "nextSequence": 1,
+        })
+        instance = self.make_agent("host-mixed")
+        ticket_id = instance._enqueue_comfy_gpu_admission(self.make_lease("job-mixed"), 10_000)
+
+        self.assertEqual(instance._claim_comfy_gpu_admission_sharded(ticket_id, agent._now_ms(), True), (None, False))
+        self.assertEqual(self.db.get(self.root[1:].split("/") + ["active", "ticketId"]), "inference_req1")
+
+        self.db.set(self.root[1:].split("/") + ["active"], None)
+        self.db.set(self.root[1:].split("/") + ["tickets", "inference_req1"], None)
+        token, _saw_recovering = instance._claim_comfy_gpu_admission_sharded(ticket_id, agent._now_ms(), False)
+        self.assertTrue(token)
+        self.assertEqual(self.db.get(self.root[1:].split("/") + ["active", "ticketId"]), ticket_id)
+
+class RtdbQueueClaimTest(unittest.TestCase):
+    queue_path = "/agentQueue/host"
+
+    def setUp(self):
+        self.db = FakeRtdb()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), fake_rtdb_handler(self.db))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.database_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        agent.HTTP_POOL.close_idle()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_agent(self, instance_id="host"):
+        instance = agent.DependencyAgent.__new__(agent.DependencyAgent)
+        instance._coordination = {
+            "databaseUrl": self.database_url,
+            "paths": {"agentQueueItems": self.queue_path},
+            "features": {"agentQueueClaimV1": True},
+            "leaseDurationSeconds": 90,
+        }
+        instance._ensure_coordination_id_token = lambda force_refresh=False: "token"
+        instance._coordination_stream_healthy = True
+        instance._coordination_unindexed_queue_keys = set()
+        instance.agent_rtdb_queue_claim_enabled = True
+        instance._resolved_instance_id = instance_id
+        instance._server_now_ms = agent._now_ms
+        return instance
+
+    def seed_queue(self, count, leased=0, item_type=lambda index: "execute_job"):
+        items = {}
+        for index in range(count):
+            state = "leased" if index < leased else "queued"
+            item_id = f"item{index:06d}"
+            items[agent.DependencyAgent._coordination_queue_item_key(None, item_id)] = {
+                "itemId": item_id,
+                "type": item_type(index),
+                "state": state,
+                "priority": 0,
+                "createdAtMs": index,
+                "claimOrderKey": f"{state}|{index:012d}",
+                "payload": {"jobId": f"job{index}"},
+            }
+        self.db.set(self.queue_path[1:].split("/"), items)
+
+    def claim(self, instance, limit, skip_execute_jobs=False):
+        return instance._coordination_claim_queue_items(
+            "agentQueueItems", "agentQueueClaimV1", "leased", limit, skip_execute_jobs=skip_execute_jobs
+        )
+
+    def test_claim_round_reads_a_bounded_window_regardless_of_backlog(self):
+        sizes = []
+        for backlog in (20, 2000):
+            self.seed_queue(backlog, leased=3)
+            del self.db.requests[:]
+            claimed = self.claim(self.make_agent(), 2)
+            self.assertEqual([item["itemId"] for item in claimed], ["item000003", "item000004"])
+            self.assertTrue(all(item["payload"]["jobId"] for item in claimed))
+            query_reads = [size for method, path, size in self.db.requests if method == "GET" and path == self.queue_path]
+            self.assertEqual(len(query_reads), 1)
+            sizes.append(query_reads[0])
+        self.assertEqual(sizes[0], sizes[1])
+        leased = self.db.get(self.queue_path[1:].split("/") + [agent.DependencyAgent._coordination_queue_item_key(None, "item000003")])
+        self.assertEqual(leased["state"], "leased")
+        self.assertNotIn("claimOrderKey", leased)
+        self.assertNotIn("payload", leased)
+
+    def test_concurrent_agents_claim_disjoint_batches(self):
+        self.seed_queue(40)
+        results = {}
+
+        def run(index):
+            results[index] = self.claim(self.make_agent(f"host{index}"), 5)
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=60)
+
+        claimed = [item["itemId"] for batch in results.values() for item in batch]
+        self.assertEqual(len(claimed), 20)
+        self.assertEqual(len(set(claimed)), 20)
+        self.assertTrue(all(len(batch) == 5 for batch in results.values()))
+        rows = self.db.get(self.queue_path[1:].split("/")).values()
+        owners = {row["itemId"]: row["leaseOwner"] for row in rows if row["state"] == "leased"}
+        self.assertEqual(sorted(owners), sorted(claimed))
+
+    def test_eligible_items_behind_a_window_of_ineligible_ones_are_claimed(self):
+        for indexed in (("claimOrderKey", "state"), ("state",)):
+            self.db.indexed = set(indexed)
+            self.seed_queue(60, item_type=lambda index: "execute_job" if index < 30 else "prl_mining")
+            claimed = self.claim(self.make_agent(), 2, skip_execute_jobs=True)
+            self.assertEqual([item["itemId"] for item in claimed], ["item000030", "item000031"], indexed)
+
+    def test_missing_claim_order_index_falls_back_to_state_query(self):
+        self.db.indexed = {"state"}
+        self.seed_queue(50)
+        instance = self.make_agent()
+        self.assertEqual(len(self.claim(instance, 3)), 3)
+        self.assertEqual(instance._coordination_unindexed_queue_keys, {"agentQueueItems"})
+        del self.db.requests[:]
+        self.assertEqual(len(self.claim(instance, 3)), 3)
+        query_reads = [size for method, path, size in self.db.requests if method == "GET" and path == self.queue_path]
+        self.assertEqual(len(query_reads), 1)
+
+    @unittest.skipUnless(os.environ.get("DM_RUN_BENCHMARKS") == "1", "set DM_RUN_BENCHMARKS=1 to run")
+    def test_benchmark_claim_latency_against_backlog_size(self):
+        for backlog in (10, 1_000, 10_000, 100_000):
+            self.seed_queue(backlog)
+            instance = self.make_agent()
+            self.claim(instance, 1)
+            started = time.perf_counter()
+            rounds = 20
+            for _ in range(rounds):
+                self.claim(instance, 4)
+            elapsed_ms = (time.perf_counter() - started) * 1000 / rounds
+            print(f"backlog={backlog} claimRound={elapsed_ms:.2f}ms")
+
+
+class RuntimeDeltaMirrorTest(unittest.TestCase):
+    runtime_root = "/agentRuntime/host"
+
+    def setUp(self):
+        self.db = FakeRtdb()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), fake_rtdb_handler(self.db))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp.name, "runtime-deltas.jsonl")
+        self.control = {
+            "queueDepth": 1,
+            "stageCounts": {"executing": 1, "ready": 0},
+            "nodeContract": {"ready": True, "missingClassTypes": ["NodeA"]},
+            "inputCacheKeys": [f"key{index:04d}" for index in range(200)],
+        }
+
+    def tearDown(self):
+        agent.HTTP_POOL.close_idle()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def make_agent(self, gzip_min_bytes=0):
+        instance = agent.DependencyAgent.__new__(agent.DependencyAgent)
+        instance._coordination = {
+            "databaseUrl": f"http://127.0.0.1:{self.server.server_address[1]}",
+            "paths": {"runtimeRoot": self.runtime_root},
+        }
+        instance._ensure_coordination_id_token = lambda force_refresh=False: "token"
+        instance.coordination_runtime_full_sync_seconds = 900.0
+        instance._last_agent_runtime_signature = ""
+        instance._last_agent_runtime_full_sync_ms = 0
+        instance.agent_runtime_delta_enabled = True
+        instance.agent_runtime_gzip_min_bytes = gzip_min_bytes
+        instance._runtime_delta = agent.RuntimeDeltaEncoder(log_path=self.log_path)
+        instance._collect_agent_runtime_payload = lambda full=True, body=None: {
+            "agentControl": json.loads(json.dumps(self.control)),
+            "updatedAtMs": 1,
+        }
+        return instance
+
+    def runtime_patches(self):
+        return [size for method, path, size in self.db.requests if method == "PATCH" and path == self.runtime_root]
+
+    def replayed(self):
+        return agent.replay_runtime_deltas(agent._read_runtime_delta_log(self.log_path))
+
+    def test_heartbeat_patches_only_changed_fields_after_snapshot(self):
+        instance = self.make_agent()
+        self.assertTrue(instance._write_agent_runtime_mirror(body={}, transition_signature="sig"))
+        self.control["queueDepth"] = 2
+        self.control["stageCounts"]["ready"] = 1
+        self.assertTrue(instance._write_agent_runtime_mirror(body={}, transition_signature="sig"))
+        snapshot_size, delta_size = self.runtime_patches()
+        self.assertLess(delta_size * 20, snapshot_size)
+
+        records = list(agent._read_runtime_delta_log(self.log_path))
+        self.assertEqual([record["kind"] for record in records], ["snapshot", "delta"])
+        self.assertEqual(records[1]["baseSeq"], records[0]["seq"])
+        self.assertEqual(
+            records[1]["set"],
+            {"agentControl/queueDepth": 2, "agentControl/stageCounts/ready": 1},
+        )
+        self.assertEqual(self.replayed(), self.db.get(self.runtime_root[1:].split("/")))
+
+    def test_failed_write_is_folded_into_the_next_delta(self):
+        instance = self.make_agent()
+        instance._write_agent_runtime_mirror(body={}, transition_signature="sig")
+        self.control["queueDepth"] = 5
+        with mock.patch.object(instance, "_coordination_patch_runtime", return_value=False):
+            self.assertFalse(instance._write_agent_runtime_mirror(body={}, transition_signature="sig"))
+        self.control["stageCounts"]["executing"] = 0
+        instance._write_agent_runtime_mirror(body={}, transition_signature="sig")
+
+        records = list(agent._read_runtime_delta_log(self.log_path))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(
+            records[1]["set"],
+            {"agentControl/queueDepth": 5, "agentControl/stageCounts/executing": 0},
+        )
+        self.assertEqual(self.replayed()["agentControl"]["queueDepth"], 5)
+
+    def test_gzip_sections_round_trip_through_replay(self):
+        instance = self.make_agent(gzip_min_bytes=256)
+        instance._write_agent_runtime_mirror(body={}, transition_signature="sig")
+        stored = self.db.get(self.runtime_root[1:].split("/"))["agentControl"]
+        self.assertNotIn("inputCacheKeys", stored)
+        self.assertIn("inputCacheKeysGzip", stored)
+        # The small node contract stays plain JSON.
+        self.assertEqual(stored["nodeContract"], self.control["nodeContract"])
+
+        self.control["queueDepth"] = 3
+        instance._write_agent_runtime_mirror(body={}, transition_signature="sig")
+        records = list(agent._read_runtime_delta_log(self.log_path))
+        self.assertEqual(records[1]["set"], {"agentControl/queueDepth": 3})
+
+        replayed = self.replayed()
+        self.assertEqual(replayed["agentControl"]["inputCacheKeys"], self.control["inputCacheKeys"])
+        self.assertNotIn("inputCacheKeysGzip", replayed["agentControl"])
+
+    def test_replay_rejects_a_gap_in_the_delta_stream(self):
+        encoder = agent.RuntimeDeltaEncoder()
+        records = []
+        for value in range(3):
+            record = encoder.encode({"agentControl/queueDepth": value, "updatedAtMs": value}, at_ms=value + 1)
+            encoder.acknowledge(record)
+            records.append(record)
+        self.assertEqual(agent.replay_runtime_deltas(records), {"agentControl": {"queueDepth": 2}, "updatedAtMs": 2})
+        with self.assertRaises(ValueError):
+            agent.replay_runtime_deltas([records[0], records[2]])
+        with self.assertRaises(ValueError):
+            agent.replay_runtime_deltas(records[1:])
+
+
+class RuntimeProbeCollectorTest(unittest.TestCase):
+    def make_agent(self, collectors):
+        instance = agent.DependencyAgent.__new__(agent.DependencyAgent)
+        instance.mining_only = False
+        instance.runtime_probes_async = True
+        instance._runtime_probes_lock = threading.Lock()
+        instance._runtime_probes = {collector.name: collector for collector in collectors}
+        return instance
+
+    def test_heartbeat_reads_do_not_wait_on_a_slow_probe(self):
+        release = threading.Event()
+        calls = []
+
+        def object_info(timeout):
+            calls.append(timeout)
+            if len(calls) > 1:
+                release.wait(5)
+            return {"ready": True, "requiredClassCount": len(calls)}
+
+        node_contract = agent.ProbeCollector("nodeContract", object_info, interval_seconds=0.1, timeout_seconds=0.2)
+        reachable = agent.ProbeCollector("comfyReachable", lambda timeout: True, interval_seconds=0.1, timeout_seconds=0.2)
+        instance = self.make_agent([node_contract, reachable])
+        node_contract.start()
+        reachable.start()
+        try:
+            while len(calls) < 2:
+                time.sleep(0.01)
+            time.sleep(0.3)
+            started = time.monotonic()
+            values, meta = instance._agent_runtime_probe_readings()
+            elapsed = time.monotonic() - started
+        finally:
+            release.set()
+            node_contract.stop()
+            reachable.stop()
+
+        self.assertLess(elapsed, 0.1)
+        self.assertTrue(values["comfyReachable"])
+        self.assertEqual(values["nodeContract"], {"ready": True, "requiredClassCount": 1})
+        self.assertEqual(calls[0], 0.2)
+        self.assertTrue(meta["nodeContract"]["overdue"])
+        self.assertFalse(meta["comfyReachable"]["stale"])
+        self.assertEqual(values["queueSummary"], {})
+        self.assertNotIn("queueSummary", meta)
+
+    def test_inline_refresh_is_not_overwritten_by_an_older_background_run(self):
+        release = threading.Event()
+        started = threading.Event()
+        readings = iter(["pre-restart", "post-restart"])
+
+        def reachable(_timeout):
+            value = next(readings)
+            if value == "pre-restart":
+                started.set()
+                release.wait(5)
+            return value
+
+        collector = agent.ProbeCollector("comfyReachable", reachable, interval_seconds=60, timeout_seconds=0.1)
+        background = threading.Thread(target=collector.collect)
+        background.start()
+        self.assertTrue(started.wait(5))
+        collector.collect()
+        time.sleep(0.15)
+        self.assertTrue(collector._has_value.is_set())
+        with mock.patch.object(collector, "running", return_value=True):
+            value, meta = collector.read()
+            self.assertEqual(value, "post-restart")
+            self.assertTrue(meta["overdue"])
+            release.set()
+            background.join(timeout=5)
+            value, meta = collector.read()
+        self.assertEqual(value, "post-restart")
+        self.assertNotIn("overdue", meta)
+
+    def test_failed_refresh_keeps_last_value_and_reports_error(self):
+        results = [{"runningCount": 1}, RuntimeError("queue down")]
+
+        def queue_summary(_timeout):
+            result = results.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        collector = agent.ProbeCollector("queueSummary", queue_summary, interval_seconds=60, timeout_seconds=1)
+        first, first_meta = collector.read()
+        second, second_meta = collector.read()
+        self.assertEqual(first, {"runningCount": 1})
+        self.assertNotIn("error", first_meta)
+        self.assertEqual(second, {"runningCount": 1})
+        self.assertEqual(second_meta["error"], "queue down")
+        self.assertEqual(second_meta["failures"], 1)
+        self.assertEqual(second_meta["refreshedAtMs"], first_meta["refreshedAtMs"])
+
+
+class SqliteStateStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_agent(self):
+        instance = agent.DependencyAgent.__new__(agent.DependencyAgent)
+        instance.state_path = self.root / "dependency_agent_state.json"
+        instance.state_store_kind = "sqlite"
+        instance.state_db_path = self.root / "dependency_agent_state.sqlite3"
+        instance._state_store = None
+        instance._state = instance._load_state()
+        return instance
+
+    def reopen(self):
+        store = agent.SqliteStateStore(self.root / "dependency_agent_state.sqlite3")
+        store.open()
+        try:
+            return store.load()
+        finally:
+            store.close()
+
+    def test_json_state_migrates_on_first_start(self):
+        (self.root / "dependency_agent_state.json").write_text(json.dumps({
+            "installed_static": ["s1"],
+            "installed_dynamic": ["d1"],
+            "failed": [],
+            "lru": {"d1": {"destRelativePath": "models/d1.safetensors", "sizeBytes": 10, "lastTouchedAtMs": 5}},
+            "retry": {},
+            "verified": {"d1": {"destRelativePath": "models/d1.safetensors", "sha256": "AB", "sizeBytes": 10, "mtimeNs": 7}},
+            "node_bundle_verify_class_types_by_bundle": {"bundle": ["NodeA"]},
+        }))
+        first = self.make_agent()
+        self.assertTrue((self.root / "dependency_agent_state.json").exists())
+        self.assertFalse((self.root / "dependency_agent_state.json.migrated").exists())
+        first._state_store.close()
+
+        second = self.make_agent()
+        self.assertEqual(second._state.installed_static, {"s1"})
+        self.assertEqual(second._state.lru["d1"]["sizeBytes"], 10)
+        self.assertEqual(second._state.verified["d1"]["sha256"], "ab")
+        self.assertEqual(second._state.node_bundle_verify_class_types, {"NodeA"})
+
+    def test_interrupted_import_retries_and_json_survives_for_rollback(self):
+        legacy = self.root / "dependency_agent_state.json"
+        legacy.write_text(json.dumps({
+            "installed_dynamic": ["d1"],
+            "lru": {"d1": {"destRelativePath": "models/d1.safetensors", "sizeBytes": 10, "lastTouchedAtMs": 5}},
+        }))
+        with mock.patch.object(agent.SqliteStateStore, "save", side_effect=sqlite3.OperationalError("disk I/O error")):
+            interrupted = self.make_agent()
+        self.assertIsNone(interrupted._state_store)
+        self.assertEqual(interrupted._state.installed_dynamic, {"d1"})
+
+        migrated = self.make_agent()
+        self.assertIsNotNone(migrated._state_store)
+        self.assertEqual(migrated._state.installed_dynamic, {"d1"})
+        migrated._state_store.close()
+
+        rolled_back = agent.DependencyAgent.__new__(agent.DependencyAgent)
+        rolled_back.state_path = legacy
+        rolled_back.state_store_kind = "json"
+        self.assertEqual(rolled_back._load_state().installed_dynamic, {"d1"})
+
+    def test_save_writes_only_changed_records(self):
+        instance = self.make_agent()
+        for index in range(200):
+            dep_id = f"dep{index}"
+            instance._state.lru[dep_id] = {"destRelativePath": f"m/{dep_id}", "sizeBytes": 1, "lastTouchedAtMs": 1}
+            instance._state.installed_dynamic.add(dep_id)
+        self.assertEqual(instance._state_store.save(instance._state), 400)
+
+        instance._state.lru["dep7"]["lastTouchedAtMs"] = 2
+        self.assertEqual(instance._state_store.save(instance._state), 1)
+        self.assertEqual(instance._state_store.save(instance._state), 0)
+
+        instance._state.lru.pop("dep8")
+        instance._state.installed_dynamic.discard("dep8")
+        instance._save_state()
+        data = self.reopen()
+        self.assertEqual(data["lru"]["dep7"]["lastTouchedAtMs"], 2)
+        self.assertNotIn("dep8", data["lru"])
+        self.assertNotIn("dep8", data["installed_dynamic"])
+
+    def run_crash_script(self, mode):
+        return subprocess.run(
+            [sys.executable, "-c", STATE_CRASH_SCRIPT, str(MODULE_PATH), str(self.root / "dependency_agent_state.sqlite3"), mode],
+            capture_output=True,
+            timeout=60,
+        )
+
+    def test_crash_before_commit_keeps_previous_state(self):
+        result = self.run_crash_script("crash")
+        self.assertEqual(result.returncode, 17, result.stderr)
+        data = self.reopen()
+        self.assertEqual(sorted(data["lru"]), ["a", "b", "c"])
+        self.assertEqual(sorted(data["installed_dynamic"]), ["a", "b", "c"])
+
+    def test_committed_multi_record_eviction_survives_crash(self):
+        result = self.run_crash_script("commit")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        data = self.reopen()
+        self.assertEqual(sorted(data["lru"]), ["c"])
+        self.assertEqual(sorted(data["installed_dynamic"]), ["c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
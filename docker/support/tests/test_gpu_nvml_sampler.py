@@ -0,0 +1,174 @@
+import ctypes
+import os
+import sys
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+SUPPORT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SUPPORT_DIR))
+
+import gpu_nvml_sampler  # noqa: E402
+from gpu_nvml_sampler import NvmlSampler  # noqa: E402
+
+
+class FakeNvml:
+    """Pure-Python stand-in for libnvidia-ml that writes through ctypes references."""
+
+    def __init__(self, devices, processes=None, unsupported=(), init_status=0):
+        self.devices = devices
+        self.processes = processes or {}
+        self.unsupported = set(unsupported)
+        self.init_status = init_status
+        self.calls = {}
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        return 3 if name in self.unsupported else 0
+
+    def _device(self, handle):
+        return self.devices[handle.value - 1]
+
+    def nvmlInit_v2(self):
+        return self.init_status
+
+    def nvmlDeviceGetCount_v2(self, count):
+        count._obj.value = len(self.devices)
+        return 0
+
+    def nvmlDeviceGetHandleByIndex_v2(self, index, handle):
+        handle._obj.value = index + 1
+        return 0
+
+    def nvmlDeviceGetName(self, handle, buffer, _size):
+        buffer.value = self._device(handle)["name"].encode()
+        return self._count("nvmlDeviceGetName")
+
+    def nvmlDeviceGetUtilizationRates(self, handle, utilization):
+        utilization._obj.gpu = self._device(handle)["util"]
+        return self._count("nvmlDeviceGetUtilizationRates")
+
+    def nvmlDeviceGetMemoryInfo(self, handle, memory):
+        memory._obj.used = self._device(handle)["used"]
+        memory._obj.total = self._device(handle)["total"]
+        return self._count("nvmlDeviceGetMemoryInfo")
+
+    def nvmlDeviceGetPowerUsage(self, handle, value):
+        value._obj.value = self._device(handle)["power_mw"]
+        return self._count("nvmlDeviceGetPowerUsage")
+
+    def nvmlDeviceGetEnforcedPowerLimit(self, handle, value):
+        value._obj.value = 450_000
+        return self._count("nvmlDeviceGetEnforcedPowerLimit")
+
+    def nvmlDeviceGetTemperature(self, handle, _sensor, value):
+        value._obj.value = 61
+        return self._count("nvmlDeviceGetTemperature")
+
+    def nvmlDeviceGetClockInfo(self, handle, clock_type, value):
+        value._obj.value = 1000 + clock_type
+        return self._count("nvmlDeviceGetClockInfo")
+
+    def nvmlDeviceGetPerformanceState(self, handle, value):
+        value._obj.value = 2
+        return self._count("nvmlDeviceGetPerformanceState")
+
+    def nvmlDeviceGetCurrentClocksThrottleReasons(self, handle, value):
+        value._obj.value = 4
+        return self._count("nvmlDeviceGetCurrentClocksThrottleReasons")
+
+    def nvmlDeviceGetComputeRunningProcesses_v3(self, handle, count, infos):
+        self._count("nvmlDeviceGetComputeRunningProcesses_v3")
+        rows = self.processes.get(handle.value - 1, [])
+        if len(rows) > count._obj.value:
+            count._obj.value = len(rows)
+            return gpu_nvml_sampler.NVML_ERROR_INSUFFICIENT_SIZE
+        for slot, (pid, used) in enumerate(rows):
+            infos[slot].pid = pid
+            infos[slot].usedGpuMemory = used
+        count._obj.value = len(rows)
+        return 0
+
+
+def fake_devices():
+    return [
+        {"name": "NVIDIA RTX 5090", "util": 87, "used": 6 * 1024**3, "total": 32 * 1024**3, "power_mw": 402_500},
+        {"name": "NVIDIA RTX 5090", "util": 3, "used": 1024**3, "total": 32 * 1024**3, "power_mw": 35_000},
+    ]
+
+
+class NvmlSamplerTest(unittest.TestCase):
+    def test_sample_reads_every_device_and_grows_the_process_buffer(self):
+        processes = {0: [(1000 + index, index * 1024**2) for index in range(20)], 1: [(42, 2**64 - 1)]}
+        library = FakeNvml(fake_devices(), processes, unsupported={"nvmlDeviceGetCurrentClocksThrottleReasons"})
+        reading = NvmlSampler(library).sample()
+
+        first, second = reading["devices"]
+        self.assertEqual(first["name"], "NVIDIA RTX 5090")
+        self.assertEqual(first["utilizationGpuPct"], 87.0)
+        self.assertEqual(first["memoryUsedBytes"], 6 * 1024**3)
+        self.assertEqual(first["powerDrawW"], 402.5)
+        self.assertEqual(first["powerLimitW"], 450.0)
+        self.assertEqual((first["graphicsClockMhz"], first["smClockMhz"]), (1000.0, 1001.0))
+        self.assertEqual(first["pstate"], "P2")
+        self.assertNotIn("throttleReasons", first)
+        self.assertEqual(second["utilizationGpuPct"], 3.0)
+        self.assertEqual(len(reading["processes"]), 21)
+        self.assertEqual(reading["processes"][19], {"pid": 1019, "usedBytes": 19 * 1024**2, "device": 0})
+        self.assertEqual(reading["processes"][20], {"pid": 42, "usedBytes": None, "device": 1})
+
+    def test_latest_serves_the_ring_buffer_until_readings_go_stale(self):
+        now = [100.0]
+        library = FakeNvml(fake_devices()[:1])
+        sampler = NvmlSampler(library, history=3, clock=lambda: now[0])
+        for _ in range(5):
+            sampler.sample()
+        self.assertEqual(len(sampler.history()), 3)
+
+        calls = library.calls["nvmlDeviceGetMemoryInfo"]
+        now[0] += 0.2
+        self.assertIs(sampler.latest(max_age_seconds=0.5), sampler.history()[-1])
+        self.assertEqual(library.calls["nvmlDeviceGetMemoryInfo"], calls)
+        now[0] += 1.0
+        fresh = sampler.latest(max_age_seconds=0.5)
+        self.assertEqual(fresh["monotonic"], now[0])
+        self.assertEqual(library.calls["nvmlDeviceGetMemoryInfo"], calls + 1)
+
+    def test_background_thread_keeps_sampling(self):
+        library = FakeNvml(fake_devices()[:1])
+        sampler = NvmlSampler(library, interval_seconds=0.01, history=4).start()
+        try:
+            deadline = time.monotonic() + 5.0
+            while len(sampler.history()) < 4 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            sampler.stop()
+        self.assertEqual(len(sampler.history()), 4)
+        self.assertGreaterEqual(library.calls["nvmlDeviceGetMemoryInfo"], 4)
+
+    def test_shared_sampler_is_none_without_a_working_library(self):
+        self.addCleanup(gpu_nvml_sampler.reset_shared_sampler)
+        gpu_nvml_sampler.reset_shared_sampler()
+        with mock.patch.object(gpu_nvml_sampler, "load_nvml_library", return_value=None):
+            self.assertIsNone(gpu_nvml_sampler.shared_sampler())
+        gpu_nvml_sampler.reset_shared_sampler()
+        self.assertIsNone(gpu_nvml_sampler.shared_sampler(FakeNvml(fake_devices(), init_status=9)))
+        gpu_nvml_sampler.reset_shared_sampler()
+        with mock.patch.dict(os.environ, {"GPU_NVML_DISABLED": "1"}):
+            self.assertIsNone(gpu_nvml_sampler.shared_sampler(FakeNvml(fake_devices())))
+        gpu_nvml_sampler.reset_shared_sampler()
+        sampler = gpu_nvml_sampler.shared_sampler(FakeNvml(fake_devices()))
+        self.assertIsInstance(sampler, NvmlSampler)
+        self.assertIs(gpu_nvml_sampler.shared_sampler(), sampler)
+
+    def test_real_library_loader_tolerates_missing_nvml(self):
+        library = gpu_nvml_sampler.load_nvml_library("/nonexistent/libnvidia-ml.so.1")
+        self.assertIsNone(library)
+        # nvmlProcessInfo_v2_t: pid, padding, usedGpuMemory, gpuInstanceId, computeInstanceId.
+        self.assertEqual(ctypes.sizeof(gpu_nvml_sampler.NvmlProcessInfo), 24)
+
+
+if __name__ == "__main__":
+    unittest.main()
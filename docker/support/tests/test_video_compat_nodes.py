@@ -1,9 +1,13 @@
 import ast
 import importlib.util
+import io
 import json
 import math
+import os
+import shutil
 import subprocess
 import sys
+import time
 import types
 from pathlib import Path
 
@@ -245,6 +249,226 @@ def test_exposure_adjust_uses_bounded_frame_chunks(monkeypatch):
     assert observed_ranges == [(0, 2), (2, 4), (4, 6), (6, 7)]
 
 
+def _reference_blend_rgb24_frame(source, frame, source_weight):
+    source_weight = max(0.0, min(1.0, float(source_weight)))
+    frame_weight = 1.0 - source_weight
+    return bytes(
+        min(255, max(0, int(source[idx] * source_weight + frame[idx] * frame_weight + 0.5)))
+        for idx in range(len(frame))
+    )
+
+
+def test_seam_blend_matches_per_byte_reference_for_whole_batches():
+    module = _load_furgen_video_tools()
+    generator = module.np.random.default_rng(11)
+    source = generator.integers(0, 256, 4 * 6 * 3, dtype=module.np.uint8).tobytes()
+    frames = [generator.integers(0, 256, len(source), dtype=module.np.uint8).tobytes() for _ in range(3)]
+    weights = [0.35, 0.15, 1.7]
+
+    blended = module._blend_rgb24_frames(source, frames, weights)
+
+    assert blended == [
+        _reference_blend_rgb24_frame(source, frame, weight) for frame, weight in zip(frames, weights)
+    ]
+    assert module._blend_rgb24_frame(source, frames[0], 0.5) == _reference_blend_rgb24_frame(source, frames[0], 0.5)
+    assert module._blend_rgb24_frames(b"", frames, weights) == frames
+
+
+class _FakeRawProcess:
+    def __init__(self, stdout=b""):
+        self.stdout = io.BytesIO(stdout)
+        self.stderr = io.BytesIO(b"")
+        self.stdin = io.BytesIO()
+        self.stdin.close = lambda: None
+
+    def wait(self):
+        return 0
+
+
+def test_seam_repair_pipe_blends_only_the_leading_frames_of_later_clips(tmp_path, monkeypatch):
+    module = _load_furgen_video_tools()
+    frame_size = 2 * 2 * 3
+    clips = [
+        bytes([10]) * frame_size + bytes([200]) * frame_size,
+        bytes([0]) * frame_size * 3,
+        bytes([50]) * frame_size,
+    ]
+    decoders = [_FakeRawProcess(clip) for clip in clips]
+    encoder = _FakeRawProcess()
+    processes = iter([encoder, *decoders])
+    monkeypatch.setattr(module.subprocess, "Popen", lambda *args, **kwargs: next(processes))
+    monkeypatch.setattr(module.subprocess, "run", lambda *args, **kwargs: None)
+    monkeypatch.setattr(module.FCSConcatVideos, "_write_concat_audio_track", lambda self, **kwargs: None)
+
+    module.FCSConcatVideos()._concat_videos_with_seam_repair(
+        probes=[{"path": f"clip{index}.mp4"} for index in range(3)],
+        frame_rate=24.0,
+        overlap_frames=1,
+        overlap_seconds=1 / 24,
+        base_width=2,
+        base_height=2,
+        pix_fmt="yuv420p",
+        crf=17,
+        base_path=str(tmp_path / "base.mp4"),
+        audio_path=str(tmp_path / "audio.mp4"),
+        source_weights=[0.5, 0.25],
+    )
+
+    written = encoder.stdin.getvalue()
+    frames = [written[offset:offset + frame_size][0] for offset in range(0, len(written), frame_size)]
+    # Clip 2 blends toward clip 1's last frame; clip 3 has one frame, so only
+    # the first weight applies, toward clip 2's unblended last frame.
+    assert frames == [10, 200, 100, 50, 0, 25]
+
+
+
+def test_seam_repair_pipe_keeps_the_decode_error_when_the_encoder_pipe_also_breaks(tmp_path, monkeypatch):
+    module = _load_furgen_video_tools()
+    frame_size = 2 * 2 * 3
+    encoder = _FakeRawProcess()
+
+    def broken_write(_frame):
+        raise BrokenPipeError("encoder exited")
+
+    encoder.stdin.write = broken_write
+    decoder = _FakeRawProcess(bytes([10]) * frame_size + bytes([20]) * (frame_size - 1))
+    processes = iter([encoder, decoder])
+    monkeypatch.setattr(module.subprocess, "Popen", lambda *args, **kwargs: next(processes))
+
+    with pytest.raises(ValueError, match="short raw frame"):
+        module.FCSConcatVideos()._concat_videos_with_seam_repair(
+            probes=[{"path": "clip0.mp4"}],
+            frame_rate=24.0,
+            overlap_frames=1,
+            overlap_seconds=1 / 24,
+            base_width=2,
+            base_height=2,
+            pix_fmt="yuv420p",
+            crf=17,
+            base_path=str(tmp_path / "base.mp4"),
+            audio_path=str(tmp_path / "audio.mp4"),
+            source_weights=[0.5],
+        )
+
+@pytest.mark.skipif(not os.environ.get("FURGEN_RUN_BENCHMARKS"), reason="set FURGEN_RUN_BENCHMARKS=1")
+def test_benchmark_seam_blend_against_per_byte_reference():
+    module = _load_furgen_video_tools()
+    generator = module.np.random.default_rng(3)
+    frame_size = 1920 * 1080 * 3
+    source = generator.integers(0, 256, frame_size, dtype=module.np.uint8).tobytes()
+    frames = [generator.integers(0, 256, frame_size, dtype=module.np.uint8).tobytes() for _ in range(2)]
+
+    started = time.perf_counter()
+    reference = [_reference_blend_rgb24_frame(source, frames[0], 0.35)]
+    reference_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    blended = module._blend_rgb24_frames(source, frames, [0.35, 0.15])
+    vectorised_seconds = (time.perf_counter() - started) / len(frames)
+
+    print(f"1080p seam blend: per-byte {reference_seconds:.3f}s/frame, vectorised {vectorised_seconds:.4f}s/frame")
+    assert blended[0] == reference[0]
+    assert vectorised_seconds < reference_seconds
+
+
+def test_batched_frame_statistics_match_per_frame_reference():
+    module = _load_furgen_video_tools()
+    torch.manual_seed(3)
+    images = torch.rand(7, 24, 20, 3)
+    luma = module._luma(images)
+
+    for chunk_size in (1, 3, 16):
+        means, stds = module._mean_std_stats_frames(images, max_pixels=97, chunk_size=chunk_size)
+        robust = module._robust_luma_mean_frames(luma, 0.05, 0.9, max_pixels=97, chunk_size=chunk_size)
+        for index in range(images.shape[0]):
+            mean, std = module._mean_std_stats_single(images[index:index + 1], max_pixels=97)
+            assert torch.allclose(means[index:index + 1], mean, atol=1e-6)
+            assert torch.allclose(stds[index:index + 1], std, atol=1e-6)
+            expected = module._robust_luma_mean_single(luma[index:index + 1], 0.05, 0.9, max_pixels=97)
+            assert torch.allclose(robust[index:index + 1], expected, atol=1e-6)
+    assert torch.allclose(
+        module._robust_luma_mean_frames(luma, 0.9, 0.1),
+        luma.mean(dim=(1, 2), keepdim=True),
+        atol=1e-6,
+    )
+
+
+def test_temporal_tone_smooth_matches_per_frame_recurrence():
+    module = _load_furgen_video_tools()
+    torch.manual_seed(4)
+    images = torch.rand(9, 6, 8, 4) * torch.linspace(0.6, 1.0, 9).view(-1, 1, 1, 1)
+    strength, luma_keep, chroma_keep, max_delta = 0.8, 0.65, 0.35, 0.02
+
+    expected = images.clone()
+    smooth_y = smooth_chroma = previous_gain = previous_offset = None
+    for index in range(images.shape[0]):
+        ycbcr = module._rgb_to_ycbcr(images[index:index + 1, ..., :3])
+        current = ycbcr.mean(dim=(1, 2), keepdim=True)
+        if smooth_y is None:
+            smooth_y, smooth_chroma = current[..., 0:1], current[..., 1:3]
+            previous_gain, previous_offset = torch.ones_like(smooth_y), torch.zeros_like(smooth_chroma)
+        else:
+            smooth_y = smooth_y * luma_keep + current[..., 0:1] * (1.0 - luma_keep)
+            smooth_chroma = smooth_chroma * chroma_keep + current[..., 1:3] * (1.0 - chroma_keep)
+        gain = (smooth_y / current[..., 0:1]).clamp(0.25, 4.0)
+        previous_gain = previous_gain + (gain - previous_gain).clamp(-max_delta, max_delta)
+        offset = smooth_chroma - current[..., 1:3]
+        previous_offset = previous_offset + (offset - previous_offset).clamp(-max_delta, max_delta)
+        if index:
+            adjusted = ycbcr.clone()
+            adjusted[..., 0:1] = ycbcr[..., 0:1] * (1.0 + (previous_gain - 1.0) * strength)
+            adjusted[..., 1:3] = ycbcr[..., 1:3] + previous_offset * strength
+            expected[index:index + 1, ..., :3] = module._ycbcr_to_rgb(adjusted).clamp(0.0, 1.0)
+
+    output, = module.FurgenTemporalToneSmooth().smooth(images, strength, luma_keep, chroma_keep, max_delta, True)
+
+    assert torch.equal(output[0], images[0])
+    assert torch.equal(output[..., 3], images[..., 3])
+    assert torch.allclose(output, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize("luma_only", [True, False])
+def test_temporal_unsharp_mask_output_is_independent_of_chunk_size(monkeypatch, luma_only):
+    module = _load_furgen_video_tools()
+    torch.manual_seed(6)
+    images = torch.rand(7, 12, 10, 4)
+    rgb = images[..., :3]
+    detail = rgb - module._gaussian_blur_channel_last(rgb, 1.5)
+    if luma_only:
+        detail = module._threshold_detail(module._luma(detail), 0.01).expand_as(rgb)
+    else:
+        detail = module._threshold_detail(detail, 0.01)
+    correction = detail * 0.8
+    smooth = correction.clone()
+    smooth[0:1] = (correction[0:1] + correction[1:2]) * 0.5
+    smooth[-1:] = (correction[-2:-1] + correction[-1:]) * 0.5
+    smooth[1:-1] = (correction[:-2] + correction[1:-1] + correction[2:]) / 3.0
+    expected = module._restore_channels(images, rgb + correction.lerp(smooth, 0.35))
+
+    for chunk_size in ("1", "2", "3", "64"):
+        monkeypatch.setenv("FURGEN_FRAME_CHUNK_SIZE", chunk_size)
+        output, = module.FurgenTemporalUnsharpMask().sharpen(images, 0.8, 1.5, 0.01, luma_only, 0.35)
+        assert torch.equal(output, expected)
+
+
+def test_chunk_planner_scales_with_available_memory(monkeypatch):
+    module = _load_furgen_video_tools()
+    images = torch.zeros(100, 64, 64, 3)
+    frame_bytes = 64 * 64 * 3 * 4
+    monkeypatch.delenv("FURGEN_FRAME_CHUNK_SIZE", raising=False)
+    monkeypatch.setattr(module, "_available_memory_bytes", lambda device: frame_bytes * 4 * 40)
+    assert module._planned_chunk_size(images, working_copies=4) == 10
+    assert module._planned_chunk_size(images, working_copies=4, halo=1) == 8
+    monkeypatch.setattr(module, "_available_memory_bytes", lambda device: 10**12)
+    assert module._planned_chunk_size(images, working_copies=4) == module.V2_MAX_FRAME_CHUNK_SIZE
+    assert module._planned_chunk_size(images[:3], working_copies=4) == 3
+    monkeypatch.setattr(module, "_available_memory_bytes", lambda device: 1)
+    assert module._planned_chunk_size(images, working_copies=4) == 1
+    monkeypatch.setattr(module, "_available_memory_bytes", lambda device: None)
+    assert module._planned_chunk_size(images, working_copies=4) == module.V2_FRAME_CHUNK_SIZE
+    monkeypatch.setenv("FURGEN_FRAME_CHUNK_SIZE", "5")
+    assert module._planned_chunk_size(images, working_copies=4) == 5
+
+
 def _make_test_video(
     path, size="96x64", duration=1.2, frequency=440, video_track_timescale=None, with_audio=True,
 ):
@@ -337,6 +561,48 @@ def test_video_analysis_coarse_global_motion_and_audio_tail_metrics():
     assert tail["peakRmsTimeSeconds"] >= 1.75
 
 
+def _reference_global_translation(np, previous, current, max_shift=4):
+    height, width = previous.shape
+    best = None
+    for dy in range(-max_shift, max_shift + 1):
+        for dx in range(-max_shift, max_shift + 1):
+            x0, x1 = max(0, dx), min(width, width + dx)
+            y0, y1 = max(0, dy), min(height, height + dy)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            error = float(np.mean(np.abs(previous[y0:y1, x0:x1] - current[y0 - dy:y1 - dy, x0 - dx:x1 - dx])))
+            candidate = (error, dx * dx + dy * dy, dx, dy)
+            if best is None or candidate < best:
+                best = candidate
+    _, _, dx, dy = best or (0.0, 0, 0, 0)
+    return dx, dy, math.hypot(dx, dy)
+
+
+def test_batched_global_translation_matches_brute_force_search():
+    module = _load_furgen_video_tools()
+    np = module.np
+    generator = np.random.default_rng(5)
+    base = generator.random((40, 56)).astype(np.float32)
+    frames = [base]
+    for dx, dy in [(2, -1), (0, 0), (-3, 4), (5, 0)]:
+        frames.append(np.roll(frames[-1], shift=(dy, dx), axis=(0, 1)))
+    frames.append(generator.random((40, 56)).astype(np.float32))
+    frames.append(np.zeros((40, 56), dtype=np.float32))
+    frames.append(np.zeros((40, 56), dtype=np.float32))
+    luma = np.stack(frames)
+
+    for max_shift in (1, 4, 6):
+        expected = [
+            _reference_global_translation(np, luma[index - 1], luma[index], max_shift=max_shift)
+            for index in range(1, len(luma))
+        ]
+        assert module._global_translations(luma, max_shift=max_shift) == expected
+    assert module._global_translations(luma)[:3] == [(-2, 1, math.hypot(2, 1)), (0, 0, 0.0), (3, -4, 5.0)]
+    assert module._global_translations(luma, max_shift=6)[3] == (-5, 0, 5.0)
+    assert module._global_translation(luma[0], luma[1]) == (-2, 1, math.hypot(2, 1))
+    assert module._global_translations(luma[:1]) == []
+
+
 def test_video_analysis_manifest_includes_reference_adherence_and_audio_end_window(tmp_path, monkeypatch):
     module = _load_furgen_video_tools()
     monkeypatch.setattr(module.folder_paths, "get_output_directory", lambda: str(tmp_path))
@@ -361,6 +627,212 @@ def test_video_analysis_manifest_includes_reference_adherence_and_audio_end_wind
     assert end_window["terminal250msPeak"] > 0
 
 
+def _fake_analysis_pipeline(module, tmp_path, monkeypatch):
+    """Route analyze_video through in-memory probe/decode fakes; returns (output_dir, probes, decodes)."""
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    monkeypatch.setattr(module.folder_paths, "get_output_directory", lambda: str(output_dir))
+    monkeypatch.setattr(module.folder_paths, "get_save_image_path", lambda prefix, output: (output, prefix, 0, "", prefix))
+    monkeypatch.setenv("FURGEN_ANALYSIS_CACHE_DIR", str(tmp_path / "cache"))
+    probes, decodes = [], []
+
+    def fake_probe(path, count_frames=True):
+        probes.append((Path(path).name, count_frames))
+        return {
+            "width": 96, "height": 64, "duration_seconds": 1.0, "frame_rate": 24.0, "frame_count": 24,
+            "bitrate": 1000, "has_audio": True, "audio_sample_rate": 48000, "audio_channels": 2,
+        }
+
+    def fake_decode(source, details, duration, proxy_path, storyboard_png, fps=10):
+        decodes.append(source)
+        Path(proxy_path).write_bytes(b"proxy")
+        module.Image.new("RGB", (160, 106), (0, 0, 0)).save(storyboard_png)
+        return {
+            "earlyFrames": module.np.zeros((10, 64, 96, 3), dtype=module.np.uint8),
+            "analysisWidth": 96,
+            "analysisHeight": 64,
+            "frameCount": 25,
+            "samples": module.np.full(48000, 0.25, dtype=module.np.float32),
+            "loudness": {"integratedLoudnessLufs": -14.0, "truePeakDbfs": -1.0},
+        }
+
+    monkeypatch.setattr(module, "_probe_video_details", fake_probe)
+    monkeypatch.setattr(module, "_decode_analysis_streams", fake_decode)
+    return output_dir, probes, decodes
+
+
+def test_video_analysis_decodes_source_once_and_serves_repeats_from_cache(tmp_path, monkeypatch):
+    module = _load_furgen_video_tools()
+    output_dir, probes, decodes = _fake_analysis_pipeline(module, tmp_path, monkeypatch)
+    node = module.FCSAnalyzeVideo()
+    node.analyze_video("source.mp4", "content_abc", "first", True)
+    node.analyze_video("source.mp4", "content_abc", "second", True)
+
+    assert decodes == ["source.mp4"]
+    assert ("source.mp4", True) not in probes
+    first = json.loads((output_dir / "first_00001-analysis.json").read_text())
+    second = json.loads((output_dir / "second_00001-analysis.json").read_text())
+    assert first["source"]["frameCount"] == 25
+    assert first["waveform"]["integratedLoudnessLufs"] == -14.0
+    assert second["cacheKey"] == first["cacheKey"]
+    assert second["proxy"]["filename"] == "second_00001-proxy.mp4"
+    assert second["storyboard"]["filename"] == "second_00001-storyboard.webp"
+    assert (output_dir / "second_00001-proxy.mp4").read_bytes() == b"proxy"
+    assert second["waveform"] == first["waveform"]
+
+    node.analyze_video("source.mp4", "content_changed", "third", True)
+    assert len(decodes) == 2
+
+
+def test_video_analysis_cache_misses_when_a_local_source_is_rewritten_in_place(tmp_path, monkeypatch):
+    module = _load_furgen_video_tools()
+    output_dir, _probes, decodes = _fake_analysis_pipeline(module, tmp_path, monkeypatch)
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"first take")
+    node = module.FCSAnalyzeVideo()
+    node.analyze_video(str(source), "", "first", True)
+    node.analyze_video(str(source), "", "second", True)
+    assert len(decodes) == 1
+
+    stat = os.stat(source)
+    source.write_bytes(b"second take")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    node.analyze_video(str(source), "", "third", True)
+    assert len(decodes) == 2
+    first = json.loads((output_dir / "first_00001-analysis.json").read_text())
+    third = json.loads((output_dir / "third_00001-analysis.json").read_text())
+    assert third["canonicalSourceFingerprint"] != first["canonicalSourceFingerprint"]
+    assert third["cacheKey"] != first["cacheKey"]
+
+
+def test_video_analysis_keys_remote_sources_on_their_etag_and_skips_the_cache_without_one(tmp_path, monkeypatch):
+    module = _load_furgen_video_tools()
+    _output_dir, _probes, decodes = _fake_analysis_pipeline(module, tmp_path, monkeypatch)
+    headers = {"ETag": '"v1"', "Content-Range": "bytes 0-0/1000"}
+    requests = []
+
+    class FakeResponse:
+        def __init__(self):
+            self.headers = dict(headers)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            return False
+
+    def fake_urlopen(request, timeout):
+        requests.append(request.get_header("Range"))
+        return FakeResponse()
+
+    monkeypatch.setattr(module.urllib.request, "urlopen", fake_urlopen)
+    url = "https://cdn.example.com/source.mp4"
+    node = module.FCSAnalyzeVideo()
+    node.analyze_video(url, "", "first", True)
+    node.analyze_video(url, "", "second", True)
+    assert len(decodes) == 1
+    assert requests == ["bytes=0-0", "bytes=0-0"]
+
+    headers["ETag"] = '"v2"'
+    node.analyze_video(url, "", "third", True)
+    assert len(decodes) == 2
+
+    headers.pop("ETag")
+    node.analyze_video(url, "", "fourth", True)
+    node.analyze_video(url, "", "fifth", True)
+    assert len(decodes) == 4
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="requires ffmpeg")
+def test_decode_analysis_streams_fans_one_decode_out_to_every_consumer(tmp_path):
+    module = _load_furgen_video_tools()
+    source = tmp_path / "source.mp4"
+    _make_test_video(source, duration=1.2)
+    details = {"width": 96, "height": 64, "duration_seconds": 1.2, "frame_count": 29, "has_audio": True}
+    proxy = tmp_path / "proxy.mp4"
+    storyboard = tmp_path / "storyboard.png"
+
+    decoded = module._decode_analysis_streams(str(source), details, 1.2, str(proxy), str(storyboard))
+
+    assert proxy.stat().st_size > 0
+    assert storyboard.stat().st_size > 0
+    assert decoded["frameCount"] > 0
+    frames = decoded["earlyFrames"]
+    assert 0 < frames.shape[0] <= 12
+    assert frames.shape[1:] == (decoded["analysisHeight"], decoded["analysisWidth"], 3)
+    assert frames.dtype == module.np.uint8
+    assert decoded["samples"] is not None and len(decoded["samples"]) > 0
+    assert {"integratedLoudnessLufs", "truePeakDbfs"} <= set(decoded["loudness"])
+
+
+def test_video_probes_run_concurrently_and_are_memoised_by_path_size_and_mtime(tmp_path, monkeypatch):
+    module = _load_furgen_video_tools()
+    module._probe_cache.clear()
+    clips = []
+    for index in range(4):
+        clip = tmp_path / f"clip{index}.mp4"
+        clip.write_bytes(b"x" * (index + 1))
+        clips.append(str(clip))
+    calls = []
+    lock = module.threading.Lock()
+    in_flight = {"now": 0, "peak": 0}
+
+    def fake_run(cmd, **kwargs):
+        with lock:
+            calls.append(list(cmd))
+            in_flight["now"] += 1
+            in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        time.sleep(0.05)
+        with lock:
+            in_flight["now"] -= 1
+        index = int(Path(cmd[-1]).stem[-1])
+        payload = {
+            "streams": [{"codec_type": "video", "width": 64 + index, "height": 48, "duration": "2.0"}],
+            "format": {"duration": "2.0"},
+        }
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(payload), stderr="")
+
+    monkeypatch.setattr(module.subprocess, "run", fake_run)
+    first = module._probe_videos(clips)
+    assert [probe["width"] for probe in first] == [64, 65, 66, 67]
+    assert in_flight["peak"] > 1
+    assert module._probe_videos(clips) == first
+    assert len(calls) == 4
+
+    stat = os.stat(clips[2])
+    os.utime(clips[2], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    module._probe_videos(clips)
+    assert [Path(cmd[-1]).name for cmd in calls[4:]] == ["clip2.mp4"]
+
+
+def test_video_detail_probe_only_counts_frames_when_container_metadata_disagrees(tmp_path, monkeypatch):
+    module = _load_furgen_video_tools()
+    module._probe_cache.clear()
+    trusted = tmp_path / "trusted.mp4"
+    suspect = tmp_path / "suspect.mp4"
+    trusted.write_bytes(b"t")
+    suspect.write_bytes(b"s")
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append((Path(cmd[-1]).name, "-count_frames" in cmd))
+        video = {"codec_type": "video", "width": 96, "height": 64, "avg_frame_rate": "24/1", "duration": "2.0"}
+        if Path(cmd[-1]).name == "trusted.mp4":
+            video["nb_frames"] = "48"
+        elif "-count_frames" in cmd:
+            video["nb_read_frames"] = "47"
+        else:
+            video["nb_frames"] = "12"
+        payload = {"streams": [video], "format": {"duration": "2.0"}}
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(payload), stderr="")
+
+    monkeypatch.setattr(module.subprocess, "run", fake_run)
+    assert module._probe_video_details(str(trusted))["frame_count"] == 48
+    assert module._probe_video_details(str(suspect))["frame_count"] == 47
+    assert module._probe_video_details(str(suspect))["frame_count"] == 47
+    assert calls == [("trusted.mp4", False), ("suspect.mp4", False), ("suspect.mp4", True)]
+
+
 def test_precision_video_ducking_depth_is_a_bounded_db_attenuation():
     module = _load_furgen_video_tools()
     assert module._ducking_compressor_options(0) == (0.0, 0.0)
@@ -753,6 +1225,44 @@ def test_furgen_seam_scale_stabilize_reduces_early_zoom_drift():
     assert torch.allclose(stabilized[2], images[2])
 
 
+def test_furgen_seam_scale_stabilize_is_deterministic_across_worker_counts(monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    import numpy as np
+
+    module = _load_furgen_video_tools()
+    rng = np.random.default_rng(99)
+    reference = np.zeros((96, 96, 3), dtype=np.uint8)
+    for _ in range(90):
+        x, y = (int(value) for value in rng.integers(6, 90, size=2))
+        color = tuple(int(v) for v in rng.integers(60, 255, size=3))
+        cv2.circle(reference, (x, y), int(rng.integers(2, 5)), color, -1)
+    frames = [reference]
+    for zoom in (1.06, 1.05, 1.04, 1.03, 1.02, 1.01):
+        offset = (1.0 - zoom) * 48.0
+        matrix = np.array([[zoom, 0.0, offset], [0.0, zoom, offset]], dtype=np.float32)
+        frames.append(cv2.warpAffine(reference, matrix, (96, 96), flags=cv2.INTER_LANCZOS4, borderMode=cv2.BORDER_REPLICATE))
+    images = torch.from_numpy(np.stack(frames).astype(np.float32) / 255.0)
+    calls = []
+    original = module.FurgenSeamScaleStabilize._detect_features
+
+    def counting_detect(cv2_module, frame_u8):
+        calls.append(frame_u8.shape)
+        return original(cv2_module, frame_u8)
+
+    monkeypatch.setattr(module.FurgenSeamScaleStabilize, "_detect_features", staticmethod(counting_detect))
+    outputs = []
+    for workers in (1, 4):
+        monkeypatch.setattr(module, "STABILIZE_WORKERS", workers)
+        calls.clear()
+        stabilized, = module.FurgenSeamScaleStabilize().stabilize(images[:1], images, 3, 4, 1.0, 0.2, 8)
+        outputs.append(stabilized)
+        assert len(calls) == 1 + 6
+
+    assert torch.equal(outputs[0], outputs[1])
+    assert torch.equal(outputs[0][0], images[0])
+    assert not torch.equal(outputs[0][1], images[1])
+
+
 def test_furgen_ltxv_add_latent_guide_temporal_schedule_collapses_for_single_latent_frame():
     module = _load_furgen_video_tools()
 